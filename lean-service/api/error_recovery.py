@@ -10,7 +10,7 @@ from datetime import datetime, timedelta
 import logging
 
 from ..services.error_recovery import ErrorRecoveryManager, ErrorType, RecoveryAction
-from ..services.security_compliance import SecurityComplianceManager
+from ..services.security_compliance import SecurityComplianceManager, get_security_compliance_manager as get_shared_compliance_manager
 from ..database import get_db
 
 # Configure logging
@@ -56,7 +56,8 @@ def get_error_recovery_manager(db = Depends(get_db)) -> ErrorRecoveryManager:
     return ErrorRecoveryManager(db)
 
 def get_security_compliance_manager(db = Depends(get_db)) -> SecurityComplianceManager:
-    return SecurityComplianceManager(db, "your_master_key_here")  # In production, use environment variable
+    # One manager per process: the anomaly detector's state must see every fill
+    return get_shared_compliance_manager(db)
 
 @router.post("/log-error")
 async def log_error(
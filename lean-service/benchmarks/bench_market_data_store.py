@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+TimescaleDB market data benchmark
+Compares the old row-at-a-time path (executemany upsert, one dict of Python
+floats per row on read) against DataBridge's COPY + merge store and
+columnar COPY reads
+
+Bars are written under a dedicated exchange name and deleted afterwards.
+The legacy path is timed on a sample and extrapolated to --bars.
+
+Usage:
+    TIMESCALE_URL=postgresql://... python benchmarks/bench_market_data_store.py
+        [--bars 10000000] [--symbols 100] [--legacy-bars 200000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.backtest_models import TimeFrame
+from services.data_bridge import DataBridge, MARKET_DATA_COLUMNS
+
+BENCH_EXCHANGE = "bench"
+START = datetime(2015, 1, 1, tzinfo=timezone.utc)
+
+LEGACY_UPSERT = f"""
+    INSERT INTO market_data ({', '.join(MARKET_DATA_COLUMNS)})
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
+    ON CONFLICT (time, symbol, exchange, timeframe)
+    DO UPDATE SET {', '.join(f'{c} = EXCLUDED.{c}' for c in MARKET_DATA_COLUMNS[4:])}
+"""
+
+
+def generate_bars(bars: int, symbols: int, offset: int = 0):
+    """Synthetic 1m bars, `symbols` interleaved per minute"""
+    rng = np.random.default_rng(42 + offset)
+    names = [f"BENCH{i}/USDT" for i in range(symbols)]
+    for i in range(offset, offset + bars):
+        minute, symbol = divmod(i, symbols)
+        close = 100.0 + float(rng.standard_normal())
+        yield (
+            START + timedelta(minutes=minute), names[symbol], BENCH_EXCHANGE, TimeFrame.MINUTE_1.value,
+            close - 0.1, close + 0.2, close - 0.2, close, 1000.0, 10, close,
+        )
+
+
+def report(name: str, rows: int, elapsed: float, extrapolate_to: int = 0):
+    line = f"  {name:<28} {rows:>11,} rows  {elapsed:8.2f} s  {rows / elapsed:>12,.0f} rows/s"
+    if extrapolate_to:
+        line += f"  (~{extrapolate_to / (rows / elapsed):,.0f} s for {extrapolate_to:,})"
+    print(line)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bars", type=int, default=10_000_000)
+    parser.add_argument("--symbols", type=int, default=100)
+    parser.add_argument("--legacy-bars", type=int, default=200_000)
+    args = parser.parse_args()
+
+    bridge = DataBridge()
+    pool = await bridge.get_timescale_pool()
+    if pool is None:
+        sys.exit("TIMESCALE_URL is not set")
+
+    symbols = [f"BENCH{i}/USDT" for i in range(args.symbols)]
+    end = START + timedelta(minutes=args.bars // args.symbols + 1)
+
+    try:
+        print("\nwrite")
+        t0 = time.perf_counter()
+        async with pool.acquire() as conn:
+            await conn.executemany(LEGACY_UPSERT, list(generate_bars(args.legacy_bars, args.symbols)))
+        report("executemany upsert", args.legacy_bars, time.perf_counter() - t0, args.bars)
+
+        t0 = time.perf_counter()
+        stored = await bridge.store_bars(generate_bars(args.bars, args.symbols), refresh_rollups=False)
+        report("COPY + merge", stored, time.perf_counter() - t0)
+
+        print("\nread")
+        legacy_end = START + timedelta(minutes=args.legacy_bars // args.symbols)
+        t0 = time.perf_counter()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                f"SELECT {', '.join(MARKET_DATA_COLUMNS)} FROM market_data "
+                "WHERE exchange = $1 AND timeframe = $2 AND time >= $3 AND time <= $4 "
+                "ORDER BY time, symbol, exchange",
+                BENCH_EXCHANGE, TimeFrame.MINUTE_1.value, START, legacy_end
+            )
+        data = [
+            {**dict(row), **{c: float(row[c]) if row[c] is not None else None for c in MARKET_DATA_COLUMNS[4:9]}}
+            for row in rows
+        ]
+        report("fetch -> row dicts", len(data), time.perf_counter() - t0, args.bars)
+        del rows, data
+
+        t0 = time.perf_counter()
+        columns = await bridge.get_market_data(
+            symbols, START, end, TimeFrame.MINUTE_1, exchanges=[BENCH_EXCHANGE]
+        )
+        report("COPY -> NumPy columns", len(columns['time']), time.perf_counter() - t0)
+        print(f"  close mean {np.nanmean(columns['close']):.4f}, "
+              f"{sum(a.nbytes for a in columns.values()) / 1e6:,.0f} MB of arrays")
+    finally:
+        async with pool.acquire() as conn:
+            await conn.execute("DELETE FROM market_data WHERE exchange = $1", BENCH_EXCHANGE)
+        await bridge.close_connections()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Backtest metrics benchmark
+Compares the old per-metric path (a DataFrame per call, returns re-derived
+by every metric, Python loops for drawdown duration) against
+MetricsCalculator on the shared vectorized metrics core
+
+Usage:
+    python benchmarks/bench_metrics.py [--points 500000] [--trades 200000] [--repeat 3]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.metrics_calculator import MetricsCalculator
+
+
+def generate(points: int, trades: int):
+    """Hourly portfolio and benchmark values plus alternating fills on 10 symbols"""
+    rng = np.random.default_rng(42)
+    times = pd.date_range('2015-01-01', periods=points, freq='h').strftime('%Y-%m-%dT%H:%M:%S').tolist()
+    values = 100000 * np.cumprod(1 + rng.normal(0.00002, 0.002, points))
+    benchmark = 100000 * np.cumprod(1 + rng.normal(0.00001, 0.002, points))
+    portfolio_values = [
+        {'time': t, 'value': float(v), 'cash': float(v) * 0.3, 'holdings': {}}
+        for t, v in zip(times, values)
+    ]
+    benchmark_data = [{'time': t, 'value': float(v)} for t, v in zip(times, benchmark)]
+
+    prices = 100 * np.cumprod(1 + rng.normal(0, 0.01, trades))
+    fills = [
+        {
+            'symbol': f"SYM{i % 10}", 'side': 'buy' if (i // 10) % 2 == 0 else 'sell',
+            'quantity': 1.0, 'price': float(prices[i]), 'timestamp': times[i % points],
+            'commission': 0.0, 'order_id': i,
+        }
+        for i in range(trades)
+    ]
+    return fills, portfolio_values, benchmark_data
+
+
+def legacy_metrics(trades, portfolio_values, benchmark_data, risk_free_rate=0.02):
+    """The old calculator's work: each metric re-derives returns from the frame"""
+    portfolio_df = pd.DataFrame(portfolio_values)
+    benchmark_df = pd.DataFrame(benchmark_data)
+    trades_df = pd.DataFrame(trades)
+
+    def returns():
+        portfolio_df['returns'] = portfolio_df['value'].pct_change()
+        return portfolio_df['returns'].dropna()
+
+    def max_drawdown():
+        values = portfolio_df['value'].values
+        drawdown = (values - np.maximum.accumulate(values)) / np.maximum.accumulate(values)
+        longest = current = 0
+        for dd in drawdown:
+            current = current + 1 if dd < 0 else 0
+            longest = max(longest, current)
+        return drawdown.min(), longest
+
+    def annualized():
+        total = portfolio_df.iloc[-1]['value'] / portfolio_df.iloc[0]['value'] - 1
+        years = (pd.to_datetime(portfolio_df.iloc[-1]['time']) - pd.to_datetime(portfolio_df.iloc[0]['time'])).days / 365.25
+        return (1 + total) ** (1 / years) - 1
+
+    result = {'annualized': annualized(), 'cagr': annualized(), 'volatility': returns().std() * np.sqrt(252)}
+    result['max_drawdown'] = max_drawdown()
+    r = returns()
+    result['var'] = (np.percentile(r, 5), np.percentile(r, 1), r[r <= np.percentile(r, 5)].mean())
+    r = returns()
+    result['sharpe'] = np.sqrt(252) * (r - risk_free_rate / 252).mean() / r.std()
+    r = returns()
+    result['sortino'] = np.sqrt(252) * (r - risk_free_rate / 252).mean() / r[r < 0].std()
+    result['calmar'] = annualized() / abs(max_drawdown()[0])
+
+    returns()
+    benchmark_df['returns'] = benchmark_df['value'].pct_change()
+    merged = pd.merge(portfolio_df[['time', 'returns']], benchmark_df[['time', 'returns']],
+                      on='time', suffixes=('_p', '_b')).dropna()
+    result['beta'] = np.cov(merged['returns_p'], merged['returns_b'])[0, 1] / np.var(merged['returns_b'])
+
+    trades_df['pnl'] = 0.0
+    result['trades'] = (len(trades_df[trades_df['pnl'] > 0]), trades_df['quantity'].abs().sum())
+    return result
+
+
+def report(name: str, points: int, elapsed: float):
+    print(f"  {name:<28} {points:>11,} points  {elapsed * 1000:10.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--points', type=int, default=500_000)
+    parser.add_argument('--trades', type=int, default=200_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    trades, portfolio_values, benchmark_data = generate(args.points, args.trades)
+    calculator = MetricsCalculator()
+    print(f"{args.points:,} portfolio points, {args.trades:,} fills")
+
+    def best(fn):
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    report("legacy per-metric", args.points, best(lambda: legacy_metrics(trades, portfolio_values, benchmark_data)))
+    report("metrics core", args.points, best(
+        lambda: asyncio.run(calculator.calculate_metrics(trades, portfolio_values, benchmark_data))
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Risk validation benchmark
+Compares recomputing drawdown, correlation and volatility from price and
+equity history on every trade (the straightforward way to fill in the old
+placeholder checks) against RiskManager.validate_trade reading each
+follower's running FollowerRiskState and the shared EWMA covariance
+
+No external services needed; the history-based path is timed on a sample
+of followers and extrapolated to --followers.
+
+Usage:
+    python benchmarks/bench_risk_validation.py
+        [--followers 10000] [--instruments 50] [--positions 8] [--history 1000]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from services.universal_platform_adapters import TradeSignal, OrderSide, OrderType, Position
+from services.risk_management_system import RiskManager, RiskCalculator
+
+
+def generate_prices(instruments: int, history: int, rng) -> np.ndarray:
+    """Correlated random-walk prices, shape (history, instruments)"""
+    factor = rng.standard_normal((history, 1))
+    # About 35% annualized volatility at one snapshot per minute
+    returns = 0.0005 * (0.6 * factor + 0.8 * rng.standard_normal((history, instruments)))
+    return 100.0 * np.exp(np.cumsum(returns, axis=0))
+
+
+def make_followers(followers: int, symbols, positions: int, prices: np.ndarray, rng):
+    book = []
+    last = prices[-1]
+    for i in range(followers):
+        held = rng.choice(len(symbols), size=positions, replace=False)
+        book.append((
+            f"follower_{i}",
+            [
+                Position(
+                    symbol=symbols[j], side=OrderSide.BUY if j % 2 else OrderSide.SELL,
+                    size=float(rng.uniform(0.1, 2.0)), entry_price=float(prices[0, j]),
+                    current_price=float(last[j]), unrealized_pnl=0.0, realized_pnl=0.0,
+                    leverage=1.0, timestamp=None
+                )
+                for j in held
+            ],
+            (10_000.0 * np.exp(np.cumsum(0.002 * rng.standard_normal(len(prices))))).tolist(),
+        ))
+    return book
+
+
+def signal_for(symbols, rng) -> TradeSignal:
+    symbol = symbols[int(rng.integers(len(symbols)))]
+    return TradeSignal(
+        symbol=symbol, side=OrderSide.BUY, quantity=0.01, price=100.0,
+        order_type=OrderType.MARKET, leverage=1.0
+    )
+
+
+def history_checks(signal, positions, equity_curve, price_history):
+    """Drawdown, correlation and volatility recomputed from history"""
+    drawdown = RiskCalculator.calculate_max_drawdown(equity_curve)
+    target = price_history[signal.symbol]
+    max_correlation = 0.0
+    for position in positions:
+        if position.symbol == signal.symbol:
+            max_correlation = 1.0
+            break
+        correlation = np.corrcoef(target, price_history[position.symbol])[0, 1]
+        max_correlation = max(max_correlation, abs(correlation))
+    returns = np.diff(np.log(target))
+    volatility = np.std(returns) * np.sqrt(365 * 24 * 60)
+    return drawdown, max_correlation, volatility
+
+
+def report(name: str, followers: int, elapsed: float, extrapolate_to: int = 0):
+    line = f"  {name:<34} {followers:>8,} trades  {elapsed:8.3f} s  {elapsed / followers * 1e6:>9,.1f} us/trade"
+    if extrapolate_to:
+        line += f"  (~{extrapolate_to * elapsed / followers:,.2f} s for {extrapolate_to:,})"
+    print(line)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--followers", type=int, default=10_000)
+    parser.add_argument("--instruments", type=int, default=50)
+    parser.add_argument("--positions", type=int, default=8)
+    parser.add_argument("--history", type=int, default=1000)
+    parser.add_argument("--legacy-followers", type=int, default=1000)
+    args = parser.parse_args()
+    # Circuit breaker warnings for followers that trip limits
+    logging.disable(logging.WARNING)
+
+    rng = np.random.default_rng(42)
+    symbols = [f"BENCH{i}/USDT" for i in range(args.instruments)]
+    prices = generate_prices(args.instruments, args.history, rng)
+    book = make_followers(args.followers, symbols, args.positions, prices, rng)
+    signals = [signal_for(symbols, rng) for _ in book]
+
+    print(f"\n{args.followers:,} followers, {args.instruments} instruments, "
+          f"{args.positions} positions each, {args.history} price snapshots")
+
+    price_history = {symbol: prices[:, j] for j, symbol in enumerate(symbols)}
+    sample = min(args.legacy_followers, len(book))
+    t0 = time.perf_counter()
+    for (_, positions, equity_curve), signal in zip(book[:sample], signals):
+        history_checks(signal, positions, equity_curve, price_history)
+    report("recompute from history", sample, time.perf_counter() - t0, args.followers)
+
+    manager = RiskManager()
+    # One snapshot per EWMA period, ending now
+    period = manager.covariance.period_seconds
+    start = time.time() - len(prices) * period
+    t0 = time.perf_counter()
+    for i, row in enumerate(prices):
+        manager.update_prices(dict(zip(symbols, row.tolist())), now=start + i * period)
+    print(f"  EWMA covariance warm-up: {args.history:,} snapshots in {time.perf_counter() - t0:.3f} s")
+
+    for (follower_id, _, equity_curve), _ in zip(book, signals):
+        state = manager.get_follower_state(follower_id)
+        for equity in equity_curve[-50:]:
+            state.mark(equity)
+
+    t0 = time.perf_counter()
+    violations = Counter()
+    for (follower_id, positions, equity_curve), signal in zip(book, signals):
+        _, found = await manager.validate_trade(follower_id, signal, positions, equity_curve[-1])
+        violations.update(violation.violation_type.value for violation in found)
+    report("validate_trade (running state)", len(book), time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(
+        manager.validate_trade(follower_id, signal, positions, equity_curve[-1])
+        for (follower_id, positions, equity_curve), signal in zip(book, signals)
+    ))
+    report("validate_trade, all at once", len(book), time.perf_counter() - t0)
+    rejected = sum(not ok for ok, _ in results)
+    print(f"  rejected {rejected:,} / {len(book):,}; first pass violations: {dict(violations)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
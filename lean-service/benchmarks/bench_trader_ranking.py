@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Master trader ranking benchmark
+Compares per-trader PerformanceCalculator metrics plus one
+calculate_overall_score call per profile against CohortMetrics (padded
+days x traders array, column-wise metrics) and vectorized scoring, both
+for a full load and for the daily update
+
+No external services needed; the per-trader path is timed on a sample
+and extrapolated to --traders.
+
+Usage:
+    python benchmarks/bench_trader_ranking.py
+        [--traders 10000] [--days 756] [--legacy-traders 500]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.master_trader_discovery import (
+    CohortMetrics, MasterTraderRanker, MasterTraderProfile, PerformanceCalculator,
+    RankingCriteria, StrategyType, RiskLevel, VerificationStatus
+)
+
+
+def generate_series(traders: int, days: int, rng):
+    """Daily returns with track records from 30 days to the full window"""
+    lengths = rng.integers(30, days + 1, size=traders)
+    drift = rng.normal(0.0005, 0.001, size=traders)
+    vol = rng.uniform(0.005, 0.04, size=traders)
+    return {
+        f"trader_{i}": (drift[i] + vol[i] * rng.standard_normal(lengths[i])).tolist()
+        for i in range(traders)
+    }
+
+
+def make_profiles(trader_ids, rng):
+    profiles = []
+    for trader_id in trader_ids:
+        profile = MasterTraderProfile(
+            id=trader_id, user_id=trader_id, profile_name=trader_id,
+            strategy_type=StrategyType.SWING, risk_level=RiskLevel.MODERATE,
+            verification_status=VerificationStatus.VERIFIED
+        )
+        perf = profile.performance
+        perf.win_rate = float(rng.uniform(0.3, 0.8))
+        perf.profit_factor = float(rng.uniform(0.5, 3.0))
+        perf.max_consecutive_losses = int(rng.integers(0, 15))
+        perf.follower_count = int(rng.integers(0, 2000))
+        perf.average_rating = float(rng.uniform(0, 5))
+        perf.total_assets_managed = float(rng.uniform(0, 2e6))
+        profiles.append(profile)
+    return profiles
+
+
+def legacy_metrics(profile, returns):
+    """The per-trader path: list-based metrics written into the profile"""
+    calc = PerformanceCalculator
+    perf = profile.performance
+    equity = np.cumprod(1 + np.array(returns)).tolist()
+    perf.max_drawdown = calc.calculate_max_drawdown(equity)
+    perf.sharpe_ratio = calc.calculate_sharpe_ratio(returns)
+    perf.sortino_ratio = calc.calculate_sortino_ratio(returns)
+    perf.calmar_ratio = calc.calculate_calmar_ratio(returns, perf.max_drawdown)
+    perf.annualized_return = np.mean(returns) * 252
+    perf.volatility = calc.calculate_volatility(returns)
+    perf.var_95 = calc.calculate_var(returns, 0.95)
+    perf.var_99 = calc.calculate_var(returns, 0.99)
+    perf.expected_shortfall = calc.calculate_expected_shortfall(returns, 0.95)
+    perf.consistency_score = calc.calculate_consistency_score(returns)
+
+
+def report(name: str, traders: int, elapsed: float, extrapolate_to: int = 0):
+    line = f"  {name:<38} {traders:>8,} traders  {elapsed:8.3f} s"
+    if extrapolate_to:
+        line += f"  (~{extrapolate_to * elapsed / traders:,.2f} s for {extrapolate_to:,})"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--traders", type=int, default=10_000)
+    parser.add_argument("--days", type=int, default=756)
+    parser.add_argument("--legacy-traders", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    series = generate_series(args.traders, args.days, rng)
+    profiles = make_profiles(series.keys(), rng)
+    ranker = MasterTraderRanker()
+    criteria = RankingCriteria()
+    print(f"\n{args.traders:,} traders, up to {args.days} daily returns each")
+
+    sample = profiles[:args.legacy_traders]
+    t0 = time.perf_counter()
+    for profile in sample:
+        legacy_metrics(profile, series[profile.id])
+    for profile in sample:
+        profile.performance.overall_score = ranker.calculate_overall_score(profile, criteria)
+    sorted(sample, key=lambda p: p.performance.overall_score, reverse=True)
+    report("per-trader metrics + scores", len(sample), time.perf_counter() - t0, args.traders)
+
+    cohort = CohortMetrics(window_days=args.days)
+    t0 = time.perf_counter()
+    cohort.load(series)
+    cohort.metrics()
+    report("cohort load + metrics", args.traders, time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    cohort.apply_to(profiles)
+    ranked = ranker.rank_profiles(profiles, criteria)
+    report("apply to profiles + vectorized rank", args.traders, time.perf_counter() - t0)
+
+    days = 5
+    t0 = time.perf_counter()
+    for _ in range(days):
+        cohort.append_day(dict(zip(cohort.trader_ids, rng.normal(0, 0.02, len(cohort)).tolist())))
+        cohort.metrics()
+        cohort.apply_to(profiles)
+        ranked = ranker.rank_profiles(profiles, criteria)
+    report("daily update + re-rank (per day)", args.traders, (time.perf_counter() - t0) / days)
+    print(f"  top trader {ranked[0].id}: score {ranked[0].performance.overall_score:.1f}, "
+          f"sharpe {ranked[0].performance.sharpe_ratio:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ import json
 
 from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from pydantic import BaseModel, Field, validator
 import docker
@@ -24,8 +25,12 @@ import structlog
 
 from services.data_bridge import DataBridge
 from services.backtest_engine import BacktestEngine
+from services.lean_runner import LeanJobCancelled
 from services.metrics_calculator import MetricsCalculator
 from services.exchange_service import ExchangeService
+from services.write_behind import close_write_behind
+from services.exchange_registry import close_exchange_registry
+from services.security_compliance import start_security_compliance
 from models.backtest_models import (
     BacktestRequest, BacktestResponse, BacktestStatus, 
     BacktestResult, MarketDataRequest, ExchangeCredentials
@@ -129,6 +134,12 @@ async def startup_event():
     else:
         logger.warning("Docker not available - backtest features will be limited")
     
+    # Pre-start warm Lean workers; backtests use cold containers until they are up
+    asyncio.create_task(backtest_engine.start())
+    
+    # Rebuild fill anomaly detection from the audit trail
+    asyncio.create_task(start_security_compliance())
+    
     logger.info("Service startup completed")
 
 @app.on_event("shutdown")
@@ -136,15 +147,17 @@ async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("Shutting down QuantConnect Lean Backtesting Service")
     
-    # Cleanup active backtests
-    for job_id, backtest_info in active_backtests_storage.items():
-        if backtest_info.get("status") == "running":
-            try:
-                container = docker_client.containers.get(job_id)
-                container.stop(timeout=10)
-                logger.info("Stopped backtest container", job_id=job_id)
-            except Exception as e:
-                logger.error("Failed to stop container", job_id=job_id, error=str(e))
+    # Stop running backtest containers
+    await backtest_engine.close()
+    
+    # Flush queued trade/reconciliation rows
+    await close_write_behind()
+    
+    # Close pooled exchange clients and their HTTP sessions
+    await close_exchange_registry()
+    
+    # Close the TimescaleDB pool
+    await data_bridge.close_connections()
     
     logger.info("Service shutdown completed")
 
@@ -259,6 +272,55 @@ async def get_backtest_status(
         completed_at=backtest_info.get("completed_at")
     )
 
+@app.get("/backtest/{job_id}/events")
+async def stream_backtest_events(
+    job_id: str,
+    user_id: str = Depends(security_manager.get_user_id)
+):
+    """
+    Stream a backtest's progress, trades and equity points via SSE as they happen
+    """
+    if job_id not in active_backtests_storage:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Backtest not found"
+        )
+    
+    backtest_info = active_backtests_storage[job_id]
+    
+    # Check user ownership
+    if backtest_info["user_id"] != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access denied"
+        )
+    
+    async def events():
+        snapshot = {"type": "status", "job_id": job_id, "status": backtest_info["status"], "progress": backtest_info.get("progress", 0)}
+        yield f"data: {json.dumps(snapshot)}\n\n"
+        if backtest_info["status"] not in ("pending", "running"):
+            return
+        
+        queue = backtest_engine.runner.subscribe(job_id)
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield f"data: {json.dumps(event, default=str)}\n\n"
+        finally:
+            backtest_engine.runner.unsubscribe(job_id, queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
 @app.get("/backtests")
 async def list_backtests(
     user_id: str = Depends(security_manager.get_user_id),
@@ -320,15 +382,14 @@ async def cancel_backtest(
         )
     
     try:
-        # Stop Docker container if running
-        if backtest_info["status"] == "running":
-            container = docker_client.containers.get(job_id)
-            container.stop(timeout=10)
-        
-        # Update status
+        # Update status first so the background job reports the cancel, not a failure
         backtest_info["status"] = "cancelled"
         backtest_info["completed_at"] = datetime.utcnow()
         
+        # Stop the Docker container if queued or running
+        await backtest_engine.cancel_backtest(job_id)
+        backtest_engine.runner.finish(job_id, {"type": "status", "status": "cancelled"})
+        
         active_backtests.dec()
         
         # Log audit event
@@ -398,6 +459,9 @@ async def execute_backtest(
     start_time = datetime.utcnow()
     
     try:
+        if active_backtests_storage[job_id]["status"] == "cancelled":
+            return
+        
         # Update status to running
         active_backtests_storage[job_id]["status"] = "running"
         active_backtests_storage[job_id]["started_at"] = start_time
@@ -417,41 +481,68 @@ async def execute_backtest(
         if not market_data:
             raise Exception("No market data available for the specified symbols and date range")
         
-        # Prepare Lean configuration
-        logger.info("Preparing Lean configuration", job_id=job_id)
-        active_backtests_storage[job_id]["progress"] = 20
+        # Identical earlier runs (same code, parameters, data and engine) are served from the cache
+        cache_key = await backtest_engine.result_cache_key(request, market_data)
         
-        lean_config = await backtest_engine.prepare_lean_config(
-            request=request,
-            market_data=market_data,
-            job_id=job_id
-        )
+        async def run_lean() -> Dict[str, Any]:
+            # Prepare Lean configuration
+            logger.info("Preparing Lean configuration", job_id=job_id)
+            active_backtests_storage[job_id]["progress"] = 20
         
-        # Run Lean backtest
-        logger.info("Running Lean backtest", job_id=job_id)
-        active_backtests_storage[job_id]["progress"] = 30
+            lean_config = await backtest_engine.prepare_lean_config(
+                request=request,
+                market_data=market_data,
+                job_id=job_id
+            )
         
-        lean_results = await backtest_engine.run_lean_backtest(
-            config=lean_config,
-            job_id=job_id
-        )
+            if active_backtests_storage[job_id]["status"] == "cancelled":
+                await backtest_engine.release_lean_config(lean_config)
+                raise LeanJobCancelled(job_id)
+        
+            # Run Lean backtest
+            logger.info("Running Lean backtest", job_id=job_id)
+            active_backtests_storage[job_id]["progress"] = 30
         
-        # Calculate metrics
-        logger.info("Calculating metrics", job_id=job_id)
-        active_backtests_storage[job_id]["progress"] = 80
+            def on_lean_event(event: Dict[str, Any]):
+                # Lean's own progress covers 30-80% of the job
+                if event["type"] == "progress":
+                    active_backtests_storage[job_id]["progress"] = 30 + int(event["progress"] * 50)
+                elif event["type"] == "trade":
+                    active_backtests_storage[job_id]["trade_count"] = event["trade_count"]
         
-        metrics = await metrics_calculator.calculate_metrics(
-            trades=lean_results.get("trades", []),
-            portfolio_values=lean_results.get("portfolio_values", []),
-            benchmark_data=lean_results.get("benchmark_data", [])
+            lean_results = await backtest_engine.run_lean_backtest(
+                config=lean_config,
+                job_id=job_id,
+                on_event=on_lean_event
+            )
+        
+            # Calculate metrics
+            logger.info("Calculating metrics", job_id=job_id)
+            active_backtests_storage[job_id]["progress"] = 80
+        
+            metrics = await metrics_calculator.calculate_metrics(
+                trades=lean_results.get("trades", []),
+                portfolio_values=lean_results.get("portfolio_values", []),
+                benchmark_data=lean_results.get("benchmark_data", [])
+            )
+        
+            return {
+                "trades": lean_results.get("trades", []),
+                "portfolio_values": lean_results.get("portfolio_values", []),
+                "metrics": metrics
+            }
+        
+        cached_results, cache_hit = await backtest_engine.result_cache.get_or_compute(
+            cache_key, run_lean, bypass=request.bypass_cache
         )
+        if cache_hit:
+            logger.info("Backtest served from result cache", job_id=job_id)
         
         # Store results
         results = {
-            "trades": lean_results.get("trades", []),
-            "portfolio_values": lean_results.get("portfolio_values", []),
-            "metrics": metrics,
+            **cached_results,
             "config": request.dict(),
+            "cached": cache_hit,
             "execution_time": (datetime.utcnow() - start_time).total_seconds()
         }
         
@@ -472,10 +563,15 @@ async def execute_backtest(
         backtest_requests.labels(status="completed").inc()
         backtest_duration.observe(results["execution_time"])
         active_backtests.dec()
+        backtest_engine.runner.finish(job_id, {"type": "status", "status": "completed", "progress": 100})
         
         logger.info("Backtest completed successfully", job_id=job_id, execution_time=results["execution_time"])
         
     except Exception as e:
+        if active_backtests_storage[job_id]["status"] == "cancelled":
+            logger.info("Backtest cancelled", job_id=job_id)
+            return
+        
         logger.error("Backtest failed", error=str(e), job_id=job_id)
         
         active_backtests_storage[job_id]["status"] = "failed"
@@ -493,6 +589,7 @@ async def execute_backtest(
         
         backtest_requests.labels(status="failed").inc()
         active_backtests.dec()
+        backtest_engine.runner.finish(job_id, {"type": "status", "status": "failed", "error": str(e)})
 
 if __name__ == "__main__":
     import uvicorn
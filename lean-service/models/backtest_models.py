@@ -60,6 +60,9 @@ class BacktestRequest(BaseModel):
     max_drawdown_limit: Optional[float] = Field(0.2, ge=0, le=1, description="Maximum drawdown limit")
     position_sizing: Optional[str] = Field("equal", description="Position sizing method")
     
+    # Ignore a cached result of an identical earlier run (the new result replaces it)
+    bypass_cache: bool = Field(False, description="Run even if an identical backtest is cached")
+    
     @validator('end_date')
     def end_date_must_be_after_start_date(cls, v, values):
         if 'start_date' in values and v <= values['start_date']:
@@ -182,6 +185,7 @@ class LeanConfig(BaseModel):
     results_folder: str = Field(..., description="Results folder path")
     config_file: str = Field(..., description="Configuration file path")
     parameters: Dict[str, Any] = Field(..., description="Strategy parameters")
+    data_key: Optional[str] = Field(None, description="Market data store key")
 
 class LeanResults(BaseModel):
     """Model for Lean backtest results"""
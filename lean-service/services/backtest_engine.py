@@ -6,15 +6,21 @@ import asyncio
 import json
 import logging
 import os
-import tempfile
+import shutil
 import uuid
-from datetime import datetime, date
+from datetime import date
 from typing import Dict, List, Any, Optional
 import docker
-import pandas as pd
 import numpy as np
 
 from models.backtest_models import BacktestRequest, LeanConfig, LeanResults, Trade, PortfolioValue
+from services.lean_runner import LeanJobRunner, LeanJob, EventCallback
+from services.lean_worker_pool import (
+    LeanWorkerPool, LEAN_JOBS_ROOT, LEAN_JOBS_MOUNT, LEAN_DATA_MOUNT,
+    CONTAINER_DATA_ROOT, CONTAINER_JOB_PATH
+)
+from services.market_data_store import MarketDataStore
+from services.result_cache import ResultCache, make_key, fingerprint_files
 
 logger = logging.getLogger(__name__)
 
@@ -29,10 +35,54 @@ class BacktestEngine:
             logger.warning(f"Docker not available: {e}. Backtests requiring Docker will fail.")
             self.docker_client = None
             self.docker_available = False
+        self.runner = LeanJobRunner(self.docker_client)
         self.lean_image = "quantconnect/lean:latest"
-        self.data_folder = "/app/data"
-        self.results_folder = "/app/results"
-        self.strategies_folder = "/app/strategies"
+        self.data_store = MarketDataStore()
+        self.worker_pool = LeanWorkerPool(self.docker_client, self.lean_image)
+        self.jobs_root = LEAN_JOBS_ROOT
+        self.result_cache = ResultCache()
+        # The generated strategy wrapper lives in this module; cached results
+        # also carry metrics, so their code moves the version too
+        services_dir = os.path.dirname(os.path.abspath(__file__))
+        self._wrapper_version = fingerprint_files([
+            os.path.join(services_dir, name)
+            for name in ("backtest_engine.py", "metrics_calculator.py", "metrics_core.py")
+        ])
+    
+    async def start(self):
+        """Start the warm Lean worker pool"""
+        try:
+            await self.worker_pool.start()
+        except Exception as e:
+            logger.warning(f"Lean worker pool unavailable, using cold containers: {e}")
+    
+    async def engine_version(self) -> str:
+        """Lean image id plus the strategy wrapper version"""
+        def image_id() -> str:
+            if self.docker_client is None:
+                return "no-docker"
+            try:
+                return self.docker_client.images.get(self.lean_image).id
+            except Exception as e:
+                logger.debug(f"Could not resolve {self.lean_image}: {e}")
+                return self.lean_image
+        
+        image = await asyncio.get_event_loop().run_in_executor(None, image_id)
+        return f"{image}:{self._wrapper_version}"
+    
+    async def result_cache_key(
+        self,
+        request: BacktestRequest,
+        market_data: List[Dict[str, Any]]
+    ) -> str:
+        """Result cache key for a request over the given bars"""
+        params = request.dict(exclude={'name', 'description', 'strategy_code', 'bypass_cache'})
+        return make_key(
+            request.strategy_code,
+            params,
+            await self.data_store.fingerprint(market_data),
+            await self.engine_version()
+        )
     
     async def prepare_lean_config(
         self,
@@ -40,35 +90,40 @@ class BacktestEngine:
         market_data: List[Dict[str, Any]],
         job_id: str
     ) -> LeanConfig:
-        """Prepare Lean configuration and data files"""
+        """
+        Prepare Lean configuration and data files
+
+        Market data comes from the shared content-addressed store (written
+        only if no earlier job used the same bars); the job folder holds just
+        the strategy, config and results. Call release_lean_config() when done.
+        """
         logger.info(f"Preparing Lean configuration for job {job_id}")
         
+        job_dir = os.path.join(self.jobs_root, job_id)
+        data_key = None
         try:
-            # Create temporary directories
-            temp_dir = tempfile.mkdtemp(prefix=f"lean_backtest_{job_id}_")
-            data_dir = os.path.join(temp_dir, "data")
-            results_dir = os.path.join(temp_dir, "results")
-            strategies_dir = os.path.join(temp_dir, "strategies")
+            results_dir = os.path.join(job_dir, "results")
+            strategies_dir = os.path.join(job_dir, "strategies")
             
-            os.makedirs(data_dir, exist_ok=True)
             os.makedirs(results_dir, exist_ok=True)
             os.makedirs(strategies_dir, exist_ok=True)
             
-            # Prepare market data files
-            await self._prepare_market_data_files(market_data, data_dir)
+            # Shared read-only market data
+            data_key = await self.data_store.acquire(market_data)
             
             # Prepare strategy file
             strategy_file = await self._prepare_strategy_file(request, strategies_dir, job_id)
             
             # Prepare Lean configuration
-            config_file = await self._prepare_lean_config_file(request, temp_dir, job_id)
+            config_file = await self._prepare_lean_config_file(request, job_dir, job_id, data_key)
             
             return LeanConfig(
                 job_id=job_id,
                 strategy_code=request.strategy_code,
-                data_folder=data_dir,
+                data_folder=self.data_store.path(data_key),
                 results_folder=results_dir,
                 config_file=config_file,
+                data_key=data_key,
                 parameters={
                     "start-date": request.start_date.strftime("%Y%m%d"),
                     "end-date": request.end_date.strftime("%Y%m%d"),
@@ -88,54 +143,11 @@ class BacktestEngine:
             
         except Exception as e:
             logger.error(f"Failed to prepare Lean configuration: {e}")
+            if data_key is not None:
+                self.data_store.release(data_key)
+            shutil.rmtree(job_dir, ignore_errors=True)
             raise
     
-    async def _prepare_market_data_files(
-        self,
-        market_data: List[Dict[str, Any]],
-        data_dir: str
-    ):
-        """Prepare market data files for Lean"""
-        logger.info("Preparing market data files")
-        
-        # Group data by symbol and exchange
-        data_by_symbol = {}
-        for record in market_data:
-            key = f"{record['symbol']}_{record['exchange']}"
-            if key not in data_by_symbol:
-                data_by_symbol[key] = []
-            data_by_symbol[key].append(record)
-        
-        # Create data files for each symbol
-        for key, records in data_by_symbol.items():
-            symbol, exchange = key.split('_', 1)
-            
-            # Create symbol directory
-            symbol_dir = os.path.join(data_dir, "crypto", exchange, symbol.lower())
-            os.makedirs(symbol_dir, exist_ok=True)
-            
-            # Convert to DataFrame and sort by time
-            df = pd.DataFrame(records)
-            df = df.sort_values('time')
-            
-            # Create hourly data file
-            hourly_file = os.path.join(symbol_dir, "hour.csv")
-            df.to_csv(hourly_file, index=False, header=False)
-            
-            # Create daily data file (aggregate from hourly)
-            daily_df = df.set_index('time').resample('D').agg({
-                'open': 'first',
-                'high': 'max',
-                'low': 'min',
-                'close': 'last',
-                'volume': 'sum'
-            }).dropna()
-            
-            daily_file = os.path.join(symbol_dir, "daily.csv")
-            daily_df.to_csv(daily_file, index=False, header=False)
-            
-            logger.info(f"Created data files for {symbol} on {exchange}")
-    
     async def _prepare_strategy_file(
         self,
         request: BacktestRequest,
@@ -150,6 +162,7 @@ class BacktestEngine:
 # Auto-generated strategy for job {job_id}
 from AlgorithmImports import *
 from datetime import datetime, timedelta
+import json
 import pandas as pd
 import numpy as np
 
@@ -221,9 +234,14 @@ class InstitutionalStrategy(QCAlgorithm):
             'time': self.Time,
             'value': current_value,
             'cash': self.Portfolio.Cash,
-            'holdings': {{symbol: holding.Quantity for symbol, holding in self.Portfolio.items()}},
+            'holdings': {{str(symbol): holding.Quantity for symbol, holding in self.Portfolio.items()}},
             'drawdown': self.current_drawdown
         }})
+        # Streamed to the service as the backtest runs
+        self.Debug("Portfolio update: " + json.dumps(self.portfolio_values[-1], default=str))
+        elapsed = (self.Time - self.StartDate).total_seconds()
+        total = max((self.EndDate - self.StartDate).total_seconds(), 1)
+        self.Debug(f"Backtest progress: {{elapsed / total:.4f}}")
         
         # Execute user's rebalancing logic
         self.ExecuteStrategy()
@@ -254,7 +272,7 @@ class InstitutionalStrategy(QCAlgorithm):
                 'order_id': orderEvent.OrderId
             }}
             self.trades.append(trade)
-            self.Debug(f"Trade executed: {{trade}}")
+            self.Debug("Trade executed: " + json.dumps(trade, default=str))
     
     def OnEndOfAlgorithm(self):
         '''Called at the end of the algorithm'''
@@ -267,8 +285,7 @@ class InstitutionalStrategy(QCAlgorithm):
         }}
         
         # Write results to file
-        import json
-        with open('/app/results/backtest_results.json', 'w') as f:
+        with open('{CONTAINER_JOB_PATH}/results/backtest_results.json', 'w') as f:
             json.dump(results, f, default=str)
         
         self.Debug(f"Algorithm completed. Final value: {{self.Portfolio.TotalPortfolioValue}}")
@@ -284,8 +301,9 @@ class InstitutionalStrategy(QCAlgorithm):
     async def _prepare_lean_config_file(
         self,
         request: BacktestRequest,
-        temp_dir: str,
-        job_id: str
+        job_dir: str,
+        job_id: str,
+        data_key: str
     ) -> str:
         """Prepare Lean configuration file"""
         logger.info("Preparing Lean configuration file")
@@ -293,10 +311,10 @@ class InstitutionalStrategy(QCAlgorithm):
         config = {
             "environment": "backtesting",
             "algorithm-type-name": f"strategy_{job_id}",
-            "algorithm-location": f"/app/strategies/strategy_{job_id}.py",
+            "algorithm-location": f"{CONTAINER_JOB_PATH}/strategies/strategy_{job_id}.py",
             "algorithm-language": "Python",
-            "data-folder": "/app/data",
-            "results-destination-folder": "/app/results",
+            "data-folder": f"{CONTAINER_DATA_ROOT}/{data_key}",
+            "results-destination-folder": f"{CONTAINER_JOB_PATH}/results",
             "debugging": True,
             "debugging-method": "LocalCmdline",
             "log-handler": "ConsoleLogHandler",
@@ -332,7 +350,7 @@ class InstitutionalStrategy(QCAlgorithm):
             }
         }
         
-        config_file = os.path.join(temp_dir, "config.json")
+        config_file = os.path.join(job_dir, "config.json")
         with open(config_file, 'w') as f:
             json.dump(config, f, indent=2)
         
@@ -341,52 +359,61 @@ class InstitutionalStrategy(QCAlgorithm):
     async def run_lean_backtest(
         self,
         config: LeanConfig,
-        job_id: str
+        job_id: str,
+        on_event: Optional[EventCallback] = None
     ) -> Dict[str, Any]:
-        """Run Lean backtest in Docker container"""
+        """
+        Run Lean backtest on a warm worker, or in a fresh Docker container
+        when none is idle
+
+        The job is scheduled on the shared runner; trades, equity points
+        and progress are passed to `on_event` (and the job's subscribers) as
+        the log is written. The job folder is removed afterwards.
+        """
         logger.info(f"Running Lean backtest for job {job_id}")
         
+        # Every Lean container sees only its own job, always at the same path
+        job_path = CONTAINER_JOB_PATH
+        environment = {
+            "PYTHONPATH": f"{job_path}/strategies",
+            "LEAN_DATA_FOLDER": f"{CONTAINER_DATA_ROOT}/{config.data_key}",
+            "LEAN_RESULTS_FOLDER": f"{job_path}/results"
+        }
+        
         try:
-            # Prepare volumes
+            if not os.path.isabs(LEAN_JOBS_MOUNT):
+                # A named volume can only be mounted whole, which would expose every job
+                raise RuntimeError(f"LEAN_JOBS_MOUNT must be a host path, got {LEAN_JOBS_MOUNT!r}")
+            # Data store read-only; only this job's folder is writable
             volumes = {
-                config.data_folder: {'bind': '/app/data', 'mode': 'rw'},
-                config.results_folder: {'bind': '/app/results', 'mode': 'rw'},
-                os.path.dirname(config.config_file): {'bind': '/app/config', 'mode': 'rw'},
-                os.path.dirname(config.strategy_code): {'bind': '/app/strategies', 'mode': 'rw'}
+                LEAN_DATA_MOUNT: {'bind': CONTAINER_DATA_ROOT, 'mode': 'ro'},
+                os.path.join(LEAN_JOBS_MOUNT, job_id): {'bind': job_path, 'mode': 'rw'},
             }
             
-            # Run Lean container
-            container = self.docker_client.containers.run(
+            job = await self.runner.run(
+                job_id,
                 self.lean_image,
-                command=[
-                    "dotnet", "QuantConnect.Lean.Launcher.dll",
-                    "--config", "/app/config/config.json"
-                ],
-                volumes=volumes,
-                detach=True,
-                name=f"lean_backtest_{job_id}",
-                mem_limit="4g",
-                cpu_count=2,
-                environment={
-                    "PYTHONPATH": "/app/strategies",
-                    "LEAN_DATA_FOLDER": "/app/data",
-                    "LEAN_RESULTS_FOLDER": "/app/results"
-                }
+                {
+                    'command': [
+                        "dotnet", "QuantConnect.Lean.Launcher.dll",
+                        "--config", f"{job_path}/config.json"
+                    ],
+                    'volumes': volumes,
+                    'name': f"lean_backtest_{job_id}",
+                    'mem_limit': "4g",
+                    'cpu_count': 2,
+                    'environment': environment
+                },
+                on_event=on_event,
+                worker_pool=self.worker_pool,
+                worker_request={'config': f"{job_path}/config.json", 'env': environment},
+                job_dir=os.path.join(self.jobs_root, job_id)
             )
             
-            logger.info(f"Started Lean container {container.id} for job {job_id}")
-            
-            # Wait for completion
-            result = container.wait(timeout=3600)  # 1 hour timeout
-            
-            # Get logs
-            logs = container.logs().decode('utf-8')
-            
             # Parse results
-            results = await self._parse_lean_results(config.results_folder, logs)
-            
-            # Cleanup container
-            container.remove()
+            results = await asyncio.get_event_loop().run_in_executor(
+                None, self._parse_lean_results, config.results_folder, job
+            )
             
             logger.info(f"Lean backtest completed for job {job_id}")
             return results
@@ -394,11 +421,31 @@ class InstitutionalStrategy(QCAlgorithm):
         except Exception as e:
             logger.error(f"Failed to run Lean backtest: {e}")
             raise
+        finally:
+            await self.release_lean_config(config)
+    
+    async def release_lean_config(self, config: LeanConfig):
+        """Drop the job folder and release its market data set"""
+        if config.data_key is not None:
+            self.data_store.release(config.data_key)
+            config.data_key = None
+        await asyncio.get_event_loop().run_in_executor(
+            None, shutil.rmtree, os.path.join(self.jobs_root, config.job_id), True
+        )
     
-    async def _parse_lean_results(
+    async def cancel_backtest(self, job_id: str) -> bool:
+        """Stop a queued or running backtest container"""
+        return await self.runner.cancel(job_id)
+    
+    async def close(self):
+        """Stop running backtests and the warm worker pool"""
+        await self.runner.close()
+        await self.worker_pool.close()
+    
+    def _parse_lean_results(
         self,
         results_folder: str,
-        logs: str
+        job: LeanJob
     ) -> Dict[str, Any]:
         """Parse Lean backtest results"""
         logger.info("Parsing Lean backtest results")
@@ -407,7 +454,7 @@ class InstitutionalStrategy(QCAlgorithm):
             "trades": [],
             "portfolio_values": [],
             "benchmark_data": [],
-            "logs": logs
+            "logs": job.parser.tail
         }
         
         try:
@@ -418,61 +465,14 @@ class InstitutionalStrategy(QCAlgorithm):
                     lean_results = json.load(f)
                     results.update(lean_results)
             
-            # Parse trades from logs if available
+            # Fall back to what was parsed from the log stream
             if not results["trades"]:
-                results["trades"] = self._parse_trades_from_logs(logs)
+                results["trades"] = job.parser.trades
             
-            # Parse portfolio values from logs if available
             if not results["portfolio_values"]:
-                results["portfolio_values"] = self._parse_portfolio_values_from_logs(logs)
+                results["portfolio_values"] = job.parser.portfolio_values
             
         except Exception as e:
             logger.error(f"Failed to parse Lean results: {e}")
         
         return results
-    
-    def _parse_trades_from_logs(self, logs: str) -> List[Dict[str, Any]]:
-        """Parse trades from Lean logs"""
-        trades = []
-        
-        # Look for trade execution patterns in logs
-        lines = logs.split('\n')
-        for line in lines:
-            if "Trade executed:" in line:
-                try:
-                    # Extract trade data from log line
-                    # This is a simplified parser - in production, use proper JSON logging
-                    trade_data = line.split("Trade executed:")[-1].strip()
-                    if trade_data.startswith('{') and trade_data.endswith('}'):
-                        trade = json.loads(trade_data)
-                        trades.append(trade)
-                except:
-                    continue
-        
-        return trades
-    
-    def _parse_portfolio_values_from_logs(self, logs: str) -> List[Dict[str, Any]]:
-        """Parse portfolio values from Lean logs"""
-        portfolio_values = []
-        
-        # Look for portfolio value patterns in logs
-        lines = logs.split('\n')
-        for line in lines:
-            if "Portfolio value:" in line or "Total portfolio value:" in line:
-                try:
-                    # Extract portfolio value data from log line
-                    # This is a simplified parser - in production, use proper JSON logging
-                    value_str = line.split(":")[-1].strip()
-                    value = float(value_str.replace(',', ''))
-                    
-                    portfolio_values.append({
-                        'time': datetime.now(),  # Approximate timestamp
-                        'value': value,
-                        'cash': 0,  # Would need to parse from logs
-                        'holdings': {},
-                        'drawdown': 0
-                    })
-                except:
-                    continue
-        
-        return portfolio_values
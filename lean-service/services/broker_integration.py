@@ -13,6 +13,7 @@ import aiohttp
 import ccxt.pro as ccxt
 
 from utils.security import SecurityUtils
+from services.exchange_registry import get_exchange_registry
 from utils.monitoring import broker_connections, broker_errors, broker_latency
 
 logger = logging.getLogger(__name__)
@@ -104,23 +105,24 @@ class BrokerIntegrationService:
                 logger.error(f"Unsupported exchange: {exchange_name}")
                 return False
             
-            # Create exchange client
-            exchange_class = getattr(ccxt, exchange_name)
-            client = exchange_class({
-                'apiKey': api_key,
-                'secret': api_secret,
-                'sandbox': sandbox,
-                'enableRateLimit': True,
-                'options': {
-                    'defaultType': 'spot'  # Start with spot trading
-                }
-            })
+            # Shared client for this account (markets from the shared cache)
+            registry = get_exchange_registry()
+            client = await registry.acquire(
+                exchange_name,
+                {'apiKey': api_key, 'secret': api_secret},
+                sandbox=sandbox,
+                config={'options': {'defaultType': 'spot'}},  # Start with spot trading
+            )
             
             # Test connection
-            await client.load_markets()
             balance = await client.fetch_balance()
             
-            # Store client
+            # Store client (held until cleanup)
+            previous = self.exchange_clients.get(exchange_name)
+            if previous is not client:
+                if previous is not None:
+                    registry.release(previous)
+                registry.hold(client)
             self.exchange_clients[exchange_name] = client
             
             # Initialize rate limiting
@@ -449,17 +451,14 @@ class BrokerIntegrationService:
     async def test_connection(self, exchange_name: str, api_key: str, api_secret: str) -> Dict[str, Any]:
         """Test connection to an exchange"""
         try:
-            # Create temporary client for testing
-            exchange_class = getattr(ccxt, exchange_name.lower())
-            client = exchange_class({
-                'apiKey': api_key,
-                'secret': api_secret,
-                'enableRateLimit': True,
-                'sandbox': True  # Use sandbox for testing
-            })
+            # Shared sandbox client for testing (closed by the registry when idle)
+            client = await get_exchange_registry().acquire(
+                exchange_name,
+                {'apiKey': api_key, 'secret': api_secret},
+                sandbox=True
+            )
             
             # Test connection
-            await client.load_markets()
             balance = await client.fetch_balance()
             
             return {
@@ -482,10 +481,10 @@ class BrokerIntegrationService:
     async def cleanup(self):
         """Cleanup resources"""
         try:
-            # Close all exchange clients
+            # Return exchange clients to the shared registry
+            registry = get_exchange_registry()
             for client in self.exchange_clients.values():
-                if hasattr(client, 'close'):
-                    await client.close()
+                registry.release(client)
             
             self.exchange_clients.clear()
             self.rate_limits.clear()
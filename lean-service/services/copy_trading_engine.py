@@ -6,8 +6,11 @@ Real-time trade synchronization and execution system
 import asyncio
 import json
 import logging
+import os
+import time
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
@@ -17,9 +20,19 @@ from sqlalchemy.orm import sessionmaker
 
 from utils.security import SecurityUtils
 from utils.monitoring import copy_trades_executed, copy_trades_failed, sync_errors
+from services.write_behind import get_write_behind
+from services.exchange_registry import get_exchange_registry
+from services.risk_management_system import risk_manager
+from services.security_compliance import get_security_compliance_manager
+from services.universal_platform_adapters import OrderSide
 
 logger = logging.getLogger(__name__)
 
+# Max (exchange, symbol) lanes replaying concurrently per sync
+COPY_SYNC_MAX_LANES = int(os.getenv('COPY_SYNC_MAX_LANES', '32'))
+# Fallback pacing when a client doesn't report ccxt's rateLimit (ms between requests)
+DEFAULT_RATE_LIMIT_MS = 100
+
 class TradeStatus(Enum):
     PENDING = "pending"
     SENT = "sent"
@@ -55,6 +68,74 @@ class ExecutionResult:
     error_message: Optional[str] = None
     execution_time: Optional[datetime] = None
 
+class TokenBucket:
+    """
+    Async token bucket: `rate` requests per second, bursts up to `capacity`
+    
+    The default capacity of 1 matches ccxt's own throttler (no bursts above
+    the exchange's advertised rate).
+    """
+    
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    @classmethod
+    def for_client(cls, client: Any) -> "TokenBucket":
+        """Bucket matching a ccxt client's rateLimit (milliseconds between requests)"""
+        rate_limit_ms = getattr(client, 'rateLimit', None) or DEFAULT_RATE_LIMIT_MS
+        return cls(1000.0 / rate_limit_ms)
+    
+    async def acquire(self):
+        """Wait for one token (waiters are served in arrival order)"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class ExchangeExecutionStats:
+    """Throughput and order latency for one exchange during a sync"""
+    
+    def __init__(self):
+        self.started = time.monotonic()
+        self.last_order = self.started
+        self.orders = 0
+        self.failures = 0
+        self.total_latency_ms = 0.0
+        self.latencies: deque = deque(maxlen=1000)
+    
+    def record(self, latency_ms: float, success: bool):
+        self.orders += 1
+        self.last_order = time.monotonic()
+        if not success:
+            self.failures += 1
+        self.total_latency_ms += latency_ms
+        self.latencies.append(latency_ms)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        elapsed = max(self.last_order - self.started, 1e-9)
+        ordered = sorted(self.latencies)
+        
+        def percentile(q: float) -> Optional[float]:
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2) if ordered else None
+        
+        return {
+            "orders": self.orders,
+            "failures": self.failures,
+            "orders_per_second": round(self.orders / elapsed, 3),
+            "mean_latency_ms": round(self.total_latency_ms / self.orders, 2) if self.orders else None,
+            "p50_latency_ms": percentile(0.50),
+            "p95_latency_ms": percentile(0.95),
+        }
+
 class CopyTradingEngine:
     """Main copy trading engine for real-time trade synchronization"""
     
@@ -67,14 +148,26 @@ class CopyTradingEngine:
         self.engine = create_engine(db_url)
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
         
-        # Exchange clients cache
+        # Batched, non-blocking persistence for trade execution logs
+        self.persistence = get_write_behind(db_url, self.engine)
+        
+        # Exchange clients held from the shared registry, by linked exchange account id
         self.exchange_clients: Dict[str, ccxt.Exchange] = {}
         
         # Active sync tasks
         self.active_syncs: Dict[str, asyncio.Task] = {}
         
-        # Rate limiting
-        self.rate_limits: Dict[str, Dict[str, Any]] = {}
+        # Rate limiting: one token bucket per linked exchange account
+        self.rate_limiters: Dict[str, TokenBucket] = {}
+        
+        # Per-config, per-exchange execution stats of the current/last sync
+        self.sync_stats: Dict[str, Dict[str, ExchangeExecutionStats]] = {}
+        
+        # Shared running risk state (follower exposure, instrument covariance)
+        self.risk_manager = risk_manager
+        
+        # Fill audit trail and streaming anomaly detection (created on first fill)
+        self.compliance = None
         
         logger.info("Copy Trading Engine initialized")
 
@@ -184,22 +277,35 @@ class CopyTradingEngine:
                 logger.warning(f"No trades found in backtest {backtest.id}")
                 return
             
-            # Process each trade
+            # Apply risk limits
+            executable = []
             for trade in trades:
-                try:
-                    await self._execute_trade_on_exchanges(
-                        config_id, config, trade, exchanges
-                    )
-                    
-                    # Rate limiting
-                    await asyncio.sleep(0.1)  # 100ms between trades
-                    
-                except Exception as e:
-                    logger.error(f"Error executing trade {trade}: {e}")
-                    sync_errors.labels(error_type='execution').inc()
-                    continue
+                if self._check_risk_limits(config, trade):
+                    executable.append(trade)
+                else:
+                    logger.warning(f"Trade {trade.symbol} {trade.side} failed risk checks")
+            
+            # One lane per (exchange, symbol): order is kept within a symbol,
+            # independent symbols and exchanges replay concurrently
+            lanes: Dict[Tuple[Any, str], Tuple[Any, List[TradeSignal]]] = {}
+            for exchange in exchanges:
+                for trade in executable:
+                    lanes.setdefault((exchange.id, trade.symbol), (exchange, []))[1].append(trade)
+            
+            stats = self.sync_stats[config_id] = {}
+            semaphore = asyncio.Semaphore(COPY_SYNC_MAX_LANES)
+            
+            async def run_lane(exchange: Any, lane: List[TradeSignal]):
+                async with semaphore:
+                    for trade in lane:
+                        await self._execute_paced(config_id, config, trade, exchange, stats)
             
-            logger.info(f"Completed trade sync for config {config_id}")
+            await asyncio.gather(*(run_lane(exchange, lane) for exchange, lane in lanes.values()))
+            
+            logger.info(
+                f"Completed trade sync for config {config_id}: "
+                + ", ".join(f"{name} {s.orders} orders at {s.to_dict()['orders_per_second']}/s" for name, s in stats.items())
+            )
             
         except asyncio.CancelledError:
             logger.info(f"Trade sync cancelled for config {config_id}")
@@ -248,38 +354,71 @@ class CopyTradingEngine:
         
         return trades
 
-    async def _execute_trade_on_exchanges(
-        self, 
-        config_id: str, 
-        config: Any, 
-        trade: TradeSignal, 
-        exchanges: List[Any]
+    async def _execute_paced(
+        self,
+        config_id: str,
+        config: Any,
+        trade: TradeSignal,
+        exchange: Any,
+        stats: Dict[str, ExchangeExecutionStats]
     ):
-        """Execute a trade on all target exchanges"""
-        
-        # Apply risk limits
-        if not self._check_risk_limits(config, trade):
-            logger.warning(f"Trade {trade.symbol} {trade.side} failed risk checks")
+        """Execute one trade on one exchange within that account's rate limit"""
+        try:
+            client = await self._get_exchange_client(exchange)
+            if client is not None:
+                limiter = self.rate_limiters.get(exchange.id)
+                if limiter is None:
+                    limiter = self.rate_limiters[exchange.id] = TokenBucket.for_client(client)
+                await limiter.acquire()
+            
+            started = time.perf_counter()
+            result = await self._execute_trade_on_exchange(
+                config_id, trade, exchange, config
+            )
+            exchange_stats = stats.get(exchange.exchange_name)
+            if exchange_stats is None:
+                exchange_stats = stats[exchange.exchange_name] = ExchangeExecutionStats()
+            exchange_stats.record((time.perf_counter() - started) * 1000, result.success)
+            
+            # Log the trade execution
+            await self._log_trade_execution(config_id, trade, exchange, result)
+            
+            if result.success:
+                copy_trades_executed.labels(exchange=exchange.exchange_name).inc()
+                self._record_fill(trade, exchange, result)
+            else:
+                copy_trades_failed.labels(exchange=exchange.exchange_name).inc()
+                
+        except Exception as e:
+            logger.error(f"Error executing trade {trade} on {exchange.exchange_name}: {e}")
+            sync_errors.labels(error_type='execution').inc()
+            copy_trades_failed.labels(exchange=exchange.exchange_name).inc()
+
+    def _record_fill(self, trade: TradeSignal, exchange: Any, result: ExecutionResult):
+        """Apply a filled copy trade to the follower's risk state, the audit trail and the anomaly detector"""
+        price = result.filled_price or trade.price
+        if not result.filled_quantity or not price:
             return
+        try:
+            self.risk_manager.record_fill(
+                exchange.user_id, trade.symbol, OrderSide(trade.side.lower()),
+                float(result.filled_quantity), float(price)
+            )
+        except Exception as e:
+            logger.error(f"Error recording fill of {trade.symbol} for risk state: {e}")
         
-        # Execute on each exchange
-        for exchange in exchanges:
-            try:
-                result = await self._execute_trade_on_exchange(
-                    config_id, trade, exchange, config
-                )
-                
-                # Log the trade execution
-                await self._log_trade_execution(config_id, trade, exchange, result)
-                
-                if result.success:
-                    copy_trades_executed.labels(exchange=exchange.exchange_name).inc()
-                else:
-                    copy_trades_failed.labels(exchange=exchange.exchange_name).inc()
-                    
-            except Exception as e:
-                logger.error(f"Error executing trade on {exchange.exchange_name}: {e}")
-                copy_trades_failed.labels(exchange=exchange.exchange_name).inc()
+        try:
+            if self.compliance is None:
+                self.compliance = get_security_compliance_manager(self.engine, persistence=self.persistence)
+            anomalies = self.compliance.record_fill(
+                exchange.user_id, trade.symbol, exchange.exchange_name, trade.side,
+                float(result.filled_quantity), float(price),
+                timestamp=result.execution_time
+            )
+            for anomaly in anomalies:
+                logger.warning(f"Anomaly for user {exchange.user_id}: {anomaly['description']}")
+        except Exception as e:
+            logger.error(f"Error auditing fill of {trade.symbol}: {e}")
 
     def _check_risk_limits(self, config: Any, trade: TradeSignal) -> bool:
         """Check if trade passes risk limits"""
@@ -383,33 +522,29 @@ class CopyTradingEngine:
             return trade
 
     async def _get_exchange_client(self, exchange: Any) -> Optional[ccxt.Exchange]:
-        """Get or create exchange client"""
+        """Get the shared exchange client for a linked exchange account"""
+        client = self.exchange_clients.get(exchange.id)
+        if client is not None:
+            return client
+        
         try:
-            exchange_name = exchange.exchange_name.lower()
-            
-            if exchange_name in self.exchange_clients:
-                return self.exchange_clients[exchange_name]
-            
             # Decrypt credentials
             api_key = self.security_utils.decrypt_data(exchange.api_key_encrypted)
             api_secret = self.security_utils.decrypt_data(exchange.api_secret_encrypted)
             
-            # Create exchange client
-            exchange_class = getattr(ccxt, exchange_name)
-            client = exchange_class({
-                'apiKey': api_key,
-                'secret': api_secret,
-                'enableRateLimit': True,
-                'options': {
+            # Concurrent lanes get the same client; markets come from the shared cache
+            client = await get_exchange_registry().acquire(
+                exchange.exchange_name,
+                {'apiKey': api_key, 'secret': api_secret},
+                config={'options': {
                     'defaultType': 'future' if exchange.exchange_type == 'futures' else 'spot'
-                }
-            })
-            
-            # Test connection
-            await client.load_markets()
-            
-            self.exchange_clients[exchange_name] = client
-            return client
+                }},
+            )
+            if exchange.id not in self.exchange_clients:
+                # Held until cleanup(); another lane may have registered it meanwhile
+                get_exchange_registry().hold(client)
+                self.exchange_clients[exchange.id] = client
+            return self.exchange_clients[exchange.id]
             
         except Exception as e:
             logger.error(f"Error creating exchange client for {exchange.exchange_name}: {e}")
@@ -422,36 +557,21 @@ class CopyTradingEngine:
         exchange: Any, 
         result: ExecutionResult
     ):
-        """Log trade execution to database"""
+        """Queue the trade execution log row (written behind, off the trade path)"""
         try:
-            with self.SessionLocal() as session:
-                session.execute(
-                    text("""
-                        INSERT INTO copy_trades (
-                            user_id, source_backtest_id, target_exchange_id,
-                            symbol, side, quantity, price, status,
-                            exchange_order_id, error_message, created_at
-                        ) VALUES (
-                            :user_id, :source_backtest_id, :target_exchange_id,
-                            :symbol, :side, :quantity, :price, :status,
-                            :exchange_order_id, :error_message, :created_at
-                        )
-                    """),
-                    {
-                        "user_id": exchange.user_id,
-                        "source_backtest_id": trade.source_backtest_id,
-                        "target_exchange_id": exchange.id,
-                        "symbol": trade.symbol,
-                        "side": trade.side,
-                        "quantity": trade.quantity,
-                        "price": trade.price,
-                        "status": TradeStatus.FILLED.value if result.success else TradeStatus.FAILED.value,
-                        "exchange_order_id": result.order_id,
-                        "error_message": result.error_message,
-                        "created_at": result.execution_time or datetime.now()
-                    }
-                )
-                session.commit()
+            self.persistence.enqueue("copy_trades", {
+                "user_id": exchange.user_id,
+                "source_backtest_id": trade.source_backtest_id,
+                "target_exchange_id": exchange.id,
+                "symbol": trade.symbol,
+                "side": trade.side,
+                "quantity": trade.quantity,
+                "price": trade.price,
+                "status": TradeStatus.FILLED.value if result.success else TradeStatus.FAILED.value,
+                "exchange_order_id": result.order_id,
+                "error_message": result.error_message,
+                "created_at": result.execution_time or datetime.now()
+            })
                 
         except Exception as e:
             logger.error(f"Error logging trade execution: {e}")
@@ -484,7 +604,10 @@ class CopyTradingEngine:
                     "total_trades": config.total_trades or 0,
                     "successful_trades": config.successful_trades or 0,
                     "failed_trades": config.failed_trades or 0,
-                    "is_active": config_id in self.active_syncs
+                    "is_active": config_id in self.active_syncs,
+                    "execution": {
+                        name: stats.to_dict() for name, stats in self.sync_stats.get(config_id, {}).items()
+                    }
                 }
                 
         except Exception as e:
@@ -530,10 +653,11 @@ class CopyTradingEngine:
             # Wait for tasks to complete
             await asyncio.gather(*self.active_syncs.values(), return_exceptions=True)
             
-            # Close exchange clients
+            # Return exchange clients to the shared registry
+            registry = get_exchange_registry()
             for client in self.exchange_clients.values():
-                if hasattr(client, 'close'):
-                    await client.close()
+                registry.release(client)
+            self.exchange_clients.clear()
             
             logger.info("Copy trading engine cleanup completed")
             
@@ -1,29 +1,139 @@
 """
 Data bridge service for fetching market data from various sources
+
+- TimescaleDB access goes through an asyncpg connection pool
+- Bars are bulk-loaded with COPY into a per-transaction staging table and
+  merged into market_data with one INSERT ... ON CONFLICT per chunk
+- Queries stream out with COPY and come back as NumPy column arrays (or a
+  pyarrow Table), not one Python dict per row
+- Only base-resolution bars (MARKET_DATA_BASE_TIMEFRAME) are stored; higher
+  timeframes are read from TimescaleDB continuous aggregates, using the
+  coarsest one the requested timeframe can be built from, and fetched from
+  the source at the requested timeframe where stored bars don't cover them
 """
 
 import asyncio
+import io
+import itertools
 import logging
-from datetime import datetime, date, timedelta
-from typing import List, Dict, Any, Optional
+from datetime import datetime, date, time as dt_time, timedelta, timezone
+from typing import List, Dict, Any, Optional, Iterable, Tuple
 import pandas as pd
 import numpy as np
-import ccxt
 import asyncpg
 from polygon import RESTClient
 import os
 import json
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+    pa_csv = None
+
 from models.backtest_models import MarketDataRequest, TimeFrame, ExchangeType
+from services.exchange_registry import get_exchange_registry
 
 logger = logging.getLogger(__name__)
 
+TIMESCALE_POOL_MIN_SIZE = int(os.getenv('TIMESCALE_POOL_MIN_SIZE', '2'))
+TIMESCALE_POOL_MAX_SIZE = int(os.getenv('TIMESCALE_POOL_MAX_SIZE', '10'))
+MARKET_DATA_COPY_CHUNK = int(os.getenv('MARKET_DATA_COPY_CHUNK', '250000'))
+
+MARKET_DATA_COLUMNS = (
+    'time', 'symbol', 'exchange', 'timeframe', 'open', 'high', 'low', 'close',
+    'volume', 'trade_count', 'vwap'
+)
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'vwap')
+
+# Bars stored in market_data. The continuous aggregates in
+# scripts/setup-timescaledb.sql are built from '1m' bars; keep the two in sync.
+MARKET_DATA_BASE_TIMEFRAME = TimeFrame(os.getenv('MARKET_DATA_BASE_TIMEFRAME', '1m'))
+
+# timeframe -> continuous aggregate, finest first (each one rolls up the previous)
+MARKET_DATA_ROLLUPS = {
+    TimeFrame.MINUTE_5: 'market_data_5m_rollup',
+    TimeFrame.MINUTE_15: 'market_data_15m_rollup',
+    TimeFrame.HOUR_1: 'market_data_1h_rollup',
+    TimeFrame.HOUR_4: 'market_data_4h_rollup',
+    TimeFrame.DAY_1: 'market_data_1d_rollup',
+}
+
+TIMEFRAME_INTERVALS = {
+    TimeFrame.MINUTE_1: '1 minute',
+    TimeFrame.MINUTE_5: '5 minutes',
+    TimeFrame.MINUTE_15: '15 minutes',
+    TimeFrame.MINUTE_30: '30 minutes',
+    TimeFrame.HOUR_1: '1 hour',
+    TimeFrame.HOUR_4: '4 hours',
+    TimeFrame.HOUR_8: '8 hours',
+    TimeFrame.HOUR_12: '12 hours',
+    TimeFrame.DAY_1: '1 day',
+    TimeFrame.WEEK_1: '1 week',
+    TimeFrame.MONTH_1: '1 month',
+}
+
+TIMEFRAME_SECONDS = {
+    TimeFrame.MINUTE_1: 60,
+    TimeFrame.MINUTE_5: 300,
+    TimeFrame.MINUTE_15: 900,
+    TimeFrame.MINUTE_30: 1800,
+    TimeFrame.HOUR_1: 3600,
+    TimeFrame.HOUR_4: 14400,
+    TimeFrame.HOUR_8: 28800,
+    TimeFrame.HOUR_12: 43200,
+    TimeFrame.DAY_1: 86400,
+    TimeFrame.WEEK_1: 604800,
+}
+
+
+def can_roll_up(source: TimeFrame, target: TimeFrame) -> bool:
+    """Whether `target` bars can be built exactly from `source` bars"""
+    if source == target:
+        return True
+    if source == TimeFrame.MONTH_1:
+        return False
+    if target == TimeFrame.MONTH_1:
+        # Months are whole UTC days
+        return 86400 % TIMEFRAME_SECONDS[source] == 0
+    return (
+        TIMEFRAME_SECONDS[target] > TIMEFRAME_SECONDS[source]
+        and TIMEFRAME_SECONDS[target] % TIMEFRAME_SECONDS[source] == 0
+    )
+
+
+def _as_datetime(value: date, end: bool = False) -> datetime:
+    """Dates become the start (or end) of that UTC day"""
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return datetime.combine(value, dt_time.max if end else dt_time.min, tzinfo=timezone.utc)
+
+# One bar in MARKET_DATA_COLUMNS order
+BarRecord = Tuple[Any, ...]
+
+
+def _empty_market_data_columns() -> Dict[str, np.ndarray]:
+    columns = {
+        'time': np.array([], dtype='datetime64[us]'),
+        'symbol': np.array([], dtype=object),
+        'exchange': np.array([], dtype=object),
+        'timeframe': np.array([], dtype=object),
+        'trade_count': np.array([], dtype=np.int64),
+    }
+    columns.update({name: np.array([], dtype=np.float64) for name in PRICE_COLUMNS})
+    return {name: columns[name] for name in MARKET_DATA_COLUMNS}
+
+
 class DataBridge:
     """Service for fetching and managing market data"""
     
     def __init__(self):
         self.polygon_client = None
-        self.timescale_connection = None
+        self.timescale_pool: Optional[asyncpg.Pool] = None
+        self._pool_lock = asyncio.Lock()
+        # Continuous aggregates found missing in the database (queries fall back to finer data)
+        self._missing_rollups = set()
         self.exchanges = {}
         self._initialize_clients()
     
@@ -43,7 +153,7 @@ class DataBridge:
             logger.error(f"Failed to initialize clients: {e}")
     
     def _initialize_ccxt_exchanges(self):
-        """Initialize CCXT exchange clients"""
+        """Register CCXT exchange accounts (clients come from the shared registry on first use)"""
         exchange_configs = {
             'binance': {
                 'apiKey': os.getenv('BINANCE_API_KEY'),
@@ -68,20 +178,38 @@ class DataBridge:
         
         for exchange_name, config in exchange_configs.items():
             if config.get('apiKey') and config.get('secret'):
-                try:
-                    exchange_class = getattr(ccxt, exchange_name)
-                    self.exchanges[exchange_name] = exchange_class(config)
-                    logger.info(f"Initialized {exchange_name} exchange")
-                except Exception as e:
-                    logger.warning(f"Failed to initialize {exchange_name}: {e}")
+                self.exchanges[exchange_name] = config
+                logger.info(f"Initialized {exchange_name} exchange")
+    
+    async def _get_exchange(self, exchange_name: str):
+        """Shared sync ccxt client for a configured exchange account"""
+        config = self.exchanges[exchange_name]
+        return await get_exchange_registry().acquire(
+            exchange_name,
+            {
+                'apiKey': config['apiKey'],
+                'secret': config['secret'],
+                'password': config.get('passphrase'),
+            },
+            sandbox=config['sandbox'],
+            config={'rateLimit': config['rateLimit']},
+            asynchronous=False
+        )
     
-    async def get_timescale_connection(self):
-        """Get TimescaleDB connection"""
-        if not self.timescale_connection:
+    async def get_timescale_pool(self) -> Optional[asyncpg.Pool]:
+        """Get the TimescaleDB connection pool (None when TIMESCALE_URL is unset)"""
+        if self.timescale_pool is None:
             timescale_url = os.getenv('TIMESCALE_URL')
-            if timescale_url:
-                self.timescale_connection = await asyncpg.connect(timescale_url)
-        return self.timescale_connection
+            if not timescale_url:
+                return None
+            async with self._pool_lock:
+                if self.timescale_pool is None:
+                    self.timescale_pool = await asyncpg.create_pool(
+                        timescale_url,
+                        min_size=TIMESCALE_POOL_MIN_SIZE,
+                        max_size=TIMESCALE_POOL_MAX_SIZE,
+                    )
+        return self.timescale_pool
     
     async def fetch_market_data(
         self,
@@ -93,16 +221,35 @@ class DataBridge:
     ) -> List[Dict[str, Any]]:
         """
         Fetch market data from various sources
+
+        Higher timeframes are served from the TimescaleDB rollups for every
+        (symbol, exchange) whose stored base bars cover the range; the rest
+        are fetched from the source at the requested timeframe, never as
+        base bars. Base-timeframe requests are fetched and stored.
         """
         if exchanges is None:
             exchanges = [ExchangeType.BINANCE]
         
-        logger.info(f"Fetching market data for {symbols} from {exchanges}")
+        start, end = _as_datetime(start_date), _as_datetime(end_date, end=True)
+        stored_pairs = set()
+        if timeframe != MARKET_DATA_BASE_TIMEFRAME and can_roll_up(MARKET_DATA_BASE_TIMEFRAME, timeframe):
+            coverage = await self._stored_coverage(symbols, [exchange.value for exchange in exchanges], start, end)
+            stored_pairs = {pair for pair, bars in coverage.items() if self._covers(bars, start, end, timeframe)}
         
         all_data = []
+        fetched = []
         
         for symbol in symbols:
             for exchange in exchanges:
+                if (symbol, exchange.value) in stored_pairs:
+                    columns = await self.get_market_data(
+                        [symbol], start_date, end_date, timeframe, exchanges=[exchange.value]
+                    )
+                    if len(columns['time']):
+                        all_data.extend(self._columns_to_records(columns))
+                        logger.info(f"Served {len(columns['time'])} {timeframe.value} records for {symbol} from {exchange} rollups")
+                        continue
+                
                 try:
                     if exchange == ExchangeType.POLYGON:
                         data = await self._fetch_polygon_data(symbol, start_date, end_date, timeframe)
@@ -111,18 +258,62 @@ class DataBridge:
                     
                     if data:
                         all_data.extend(data)
+                        fetched.extend(data)
                         logger.info(f"Fetched {len(data)} records for {symbol} from {exchange}")
                     
                 except Exception as e:
                     logger.error(f"Failed to fetch data for {symbol} from {exchange}: {e}")
                     continue
         
-        # Store data in TimescaleDB
-        if all_data:
-            await self._store_market_data(all_data)
+        if fetched and timeframe == MARKET_DATA_BASE_TIMEFRAME:
+            # Only base bars are stored; the rollups are built from them
+            await self._store_market_data(fetched)
         
         return all_data
     
+    async def _stored_coverage(
+        self,
+        symbols: List[str],
+        exchanges: List[str],
+        start: datetime,
+        end: datetime
+    ) -> Dict[Tuple[str, str], Tuple[datetime, datetime]]:
+        """First and last stored base bar in [start, end] per (symbol, exchange)"""
+        pool = await self.get_timescale_pool()
+        if not pool:
+            return {}
+        try:
+            async with pool.acquire() as conn:
+                rows = await conn.fetch(
+                    """
+                    SELECT symbol, exchange, min(time) AS first_bar, max(time) AS last_bar
+                    FROM market_data
+                    WHERE timeframe = $1
+                    AND symbol = ANY($2::text[])
+                    AND exchange = ANY($3::text[])
+                    AND time >= $4
+                    AND time <= $5
+                    GROUP BY symbol, exchange
+                    """,
+                    MARKET_DATA_BASE_TIMEFRAME.value, list(symbols), list(exchanges), start, end
+                )
+        except Exception as e:
+            logger.warning(f"Could not check stored market data coverage: {e}")
+            return {}
+        return {(row['symbol'], row['exchange']): (row['first_bar'], row['last_bar']) for row in rows}
+
+    @staticmethod
+    def _covers(bars: Tuple[datetime, datetime], start: datetime, end: datetime, timeframe: TimeFrame) -> bool:
+        """
+        Whether stored bars span [start, end] to within one bar of `timeframe`
+        at either end (the range up to now, for an end in the future).
+        Gaps inside the range are not detected.
+        """
+        first_bar, last_bar = bars
+        slack = timedelta(seconds=TIMEFRAME_SECONDS.get(timeframe, 31 * 86400))
+        end = min(end, datetime.now(timezone.utc))
+        return first_bar <= start + slack and last_bar >= end - slack
+    
     async def _fetch_crypto_data(
         self,
         symbol: str,
@@ -136,28 +327,35 @@ class DataBridge:
             logger.warning(f"Exchange {exchange_name} not available")
             return []
         
-        exchange = self.exchanges[exchange_name]
-        
         try:
+            exchange = await self._get_exchange(exchange_name)
+            
             # Convert timeframe to CCXT format
             ccxt_timeframe = self._convert_timeframe_to_ccxt(timeframe)
             
             # Convert dates to timestamps
-            since = int(datetime.combine(start_date, datetime.min.time()).timestamp() * 1000)
-            until = int(datetime.combine(end_date, datetime.max.time()).timestamp() * 1000)
+            since = int(_as_datetime(start_date).timestamp() * 1000)
+            until = int(_as_datetime(end_date, end=True).timestamp() * 1000)
             
-            # Fetch OHLCV data
-            ohlcv = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: exchange.fetch_ohlcv(symbol, ccxt_timeframe, since=since, limit=1000)
-            )
+            # Fetch OHLCV data, a page at a time (base-resolution ranges span many pages)
+            ohlcv = []
+            cursor = since
+            while cursor <= until:
+                page = await asyncio.get_event_loop().run_in_executor(
+                    None,
+                    lambda: exchange.fetch_ohlcv(symbol, ccxt_timeframe, since=cursor, limit=1000)
+                )
+                if not page or page[-1][0] < cursor:
+                    break
+                ohlcv.extend(page)
+                cursor = page[-1][0] + 1
             
             # Convert to our format
             data = []
             for candle in ohlcv:
                 if candle[0] >= since and candle[0] <= until:
                     data.append({
-                        'time': datetime.fromtimestamp(candle[0] / 1000),
+                        'time': datetime.fromtimestamp(candle[0] / 1000, tz=timezone.utc),
                         'symbol': symbol,
                         'exchange': exchange_name,
                         'timeframe': timeframe.value,
@@ -190,12 +388,12 @@ class DataBridge:
         
         try:
             # Convert timeframe to Polygon format
-            polygon_timespan = self._convert_timeframe_to_polygon(timeframe)
+            polygon_timespan, multiplier = self._convert_timeframe_to_polygon(timeframe)
             
             # Fetch aggregates
             bars = self.polygon_client.get_aggs(
                 ticker=symbol,
-                multiplier=1,
+                multiplier=multiplier,
                 timespan=polygon_timespan,
                 from_=start_date.strftime('%Y-%m-%d'),
                 to=end_date.strftime('%Y-%m-%d'),
@@ -206,7 +404,7 @@ class DataBridge:
             data = []
             for bar in bars:
                 data.append({
-                    'time': datetime.fromtimestamp(bar.timestamp / 1000),
+                    'time': datetime.fromtimestamp(bar.timestamp / 1000, tz=timezone.utc),
                     'symbol': symbol,
                     'exchange': 'polygon',
                     'timeframe': timeframe.value,
@@ -242,143 +440,340 @@ class DataBridge:
         }
         return mapping.get(timeframe, '1h')
     
-    def _convert_timeframe_to_polygon(self, timeframe: TimeFrame) -> str:
-        """Convert our timeframe to Polygon format"""
+    def _convert_timeframe_to_polygon(self, timeframe: TimeFrame) -> Tuple[str, int]:
+        """Convert our timeframe to Polygon format (timespan, multiplier)"""
         mapping = {
-            TimeFrame.MINUTE_1: 'minute',
-            TimeFrame.MINUTE_5: 'minute',
-            TimeFrame.MINUTE_15: 'minute',
-            TimeFrame.MINUTE_30: 'minute',
-            TimeFrame.HOUR_1: 'hour',
-            TimeFrame.HOUR_4: 'hour',
-            TimeFrame.HOUR_8: 'hour',
-            TimeFrame.HOUR_12: 'hour',
-            TimeFrame.DAY_1: 'day',
-            TimeFrame.WEEK_1: 'week',
-            TimeFrame.MONTH_1: 'month'
+            TimeFrame.MINUTE_1: ('minute', 1),
+            TimeFrame.MINUTE_5: ('minute', 5),
+            TimeFrame.MINUTE_15: ('minute', 15),
+            TimeFrame.MINUTE_30: ('minute', 30),
+            TimeFrame.HOUR_1: ('hour', 1),
+            TimeFrame.HOUR_4: ('hour', 4),
+            TimeFrame.HOUR_8: ('hour', 8),
+            TimeFrame.HOUR_12: ('hour', 12),
+            TimeFrame.DAY_1: ('day', 1),
+            TimeFrame.WEEK_1: ('week', 1),
+            TimeFrame.MONTH_1: ('month', 1)
         }
-        return mapping.get(timeframe, 'hour')
+        return mapping.get(timeframe, ('hour', 1))
     
-    async def _store_market_data(self, data: List[Dict[str, Any]]):
+    async def _store_market_data(self, data: List[Dict[str, Any]]) -> int:
         """Store market data in TimescaleDB"""
         try:
-            conn = await self.get_timescale_connection()
-            if not conn:
-                logger.warning("No TimescaleDB connection available")
-                return
-            
-            # Prepare data for insertion
-            values = []
-            for record in data:
-                values.append((
-                    record['time'],
-                    record['symbol'],
-                    record['exchange'],
-                    record['timeframe'],
-                    record['open'],
-                    record['high'],
-                    record['low'],
-                    record['close'],
-                    record['volume'],
-                    record['trade_count'],
-                    record['vwap']
-                ))
-            
-            # Insert data
-            await conn.executemany(
-                """
-                INSERT INTO market_data (
-                    time, symbol, exchange, timeframe, open, high, low, close, 
-                    volume, trade_count, vwap
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
-                ON CONFLICT (time, symbol, exchange, timeframe) 
-                DO UPDATE SET
-                    open = EXCLUDED.open,
-                    high = EXCLUDED.high,
-                    low = EXCLUDED.low,
-                    close = EXCLUDED.close,
-                    volume = EXCLUDED.volume,
-                    trade_count = EXCLUDED.trade_count,
-                    vwap = EXCLUDED.vwap
-                """,
-                values
+            stored = await self.store_bars(
+                tuple(record[column] for column in MARKET_DATA_COLUMNS) for record in data
             )
-            
-            logger.info(f"Stored {len(data)} market data records in TimescaleDB")
-            
+            if stored:
+                logger.info(f"Stored {stored} market data records in TimescaleDB")
+            return stored
         except Exception as e:
             logger.error(f"Failed to store market data: {e}")
-    
+            return 0
+
+    async def store_bars(
+        self,
+        records: Iterable[BarRecord],
+        chunk_size: int = MARKET_DATA_COPY_CHUNK,
+        refresh_rollups: bool = True
+    ) -> int:
+        """
+        Bulk upsert bars into market_data.
+
+        Each chunk is one transaction: COPY into a temporary staging table,
+        then a single INSERT ... SELECT ... ON CONFLICT DO UPDATE. The
+        rollups covering the written base bars are refreshed afterwards.
+
+        Args:
+            records: Bars as tuples in MARKET_DATA_COLUMNS order (may be a generator)
+            chunk_size: Bars per COPY / merge transaction
+            refresh_rollups: Refresh the continuous aggregates over the written range
+
+        Returns:
+            Number of bars written
+        """
+        pool = await self.get_timescale_pool()
+        if not pool:
+            logger.warning("No TimescaleDB connection available")
+            return 0
+
+        columns = ', '.join(MARKET_DATA_COLUMNS)
+        updates = ', '.join(f"{column} = EXCLUDED.{column}" for column in MARKET_DATA_COLUMNS[4:])
+        # DISTINCT ON keeps one row per key (the last one copied, as executemany
+        # did); a second row for the same key would abort the ON CONFLICT merge
+        merge = f"""
+            INSERT INTO market_data ({columns})
+            SELECT DISTINCT ON (time, symbol, exchange, timeframe) {columns}
+            FROM market_data_staging
+            ORDER BY time, symbol, exchange, timeframe, ctid DESC
+            ON CONFLICT (time, symbol, exchange, timeframe)
+            DO UPDATE SET {updates}
+        """
+
+        stored = 0
+        first_bar = last_bar = None
+        records = iter(records)
+        async with pool.acquire() as conn:
+            while True:
+                chunk = list(itertools.islice(records, chunk_size))
+                if not chunk:
+                    break
+                async with conn.transaction():
+                    await conn.execute(
+                        "CREATE TEMP TABLE market_data_staging "
+                        "(LIKE market_data INCLUDING DEFAULTS) ON COMMIT DROP"
+                    )
+                    await conn.copy_records_to_table(
+                        'market_data_staging', records=chunk, columns=list(MARKET_DATA_COLUMNS)
+                    )
+                    await conn.execute(merge)
+                stored += len(chunk)
+
+                base_times = refresh_rollups and [
+                    record[0] for record in chunk if record[3] == MARKET_DATA_BASE_TIMEFRAME.value
+                ]
+                if base_times:
+                    first_bar = min(base_times + ([first_bar] if first_bar else []))
+                    last_bar = max(base_times + ([last_bar] if last_bar else []))
+
+            if first_bar is not None:
+                await self._refresh_rollups(conn, first_bar, last_bar)
+        return stored
+
+    async def _refresh_rollups(self, conn: asyncpg.Connection, first_bar: datetime, last_bar: datetime):
+        """
+        Materialize the rollup buckets covering newly written base bars.
+
+        The refresh policies only look at recent data, so backfilled history
+        is refreshed here, finest rollup first since each one reads the
+        previous. Whole UTC days are refreshed so every bucket is complete.
+        """
+        start = _as_datetime(first_bar).replace(hour=0, minute=0, second=0, microsecond=0)
+        end = _as_datetime(last_bar).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        for timeframe, relation in MARKET_DATA_ROLLUPS.items():
+            if relation in self._missing_rollups:
+                continue
+            try:
+                # CALL can't run in a transaction block, so no bind parameters
+                await conn.execute(
+                    f"CALL refresh_continuous_aggregate('{relation}', "
+                    f"'{start.isoformat()}', '{end.isoformat()}')"
+                )
+            except asyncpg.UndefinedObjectError:
+                self._missing_rollups.add(relation)
+                logger.warning(f"Continuous aggregate {relation} not found, {timeframe.value} bars will be rolled up per query")
+            except Exception as e:
+                logger.warning(f"Failed to refresh {relation}: {e}")
+
+    def select_materialization(self, timeframe: TimeFrame) -> Tuple[str, TimeFrame]:
+        """
+        Coarsest stored resolution a timeframe can be served from.
+
+        Returns:
+            (relation, its timeframe): a continuous aggregate, or market_data
+            with the base timeframe. Timeframes that can't be built from base
+            bars are looked up in market_data as stored.
+        """
+        if not can_roll_up(MARKET_DATA_BASE_TIMEFRAME, timeframe):
+            return 'market_data', timeframe
+
+        best_relation, best_timeframe = 'market_data', MARKET_DATA_BASE_TIMEFRAME
+        for rollup_timeframe, relation in MARKET_DATA_ROLLUPS.items():
+            if (
+                relation not in self._missing_rollups
+                and rollup_timeframe != MARKET_DATA_BASE_TIMEFRAME
+                and can_roll_up(MARKET_DATA_BASE_TIMEFRAME, rollup_timeframe)
+                and can_roll_up(rollup_timeframe, timeframe)
+                and TIMEFRAME_SECONDS[rollup_timeframe] > TIMEFRAME_SECONDS[best_timeframe]
+            ):
+                best_relation, best_timeframe = relation, rollup_timeframe
+        return best_relation, best_timeframe
+
     async def get_market_data(
         self,
         symbols: List[str],
         start_date: date,
         end_date: date,
         timeframe: TimeFrame = TimeFrame.HOUR_1,
-        exchanges: List[str] = None
-    ) -> List[Dict[str, Any]]:
-        """Get market data from TimescaleDB"""
+        exchanges: List[str] = None,
+        as_arrow: bool = False
+    ) -> Any:
+        """
+        Get market data from TimescaleDB as columns.
+
+        The result set is streamed with COPY and parsed in bulk, so no Python
+        object is created per row. Timeframes above the base resolution are
+        read from the coarsest continuous aggregate they can be built from
+        (see select_materialization) and re-bucketed in the database.
+
+        Args:
+            symbols: Symbols to load
+            start_date: First bar time (inclusive)
+            end_date: Last bar time (inclusive)
+            timeframe: Bar timeframe
+            exchanges: Exchanges to load (default binance, coinbase, kraken)
+            as_arrow: Return a pyarrow Table instead of NumPy arrays
+
+        Returns:
+            Dict of column name -> NumPy array ('time' is datetime64[us] UTC,
+            prices float64 with NaN for a missing vwap), ordered by time,
+            symbol, exchange; or a pyarrow Table with the same columns
+        """
+        if as_arrow and pa is None:
+            raise ImportError("pyarrow is required for as_arrow=True")
+
+        empty = _empty_market_data_columns()
         try:
-            conn = await self.get_timescale_connection()
-            if not conn:
+            pool = await self.get_timescale_pool()
+            if not pool:
                 logger.warning("No TimescaleDB connection available")
-                return []
+                return pa.table(empty) if as_arrow else empty
             
             if exchanges is None:
                 exchanges = ['binance', 'coinbase', 'kraken']
             
-            # Build query
-            placeholders = ','.join([f'${i+1}' for i in range(len(symbols))])
-            exchange_placeholders = ','.join([f'${i+len(symbols)+1}' for i in range(len(exchanges))])
+            for _ in range(len(MARKET_DATA_ROLLUPS) + 1):
+                relation, source_timeframe = self.select_materialization(timeframe)
+                query, params = self._market_data_query(
+                    relation, source_timeframe, timeframe, symbols, exchanges,
+                    _as_datetime(start_date), _as_datetime(end_date, end=True)
+                )
+                buffer = io.BytesIO()
+                try:
+                    async with pool.acquire() as conn:
+                        await conn.copy_from_query(query, *params, output=buffer.write, format='csv', header=True)
+                    break
+                except asyncpg.UndefinedTableError:
+                    if relation == 'market_data':
+                        raise
+                    # Rollup not created in this database: use the next finer one
+                    self._missing_rollups.add(relation)
+                    logger.warning(f"Continuous aggregate {relation} not found, falling back to finer bars")
+            buffer.seek(0)
+
+            columns = await asyncio.get_event_loop().run_in_executor(None, self._parse_market_data_csv, buffer)
+            logger.info(
+                f"Retrieved {len(columns['time'])} {timeframe.value} market data records "
+                f"from {relation} ({source_timeframe.value})"
+            )
+            return pa.table(columns) if as_arrow else columns
             
+        except Exception as e:
+            logger.error(f"Failed to get market data: {e}")
+            return pa.table(empty) if as_arrow else empty
+
+    @staticmethod
+    def _market_data_query(
+        relation: str,
+        source_timeframe: TimeFrame,
+        timeframe: TimeFrame,
+        symbols: List[str],
+        exchanges: List[str],
+        start: datetime,
+        end: datetime
+    ) -> Tuple[str, List[Any]]:
+        """Bars of `timeframe` from `relation`, re-bucketed in the database when coarser"""
+        params: List[Any] = list(symbols) + list(exchanges)
+        placeholders = ','.join([f'${i+1}' for i in range(len(symbols))])
+        exchange_placeholders = ','.join([f'${i+len(symbols)+1}' for i in range(len(exchanges))])
+        where = f"symbol IN ({placeholders}) AND exchange IN ({exchange_placeholders})"
+        if relation == 'market_data':
+            params.append(source_timeframe.value)
+            where += f" AND timeframe = ${len(params)}"
+        
+        # Times leave as epoch microseconds, so parsing is independent of the session time zone
+        if source_timeframe == timeframe:
+            params += [start, end]
             query = f"""
-                SELECT time, symbol, exchange, timeframe, open, high, low, close, volume, trade_count, vwap
-                FROM market_data
-                WHERE symbol IN ({placeholders})
-                AND exchange IN ({exchange_placeholders})
-                AND timeframe = ${len(symbols) + len(exchanges) + 1}
-                AND time >= ${len(symbols) + len(exchanges) + 2}
-                AND time <= ${len(symbols) + len(exchanges) + 3}
+                SELECT (extract(epoch FROM time) * 1000000)::bigint AS time,
+                       symbol, exchange, '{timeframe.value}' AS timeframe,
+                       open::float8, high::float8, low::float8, close::float8, volume::float8,
+                       coalesce(trade_count, 0) AS trade_count, vwap::float8
+                FROM {relation}
+                WHERE {where}
+                AND time >= ${len(params) - 1}
+                AND time <= ${len(params)}
                 ORDER BY time, symbol, exchange
             """
-            
-            params = (
-                symbols + 
-                exchanges + 
-                [timeframe.value, start_date, end_date]
+            return query, params
+        
+        # Start at the bucket containing `start` so the first bar is complete
+        params += [TIMEFRAME_INTERVALS[timeframe], start, end]
+        interval = f"${len(params) - 2}::text::interval"
+        query = f"""
+            SELECT (extract(epoch FROM bucket) * 1000000)::bigint AS time,
+                   symbol, exchange, '{timeframe.value}' AS timeframe,
+                   open::float8, high::float8, low::float8, close::float8, volume::float8,
+                   coalesce(trade_count, 0) AS trade_count, vwap::float8
+            FROM (
+                SELECT time_bucket({interval}, time) AS bucket, symbol, exchange,
+                       first(open, time) AS open, max(high) AS high, min(low) AS low,
+                       last(close, time) AS close, sum(volume) AS volume,
+                       sum(trade_count) AS trade_count,
+                       sum(coalesce(vwap, close) * volume) / nullif(sum(volume), 0) AS vwap
+                FROM {relation}
+                WHERE {where}
+                AND time >= time_bucket({interval}, ${len(params) - 1}::timestamptz)
+                AND time <= ${len(params)}
+                GROUP BY bucket, symbol, exchange
+            ) bars
+            ORDER BY bucket, symbol, exchange
+        """
+        return query, params
+
+    @staticmethod
+    def _parse_market_data_csv(buffer: io.BytesIO) -> Dict[str, np.ndarray]:
+        """Parse a COPY ... CSV result into typed column arrays"""
+        if pa_csv is not None:
+            table = pa_csv.read_csv(
+                buffer,
+                convert_options=pa_csv.ConvertOptions(column_types={
+                    'time': pa.int64(), 'symbol': pa.string(), 'exchange': pa.string(),
+                    'timeframe': pa.string(), 'trade_count': pa.int64(),
+                    **{name: pa.float64() for name in PRICE_COLUMNS},
+                }),
             )
-            
-            rows = await conn.fetch(query, *params)
-            
-            # Convert to list of dictionaries
-            data = []
-            for row in rows:
-                data.append({
-                    'time': row['time'],
-                    'symbol': row['symbol'],
-                    'exchange': row['exchange'],
-                    'timeframe': row['timeframe'],
-                    'open': float(row['open']),
-                    'high': float(row['high']),
-                    'low': float(row['low']),
-                    'close': float(row['close']),
-                    'volume': float(row['volume']),
-                    'trade_count': row['trade_count'],
-                    'vwap': float(row['vwap']) if row['vwap'] else None
-                })
-            
-            logger.info(f"Retrieved {len(data)} market data records from TimescaleDB")
-            return data
-            
-        except Exception as e:
-            logger.error(f"Failed to get market data: {e}")
-            return []
-    
+            raw = {name: table.column(name).to_numpy() for name in MARKET_DATA_COLUMNS}
+        else:
+            frame = pd.read_csv(
+                buffer,
+                dtype={
+                    'time': np.int64, 'symbol': object, 'exchange': object,
+                    'timeframe': object, 'trade_count': np.int64,
+                    **{name: np.float64 for name in PRICE_COLUMNS},
+                },
+                keep_default_na=False,
+                na_values={name: [''] for name in PRICE_COLUMNS},
+            )
+            raw = {name: frame[name].to_numpy() for name in MARKET_DATA_COLUMNS}
+
+        raw['time'] = raw['time'].astype(np.int64).view('datetime64[us]')
+        for name in PRICE_COLUMNS:
+            raw[name] = np.asarray(raw[name], dtype=np.float64)
+        return raw
+
+    @staticmethod
+    def _columns_to_records(columns: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+        """Column arrays back to the row dicts fetch_market_data returns"""
+        times = columns['time'].astype('datetime64[us]').astype(datetime)
+        records = []
+        for i in range(len(times)):
+            vwap = columns['vwap'][i]
+            records.append({
+                'time': times[i].replace(tzinfo=timezone.utc),
+                'symbol': columns['symbol'][i],
+                'exchange': columns['exchange'][i],
+                'timeframe': columns['timeframe'][i],
+                **{name: float(columns[name][i]) for name in PRICE_COLUMNS[:5]},
+                'trade_count': int(columns['trade_count'][i]),
+                'vwap': None if np.isnan(vwap) else float(vwap),
+            })
+        return records
+
     async def get_latest_prices(self, symbols: List[str], exchanges: List[str] = None) -> Dict[str, float]:
         """Get latest prices for symbols"""
         try:
-            conn = await self.get_timescale_connection()
-            if not conn:
+            pool = await self.get_timescale_pool()
+            if not pool:
                 logger.warning("No TimescaleDB connection available")
                 return {}
             
@@ -397,7 +792,7 @@ class DataBridge:
             """
             
             params = symbols + exchanges
-            rows = await conn.fetch(query, *params)
+            rows = await pool.fetch(query, *params)
             
             prices = {row['symbol']: float(row['close']) for row in rows}
             return prices
@@ -408,6 +803,6 @@ class DataBridge:
     
     async def close_connections(self):
         """Close database connections"""
-        if self.timescale_connection:
-            await self.timescale_connection.close()
-            self.timescale_connection = None
+        if self.timescale_pool:
+            await self.timescale_pool.close()
+            self.timescale_pool = None
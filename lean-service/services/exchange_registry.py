@@ -0,0 +1,353 @@
+"""
+Exchange Client Registry
+One shared pool of ccxt clients for the whole lean-service
+
+- Clients are keyed by (exchange, account, sandbox, config), so services
+  using the same account share one instance, and different accounts on the
+  same exchange no longer collide
+- Market metadata is loaded once per (exchange, sandbox, market type) into
+  an in-memory + on-disk cache with a TTL and applied to new clients with
+  set_markets() instead of a load_markets() round trip each
+- Async clients share one aiohttp session, sync clients one requests session
+- Clients unused for EXCHANGE_CLIENT_IDLE_SECONDS are closed, unless held
+  by a long-lived owner (acquire(..., hold=True) / release())
+"""
+
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import os
+import ssl
+import time
+from typing import Dict, Any, Optional, Tuple
+
+import ccxt
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+try:
+    import ccxt.pro as ccxt_async
+except ImportError:
+    import ccxt.async_support as ccxt_async
+
+try:
+    import certifi
+    _CA_FILE = certifi.where()
+except ImportError:
+    _CA_FILE = None
+
+EXCHANGE_MARKETS_TTL = float(os.getenv('EXCHANGE_MARKETS_TTL', '3600'))
+EXCHANGE_MARKETS_CACHE_DIR = os.getenv('EXCHANGE_MARKETS_CACHE_DIR', '/tmp/lean-exchange-markets')
+EXCHANGE_CLIENT_IDLE_SECONDS = float(os.getenv('EXCHANGE_CLIENT_IDLE_SECONDS', '600'))
+IDLE_SWEEP_INTERVAL = 60.0
+
+# (exchange id, sandbox, market type)
+MarketKey = Tuple[str, bool, str]
+
+
+class _ClientEntry:
+    """A pooled client and its usage"""
+
+    def __init__(self, client: Any, asynchronous: bool, market_key: MarketKey):
+        self.client = client
+        self.asynchronous = asynchronous
+        self.market_key = market_key
+        self.last_used = time.monotonic()
+        self.holders = 0
+
+
+class ExchangeClientRegistry:
+    """Shared ccxt clients with cached market metadata"""
+
+    def __init__(
+        self,
+        markets_ttl: float = EXCHANGE_MARKETS_TTL,
+        cache_dir: str = EXCHANGE_MARKETS_CACHE_DIR,
+        idle_seconds: float = EXCHANGE_CLIENT_IDLE_SECONDS,
+    ):
+        self.markets_ttl = markets_ttl
+        self.cache_dir = cache_dir
+        self.idle_seconds = idle_seconds
+
+        self._clients: Dict[Tuple, _ClientEntry] = {}
+        # id(client) -> entry, for hold()/release() without a scan
+        self._entries_by_client: Dict[int, _ClientEntry] = {}
+        self._client_locks: Dict[Tuple, asyncio.Lock] = {}
+        # market key -> (loaded_at wall time, markets, currencies)
+        self._markets: Dict[MarketKey, Tuple[float, Dict[str, Any], Dict[str, Any]]] = {}
+        self._market_locks: Dict[MarketKey, asyncio.Lock] = {}
+
+        self._aiohttp_session: Optional[aiohttp.ClientSession] = None
+        self._requests_session = None
+        self._sweeper: Optional[asyncio.Task] = None
+
+        self.stats = {
+            'clients_created': 0,
+            'clients_reused': 0,
+            'clients_closed_idle': 0,
+            'markets_loaded': 0,
+            'markets_from_memory': 0,
+            'markets_from_disk': 0,
+        }
+
+    # ============ Clients ============
+
+    async def acquire(
+        self,
+        exchange_id: str,
+        credentials: Optional[Dict[str, Any]] = None,
+        sandbox: bool = False,
+        config: Optional[Dict[str, Any]] = None,
+        asynchronous: bool = True,
+        load_markets: bool = True,
+        hold: bool = False,
+    ) -> Any:
+        """
+        Get the shared client for an exchange account, creating it if needed.
+
+        Args:
+            exchange_id: ccxt exchange id (e.g. 'binance')
+            credentials: ccxt credential fields (apiKey, secret, password);
+                None for a public (market data only) client
+            sandbox: Use the exchange's sandbox / testnet
+            config: Extra ccxt options (rateLimit, options.defaultType, ...)
+            asynchronous: ccxt.pro client (True) or sync ccxt client (False)
+            load_markets: Make sure market metadata is loaded on the client
+            hold: Keep the client open until release() (long-lived owners)
+
+        Returns:
+            ccxt exchange instance
+        """
+        exchange_id = exchange_id.lower()
+        credentials = {k: v for k, v in (credentials or {}).items() if v}
+        config = config or {}
+        key = self._client_key(exchange_id, credentials, sandbox, config, asynchronous)
+
+        entry = self._clients.get(key)
+        if entry is None:
+            lock = self._client_locks.setdefault(key, asyncio.Lock())
+            async with lock:
+                entry = self._clients.get(key)
+                if entry is None:
+                    entry = self._create(key, exchange_id, credentials, sandbox, config, asynchronous)
+                else:
+                    self.stats['clients_reused'] += 1
+        else:
+            self.stats['clients_reused'] += 1
+
+        entry.last_used = time.monotonic()
+        if hold:
+            entry.holders += 1
+        self._ensure_sweeper()
+
+        if load_markets and not entry.client.markets:
+            await self._apply_markets(entry)
+        return entry.client
+
+    def hold(self, client: Any):
+        """Keep a pooled client open until release()"""
+        entry = self._entry_for(client)
+        if entry is not None:
+            entry.holders += 1
+
+    def release(self, client: Any):
+        """Drop a hold taken with hold() or acquire(..., hold=True)"""
+        entry = self._entry_for(client)
+        if entry is not None:
+            entry.holders = max(0, entry.holders - 1)
+            entry.last_used = time.monotonic()
+
+    def _entry_for(self, client: Any) -> Optional[_ClientEntry]:
+        entry = self._entries_by_client.get(id(client))
+        # A closed client's id can be reused by a new object
+        return entry if entry is not None and entry.client is client else None
+
+    @staticmethod
+    def _client_key(exchange_id: str, credentials: Dict[str, Any], sandbox: bool, config: Dict[str, Any], asynchronous: bool) -> Tuple:
+        # Accounts are identified by a digest of all the credentials, never the credentials
+        # themselves, so a rotated secret or password gets its own client
+        if credentials:
+            digest = hashlib.sha256(json.dumps(credentials, sort_keys=True, default=str).encode())
+            account = digest.hexdigest()[:32]
+        else:
+            account = 'public'
+        return (exchange_id, account, sandbox, json.dumps(config, sort_keys=True, default=str), asynchronous)
+
+    def _create(self, key: Tuple, exchange_id: str, credentials: Dict[str, Any], sandbox: bool, config: Dict[str, Any], asynchronous: bool) -> _ClientEntry:
+        module = ccxt_async if asynchronous else ccxt
+        exchange_class = getattr(module, exchange_id)
+
+        params = {'enableRateLimit': True, **config, **credentials}
+        params['session'] = self._shared_aiohttp_session() if asynchronous else self._shared_requests_session()
+        client = exchange_class(params)
+        if sandbox:
+            try:
+                client.set_sandbox_mode(True)
+            except ccxt.NotSupported:
+                # Never fall back to live endpoints with account credentials
+                if credentials:
+                    raise
+                logger.warning(f"{exchange_id} has no sandbox, using live public endpoints")
+
+        market_type = (config.get('options') or {}).get('defaultType', 'spot')
+        entry = _ClientEntry(client, asynchronous, (exchange_id, sandbox, market_type))
+        self._clients[key] = entry
+        self._entries_by_client[id(client)] = entry
+        self.stats['clients_created'] += 1
+        logger.info(f"Created {'async' if asynchronous else 'sync'} {exchange_id} client (account {key[1]}, sandbox={sandbox})")
+        return entry
+
+    def _shared_aiohttp_session(self) -> aiohttp.ClientSession:
+        if self._aiohttp_session is None or self._aiohttp_session.closed:
+            ssl_context = ssl.create_default_context(cafile=_CA_FILE)
+            self._aiohttp_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(ssl=ssl_context, limit=100, ttl_dns_cache=300, enable_cleanup_closed=True),
+                trust_env=True,
+            )
+        return self._aiohttp_session
+
+    def _shared_requests_session(self):
+        if self._requests_session is None:
+            import requests
+            self._requests_session = requests.Session()
+        return self._requests_session
+
+    # ============ Market metadata ============
+
+    async def _apply_markets(self, entry: _ClientEntry):
+        """Load market metadata onto a client from the shared cache, loading it once if stale"""
+        market_key = entry.market_key
+        lock = self._market_locks.setdefault(market_key, asyncio.Lock())
+        async with lock:
+            if entry.client.markets:
+                return
+
+            cached = self._markets.get(market_key)
+            if cached is not None and time.time() - cached[0] < self.markets_ttl:
+                self.stats['markets_from_memory'] += 1
+            else:
+                cached = await asyncio.get_event_loop().run_in_executor(None, self._read_disk_cache, market_key)
+                if cached is not None:
+                    self.stats['markets_from_disk'] += 1
+                    self._markets[market_key] = cached
+
+            if cached is not None:
+                entry.client.set_markets(cached[1], cached[2] or None)
+                return
+
+            if entry.asynchronous:
+                await entry.client.load_markets()
+            else:
+                await asyncio.get_event_loop().run_in_executor(None, entry.client.load_markets)
+            cached = (time.time(), entry.client.markets, entry.client.currencies or {})
+            self._markets[market_key] = cached
+            self.stats['markets_loaded'] += 1
+            await asyncio.get_event_loop().run_in_executor(None, self._write_disk_cache, market_key, cached)
+
+    def _cache_path(self, market_key: MarketKey) -> str:
+        exchange_id, sandbox, market_type = market_key
+        return os.path.join(self.cache_dir, f"{exchange_id}-{'sandbox' if sandbox else 'live'}-{market_type}.json")
+
+    def _read_disk_cache(self, market_key: MarketKey) -> Optional[Tuple[float, Dict[str, Any], Dict[str, Any]]]:
+        try:
+            with open(self._cache_path(market_key)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - data.get('loaded_at', 0) >= self.markets_ttl:
+            return None
+        return data['loaded_at'], data['markets'], data.get('currencies') or {}
+
+    def _write_disk_cache(self, market_key: MarketKey, cached: Tuple[float, Dict[str, Any], Dict[str, Any]]):
+        path = self._cache_path(market_key)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'loaded_at': cached[0], 'markets': cached[1], 'currencies': cached[2]}, f, default=str)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not write market cache {path}: {e}")
+
+    # ============ Lifecycle ============
+
+    def _ensure_sweeper(self):
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(IDLE_SWEEP_INTERVAL)
+            await self.close_idle()
+
+    async def close_idle(self):
+        """Close clients nobody holds and nobody has used recently"""
+        now = time.monotonic()
+        idle = [
+            key for key, entry in self._clients.items()
+            if entry.holders == 0 and now - entry.last_used >= self.idle_seconds
+        ]
+        for key in idle:
+            entry = self._clients.pop(key)
+            self._entries_by_client.pop(id(entry.client), None)
+            self._client_locks.pop(key, None)
+            await self._close_client(entry)
+            self.stats['clients_closed_idle'] += 1
+
+    @staticmethod
+    async def _close_client(entry: _ClientEntry):
+        close = getattr(entry.client, 'close', None)
+        if close is None:
+            return
+        try:
+            result = close()
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            logger.warning(f"Error closing {entry.market_key[0]} client: {e}")
+
+    async def close(self):
+        """Close every client and the shared HTTP sessions"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        entries, self._clients = list(self._clients.values()), {}
+        self._entries_by_client.clear()
+        self._client_locks.clear()
+        for entry in entries:
+            await self._close_client(entry)
+        if self._aiohttp_session is not None:
+            await self._aiohttp_session.close()
+            self._aiohttp_session = None
+        if self._requests_session is not None:
+            self._requests_session.close()
+            self._requests_session = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'clients': len(self._clients),
+            'held_clients': sum(1 for entry in self._clients.values() if entry.holders),
+            'cached_markets': len(self._markets),
+        }
+
+
+# Global registry instance
+_registry: Optional[ExchangeClientRegistry] = None
+
+
+def get_exchange_registry() -> ExchangeClientRegistry:
+    """Get or create the shared exchange client registry"""
+    global _registry
+    if _registry is None:
+        _registry = ExchangeClientRegistry()
+    return _registry
+
+
+async def close_exchange_registry():
+    """Close all pooled exchange clients"""
+    if _registry is not None:
+        await _registry.close()
@@ -5,10 +5,10 @@ Exchange service for managing exchange connections and copy trading
 import logging
 import asyncio
 from typing import List, Dict, Any, Optional
-import ccxt
 import asyncpg
 
 from models.backtest_models import ExchangeCredentials, ExchangeType
+from services.exchange_registry import get_exchange_registry
 
 logger = logging.getLogger(__name__)
 
@@ -23,17 +23,17 @@ class ExchangeService:
         """Initialize exchange clients"""
         exchange_configs = {
             'binance': {
-                'class': ccxt.binance,
+                'id': 'binance',
                 'sandbox': True,
                 'rateLimit': 1200
             },
             'coinbase': {
-                'class': ccxt.coinbasepro,
+                'id': 'coinbasepro',
                 'sandbox': True,
                 'rateLimit': 1000
             },
             'kraken': {
-                'class': ccxt.kraken,
+                'id': 'kraken',
                 'sandbox': True,
                 'rateLimit': 3000
             }
@@ -46,17 +46,25 @@ class ExchangeService:
             except Exception as e:
                 logger.warning(f"Failed to initialize {exchange_name}: {e}")
     
+    async def _get_client(self, exchange_name: str, credentials: Optional[ExchangeCredentials] = None):
+        """Shared sync ccxt client for an account (public sandbox client without credentials)"""
+        exchange_config = self.exchanges[exchange_name]
+        return await get_exchange_registry().acquire(
+            exchange_config['id'],
+            {
+                'apiKey': credentials.api_key,
+                'secret': credentials.api_secret,
+                'password': credentials.passphrase,
+            } if credentials else None,
+            sandbox=credentials.sandbox if credentials else exchange_config['sandbox'],
+            config={'rateLimit': exchange_config['rateLimit']},
+            asynchronous=False
+        )
+    
     async def test_connection(self, exchange_name: str, credentials: ExchangeCredentials) -> bool:
         """Test exchange connection"""
         try:
-            exchange_class = self.exchanges[exchange_name]['class']
-            exchange = exchange_class({
-                'apiKey': credentials.api_key,
-                'secret': credentials.api_secret,
-                'passphrase': credentials.passphrase,
-                'sandbox': credentials.sandbox,
-                'rateLimit': self.exchanges[exchange_name]['rateLimit']
-            })
+            exchange = await self._get_client(exchange_name, credentials)
             
             # Test connection by fetching balance
             balance = await asyncio.get_event_loop().run_in_executor(
@@ -74,14 +82,7 @@ class ExchangeService:
     async def get_account_balance(self, exchange_name: str, credentials: ExchangeCredentials) -> Dict[str, float]:
         """Get account balance"""
         try:
-            exchange_class = self.exchanges[exchange_name]['class']
-            exchange = exchange_class({
-                'apiKey': credentials.api_key,
-                'secret': credentials.api_secret,
-                'passphrase': credentials.passphrase,
-                'sandbox': credentials.sandbox,
-                'rateLimit': self.exchanges[exchange_name]['rateLimit']
-            })
+            exchange = await self._get_client(exchange_name, credentials)
             
             balance = await asyncio.get_event_loop().run_in_executor(
                 None,
@@ -110,14 +111,7 @@ class ExchangeService:
     ) -> Dict[str, Any]:
         """Place order on exchange"""
         try:
-            exchange_class = self.exchanges[exchange_name]['class']
-            exchange = exchange_class({
-                'apiKey': credentials.api_key,
-                'secret': credentials.api_secret,
-                'passphrase': credentials.passphrase,
-                'sandbox': credentials.sandbox,
-                'rateLimit': self.exchanges[exchange_name]['rateLimit']
-            })
+            exchange = await self._get_client(exchange_name, credentials)
             
             # Place order
             order = await asyncio.get_event_loop().run_in_executor(
@@ -147,14 +141,7 @@ class ExchangeService:
     ) -> Dict[str, Any]:
         """Get order status"""
         try:
-            exchange_class = self.exchanges[exchange_name]['class']
-            exchange = exchange_class({
-                'apiKey': credentials.api_key,
-                'secret': credentials.api_secret,
-                'passphrase': credentials.passphrase,
-                'sandbox': credentials.sandbox,
-                'rateLimit': self.exchanges[exchange_name]['rateLimit']
-            })
+            exchange = await self._get_client(exchange_name, credentials)
             
             order = await asyncio.get_event_loop().run_in_executor(
                 None,
@@ -176,14 +163,7 @@ class ExchangeService:
     ) -> bool:
         """Cancel order"""
         try:
-            exchange_class = self.exchanges[exchange_name]['class']
-            exchange = exchange_class({
-                'apiKey': credentials.api_key,
-                'secret': credentials.api_secret,
-                'passphrase': credentials.passphrase,
-                'sandbox': credentials.sandbox,
-                'rateLimit': self.exchanges[exchange_name]['rateLimit']
-            })
+            exchange = await self._get_client(exchange_name, credentials)
             
             result = await asyncio.get_event_loop().run_in_executor(
                 None,
@@ -200,11 +180,7 @@ class ExchangeService:
     async def get_trading_fees(self, exchange_name: str, symbol: str) -> Dict[str, float]:
         """Get trading fees for symbol"""
         try:
-            exchange_class = self.exchanges[exchange_name]['class']
-            exchange = exchange_class({
-                'sandbox': True,
-                'rateLimit': self.exchanges[exchange_name]['rateLimit']
-            })
+            exchange = await self._get_client(exchange_name)
             
             fees = await asyncio.get_event_loop().run_in_executor(
                 None,
@@ -220,16 +196,10 @@ class ExchangeService:
     async def get_symbol_info(self, exchange_name: str, symbol: str) -> Dict[str, Any]:
         """Get symbol information"""
         try:
-            exchange_class = self.exchanges[exchange_name]['class']
-            exchange = exchange_class({
-                'sandbox': True,
-                'rateLimit': self.exchanges[exchange_name]['rateLimit']
-            })
+            exchange = await self._get_client(exchange_name)
             
-            markets = await asyncio.get_event_loop().run_in_executor(
-                None,
-                exchange.load_markets
-            )
+            # Loaded once by the registry and shared across clients
+            markets = exchange.markets or {}
             
             return markets.get(symbol, {})
             
@@ -249,16 +219,10 @@ class ExchangeService:
     async def get_supported_symbols(self, exchange_name: str) -> List[str]:
         """Get list of supported symbols"""
         try:
-            exchange_class = self.exchanges[exchange_name]['class']
-            exchange = exchange_class({
-                'sandbox': True,
-                'rateLimit': self.exchanges[exchange_name]['rateLimit']
-            })
+            exchange = await self._get_client(exchange_name)
             
-            markets = await asyncio.get_event_loop().run_in_executor(
-                None,
-                exchange.load_markets
-            )
+            # Loaded once by the registry and shared across clients
+            markets = exchange.markets or {}
             
             return list(markets.keys())
             
@@ -0,0 +1,469 @@
+"""
+Lean Job Runner
+Non-blocking scheduler for Lean backtests (warm workers or cold containers)
+
+- Concurrency is capped from the Docker host's CPUs and memory divided by
+  the per-job limits (LEAN_MAX_CONCURRENT overrides); extra jobs wait their turn
+- Every docker SDK call runs on the runner's own thread pool, never on the
+  event loop
+- Container logs are tailed as they are written and parsed line by line
+  into trades, equity points and progress, which are pushed to subscribers
+  (SSE endpoint, job status) as they happen
+- Jobs go to an idle warm worker (see lean_worker_pool) when one is free,
+  otherwise to a fresh container
+- Only a bounded tail of the log is kept in memory
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Callable, Set, Deque
+
+logger = logging.getLogger(__name__)
+
+LEAN_CPUS_PER_JOB = float(os.getenv('LEAN_CPUS_PER_JOB', '2'))
+LEAN_MEMORY_PER_JOB = os.getenv('LEAN_MEMORY_PER_JOB', '4g')
+LEAN_MAX_CONCURRENT = int(os.getenv('LEAN_MAX_CONCURRENT', '0'))  # 0 = size from the host
+LEAN_JOB_TIMEOUT = float(os.getenv('LEAN_JOB_TIMEOUT', '3600'))
+LEAN_LOG_TAIL_LINES = int(os.getenv('LEAN_LOG_TAIL_LINES', '2000'))
+
+# Longest message accepted from a worker agent (one JSON-wrapped log line)
+WORKER_LINE_LIMIT = 16 * 1024 * 1024
+
+# Markers written by the generated strategy (see BacktestEngine._prepare_strategy_file)
+TRADE_MARKER = "Trade executed:"
+EQUITY_MARKER = "Portfolio update:"
+PROGRESS_MARKER = "Backtest progress:"
+_LEGACY_EQUITY = re.compile(r"(?:Total portfolio value|Portfolio value):\s*([\d,.]+)\s*$")
+
+# Event callback: called on the event loop with each parsed event
+EventCallback = Callable[[Dict[str, Any]], None]
+
+_UNITS = {'b': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+
+
+def parse_memory(value: str) -> int:
+    """Docker-style memory size ('4g', '512m') to bytes"""
+    value = value.strip().lower()
+    if value and value[-1] in _UNITS:
+        return int(float(value[:-1]) * _UNITS[value[-1]])
+    return int(value)
+
+
+def host_concurrency_limit(cpus: float, memory: int, cpus_per_job: float, memory_per_job: int) -> int:
+    """How many jobs fit on a host with the given CPUs and memory (at least 1)"""
+    return max(1, min(int(cpus // cpus_per_job), int(memory // memory_per_job)))
+
+
+class LeanJobCancelled(Exception):
+    """The job was cancelled before or while running"""
+
+
+class LeanLogParser:
+    """Incremental parser for Lean container output, fed one line at a time"""
+
+    def __init__(self, tail_lines: int = LEAN_LOG_TAIL_LINES):
+        self.trades: List[Dict[str, Any]] = []
+        self.portfolio_values: List[Dict[str, Any]] = []
+        self.progress = 0.0
+        self.lines = 0
+        self._tail: Deque[str] = deque(maxlen=tail_lines)
+
+    def feed(self, line: str) -> Optional[Dict[str, Any]]:
+        """Parse one log line; returns an event for trade / equity / progress lines"""
+        self.lines += 1
+        self._tail.append(line)
+
+        if TRADE_MARKER in line:
+            trade = self._json_after(line, TRADE_MARKER)
+            if trade is not None:
+                self.trades.append(trade)
+                return {'type': 'trade', 'trade': trade, 'trade_count': len(self.trades)}
+            return None
+
+        if EQUITY_MARKER in line:
+            point = self._json_after(line, EQUITY_MARKER)
+            if point is not None:
+                self.portfolio_values.append(point)
+                return {'type': 'equity', 'point': point}
+            return None
+
+        if PROGRESS_MARKER in line:
+            try:
+                progress = float(line.split(PROGRESS_MARKER, 1)[1].strip())
+            except ValueError:
+                return None
+            self.progress = min(1.0, max(self.progress, progress))
+            return {'type': 'progress', 'progress': self.progress}
+
+        match = _LEGACY_EQUITY.search(line)
+        if match:
+            try:
+                value = float(match.group(1).replace(',', ''))
+            except ValueError:
+                return None
+            point = {'time': None, 'value': value, 'cash': 0, 'holdings': {}, 'drawdown': 0}
+            self.portfolio_values.append(point)
+            return {'type': 'equity', 'point': point}
+        return None
+
+    @staticmethod
+    def _json_after(line: str, marker: str) -> Optional[Dict[str, Any]]:
+        payload = line.split(marker, 1)[1].strip()
+        if not (payload.startswith('{') and payload.endswith('}')):
+            return None
+        try:
+            return json.loads(payload)
+        except ValueError:
+            return None
+
+    @property
+    def tail(self) -> str:
+        return '\n'.join(self._tail)
+
+
+class LeanJob:
+    """One scheduled Lean run"""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.status = 'queued'
+        self.container = None
+        self.connection = None
+        self.parser = LeanLogParser()
+        self.queued_at = time.time()
+        self.started_at: Optional[float] = None
+        self.cancelled = False
+
+
+class LeanJobRunner:
+    """Runs Lean containers off the event loop with a host-sized concurrency limit"""
+
+    def __init__(self, docker_client, max_concurrent: int = LEAN_MAX_CONCURRENT):
+        self.docker_client = docker_client
+        self.memory_per_job = parse_memory(LEAN_MEMORY_PER_JOB)
+        self._max_concurrent = max_concurrent
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+        self.jobs: Dict[str, LeanJob] = {}
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.stats = {'started': 0, 'completed': 0, 'failed': 0, 'cancelled': 0, 'timed_out': 0}
+
+    # ============ Scheduling ============
+
+    async def _ensure_limits(self):
+        if self._semaphore is not None:
+            return
+        limit = self._max_concurrent
+        if limit <= 0:
+            limit = await asyncio.get_event_loop().run_in_executor(None, self._host_limit)
+        # Re-check: another job may have sized the runner meanwhile
+        if self._semaphore is None:
+            self._max_concurrent = limit
+            self._semaphore = asyncio.Semaphore(limit)
+            # One log tail plus short docker calls per running job
+            self._executor = ThreadPoolExecutor(max_workers=2 * limit + 2, thread_name_prefix='lean-docker')
+            logger.info(f"Lean runner allows {limit} concurrent backtests")
+
+    def _host_limit(self) -> int:
+        """Size from the Docker host (it may not be this machine), else from this host"""
+        try:
+            info = self.docker_client.info()
+            cpus, memory = info['NCPU'], info['MemTotal']
+        except Exception:
+            cpus = os.cpu_count() or 1
+            try:
+                memory = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+            except (ValueError, OSError, AttributeError):
+                memory = self.memory_per_job
+        return host_concurrency_limit(cpus, memory, LEAN_CPUS_PER_JOB, self.memory_per_job)
+
+    async def _docker(self, fn, *args, **kwargs):
+        return await asyncio.get_event_loop().run_in_executor(self._executor, lambda: fn(*args, **kwargs))
+
+    async def run(
+        self,
+        job_id: str,
+        image: str,
+        run_kwargs: Dict[str, Any],
+        on_event: Optional[EventCallback] = None,
+        timeout: float = LEAN_JOB_TIMEOUT,
+        worker_pool=None,
+        worker_request: Optional[Dict[str, Any]] = None,
+        job_dir: Optional[str] = None,
+    ) -> LeanJob:
+        """
+        Run one Lean backtest to completion.
+
+        Waits for a free slot, then sends the job to an idle warm worker from
+        `worker_pool` if there is one, otherwise starts a cold container
+        (removed afterwards). The log is streamed and parsed while it runs.
+
+        Args:
+            job_id: Backtest job id
+            image: Lean image
+            run_kwargs: Keyword arguments for containers.run() (command, volumes, limits, ...)
+            on_event: Called with each trade / equity / progress / status event
+            timeout: Seconds before the job is stopped
+            worker_pool: Optional LeanWorkerPool to try first
+            worker_request: Request sent to the worker agent (config path, env)
+            job_dir: The job's folder, moved into the worker for the run
+
+        Returns:
+            The finished job (parsed trades, equity points, log tail)
+        """
+        if self.docker_client is None:
+            raise RuntimeError("Docker is not available")
+        await self._ensure_limits()
+
+        job = LeanJob(job_id)
+        self.jobs[job_id] = job
+        self._emit(job, {'type': 'status', 'status': 'queued'}, on_event)
+
+        try:
+            async with self._semaphore:
+                if job.cancelled:
+                    raise LeanJobCancelled(job_id)
+                job.status = 'running'
+                job.started_at = time.time()
+                self.stats['started'] += 1
+                self._emit(job, {'type': 'status', 'status': 'running'}, on_event)
+
+                worker = await worker_pool.acquire(job_dir) if worker_pool is not None and job_dir else None
+                ran = worker is not None and await self._run_on_worker(
+                    job, worker_pool, worker, worker_request, on_event, timeout
+                )
+                if not ran:
+                    await self._run_container(job, image, run_kwargs, on_event, timeout)
+
+            job.status = 'completed'
+            self.stats['completed'] += 1
+            return job
+
+        except (LeanJobCancelled, asyncio.CancelledError):
+            job.status = 'cancelled'
+            self.stats['cancelled'] += 1
+            raise
+        except Exception:
+            job.status = 'failed'
+            self.stats['failed'] += 1
+            raise
+        finally:
+            self._emit(job, {'type': 'status', 'status': job.status}, on_event)
+            self.jobs.pop(job_id, None)
+
+    async def _run_container(
+        self,
+        job: LeanJob,
+        image: str,
+        run_kwargs: Dict[str, Any],
+        on_event: Optional[EventCallback],
+        timeout: float,
+    ):
+        """Cold path: one container for the job"""
+        job.container = await self._docker(
+            self.docker_client.containers.run, image, detach=True, **run_kwargs
+        )
+        logger.info(f"Started Lean container {job.container.id} for job {job.job_id}")
+
+        try:
+            await asyncio.wait_for(self._follow(job, on_event), timeout=timeout)
+            exit_status = await self._docker(job.container.wait)
+        except asyncio.TimeoutError:
+            self.stats['timed_out'] += 1
+            await self._stop(job)
+            raise TimeoutError(f"Lean backtest exceeded {timeout:.0f}s")
+        finally:
+            await self._remove(job)
+
+        if job.cancelled:
+            raise LeanJobCancelled(job.job_id)
+        status_code = (exit_status or {}).get('StatusCode', 0)
+        if status_code != 0:
+            raise RuntimeError(f"Lean exited with status {status_code}: {job.parser.tail[-500:]}")
+
+    async def _run_on_worker(
+        self,
+        job: LeanJob,
+        pool,
+        worker,
+        request: Dict[str, Any],
+        on_event: Optional[EventCallback],
+        timeout: float,
+    ) -> bool:
+        """
+        Warm path: send the job to a worker agent and parse the log it streams back.
+
+        Returns False without running anything if the worker cannot be reached.
+        """
+        logger.info(f"Running job {job.job_id} on Lean worker {worker.name}")
+        exit_code = None
+        try:
+            reader, writer = await asyncio.open_unix_connection(worker.socket_path, limit=WORKER_LINE_LIMIT)
+        except OSError as e:
+            logger.warning(f"Lean worker {worker.name} unreachable, using a fresh container: {e}")
+            await pool.release(worker)
+            return False
+        job.connection = writer
+
+        async def follow():
+            nonlocal exit_code
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    return
+                message = json.loads(raw)
+                if message.get('type') == 'exit':
+                    exit_code = message.get('code')
+                    return
+                event = job.parser.feed(message.get('line', ''))
+                if event is not None:
+                    self._emit(job, event, on_event)
+
+        try:
+            writer.write(json.dumps({**request, 'job_id': job.job_id}).encode() + b'\n')
+            await writer.drain()
+            await asyncio.wait_for(follow(), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.stats['timed_out'] += 1
+            # Closing the connection makes the agent kill the launcher
+            raise TimeoutError(f"Lean backtest exceeded {timeout:.0f}s")
+        except (ConnectionError, ValueError) as e:
+            if not job.cancelled:
+                raise RuntimeError(f"Lean worker {worker.name} failed: {e}")
+        finally:
+            job.connection = None
+            writer.close()
+            # Brings the job folder back; the worker itself is replaced
+            await pool.release(worker)
+
+        if job.cancelled:
+            raise LeanJobCancelled(job.job_id)
+        if exit_code is None:
+            raise RuntimeError(f"Lean worker {worker.name} closed the connection: {job.parser.tail[-500:]}")
+        if exit_code != 0:
+            raise RuntimeError(f"Lean exited with status {exit_code}: {job.parser.tail[-500:]}")
+        return True
+
+    async def _follow(self, job: LeanJob, on_event: Optional[EventCallback]):
+        """Tail the container log on a worker thread and parse lines as they arrive"""
+        loop = asyncio.get_event_loop()
+        lines: asyncio.Queue = asyncio.Queue()
+
+        def pump():
+            pending = b''
+            try:
+                for chunk in job.container.logs(stream=True, follow=True):
+                    pending += chunk
+                    *complete, pending = pending.split(b'\n')
+                    for raw in complete:
+                        loop.call_soon_threadsafe(lines.put_nowait, raw.decode('utf-8', 'replace'))
+                if pending:
+                    loop.call_soon_threadsafe(lines.put_nowait, pending.decode('utf-8', 'replace'))
+            finally:
+                loop.call_soon_threadsafe(lines.put_nowait, None)
+
+        pumping = loop.run_in_executor(self._executor, pump)
+        try:
+            while True:
+                line = await lines.get()
+                if line is None:
+                    break
+                event = job.parser.feed(line)
+                if event is not None:
+                    self._emit(job, event, on_event)
+        finally:
+            if not pumping.done():
+                # Timed out or cancelled: stopping the container ends the stream
+                await self._stop(job)
+            await asyncio.shield(pumping)
+
+    async def _stop(self, job: LeanJob):
+        if job.container is None:
+            return
+        try:
+            await self._docker(job.container.stop, timeout=10)
+        except Exception as e:
+            logger.debug(f"Stopping container for job {job.job_id}: {e}")
+
+    async def _remove(self, job: LeanJob):
+        try:
+            await self._docker(job.container.remove, force=True)
+        except Exception as e:
+            logger.warning(f"Failed to remove container for job {job.job_id}: {e}")
+
+    async def cancel(self, job_id: str) -> bool:
+        """Stop a queued or running job; returns False if it is not known"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return False
+        job.cancelled = True
+        if job.connection is not None:
+            # Warm worker: the agent kills the launcher when the connection drops
+            job.connection.close()
+        await self._stop(job)
+        return True
+
+    async def close(self):
+        """Stop every running container and the worker threads"""
+        await asyncio.gather(*(self.cancel(job_id) for job_id in list(self.jobs)), return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    # ============ Event push ============
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """Queue receiving this job's events; None marks the end of the stream"""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        job = self.jobs.get(job_id)
+        if job is not None:
+            queue.put_nowait({
+                'type': 'snapshot',
+                'job_id': job_id,
+                'status': job.status,
+                'progress': job.parser.progress,
+                'trade_count': len(job.parser.trades),
+            })
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        subscribers = self._subscribers.get(job_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[job_id]
+
+    def publish(self, job_id: str, event: Dict[str, Any]):
+        """Push an event to the job's subscribers"""
+        for queue in self._subscribers.get(job_id, ()):
+            queue.put_nowait({**event, 'job_id': job_id})
+
+    def finish(self, job_id: str, event: Dict[str, Any]):
+        """Push a final event and close the job's streams"""
+        self.publish(job_id, event)
+        for queue in self._subscribers.pop(job_id, ()):
+            queue.put_nowait(None)
+
+    def _emit(self, job: LeanJob, event: Dict[str, Any], on_event: Optional[EventCallback]):
+        self.publish(job.job_id, event)
+        if on_event is not None:
+            try:
+                on_event(event)
+            except Exception as e:
+                logger.warning(f"Event callback failed for job {job.job_id}: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'max_concurrent': self._max_concurrent or None,
+            'running': sum(1 for job in self.jobs.values() if job.status == 'running'),
+            'queued': sum(1 for job in self.jobs.values() if job.status == 'queued'),
+            'subscribers': sum(len(queues) for queues in self._subscribers.values()),
+        }
@@ -0,0 +1,149 @@
+"""
+Lean Worker Agent
+Runs inside a warm Lean container and executes backtests sent over a unix socket
+
+Standard library only: it runs on the Lean image's Python, not the service's.
+
+Protocol (one JSON object per line):
+- Request:  {"job_id": ..., "config": "/lean/job/config.json", "env": {...}}
+- Replies:  {"type": "log", "line": ...} for every output line of the launcher,
+            then {"type": "exit", "code": <launcher exit code>}
+- Closing the connection kills the running launcher
+
+The agent runs a single job: once the request arrives it stops listening and
+removes its socket, so nothing the job starts can reach it, and it exits when
+the job is done. Connections closed without a request (readiness probes) are
+ignored.
+
+Usage:
+    python lean_worker_agent.py /lean/agent-socket/agent.sock
+"""
+
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+from typing import Optional
+
+logger = logging.getLogger("lean_worker_agent")
+
+LEAN_LAUNCHER = os.getenv('LEAN_LAUNCHER', 'QuantConnect.Lean.Launcher.dll')
+LEAN_LAUNCHER_DIR = os.getenv('LEAN_LAUNCHER_DIR') or None  # None = the image's working directory
+
+
+async def run_job(request: dict, writer: asyncio.StreamWriter, disconnected: asyncio.Future) -> int:
+    """Run one launcher process, streaming its output until it exits or the client goes away"""
+    env = {**os.environ, **{k: str(v) for k, v in (request.get('env') or {}).items()}}
+    process = await asyncio.create_subprocess_exec(
+        'dotnet', LEAN_LAUNCHER, '--config', request['config'],
+        cwd=LEAN_LAUNCHER_DIR,
+        env=env,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        # Own process group, so a kill also reaches anything the launcher started
+        start_new_session=True,
+    )
+    logger.info("job %s started (pid %s)", request.get('job_id'), process.pid)
+
+    async def pump():
+        while True:
+            raw = await process.stdout.readline()
+            if not raw:
+                break
+            line = raw.decode('utf-8', 'replace').rstrip('\r\n')
+            writer.write(json.dumps({'type': 'log', 'line': line}).encode() + b'\n')
+            await writer.drain()
+        return await process.wait()
+
+    pumping = asyncio.ensure_future(pump())
+    try:
+        await asyncio.wait([pumping, disconnected], return_when=asyncio.FIRST_COMPLETED)
+        if pumping.done():
+            # Raises if streaming to the client failed; the finally still kills the launcher
+            return pumping.result()
+        logger.info("job %s cancelled by the client", request.get('job_id'))
+    finally:
+        # However the job ended, nothing it started outlives it
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await process.wait()
+        pumping.cancel()
+    return process.returncode
+
+
+class Agent:
+    """Accepts a single job on a unix socket"""
+
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._done: Optional[asyncio.Future] = None
+
+    def _stop_listening(self):
+        self._server.close()
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            raw = await reader.readline()
+            if not raw or not self._server.is_serving():
+                return
+            self._stop_listening()
+
+            try:
+                request = json.loads(raw)
+                # Anything read after the request (normally EOF) means the client is gone
+                disconnected = asyncio.ensure_future(reader.read())
+                try:
+                    code = await run_job(request, writer, disconnected)
+                finally:
+                    disconnected.cancel()
+                if not writer.is_closing():
+                    writer.write(json.dumps({'type': 'exit', 'code': code}).encode() + b'\n')
+                    await writer.drain()
+            finally:
+                if not self._done.done():
+                    self._done.set_result(None)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            logger.exception("job failed: %s", e)
+            try:
+                writer.write(json.dumps({'type': 'exit', 'code': -1, 'error': str(e)}).encode() + b'\n')
+                await writer.drain()
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._done = asyncio.get_running_loop().create_future()
+        self._server = await asyncio.start_unix_server(self.handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        logger.info("listening on %s", self.socket_path)
+        await self._done
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    if len(sys.argv) != 2:
+        sys.exit(f"usage: {sys.argv[0]} SOCKET_PATH")
+    try:
+        asyncio.run(Agent(sys.argv[1]).serve())
+    finally:
+        if os.path.exists(sys.argv[1]):
+            os.unlink(sys.argv[1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Lean Worker Pool
+Pre-started Lean containers that take backtests over a local unix socket
+
+- LEAN_WARM_POOL_SIZE containers are started with the service and kept idle,
+  so a backtest skips container create/start (0 disables the pool)
+- Each worker runs services/lean_worker_agent.py, which launches Lean for
+  the job it is sent and streams the output back over the socket
+- Workers never share anything writable: each mounts the market data store
+  and the agent read-only, plus its own socket folder and its own job slot,
+  which is bound at the same path a cold container sees its job folder
+- A job's folder is moved into the worker's slot when the job starts and
+  back out when it ends
+- Workers are single-use, so no container ever runs two tenants' code; a
+  replacement starts in the background after every job
+- Jobs that find no idle worker run in a cold container instead
+- LEAN_JOBS_MOUNT must be a host path (named volumes can only be mounted
+  whole); otherwise the pool stays off
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import uuid
+from typing import Dict, List, Any, Optional
+
+from services.lean_runner import LEAN_CPUS_PER_JOB, LEAN_MEMORY_PER_JOB
+from services.market_data_store import LEAN_DATA_ROOT
+
+logger = logging.getLogger(__name__)
+
+LEAN_WARM_POOL_SIZE = int(os.getenv('LEAN_WARM_POOL_SIZE', '2'))
+LEAN_WORKER_START_TIMEOUT = float(os.getenv('LEAN_WORKER_START_TIMEOUT', '60'))
+LEAN_WORKER_PYTHON = os.getenv('LEAN_WORKER_PYTHON', 'python')
+
+# Where the service reads and writes job folders, and the same folder on the
+# Docker host (a host path, so each job can be mounted on its own; defaults
+# assume the same path)
+LEAN_JOBS_ROOT = os.getenv('LEAN_JOBS_ROOT', '/app/jobs')
+LEAN_JOBS_MOUNT = os.getenv('LEAN_JOBS_MOUNT', LEAN_JOBS_ROOT)
+LEAN_DATA_MOUNT = os.getenv('LEAN_DATA_MOUNT', LEAN_DATA_ROOT)
+
+# Paths inside Lean containers
+CONTAINER_DATA_ROOT = '/lean/data-store'
+CONTAINER_JOB_PATH = '/lean/job'
+CONTAINER_AGENT_ROOT = '/lean/agent'
+CONTAINER_SOCKET_DIR = '/lean/agent-socket'
+
+WORKER_LABEL = 'wagyu.lean-worker'
+_AGENT_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lean_worker_agent.py')
+
+
+class LeanWorker:
+    """One warm Lean container and its folders (service-side paths)"""
+
+    def __init__(self, name: str, root: str):
+        self.name = name
+        self.root = root
+        self.job_slot = os.path.join(root, 'job')
+        self.socket_path = os.path.join(root, 'socket', 'agent.sock')
+        self.container = None
+        # Job folder currently moved into job_slot
+        self.job_dir: Optional[str] = None
+
+
+class LeanWorkerPool:
+    """Idle warm workers handed out one job at a time"""
+
+    def __init__(
+        self,
+        docker_client,
+        image: str,
+        size: int = LEAN_WARM_POOL_SIZE,
+        jobs_root: str = LEAN_JOBS_ROOT,
+        jobs_mount: str = LEAN_JOBS_MOUNT,
+    ):
+        self.docker_client = docker_client
+        self.image = image
+        self.size = size if docker_client is not None else 0
+        self.jobs_root = jobs_root
+        self.jobs_mount = jobs_mount
+        self.agent_dir = os.path.join(jobs_root, '.agent')
+        self.workers_dir = os.path.join(jobs_root, '.workers')
+
+        self._idle: List[LeanWorker] = []
+        self._workers: Dict[str, LeanWorker] = {}
+        self._replacing: set = set()
+        self._closed = False
+        self.stats = {'started': 0, 'failed_starts': 0, 'recycled': 0, 'warm_jobs': 0}
+
+    async def _docker(self, fn, *args, **kwargs):
+        return await asyncio.get_event_loop().run_in_executor(None, lambda: fn(*args, **kwargs))
+
+    async def start(self):
+        """Install the agent where workers can see it and start the pool"""
+        if self.size <= 0:
+            return
+        if not os.path.isabs(self.jobs_mount):
+            logger.warning(f"LEAN_JOBS_MOUNT={self.jobs_mount!r} is not a host path, Lean worker pool disabled")
+            self.size = 0
+            return
+        await self._docker(self._install_agent)
+        # Leftovers from a previous run of the service
+        await self._docker(self._remove_stale_workers)
+        await asyncio.gather(*(self._add_worker() for _ in range(self.size)))
+        logger.info(f"Lean worker pool started {len(self._idle)}/{self.size} workers")
+
+    def _install_agent(self):
+        os.makedirs(self.agent_dir, exist_ok=True)
+        shutil.copyfile(_AGENT_SOURCE, os.path.join(self.agent_dir, 'lean_worker_agent.py'))
+
+    def _remove_stale_workers(self):
+        for container in self.docker_client.containers.list(all=True, filters={'label': WORKER_LABEL}):
+            try:
+                container.remove(force=True)
+            except Exception as e:
+                logger.debug(f"Removing stale Lean worker {container.name}: {e}")
+        shutil.rmtree(self.workers_dir, ignore_errors=True)
+
+    def _host_path(self, path: str) -> str:
+        """The Docker host path of a folder under the jobs root"""
+        return os.path.join(self.jobs_mount, os.path.relpath(path, self.jobs_root))
+
+    async def _add_worker(self):
+        worker = await self._start_worker()
+        if worker is None:
+            return
+        if self._closed:
+            await self._remove(worker)
+        else:
+            self._idle.append(worker)
+
+    async def _start_worker(self) -> Optional[LeanWorker]:
+        name = f"lean_worker_{uuid.uuid4().hex[:8]}"
+        worker = LeanWorker(name, os.path.join(self.workers_dir, name))
+        try:
+            await self._docker(os.makedirs, worker.job_slot)
+            await self._docker(os.makedirs, os.path.dirname(worker.socket_path))
+            worker.container = await self._docker(
+                self.docker_client.containers.run,
+                self.image,
+                command=[
+                    LEAN_WORKER_PYTHON, f"{CONTAINER_AGENT_ROOT}/lean_worker_agent.py",
+                    f"{CONTAINER_SOCKET_DIR}/{os.path.basename(worker.socket_path)}"
+                ],
+                detach=True,
+                name=name,
+                labels={WORKER_LABEL: '1'},
+                volumes={
+                    LEAN_DATA_MOUNT: {'bind': CONTAINER_DATA_ROOT, 'mode': 'ro'},
+                    self._host_path(self.agent_dir): {'bind': CONTAINER_AGENT_ROOT, 'mode': 'ro'},
+                    self._host_path(os.path.dirname(worker.socket_path)): {'bind': CONTAINER_SOCKET_DIR, 'mode': 'rw'},
+                    self._host_path(worker.job_slot): {'bind': CONTAINER_JOB_PATH, 'mode': 'rw'},
+                },
+                mem_limit=LEAN_MEMORY_PER_JOB,
+                nano_cpus=int(LEAN_CPUS_PER_JOB * 1e9),
+            )
+            await self._wait_ready(worker)
+        except Exception as e:
+            self.stats['failed_starts'] += 1
+            logger.warning(f"Failed to start Lean worker {name}: {e}")
+            await self._remove(worker)
+            return None
+
+        self._workers[name] = worker
+        self.stats['started'] += 1
+        return worker
+
+    async def _wait_ready(self, worker: LeanWorker):
+        """Wait until the agent accepts connections on its socket"""
+        deadline = asyncio.get_event_loop().time() + LEAN_WORKER_START_TIMEOUT
+        while True:
+            try:
+                _, writer = await asyncio.open_unix_connection(worker.socket_path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                if asyncio.get_event_loop().time() > deadline:
+                    raise TimeoutError(f"agent did not listen within {LEAN_WORKER_START_TIMEOUT:.0f}s")
+                await asyncio.sleep(0.25)
+                continue
+            # An empty connection is ignored by the agent
+            writer.close()
+            return
+
+    async def acquire(self, job_dir: str) -> Optional[LeanWorker]:
+        """
+        An idle worker with the job folder moved into its slot, or None if
+        all are busy (or the pool is off). Pass the worker to release() after
+        the job, whatever happened, to get the folder back.
+        """
+        if not self._idle:
+            return None
+        worker = self._idle.pop()
+        worker.job_dir = job_dir
+        try:
+            await self._docker(_move_entries, job_dir, worker.job_slot)
+        except OSError as e:
+            logger.warning(f"Could not stage job folder for Lean worker {worker.name}: {e}")
+            await self.release(worker)
+            return None
+        self.stats['warm_jobs'] += 1
+        return worker
+
+    async def release(self, worker: LeanWorker):
+        """Move the job folder back and replace the worker (workers run one job each)"""
+        if worker.job_dir is not None:
+            try:
+                # The bind mount follows the slot folder itself, so its entries move, not the folder
+                await self._docker(_move_entries, worker.job_slot, worker.job_dir)
+                worker.job_dir = None
+            except OSError as e:
+                # Leave the slot on disk (see _remove) rather than lose the job's files
+                logger.warning(f"Could not collect job folder from Lean worker {worker.name}: {e}")
+        if self._closed:
+            return
+        self.stats['recycled'] += 1
+        task = asyncio.ensure_future(self._replace(worker))
+        self._replacing.add(task)
+        task.add_done_callback(self._replacing.discard)
+
+    async def _replace(self, worker: LeanWorker):
+        await self._remove(worker)
+        await self._add_worker()
+
+    async def _remove(self, worker: LeanWorker):
+        self._workers.pop(worker.name, None)
+        if worker.container is not None:
+            try:
+                await self._docker(worker.container.remove, force=True)
+            except Exception as e:
+                logger.warning(f"Failed to remove Lean worker {worker.name}: {e}")
+        if worker.job_dir is None:
+            await self._docker(shutil.rmtree, worker.root, True)
+
+    async def close(self):
+        """Remove every worker container"""
+        self._closed = True
+        for task in list(self._replacing):
+            task.cancel()
+        workers = list(self._workers.values())
+        self._idle.clear()
+        await asyncio.gather(*(self._remove(worker) for worker in workers), return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'size': self.size,
+            'workers': len(self._workers),
+            'idle': len(self._idle),
+        }
+
+
+def _move_entries(source: str, destination: str):
+    """Move everything in one folder into another (same filesystem)"""
+    os.makedirs(destination, exist_ok=True)
+    for entry in os.listdir(source):
+        os.rename(os.path.join(source, entry), os.path.join(destination, entry))
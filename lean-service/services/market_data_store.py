@@ -0,0 +1,165 @@
+"""
+Content-Addressed Market Data Store
+Lean data folders prepared once and shared read-only between backtests
+
+- A data set is keyed by a hash of its bars, so jobs over the same symbols,
+  exchanges and range reuse one folder instead of rewriting CSVs per job
+- Folders are written to a temporary name and renamed into place, so a
+  folder that exists is always complete and never modified again
+- Least recently used data sets not in use by a running job are pruned once
+  the store exceeds LEAN_DATA_STORE_MAX_GB
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+from typing import Dict, List, Any
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+LEAN_DATA_ROOT = os.getenv('LEAN_DATA_ROOT', '/app/data/store')
+LEAN_DATA_STORE_MAX_GB = float(os.getenv('LEAN_DATA_STORE_MAX_GB', '20'))
+
+BAR_COLUMNS = ['time', 'symbol', 'exchange', 'open', 'high', 'low', 'close', 'volume']
+
+
+class MarketDataStore:
+    """Content-addressed Lean data folders under one root"""
+
+    def __init__(self, root: str = LEAN_DATA_ROOT, max_bytes: int = int(LEAN_DATA_STORE_MAX_GB * 1024 ** 3)):
+        self.root = root
+        self.max_bytes = max_bytes
+        # data key -> jobs currently using it
+        self._in_use: Dict[str, int] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.stats = {'prepared': 0, 'reused': 0, 'pruned': 0}
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    async def acquire(self, market_data: List[Dict[str, Any]]) -> str:
+        """
+        Make sure a folder for these bars exists and mark it in use.
+
+        Returns:
+            Data key (folder name under the store root); release() it when the job ends
+        """
+        loop = asyncio.get_event_loop()
+        frame = await loop.run_in_executor(None, self._frame, market_data)
+        key = await loop.run_in_executor(None, self._key, frame)
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+            if os.path.isdir(self.path(key)):
+                self.stats['reused'] += 1
+                await loop.run_in_executor(None, os.utime, self.path(key))
+            else:
+                try:
+                    await loop.run_in_executor(None, self._write, key, frame)
+                except Exception:
+                    self.release(key)
+                    raise
+                self.stats['prepared'] += 1
+                await loop.run_in_executor(None, self.prune)
+        return key
+
+    async def fingerprint(self, market_data: List[Dict[str, Any]]) -> str:
+        """Data key for these bars without writing anything"""
+        loop = asyncio.get_event_loop()
+        frame = await loop.run_in_executor(None, self._frame, market_data)
+        return await loop.run_in_executor(None, self._key, frame)
+
+    def release(self, key: str):
+        """A job no longer reads this data set"""
+        count = self._in_use.get(key, 0) - 1
+        if count > 0:
+            self._in_use[key] = count
+        else:
+            self._in_use.pop(key, None)
+
+    @staticmethod
+    def _frame(market_data: List[Dict[str, Any]]) -> pd.DataFrame:
+        frame = pd.DataFrame(market_data, columns=BAR_COLUMNS)
+        frame['time'] = pd.to_datetime(frame['time'], utc=True)
+        return frame.sort_values(['symbol', 'exchange', 'time'], kind='stable').reset_index(drop=True)
+
+    @staticmethod
+    def _key(frame: pd.DataFrame) -> str:
+        digest = hashlib.sha256()
+        digest.update(','.join(frame.columns).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+        return digest.hexdigest()[:32]
+
+    def _write(self, key: str, frame: pd.DataFrame):
+        """Write the Lean folder under a temporary name, then rename it into place"""
+        os.makedirs(self.root, exist_ok=True)
+        staging = os.path.join(self.root, f".{key}.{uuid.uuid4().hex[:8]}")
+        try:
+            for (symbol, exchange), records in frame.groupby(['symbol', 'exchange'], sort=False):
+                symbol_dir = os.path.join(staging, "crypto", exchange, symbol.lower())
+                os.makedirs(symbol_dir, exist_ok=True)
+
+                records = records.drop(columns=['symbol', 'exchange'])
+                records.to_csv(os.path.join(symbol_dir, "hour.csv"), index=False, header=False)
+
+                # Daily bars aggregated from the source bars
+                daily = records.set_index('time').resample('D').agg({
+                    'open': 'first',
+                    'high': 'max',
+                    'low': 'min',
+                    'close': 'last',
+                    'volume': 'sum'
+                }).dropna()
+                daily.to_csv(os.path.join(symbol_dir, "daily.csv"), index=False, header=False)
+
+            os.rename(staging, self.path(key))
+            logger.info(f"Prepared market data set {key} ({len(frame)} bars)")
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            if not os.path.isdir(self.path(key)):
+                raise
+            # Another process wrote the same data set first
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    def prune(self):
+        """Remove least recently used data sets not in use until under max_bytes"""
+        try:
+            entries = [
+                entry for entry in os.scandir(self.root)
+                if entry.is_dir() and not entry.name.startswith('.')
+            ]
+        except FileNotFoundError:
+            return
+
+        sizes = {entry.name: self._size(entry.path) for entry in entries}
+        total = sum(sizes.values())
+        for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+            if total <= self.max_bytes:
+                break
+            if entry.name in self._in_use:
+                continue
+            shutil.rmtree(entry.path, ignore_errors=True)
+            total -= sizes[entry.name]
+            self.stats['pruned'] += 1
+
+    @staticmethod
+    def _size(path: str) -> int:
+        total = 0
+        for dirpath, _, filenames in os.walk(path):
+            for name in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, name))
+                except OSError:
+                    pass
+        return total
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, 'in_use': len(self._in_use)}
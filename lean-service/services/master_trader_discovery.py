@@ -1,10 +1,22 @@
 """
 Master Trader Discovery and Ranking System
 Performance-based ranking and discovery of master traders
+
+- CohortMetrics keeps every master trader's daily returns in one padded
+  (days x traders) array with a validity mask and computes the
+  PerformanceCalculator metrics column-wise for the whole universe
+- Appending a day updates running moments, drawdowns and the 20-day
+  rolling Sharpe ratios in O(traders); quantiles are recomputed in one
+  vectorized pass the next time metrics are read
+- MasterTraderRanker scores a whole list of profiles at once
+- MasterTraderDiscovery loads the cohort from the stored return histories
+  on first use (built off the event loop, then swapped in) and appends
+  later days on the loop, so rankings never read a half-written day
 """
 
 import asyncio
 import logging
+import os
 import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
@@ -17,6 +29,11 @@ import math
 
 logger = logging.getLogger(__name__)
 
+# Trailing window of daily returns kept per trader (about three years)
+RANKING_WINDOW_DAYS = int(os.getenv('RANKING_WINDOW_DAYS', '756'))
+# Seconds between cohort load attempts while the stored histories are empty or unreachable
+COHORT_RETRY_SECONDS = float(os.getenv('COHORT_RETRY_SECONDS', '60'))
+
 class StrategyType(Enum):
     SCALPING = "scalping"
     SWING = "swing"
@@ -299,6 +316,348 @@ class PerformanceCalculator:
         
         return total_return / max_drawdown
 
+class CohortMetrics:
+    """
+    Daily returns of the whole master-trader universe, one column per trader.
+    
+    Returns sit in a ring buffer of window_days rows. A trader's rows are
+    valid from their first return on; days they don't report count as flat.
+    The window moments (count, sum, sum of squares, downside sums) are
+    updated as days enter and leave the window. Equity, peak and max
+    drawdown are updated as days arrive and cover the whole tracked history.
+    Metrics match PerformanceCalculator on the same series.
+    
+    For consistency, the Sharpe ratio of the 20-day window ending on each
+    day is kept alongside the returns and computed from running 20-day sums.
+    So a new day adds one row instead of recomputing every window.
+    """
+    
+    TRADING_DAYS = 252
+    # calculate_consistency_score's window once a trader has 80+ days
+    ROLLING_DAYS = 20
+    # Standard deviations below this are treated as zero; running sums
+    # leave float noise where the list version would see an exact zero
+    FLAT_STD = 1e-10
+    
+    def __init__(self, window_days: int = RANKING_WINDOW_DAYS, risk_free_rate: float = 0.02):
+        self.window_days = max(window_days, self.ROLLING_DAYS)
+        self.daily_risk_free = risk_free_rate / self.TRADING_DAYS
+        self.index: Dict[str, int] = {}
+        self.trader_ids: List[str] = []
+        self._head = 0  # ring row holding the oldest day
+        self._days = 0
+        self._reset_aggregates(0)
+        self._metrics: Optional[Dict[str, np.ndarray]] = None
+    
+    def _reset_aggregates(self, capacity: int):
+        self._returns = np.zeros((self.window_days, capacity))
+        self._valid = np.zeros((self.window_days, capacity), dtype=bool)
+        # Sharpe of the ROLLING_DAYS window ending on each ring row
+        self._window_sharpe = np.zeros((self.window_days, capacity))
+        self._window_full = np.zeros((self.window_days, capacity), dtype=bool)
+        self._roll_count = np.zeros(capacity)
+        self._roll_sum = np.zeros(capacity)
+        self._roll_sumsq = np.zeros(capacity)
+        self._count = np.zeros(capacity)
+        self._sum = np.zeros(capacity)
+        self._sumsq = np.zeros(capacity)
+        # Over excess returns below zero, as in calculate_sortino_ratio
+        self._down_count = np.zeros(capacity)
+        self._down_sum = np.zeros(capacity)
+        self._down_sumsq = np.zeros(capacity)
+        self._started = np.zeros(capacity, dtype=bool)
+        self._equity = np.ones(capacity)
+        self._peak = np.ones(capacity)
+        self._max_drawdown = np.zeros(capacity)
+    
+    def __len__(self) -> int:
+        return len(self.trader_ids)
+    
+    def _ensure_traders(self, trader_ids):
+        new = [trader_id for trader_id in trader_ids if trader_id not in self.index]
+        if not new:
+            return
+        size = len(self.trader_ids)
+        for trader_id in new:
+            self.index[trader_id] = len(self.trader_ids)
+            self.trader_ids.append(trader_id)
+        if len(self.trader_ids) <= self._returns.shape[1]:
+            return
+        
+        # Grow columns geometrically so adding traders stays cheap
+        capacity = max(len(self.trader_ids), 2 * self._returns.shape[1], 64)
+        def grow(array, fill):
+            grown = np.full(array.shape[:-1] + (capacity,), fill, dtype=array.dtype)
+            grown[..., :size] = array[..., :size]
+            return grown
+        for name, fill in (
+            ('_returns', 0.0), ('_valid', False), ('_window_sharpe', 0.0), ('_window_full', False),
+            ('_roll_count', 0.0), ('_roll_sum', 0.0), ('_roll_sumsq', 0.0), ('_count', 0.0), ('_sum', 0.0), ('_sumsq', 0.0),
+            ('_down_count', 0.0), ('_down_sum', 0.0), ('_down_sumsq', 0.0),
+            ('_started', False), ('_equity', 1.0), ('_peak', 1.0), ('_max_drawdown', 0.0)
+        ):
+            setattr(self, name, grow(getattr(self, name), fill))
+    
+    def load(self, series: Dict[str, List[float]]):
+        """Replace the cohort with full daily return histories, oldest first"""
+        self.index, self.trader_ids = {}, []
+        self._reset_aggregates(0)
+        self._ensure_traders(series.keys())
+        size = len(self.trader_ids)
+        
+        # Right-aligned padded array of the full histories
+        length = max((len(values) for values in series.values()), default=0)
+        full = np.zeros((length, self._returns.shape[1]))
+        valid = np.zeros(full.shape, dtype=bool)
+        for trader_id, values in series.items():
+            if len(values):
+                column = self.index[trader_id]
+                full[length - len(values):, column] = values
+                valid[length - len(values):, column] = True
+        
+        if length:
+            equity = np.cumprod(1.0 + full, axis=0)
+            # Peaks start from the initial equity of 1, as in append_day
+            peak = np.maximum(np.maximum.accumulate(equity, axis=0), 1.0)
+            self._max_drawdown = ((peak - equity) / peak).max(axis=0)
+            self._equity, self._peak = equity[-1], peak[-1]
+            self._started = valid.any(axis=0)
+        
+        # Keep the trailing window, chronological from row 0
+        keep = min(length, self.window_days)
+        self._returns[self.window_days - keep:] = full[length - keep:]
+        self._valid[self.window_days - keep:] = valid[length - keep:]
+        self._head = 0
+        self._days = length
+        self._recompute_moments()
+        logger.info(f"Loaded {size} trader return series ({length} days)")
+    
+    def _recompute_moments(self):
+        returns = np.where(self._valid, self._returns, 0.0)
+        excess = returns - self.daily_risk_free
+        down = self._valid & (excess < 0)
+        self._count = self._valid.sum(axis=0).astype(float)
+        self._sum = returns.sum(axis=0)
+        self._sumsq = (returns * returns).sum(axis=0)
+        self._down_count = down.sum(axis=0).astype(float)
+        self._down_sum = np.where(down, excess, 0.0).sum(axis=0)
+        self._down_sumsq = np.where(down, excess * excess, 0.0).sum(axis=0)
+        
+        # Rolling windows, computed in chronological order and stored back in ring order
+        window = self.ROLLING_DAYS
+        chronological = np.roll(np.where(self._valid, self._returns - self.daily_risk_free, 0.0), -self._head, axis=0)
+        chronological_valid = np.roll(self._valid, -self._head, axis=0)
+        zero = np.zeros((1, chronological.shape[1]))
+        cumsum = np.vstack([zero, np.cumsum(chronological, axis=0)])
+        cumsq = np.vstack([zero, np.cumsum(chronological * chronological, axis=0)])
+        cumcount = np.vstack([zero, np.cumsum(chronological_valid, axis=0)])
+        sharpe = np.zeros(chronological.shape)
+        full = np.zeros(chronological.shape, dtype=bool)
+        # Rows before ROLLING_DAYS - 1 would need days that left the ring
+        sums = cumsum[window:] - cumsum[:-window]
+        sumsqs = cumsq[window:] - cumsq[:-window]
+        full[window - 1:] = (cumcount[window:] - cumcount[:-window]) == window
+        sharpe[window - 1:] = self._rolling_sharpe(sums, sumsqs)
+        self._window_sharpe = np.roll(sharpe, self._head, axis=0)
+        self._window_full = np.roll(full, self._head, axis=0)
+        self._roll_sum, self._roll_sumsq = sums[-1].copy(), sumsqs[-1].copy()
+        self._roll_count = cumcount[-1] - cumcount[-1 - window]
+        self._metrics = None
+    
+    def _rolling_sharpe(self, sums: np.ndarray, sumsqs: np.ndarray) -> np.ndarray:
+        """Annualized Sharpe of ROLLING_DAYS windows from their excess return sums"""
+        mean = sums / self.ROLLING_DAYS
+        std = np.sqrt(np.maximum(sumsqs / self.ROLLING_DAYS - mean ** 2, 0.0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(std > self.FLAT_STD, mean / std * np.sqrt(self.TRADING_DAYS), 0.0)
+    
+    def _add_row(self, returns: np.ndarray, valid: np.ndarray, sign: float):
+        returns = np.where(valid, returns, 0.0)
+        excess = returns - self.daily_risk_free
+        down = valid & (excess < 0)
+        self._count += sign * valid
+        self._sum += sign * returns
+        self._sumsq += sign * returns * returns
+        self._down_count += sign * down
+        self._down_sum += sign * np.where(down, excess, 0.0)
+        self._down_sumsq += sign * np.where(down, excess * excess, 0.0)
+    
+    def append_day(self, returns: Dict[str, float]):
+        """
+        Add one day of returns (trader id -> daily return).
+        
+        O(traders): the oldest day leaves the window and the new one enters.
+        """
+        self._ensure_traders(returns.keys())
+        columns = np.fromiter((self.index[trader_id] for trader_id in returns), dtype=np.int64, count=len(returns))
+        row = np.zeros(self._returns.shape[1])
+        row[columns] = np.fromiter(returns.values(), dtype=float, count=len(returns))
+        self._started[columns] = True
+        valid = self._started.copy()
+        
+        # The day leaving the rolling window (read before the ring row is reused)
+        leaving = (self._head - self.ROLLING_DAYS) % self.window_days
+        leaving_excess = np.where(self._valid[leaving], self._returns[leaving] - self.daily_risk_free, 0.0)
+        excess = np.where(valid, row - self.daily_risk_free, 0.0)
+        self._roll_count += valid.astype(float) - self._valid[leaving]
+        self._roll_sum += excess - leaving_excess
+        self._roll_sumsq += excess * excess - leaving_excess * leaving_excess
+        
+        # The ring row being overwritten holds the day leaving the window
+        self._add_row(self._returns[self._head], self._valid[self._head], -1.0)
+        self._returns[self._head] = row
+        self._valid[self._head] = valid
+        self._add_row(row, valid, 1.0)
+        self._window_sharpe[self._head] = self._rolling_sharpe(self._roll_sum, self._roll_sumsq)
+        self._window_full[self._head] = self._roll_count == self.ROLLING_DAYS
+        self._head = (self._head + 1) % self.window_days
+        self._days += 1
+        
+        self._equity *= 1.0 + row
+        np.maximum(self._peak, self._equity, out=self._peak)
+        np.maximum(self._max_drawdown, (self._peak - self._equity) / self._peak, out=self._max_drawdown)
+        
+        if self._days % self.window_days == 0:
+            # Bound floating point drift of the running sums
+            self._recompute_moments()
+        self._metrics = None
+    
+    def metrics(self) -> Dict[str, np.ndarray]:
+        """Metric columns for all traders, in trader_ids order"""
+        if self._metrics is not None:
+            return self._metrics
+        
+        size = len(self.trader_ids)
+        sqrt_days = np.sqrt(self.TRADING_DAYS)
+        n = self._count[:size]
+        enough = n >= 2
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(n > 0, self._sum[:size] / n, 0.0)
+            std = np.sqrt(np.maximum(np.where(n > 0, self._sumsq[:size] / n, 0.0) - mean ** 2, 0.0))
+            mean_excess = mean - self.daily_risk_free
+            flat = std <= self.FLAT_STD
+            sharpe = np.where(enough & ~flat, mean_excess / std * sqrt_days, 0.0)
+            
+            down_n = self._down_count[:size]
+            down_mean = np.where(down_n > 0, self._down_sum[:size] / down_n, 0.0)
+            down_std = np.sqrt(np.maximum(np.where(down_n > 0, self._down_sumsq[:size] / down_n, 0.0) - down_mean ** 2, 0.0))
+            sortino = np.where(
+                down_n == 0,
+                np.where(mean_excess > 0, np.inf, 0.0),
+                np.where(down_std <= self.FLAT_STD, 0.0, mean_excess / down_std * sqrt_days)
+            )
+            sortino = np.where(enough, sortino, 0.0)
+            
+            max_drawdown = self._max_drawdown[:size]
+            annualized_return = mean * self.TRADING_DAYS
+            total_return = self._equity[:size] - 1.0
+            calmar = np.where(max_drawdown == 0, 0.0, annualized_return / max_drawdown)
+            recovery = np.where(max_drawdown == 0, 0.0, total_return / max_drawdown)
+        
+        # Quantiles don't depend on order, so the ring is used as is
+        var_95, var_99, expected_shortfall = self._tail_metrics(self._returns[:, :size], self._valid[:, :size], n)
+        
+        self._metrics = {
+            'total_return': total_return,
+            'annualized_return': annualized_return,
+            'sharpe_ratio': sharpe,
+            'sortino_ratio': sortino,
+            'calmar_ratio': calmar,
+            'max_drawdown': max_drawdown,
+            'current_drawdown': (self._peak[:size] - self._equity[:size]) / self._peak[:size],
+            'volatility': np.where(enough, std * sqrt_days, 0.0),
+            'var_95': var_95,
+            'var_99': var_99,
+            'expected_shortfall': expected_shortfall,
+            'recovery_factor': recovery,
+            'consistency_score': self._consistency(n),
+        }
+        return self._metrics
+    
+    @staticmethod
+    def _tail_metrics(returns: np.ndarray, valid: np.ndarray, n: np.ndarray):
+        """VaR at 95/99% (linear interpolation, as np.percentile) and 95% expected shortfall"""
+        ordered = np.sort(np.where(valid, returns, np.inf), axis=0)
+        counts = n.astype(np.int64)
+        has_data = counts > 0
+        
+        def percentile(q):
+            position = np.maximum(counts - 1, 0) * q
+            lower = np.floor(position).astype(np.int64)
+            upper = np.minimum(lower + 1, np.maximum(counts - 1, 0))
+            low = np.take_along_axis(ordered, lower[None, :], axis=0)[0]
+            high = np.take_along_axis(ordered, upper[None, :], axis=0)[0]
+            value = low + (high - low) * (position - lower)
+            return np.where(has_data, value, 0.0)
+        
+        with np.errstate(invalid='ignore'):
+            var_95, var_99 = percentile(0.05), percentile(0.01)
+        tail = valid & (returns <= var_95)
+        tail_count = tail.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shortfall = np.where(tail_count > 0, np.where(tail, returns, 0.0).sum(axis=0) / tail_count, 0.0)
+        return var_95, var_99, shortfall
+    
+    def _consistency(self, n: np.ndarray) -> np.ndarray:
+        """
+        calculate_consistency_score for every trader: 1 / (1 + std of the
+        Sharpe ratios of rolling windows of min(20, n // 4) days). As in the
+        list version, the windows start at the first return and stop before
+        the last one.
+        """
+        size = len(n)
+        days = self.window_days
+        counts = n.astype(np.int64)
+        windows = np.minimum(self.ROLLING_DAYS, counts // 4)
+        scores = np.zeros(size)
+        
+        def score(sharpe, used):
+            used_count = used.sum(axis=0)
+            mean = np.where(used, sharpe, 0.0).sum(axis=0) / used_count
+            std = np.sqrt(np.maximum(np.where(used, (sharpe - mean) ** 2, 0.0).sum(axis=0) / used_count, 0.0))
+            return np.where(std <= self.FLAT_STD, 1.0, np.minimum(1.0 / (1.0 + std), 1.0))
+        
+        # Traders with 80+ days: the stored 20-day window Sharpes
+        columns = np.flatnonzero((counts >= 10) & (windows == self.ROLLING_DAYS))
+        if len(columns):
+            sharpe = self._window_sharpe[:, columns]
+            used = self._window_full[:, columns]
+            # Windows must lie inside the ring and end before the last day:
+            # drop the first ROLLING_DAYS - 1 rows and the last row, in ring order
+            dropped = np.append(np.arange(self.ROLLING_DAYS - 1), days - 1)
+            used[(self._head + dropped) % days] = False
+            scores[columns] = score(sharpe, used)
+        
+        # Shorter track records: recompute their few, shorter windows
+        for window in np.unique(windows[(counts >= 10) & (windows < self.ROLLING_DAYS)]):
+            columns = np.flatnonzero((counts >= 10) & (windows == window))
+            excess = np.roll(self._returns[:, columns], -self._head, axis=0) - self.daily_risk_free
+            cumsum = np.vstack([np.zeros(len(columns)), np.cumsum(excess, axis=0)])
+            cumsq = np.vstack([np.zeros(len(columns)), np.cumsum(excess * excess, axis=0)])
+            # Window starting at row s covers rows s .. s + window - 1
+            mean = (cumsum[window:] - cumsum[:-window]) / window
+            std = np.sqrt(np.maximum((cumsq[window:] - cumsq[:-window]) / window - mean ** 2, 0.0))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                sharpe = np.where(std > self.FLAT_STD, mean / std * np.sqrt(self.TRADING_DAYS), 0.0)
+            # Series are right-aligned in the window
+            starts = np.arange(days - window + 1)[:, None]
+            used = (starts >= days - counts[columns]) & (starts <= days - 1 - window)
+            scores[columns] = score(sharpe, used)
+        return scores
+    
+    def apply_to(self, profiles: List['MasterTraderProfile']):
+        """Copy return-derived metrics into the profiles of known traders"""
+        metrics = self.metrics()
+        for profile in profiles:
+            column = self.index.get(profile.id)
+            if column is None:
+                continue
+            perf = profile.performance
+            for name, values in metrics.items():
+                setattr(perf, name, float(values[column]))
+
+
 class MasterTraderRanker:
     """Ranks master traders based on multiple criteria"""
     
@@ -471,6 +830,78 @@ class MasterTraderRanker:
             score -= penalty
         
         return max(score, 0)
+    
+    # Profile fields read by calculate_overall_score
+    SCORE_FIELDS = (
+        'annualized_return', 'sharpe_ratio', 'calmar_ratio', 'max_drawdown', 'volatility', 'var_95',
+        'consistency_score', 'win_rate', 'profit_factor', 'max_consecutive_losses',
+        'follower_count', 'average_rating', 'total_assets_managed'
+    )
+    
+    def score_columns(self, columns: Dict[str, np.ndarray], criteria: RankingCriteria) -> np.ndarray:
+        """calculate_overall_score over metric columns, one entry per trader"""
+        c = columns
+        
+        def tiers(values, thresholds, points):
+            # First matching "values > threshold" wins, as in the if/elif chains
+            return np.select([values > t for t in thresholds], points, 0.0)
+        
+        return_score = np.minimum(c['annualized_return'] * 100, 50)
+        return_score = return_score + tiers(c['sharpe_ratio'], (2.0, 1.5, 1.0, 0.5), (20, 15, 10, 5))
+        return_score = return_score + tiers(c['calmar_ratio'], (3.0, 2.0), (10, 5))
+        return_score = np.minimum(return_score, 100)
+        
+        risk_score = 100 - tiers(c['max_drawdown'], (0.30, 0.20, 0.10), (30, 20, 10))
+        risk_score = risk_score - tiers(c['volatility'], (0.50, 0.30, 0.20), (20, 10, 5))
+        risk_score = risk_score - tiers(-c['var_95'], (0.05, 0.03, 0.02), (15, 10, 5))
+        risk_score = np.maximum(risk_score, 0)
+        
+        consistency_score = c['consistency_score'] * 50
+        consistency_score = consistency_score + tiers(c['win_rate'], (0.70, 0.60, 0.50), (20, 15, 10))
+        consistency_score = consistency_score + tiers(c['profit_factor'], (2.0, 1.5, 1.2), (15, 10, 5))
+        consistency_score = consistency_score - tiers(c['max_consecutive_losses'], (10, 5), (20, 10))
+        consistency_score = np.minimum(consistency_score, 100)
+        
+        social_score = (
+            tiers(c['follower_count'], (1000, 500, 100, 10), (30, 20, 10, 5)) +
+            tiers(c['average_rating'], (4.5, 4.0, 3.5, 3.0), (25, 20, 15, 10)) +
+            tiers(c['total_assets_managed'], (1000000, 100000, 10000, 1000), (20, 15, 10, 5))
+        )
+        social_score = np.minimum(social_score, 100)
+        
+        score = (
+            return_score * criteria.return_weight +
+            risk_score * criteria.risk_weight +
+            consistency_score * criteria.consistency_weight +
+            social_score * criteria.social_weight
+        )
+        
+        # Penalties
+        excess_drawdown = c['max_drawdown'] - criteria.max_drawdown_threshold
+        score = score - np.where(excess_drawdown > 0, excess_drawdown * criteria.max_drawdown_penalty * 100, 0)
+        excess_volatility = c['volatility'] - 0.30
+        score = score - np.where(excess_volatility > 0, excess_volatility * criteria.volatility_penalty * 100, 0)
+        
+        return np.clip(np.nan_to_num(score, nan=0.0), 0, 100)
+    
+    def score_profiles(self, profiles: List[MasterTraderProfile], criteria: RankingCriteria) -> np.ndarray:
+        """Score all profiles in one pass and store each in performance.overall_score"""
+        if not profiles:
+            return np.zeros(0)
+        performances = [profile.performance for profile in profiles]
+        columns = {
+            name: np.fromiter((getattr(perf, name) for perf in performances), dtype=float, count=len(performances))
+            for name in self.SCORE_FIELDS
+        }
+        scores = self.score_columns(columns, criteria)
+        for perf, score in zip(performances, scores.tolist()):
+            perf.overall_score = score
+        return scores
+    
+    def rank_profiles(self, profiles: List[MasterTraderProfile], criteria: RankingCriteria) -> List[MasterTraderProfile]:
+        """Profiles sorted by overall score, best first"""
+        scores = self.score_profiles(profiles, criteria)
+        return [profiles[i] for i in np.argsort(-scores, kind='stable')]
 
 class MasterTraderDiscovery:
     """Main discovery and ranking system"""
@@ -480,6 +911,13 @@ class MasterTraderDiscovery:
         self.ranker = MasterTraderRanker()
         self.performance_calculator = PerformanceCalculator()
         
+        # Daily returns of all master traders, for return-based metrics;
+        # loaded from the stored histories the first time it is needed
+        self.cohort = CohortMetrics()
+        self._cohort_loaded = False
+        self._cohort_retry_at = 0.0
+        self._cohort_lock = asyncio.Lock()
+        
         # Caching
         self.rankings_cache = {}
         self.cache_expiry = {}
@@ -528,11 +966,12 @@ class MasterTraderDiscovery:
             )
             
             # Filter profiles
+            await self._ensure_cohort()
+            self.cohort.apply_to(profiles)
             filtered_profiles = self._filter_profiles(profiles, criteria)
             
             # Calculate scores
-            for profile in filtered_profiles:
-                profile.performance.overall_score = self.ranker.calculate_overall_score(profile, criteria)
+            self.ranker.score_profiles(filtered_profiles, criteria)
             
             # Sort profiles
             reverse = sort_order == "desc"
@@ -576,13 +1015,10 @@ class MasterTraderDiscovery:
             profiles = await self._get_all_profiles()
             
             # Filter and rank
+            await self._ensure_cohort()
+            self.cohort.apply_to(profiles)
             filtered_profiles = self._filter_profiles(profiles, criteria)
-            
-            for profile in filtered_profiles:
-                profile.performance.overall_score = self.ranker.calculate_overall_score(profile, criteria)
-            
-            # Sort by overall score
-            filtered_profiles.sort(key=lambda x: x.performance.overall_score, reverse=True)
+            filtered_profiles = self.ranker.rank_profiles(filtered_profiles, criteria)
             
             # Cache results
             self.rankings_cache[cache_key] = filtered_profiles[:limit]
@@ -605,6 +1041,43 @@ class MasterTraderDiscovery:
             logger.error(f"Error getting trader details for {trader_id}: {e}")
             return None
     
+    async def _ensure_cohort(self):
+        """
+        Load the cohort from the stored return histories the first time it is needed.
+
+        An empty or failed load keeps the current cohort and is retried after
+        COHORT_RETRY_SECONDS, so a database outage at startup isn't permanent.
+        """
+        if self._cohort_loaded or time.monotonic() < self._cohort_retry_at:
+            return
+        async with self._cohort_lock:
+            if self._cohort_loaded or time.monotonic() < self._cohort_retry_at:
+                return
+            try:
+                profiles = await self._get_all_profiles()
+                histories = await self._get_return_histories([profile.id for profile in profiles])
+                if not histories:
+                    self._cohort_retry_at = time.monotonic() + COHORT_RETRY_SECONDS
+                    return
+                # Built off the loop into a fresh object nothing else reads, then swapped in
+                cohort = CohortMetrics()
+                await asyncio.get_running_loop().run_in_executor(None, cohort.load, histories)
+            except Exception as e:
+                logger.error(f"Error loading cohort return histories: {e}")
+                self._cohort_retry_at = time.monotonic() + COHORT_RETRY_SECONDS
+                return
+            self.cohort = cohort
+            self._cohort_loaded = True
+    
+    async def record_daily_returns(self, returns: Dict[str, float]):
+        """Add one day of master trader returns (trader id -> daily return)"""
+        await self._ensure_cohort()
+        # O(traders), so appended on the loop: apply_to never sees a half-written day
+        self.cohort.append_day(returns)
+        # Rankings computed from the previous day are stale
+        self.rankings_cache.clear()
+        self.cache_expiry.clear()
+    
     async def update_trader_performance(self, trader_id: str) -> bool:
         """Update performance metrics for a trader"""
         try:
@@ -675,6 +1148,12 @@ class MasterTraderDiscovery:
         # For now, return empty list
         return []
     
+    async def _get_return_histories(self, trader_ids: List[str]) -> Dict[str, List[float]]:
+        """Get each trader's daily returns from the database, oldest first"""
+        # This would be a real database query
+        # For now, return no histories
+        return {}
+    
     async def get_search_suggestions(self, query: str) -> List[str]:
         """Get search suggestions based on query"""
         try:
@@ -752,13 +1231,10 @@ class MasterTraderDiscovery:
         try:
             criteria = RankingCriteria()
             profiles = await self._get_profiles_from_db(strategy_type=strategy_type)
+            await self._ensure_cohort()
+            self.cohort.apply_to(profiles)
             filtered_profiles = self._filter_profiles(profiles, criteria)
-            
-            for profile in filtered_profiles:
-                profile.performance.overall_score = self.ranker.calculate_overall_score(profile, criteria)
-            
-            filtered_profiles.sort(key=lambda x: x.performance.overall_score, reverse=True)
-            return filtered_profiles[:limit]
+            return self.ranker.rank_profiles(filtered_profiles, criteria)[:limit]
             
         except Exception as e:
             logger.error(f"Error getting strategy rankings for {strategy_type}: {e}")
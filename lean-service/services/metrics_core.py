@@ -0,0 +1,256 @@
+"""
+Metrics Core - Vectorized performance statistics for backtests
+
+Shared by python-backend (engine/metrics_core.py) and lean-service
+(services/metrics_core.py); the services build separately, so the two
+copies are kept identical.
+
+Provides:
+- performance_stats: every portfolio and benchmark statistic from one pass
+  over the returns (moments, equity curve and drawdown computed once)
+- relative_stats: alpha, beta and tracking error against a benchmark
+- trade_stats: win/loss statistics from an array of trade PnLs
+- realized_pnl: per-fill realized PnL under average cost
+- rolling_stats: rolling Sharpe and volatility without a Python loop
+
+Inputs are NumPy arrays; results are plain floats, with returns, drawdowns
+and VaR as fractions (callers scale to percentages where they report them).
+"""
+
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+# Statistics that need a benchmark
+RELATIVE_KEYS = ('alpha', 'beta', 'tracking_error', 'information_ratio', 'treynor_ratio', 'correlation')
+
+
+def longest_run(mask: np.ndarray) -> int:
+    """Length of the longest run of True values"""
+    if not mask.any():
+        return 0
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return int((np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)).max())
+
+
+def performance_stats(
+    returns: np.ndarray,
+    benchmark_returns: Optional[np.ndarray] = None,
+    risk_free_rate: float = 0.02,
+    periods_per_year: int = 252,
+    years: Optional[float] = None,
+) -> Dict[str, float]:
+    """
+    Portfolio (and, with aligned benchmark returns, relative) statistics.
+
+    Args:
+        returns: Period returns, oldest first, NaNs already removed
+        benchmark_returns: Benchmark returns for the same periods, or None
+        risk_free_rate: Annual risk-free rate, spread evenly over the periods
+        periods_per_year: Periods per year, for annualizing
+        years: Length of the backtest in years (default: periods / periods_per_year)
+
+    Returns:
+        Dict of statistic name to value (fractions, not percentages)
+    """
+    r = np.asarray(returns, dtype=float)
+    n = len(r)
+    stats = _empty_stats()
+    if n == 0:
+        return stats
+
+    sqrt_periods = np.sqrt(periods_per_year)
+
+    # Moments, shared by every ratio below
+    mean = r.mean()
+    std = r.std(ddof=1) if n > 1 else 0.0
+    downside = r[r < 0]
+    downside_std = downside.std(ddof=1) if len(downside) > 1 else 0.0
+    excess_mean = mean - risk_free_rate / periods_per_year
+
+    # Equity curve from a starting value of 1, and its drawdowns
+    equity = np.cumprod(1.0 + r)
+    peak = np.maximum(np.maximum.accumulate(equity), 1.0)
+    drawdown = equity / peak - 1.0
+    max_drawdown = min(float(drawdown.min()), 0.0)
+
+    total_return = float(equity[-1] - 1.0)
+    if years is None:
+        years = n / periods_per_year
+    annual_return = max(1.0 + total_return, 0.0) ** (1.0 / years) - 1.0 if years > 0 else 0.0
+
+    # Tail risk from one partition of the returns
+    var_95, var_99 = np.percentile(r, [5, 1])
+    cvar_95 = r[r <= var_95].mean()
+
+    stats.update({
+        'periods': n,
+        'mean_return': float(mean),
+        'total_return': total_return,
+        'annual_return': float(annual_return),
+        'volatility': float(std * sqrt_periods),
+        'downside_volatility': float(downside_std * sqrt_periods),
+        'max_drawdown': max_drawdown,
+        'max_drawdown_duration': longest_run(drawdown < 0),
+        'sharpe_ratio': float(excess_mean / std * sqrt_periods) if std > 0 else 0.0,
+        'sortino_ratio': float(excess_mean / downside_std * sqrt_periods) if downside_std > 0 else 0.0,
+        'calmar_ratio': float(annual_return / abs(max_drawdown)) if max_drawdown < 0 else 0.0,
+        'var_95': float(var_95),
+        'var_99': float(var_99),
+        'cvar_95': float(cvar_95),
+    })
+
+    if benchmark_returns is not None and len(benchmark_returns) == n and n > 1:
+        stats.update(relative_stats(r, benchmark_returns, risk_free_rate, periods_per_year))
+    return stats
+
+
+def relative_stats(
+    returns: np.ndarray,
+    benchmark_returns: np.ndarray,
+    risk_free_rate: float = 0.02,
+    periods_per_year: int = 252,
+) -> Dict[str, float]:
+    """Alpha (per period), beta, tracking error and the ratios built on them, for aligned returns"""
+    r = np.asarray(returns, dtype=float)
+    b = np.asarray(benchmark_returns, dtype=float)
+    if len(r) != len(b) or len(r) < 2:
+        return {key: _empty_stats()[key] for key in RELATIVE_KEYS}
+
+    mean = r.mean()
+    excess_mean = mean - risk_free_rate / periods_per_year
+    b_mean = b.mean()
+    b_var = b.var(ddof=1)
+    covariance = ((r - mean) * (b - b_mean)).sum() / (len(r) - 1)
+    beta = covariance / b_var if b_var > 0 else 0.0
+    alpha = mean - beta * b_mean
+    tracking_error = (r - b).std()
+    return {
+        'alpha': float(alpha),
+        'beta': float(beta),
+        'tracking_error': float(tracking_error),
+        'information_ratio': float(alpha / tracking_error) if tracking_error > 0 else 0.0,
+        'treynor_ratio': float(excess_mean * periods_per_year / beta) if beta != 0 else 0.0,
+        'correlation': float(covariance / np.sqrt(r.var(ddof=1) * b_var)) if b_var > 0 and r.var() > 0 else 0.0,
+    }
+
+
+def _empty_stats() -> Dict[str, float]:
+    return {
+        'periods': 0,
+        'mean_return': 0.0,
+        'total_return': 0.0,
+        'annual_return': 0.0,
+        'volatility': 0.0,
+        'downside_volatility': 0.0,
+        'max_drawdown': 0.0,
+        'max_drawdown_duration': 0,
+        'sharpe_ratio': 0.0,
+        'sortino_ratio': 0.0,
+        'calmar_ratio': 0.0,
+        'var_95': 0.0,
+        'var_99': 0.0,
+        'cvar_95': 0.0,
+        'alpha': 0.0,
+        'beta': 1.0,
+        'tracking_error': 0.0,
+        'information_ratio': 0.0,
+        'treynor_ratio': 0.0,
+        'correlation': 0.0,
+    }
+
+
+def trade_stats(pnl: np.ndarray) -> Dict[str, float]:
+    """
+    Win/loss statistics of closed trades.
+
+    profit_factor is gross profit over gross loss (0 without losses);
+    avg_loss and largest_loss are negative.
+    """
+    pnl = np.asarray(pnl, dtype=float)
+    wins = pnl[pnl > 0]
+    losses = pnl[pnl < 0]
+    gross_profit = float(wins.sum())
+    gross_loss = float(-losses.sum())
+    return {
+        'trades': len(pnl),
+        'winning_trades': len(wins),
+        'losing_trades': len(losses),
+        'win_rate': len(wins) / len(pnl) if len(pnl) else 0.0,
+        'gross_profit': gross_profit,
+        'gross_loss': gross_loss,
+        'profit_factor': gross_profit / gross_loss if gross_loss > 0 else 0.0,
+        'expectancy': float(pnl.mean()) if len(pnl) else 0.0,
+        'avg_win': float(wins.mean()) if len(wins) else 0.0,
+        'avg_loss': float(losses.mean()) if len(losses) else 0.0,
+        'largest_win': float(wins.max()) if len(wins) else 0.0,
+        'largest_loss': float(losses.min()) if len(losses) else 0.0,
+    }
+
+
+def realized_pnl(symbols: Sequence[str], quantities: np.ndarray, prices: np.ndarray,
+                 return_closing: bool = False):
+    """
+    Realized PnL of each fill under average cost, before commissions.
+
+    quantities are signed (buys positive). Fills that open or add to a
+    position realize 0, as do zero-quantity fills. Position accounting is
+    sequential by nature, so this is a single pass over plain floats rather
+    than array operations.
+
+    With return_closing, also returns a mask of the fills that reduce or
+    close a position, so break-even closes can be told from openings.
+    """
+    pnl = np.zeros(len(quantities))
+    closing = np.zeros(len(quantities), dtype=bool)
+    position: Dict[str, float] = {}
+    average: Dict[str, float] = {}
+    for i, (symbol, quantity, price) in enumerate(zip(symbols, np.asarray(quantities, dtype=float).tolist(),
+                                                     np.asarray(prices, dtype=float).tolist())):
+        if quantity == 0:
+            continue
+        held = position.get(symbol, 0.0)
+        if held == 0 or (held > 0) == (quantity > 0):
+            size = held + quantity
+            if abs(size) < 1e-12:
+                position[symbol] = 0.0
+                continue
+            average[symbol] = (average.get(symbol, 0.0) * abs(held) + price * abs(quantity)) / abs(size)
+            position[symbol] = size
+            continue
+
+        closing[i] = True
+        closed = min(abs(quantity), abs(held))
+        pnl[i] = closed * (price - average[symbol]) * (1.0 if held > 0 else -1.0)
+        size = held + quantity
+        if abs(size) < 1e-12:
+            position[symbol] = 0.0
+        else:
+            if (size > 0) != (held > 0):
+                # Flipped through zero: the remainder opens at this price
+                average[symbol] = price
+            position[symbol] = size
+    if return_closing:
+        return pnl, closing
+    return pnl
+
+
+def rolling_stats(returns: np.ndarray, window: int, periods_per_year: int = 252) -> Dict[str, np.ndarray]:
+    """Sharpe ratio (no risk-free rate) and volatility of every full window, oldest first"""
+    r = np.asarray(returns, dtype=float)
+    if window < 2 or len(r) < window:
+        return {'sharpe': np.zeros(0), 'volatility': np.zeros(0)}
+
+    # Center first so the running sums don't lose precision
+    centered = r - r.mean()
+    cumsum = np.concatenate(([0.0], np.cumsum(centered)))
+    cumsq = np.concatenate(([0.0], np.cumsum(centered * centered)))
+    sums = cumsum[window:] - cumsum[:-window]
+    sumsqs = cumsq[window:] - cumsq[:-window]
+
+    mean = sums / window
+    std = np.sqrt(np.maximum((sumsqs - sums * mean) / (window - 1), 0.0))
+    sqrt_periods = np.sqrt(periods_per_year)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(std > 1e-15, (mean + r.mean()) / std * sqrt_periods, 0.0)
+    return {'sharpe': sharpe, 'volatility': std * sqrt_periods}
@@ -15,6 +15,8 @@ from enum import Enum
 import numpy as np
 from collections import defaultdict, deque
 import heapq
+import bisect
+import itertools
 
 from universal_platform_adapters import (
     UniversalPlatformManager, TradeSignal, ExecutionResult, 
@@ -65,97 +67,234 @@ class ReplicationMetrics:
     success_rate: float = 0.0
     platform_performance: Dict[str, Dict[str, float]] = field(default_factory=dict)
 
+class LatencyHistogram:
+    """
+    Fixed log-scale latency histogram (milliseconds) with O(1) inserts
+    
+    With `decay_every`, all counts are halved every that many samples, so
+    quantiles follow recent behaviour instead of the whole history.
+    """
+    
+    # Bucket upper bounds: 0.1ms .. ~100s, 4 buckets per doubling
+    BOUNDS = [0.1 * 2 ** (i / 4) for i in range(80)]
+    
+    def __init__(self, decay_every: Optional[int] = None):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.decay_every = decay_every
+        self._since_decay = 0
+    
+    def observe(self, value_ms: float):
+        """Record one sample"""
+        self.counts[bisect.bisect_left(self.BOUNDS, value_ms)] += 1
+        self.count += 1
+        self.total_ms += value_ms
+        if value_ms > self.max_ms:
+            self.max_ms = value_ms
+        
+        if self.decay_every:
+            self._since_decay += 1
+            if self._since_decay >= self.decay_every:
+                self._decay()
+    
+    def _decay(self):
+        self.counts = [c / 2 for c in self.counts]
+        self.count /= 2
+        self.total_ms /= 2
+        self._since_decay = 0
+    
+    def percentile(self, q: float) -> float:
+        """Approximate percentile (bucket upper bound, within ~19%)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min(self.BOUNDS[i], self.max_ms) if i < len(self.BOUNDS) else self.max_ms
+        return self.max_ms
+    
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            'count': round(self.count),
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(0.50), 3),
+            'p95_ms': round(self.percentile(0.95), 3),
+            'p99_ms': round(self.percentile(0.99), 3),
+            'max_ms': round(self.max_ms, 3),
+        }
+
 class ReplicationQueue:
-    """Priority queue for replication tasks"""
+    """
+    Priority work queue for replication tasks
+    
+    - Workers block on a condition instead of polling
+    - Within a priority level, followers take turns (start-time fair
+      queuing), so one follower's burst can't starve the others
+    - remove() leaves a tombstone that get() skips; the heap is compacted
+      once tombstones outnumber live entries
+    """
     
     def __init__(self):
         self._queue = []
         self._task_map = {}
-        self._lock = asyncio.Lock()
+        self._condition = asyncio.Condition()
+        self._sequence = itertools.count()
+        self._follower_turns: Dict[str, int] = {}
+        self._current_turn = 0
+        self._tombstones = 0
+        self.queue_time = LatencyHistogram()
     
     async def put(self, task: ReplicationTask):
-        """Add task to queue"""
-        async with self._lock:
-            priority = task.priority.value
-            heapq.heappush(self._queue, (priority, task.created_at, task))
+        """Add task to queue and wake one worker"""
+        async with self._condition:
+            follower = task.follower_relationship_id
+            turn = max(self._current_turn, self._follower_turns.get(follower, -1) + 1)
+            self._follower_turns[follower] = turn
+            heapq.heappush(
+                self._queue,
+                (task.priority.value, turn, next(self._sequence), time.monotonic(), task)
+            )
             self._task_map[task.id] = task
+            self._condition.notify()
     
-    async def get(self) -> Optional[ReplicationTask]:
-        """Get next task from queue"""
-        async with self._lock:
-            if not self._queue:
+    async def get(self, timeout: Optional[float] = None) -> Optional[ReplicationTask]:
+        """Wait for the next task; None only if timeout expires first"""
+        async with self._condition:
+            try:
+                await asyncio.wait_for(self._condition.wait_for(lambda: self._task_map), timeout)
+            except asyncio.TimeoutError:
                 return None
-            
-            _, _, task = heapq.heappop(self._queue)
-            if task.id in self._task_map:
-                del self._task_map[task.id]
+            return self._pop()
+    
+    def _pop(self) -> Optional[ReplicationTask]:
+        while self._queue:
+            _, turn, _, enqueued_at, task = heapq.heappop(self._queue)
+            if self._task_map.pop(task.id, None) is None:
+                # Tombstone of a removed task
+                self._tombstones -= 1
+                continue
+            self._current_turn = turn
+            if self._follower_turns.get(task.follower_relationship_id) == turn:
+                # Follower has nothing else queued
+                del self._follower_turns[task.follower_relationship_id]
+            self.queue_time.observe((time.monotonic() - enqueued_at) * 1000)
             return task
+        return None
     
     async def remove(self, task_id: str) -> bool:
         """Remove task from queue"""
-        async with self._lock:
-            if task_id in self._task_map:
-                task = self._task_map[task_id]
-                # Mark as cancelled
-                task.status = ReplicationStatus.CANCELLED
-                del self._task_map[task_id]
-                return True
-            return False
+        async with self._condition:
+            task = self._task_map.pop(task_id, None)
+            if task is None:
+                return False
+            task.status = ReplicationStatus.CANCELLED
+            self._tombstones += 1
+            if self._tombstones > len(self._task_map):
+                self._compact()
+            return True
+    
+    def _compact(self):
+        """Drop tombstones from the heap"""
+        self._queue = [entry for entry in self._queue if entry[4].id in self._task_map]
+        heapq.heapify(self._queue)
+        self._tombstones = 0
     
     async def size(self) -> int:
-        """Get queue size"""
-        async with self._lock:
-            return len(self._queue)
+        """Get number of queued (not removed) tasks"""
+        return len(self._task_map)
+
+class StreamingLatencyStats:
+    """EWMA latency / success rate plus a decaying latency histogram"""
+    
+    def __init__(self, alpha: float = 0.1, decay_every: int = 500):
+        self.alpha = alpha
+        self.latency_ewma_ms: Optional[float] = None
+        self.success_ewma: Optional[float] = None
+        self.histogram = LatencyHistogram(decay_every=decay_every)
+    
+    def record(self, latency_ms: float, success: Optional[bool] = None):
+        """O(1) update"""
+        if self.latency_ewma_ms is None:
+            self.latency_ewma_ms = latency_ms
+        else:
+            self.latency_ewma_ms += self.alpha * (latency_ms - self.latency_ewma_ms)
+        
+        if success is not None:
+            outcome = 1.0 if success else 0.0
+            if self.success_ewma is None:
+                self.success_ewma = outcome
+            else:
+                self.success_ewma += self.alpha * (outcome - self.success_ewma)
+        
+        self.histogram.observe(latency_ms)
+    
+    def quantile(self, q: float, default: float) -> float:
+        """Latency quantile, or `default` with no samples yet"""
+        if not self.histogram.count:
+            return default
+        return self.histogram.percentile(q)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'samples': round(self.histogram.count),
+            'latency_ewma_ms': round(self.latency_ewma_ms, 3) if self.latency_ewma_ms is not None else None,
+            'success_rate_ewma': round(self.success_ewma, 4) if self.success_ewma is not None else None,
+            'p50_ms': round(self.quantile(0.50, 0.0), 3),
+            'p95_ms': round(self.quantile(0.95, 0.0), 3),
+            'p99_ms': round(self.quantile(0.99, 0.0), 3),
+        }
 
 class LatencyOptimizer:
     """Optimizes replication latency using various strategies"""
     
+    # Quantile platforms are ranked by: tail latency is what delays a replicated trade
+    RANKING_QUANTILE = 0.95
+    DEFAULT_LATENCY_MS = 1000.0
+    DEFAULT_SUCCESS_RATE = 0.5
+    
     def __init__(self):
-        self.platform_latencies = defaultdict(list)
-        self.platform_success_rates = defaultdict(list)
-        self.symbol_latencies = defaultdict(list)
-        self.time_of_day_latencies = defaultdict(list)
+        self.platform_stats: Dict[str, StreamingLatencyStats] = defaultdict(StreamingLatencyStats)
+        self.symbol_stats: Dict[str, StreamingLatencyStats] = defaultdict(StreamingLatencyStats)
+        self.time_of_day_stats: Dict[int, StreamingLatencyStats] = defaultdict(StreamingLatencyStats)
     
     def record_latency(self, platform: str, symbol: str, latency_ms: float, success: bool):
         """Record latency data for optimization"""
-        self.platform_latencies[platform].append(latency_ms)
-        self.platform_success_rates[platform].append(1.0 if success else 0.0)
-        self.symbol_latencies[symbol].append(latency_ms)
-        
-        # Record time-of-day latency
-        hour = datetime.now().hour
-        self.time_of_day_latencies[hour].append(latency_ms)
-        
-        # Keep only recent data (last 1000 records per category)
-        for latency_list in [self.platform_latencies[platform], 
-                           self.symbol_latencies[symbol], 
-                           self.time_of_day_latencies[hour]]:
-            if len(latency_list) > 1000:
-                latency_list.pop(0)
+        self.platform_stats[platform].record(latency_ms, success)
+        self.symbol_stats[symbol].record(latency_ms)
+        self.time_of_day_stats[datetime.now().hour].record(latency_ms)
     
     def get_optimal_platforms(self, symbol: str, available_platforms: List[str]) -> List[str]:
         """Get platforms ordered by expected latency"""
+        q = self.RANKING_QUANTILE
+        symbol_stats = self.symbol_stats.get(symbol)
+        tod_stats = self.time_of_day_stats.get(datetime.now().hour)
         platform_scores = {}
         
         for platform in available_platforms:
             # Calculate score based on historical performance
-            avg_latency = np.mean(self.platform_latencies[platform]) if self.platform_latencies[platform] else 1000
-            success_rate = np.mean(self.platform_success_rates[platform]) if self.platform_success_rates[platform] else 0.5
-            
-            # Symbol-specific latency
-            symbol_latency = np.mean(self.symbol_latencies[symbol]) if self.symbol_latencies[symbol] else avg_latency
+            stats = self.platform_stats.get(platform)
+            platform_latency = stats.quantile(q, self.DEFAULT_LATENCY_MS) if stats else self.DEFAULT_LATENCY_MS
+            success_rate = stats.success_ewma if stats and stats.success_ewma is not None else self.DEFAULT_SUCCESS_RATE
             
-            # Time-of-day adjustment
-            current_hour = datetime.now().hour
-            tod_latency = np.mean(self.time_of_day_latencies[current_hour]) if self.time_of_day_latencies[current_hour] else avg_latency
+            # Symbol-specific and time-of-day latency
+            symbol_latency = symbol_stats.quantile(q, platform_latency) if symbol_stats else platform_latency
+            tod_latency = tod_stats.quantile(q, platform_latency) if tod_stats else platform_latency
             
             # Combined score (lower is better)
-            score = (avg_latency * 0.4 + symbol_latency * 0.3 + tod_latency * 0.3) / success_rate
+            score = (platform_latency * 0.4 + symbol_latency * 0.3 + tod_latency * 0.3) / max(success_rate, 0.01)
             platform_scores[platform] = score
         
         # Sort by score and return top platforms
         sorted_platforms = sorted(platform_scores.items(), key=lambda x: x[1])
         return [platform for platform, _ in sorted_platforms]
+    
+    def get_platform_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-platform latency quantiles and success rates"""
+        return {platform: stats.to_dict() for platform, stats in self.platform_stats.items()}
 
 class CircuitBreaker:
     """Circuit breaker for platform failures"""
@@ -203,9 +342,11 @@ class CircuitBreaker:
 class RealTimeReplicationEngine:
     """Main replication engine with sub-100ms latency"""
     
-    def __init__(self, platform_manager: UniversalPlatformManager, db_session=None):
+    def __init__(self, platform_manager: UniversalPlatformManager, db_session=None, persistence=None):
         self.platform_manager = platform_manager
         self.db_session = db_session
+        # Write-behind writer (services.write_behind) for replication session rows
+        self.persistence = persistence
         self.replication_queue = ReplicationQueue()
         self.latency_optimizer = LatencyOptimizer()
         self.circuit_breaker = CircuitBreaker()
@@ -218,6 +359,7 @@ class RealTimeReplicationEngine:
         # Metrics
         self.metrics = ReplicationMetrics()
         self.latency_history = deque(maxlen=1000)
+        self.processing_time = LatencyHistogram()
         
         # Callbacks
         self.on_task_completed: Optional[Callable] = None
@@ -288,14 +430,15 @@ class RealTimeReplicationEngine:
         
         while self.is_running:
             try:
-                # Get next task from queue
+                # Wait for the next task (no polling while idle)
                 task = await self.replication_queue.get()
                 if task is None:
-                    await asyncio.sleep(0.001)  # Small delay if queue is empty
                     continue
                 
                 # Process the task
+                started = time.perf_counter()
                 await self._process_task(task)
+                self.processing_time.observe((time.perf_counter() - started) * 1000)
                 
             except asyncio.CancelledError:
                 logger.info(f"Worker {worker_name} cancelled")
@@ -405,7 +548,7 @@ class RealTimeReplicationEngine:
                     platform, task.signal.symbol, latency_ms, result.success
                 )
             
-            # Save to database
+            # Queue for the database (written behind, never awaited on the hot path)
             await self._save_replication_session(task)
             
             # Call callbacks
@@ -487,13 +630,12 @@ class RealTimeReplicationEngine:
             platform_metrics['success_rate'] = platform_metrics['successful_trades'] / platform_metrics['total_trades']
     
     async def _save_replication_session(self, task: ReplicationTask):
-        """Save replication session to database"""
-        if not self.db_session:
+        """Queue replication session row for batched insertion"""
+        if self.persistence is None:
             return
         
         try:
-            # Save copy trading session
-            session_data = {
+            self.persistence.enqueue("replication_sessions", {
                 'id': str(uuid.uuid4()),
                 'master_trade_id': task.master_trade_id,
                 'follower_relationship_id': task.follower_relationship_id,
@@ -501,10 +643,7 @@ class RealTimeReplicationEngine:
                 'status': task.status.value,
                 'error_message': task.error_message,
                 'executed_at': task.completed_at or datetime.now()
-            }
-            
-            # This would be a database insert in a real implementation
-            logger.debug(f"Saved replication session: {session_data}")
+            })
             
         except Exception as e:
             logger.error(f"Error saving replication session: {e}")
@@ -521,6 +660,9 @@ class RealTimeReplicationEngine:
             'queue_size': queue_size,
             'is_running': self.is_running,
             'active_workers': len([w for w in self.workers if not w.done()]),
+            'queue_time': self.replication_queue.queue_time.to_dict(),
+            'processing_time': self.processing_time.to_dict(),
+            'platform_latency': self.latency_optimizer.get_platform_stats(),
             'metrics': self.metrics
         }
     
@@ -545,9 +687,9 @@ class ReplicationEngineManager:
         self.engines: Dict[str, RealTimeReplicationEngine] = {}
         self.platform_manager = UniversalPlatformManager()
     
-    async def create_engine(self, engine_id: str, db_session=None) -> RealTimeReplicationEngine:
+    async def create_engine(self, engine_id: str, db_session=None, persistence=None) -> RealTimeReplicationEngine:
         """Create a new replication engine"""
-        engine = RealTimeReplicationEngine(self.platform_manager, db_session)
+        engine = RealTimeReplicationEngine(self.platform_manager, db_session, persistence)
         self.engines[engine_id] = engine
         await engine.start()
         return engine
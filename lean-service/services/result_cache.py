@@ -0,0 +1,224 @@
+"""
+Backtest Result Cache
+Content-addressed cache of finished Lean backtests
+
+- Keys hash the normalized strategy source, the request parameters, a
+  fingerprint of the market data and the engine version (Lean image id plus
+  the strategy wrapper), so an identical re-submission is answered from disk
+- Results are gzip-compressed JSON, evicted least recently used once the
+  cache exceeds BACKTEST_CACHE_MAX_MB
+- Identical submissions arriving together run once
+"""
+
+import ast
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import textwrap
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple, Iterable
+
+logger = logging.getLogger(__name__)
+
+BACKTEST_CACHE_DIR = os.getenv('BACKTEST_CACHE_DIR', '/app/results/cache')
+BACKTEST_CACHE_MAX_MB = int(os.getenv('BACKTEST_CACHE_MAX_MB', '2048'))
+
+
+def normalize_source(source: str) -> str:
+    """
+    Strategy source with formatting and comments removed.
+
+    Code that parses is reduced to its AST dump, so whitespace, comments
+    and quoting style don't change the key; anything else falls back to
+    stripped non-blank lines.
+    """
+    try:
+        return ast.dump(ast.parse(textwrap.dedent(source)), annotate_fields=False)
+    except SyntaxError:
+        return "\n".join(line.rstrip() for line in source.splitlines() if line.strip())
+
+
+def fingerprint_files(paths: Iterable[str]) -> str:
+    """Hash of source files, used as an engine version that moves with the code"""
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(Path(path).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def _json_default(value: Any) -> Any:
+    """Encode results the way the API would (datetimes as ISO strings, NumPy scalars as numbers)"""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def make_key(source: str, params: Dict[str, Any], data_fingerprint: str, engine_version: str) -> str:
+    """Cache key for one backtest"""
+    payload = json.dumps(
+        {
+            "source": normalize_source(source),
+            "params": params,
+            "data": data_fingerprint,
+            "engine": engine_version,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """
+    Backtest results on disk, keyed by make_key().
+
+    Files live at <cache_dir>/<key[:2]>/<key>.json.gz; file mtimes carry
+    the LRU order across restarts.
+    """
+
+    def __init__(self, cache_dir: str = BACKTEST_CACHE_DIR, max_bytes: int = BACKTEST_CACHE_MAX_MB * 1024 ** 2):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._total = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"hits": 0, "misses": 0, "bypassed": 0, "coalesced": 0, "evicted": 0}
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json.gz"
+
+    def _load_index(self):
+        entries = []
+        if self.cache_dir.exists():
+            for path in self.cache_dir.glob("*/*.json.gz"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path.name[:-len(".json.gz")], stat.st_size))
+        entries.sort()
+        self._index = OrderedDict((key, size) for _, key, size in entries)
+        self._total = sum(self._index.values())
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_event_loop().run_in_executor(None, fn, *args)
+
+    async def _ensure_index(self):
+        if self._index is None:
+            await self._run(self._load_index)
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, key: str, value: Dict[str, Any]) -> int:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = gzip.compress(json.dumps(value, default=_json_default).encode("utf-8"), compresslevel=6)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        return len(data)
+
+    def _unlink(self, key: str):
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached result for key, or None"""
+        await self._ensure_index()
+        if key not in self._index:
+            return None
+        value = await self._run(self._read, key)
+        if value is None:
+            # Removed or corrupted behind our back
+            self._total -= self._index.pop(key, 0)
+            return None
+        self._index.move_to_end(key)
+        return value
+
+    async def put(self, key: str, value: Dict[str, Any]):
+        """Store a result and evict the least recently used ones over budget"""
+        await self._ensure_index()
+        size = await self._run(self._write, key, value)
+        self._total += size - self._index.pop(key, 0)
+        self._index[key] = size
+
+        while self._total > self.max_bytes and len(self._index) > 1:
+            old_key, old_size = self._index.popitem(last=False)
+            self._total -= old_size
+            self.stats["evicted"] += 1
+            await self._run(self._unlink, old_key)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+        bypass: bool = False,
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Cached result for key, or compute() it and store it.
+
+        Concurrent calls for the same key wait for the first one (and
+        compute themselves only if it fails). With bypass the cache is not
+        read but the fresh result replaces the stored one.
+
+        Returns:
+            (result, cache_hit)
+        """
+        if bypass:
+            self.stats["bypassed"] += 1
+        else:
+            cached = await self.get(key)
+            if cached is not None:
+                self.stats["hits"] += 1
+                return cached, True
+
+            pending = self._inflight.get(key)
+            if pending is not None:
+                self.stats["coalesced"] += 1
+                result = await asyncio.shield(pending)
+                if result is not None:
+                    return result, True
+            self.stats["misses"] += 1
+
+        future = asyncio.get_event_loop().create_future()
+        if not bypass:
+            self._inflight[key] = future
+        try:
+            try:
+                result = await compute()
+            except BaseException:
+                # Waiters compute for themselves
+                future.set_result(None)
+                raise
+            try:
+                await self.put(key, result)
+            except OSError as e:
+                logger.warning(f"Failed to cache backtest result {key[:12]}: {e}")
+            future.set_result(result)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        return result, False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "entries": len(self._index) if self._index is not None else None,
+            "bytes": self._total,
+        }
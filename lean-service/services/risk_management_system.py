@@ -1,12 +1,22 @@
 """
 Multi-Layer Risk Management System
 Comprehensive risk controls for copy trading operations
+
+- Each follower has a FollowerRiskState (equity, peak equity, daily PnL,
+  exposure per instrument) updated as balances and fills arrive, so trade
+  checks read current values instead of recomputing from history
+- Instrument volatilities and correlations come from one shared EWMA
+  covariance estimate, fed the prices seen in fills and position marks and
+  updated once per period
+- The checks in validate_trade are lookups against that state, awaited in turn
 """
 
 import asyncio
 import logging
+import math
+import os
 import time
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
@@ -14,10 +24,18 @@ import numpy as np
 from collections import defaultdict, deque
 import json
 
-from universal_platform_adapters import TradeSignal, OrderSide, Position
+from services.universal_platform_adapters import TradeSignal, OrderSide, Position
 
 logger = logging.getLogger(__name__)
 
+# RiskMetrics decay; the effective window is about 1 / (1 - lambda) updates
+RISK_EWMA_LAMBDA = float(os.getenv('RISK_EWMA_LAMBDA', '0.94'))
+# EWMA periods per year; prices are sampled once per period (default: one minute)
+RISK_PERIODS_PER_YEAR = float(os.getenv('RISK_PERIODS_PER_YEAR', str(365 * 24 * 60)))
+# Updates before an instrument's volatility / correlations are trusted
+RISK_EWMA_MIN_OBSERVATIONS = int(os.getenv('RISK_EWMA_MIN_OBSERVATIONS', '20'))
+
+
 class RiskLevel(Enum):
     LOW = "low"
     MEDIUM = "medium"
@@ -182,6 +200,188 @@ class RiskCalculator:
         
         return covariance / market_variance
 
+class EwmaCovariance:
+    """
+    Exponentially weighted covariance of instrument returns.
+
+    Prices are sampled into fixed periods; the last price of each instrument
+    in a period is its close. When a period with prices closes, the whole
+    matrix is decayed, cov <- lambda * cov + (1 - lambda) * r r^T, with a
+    zero return for instruments that had no price in it, so every pair ages
+    at the same rate. O(n^2) per period, lookups are O(1).
+    """
+    
+    def __init__(self, decay: float = RISK_EWMA_LAMBDA, periods_per_year: float = RISK_PERIODS_PER_YEAR,
+                 min_observations: int = RISK_EWMA_MIN_OBSERVATIONS):
+        self.decay = decay
+        self.periods_per_year = periods_per_year
+        self.min_observations = min_observations
+        self.index: Dict[str, int] = {}
+        self._cov = np.zeros((0, 0))
+        self._observations = np.zeros(0, dtype=np.int64)
+        self.period_seconds = 365 * 24 * 3600 / periods_per_year
+        self._period: Optional[int] = None
+        # Close of the previous period, and the latest prices of the current one
+        self._last_price: Dict[str, float] = {}
+        self._current: Dict[str, float] = {}
+    
+    def _ensure(self, symbols: List[str]) -> np.ndarray:
+        new = [symbol for symbol in symbols if symbol not in self.index]
+        if new:
+            size = len(self.index)
+            for offset, symbol in enumerate(new):
+                self.index[symbol] = size + offset
+            if len(self.index) > self._cov.shape[0]:
+                # Grow geometrically so adding instruments stays cheap
+                capacity = max(len(self.index), 2 * self._cov.shape[0], 8)
+                cov = np.zeros((capacity, capacity))
+                cov[:size, :size] = self._cov[:size, :size]
+                observations = np.zeros(capacity, dtype=np.int64)
+                observations[:size] = self._observations[:size]
+                self._cov, self._observations = cov, observations
+        return np.fromiter((self.index[symbol] for symbol in symbols), dtype=np.int64, count=len(symbols))
+    
+    def update_prices(self, prices: Dict[str, float], now: Optional[float] = None):
+        """Record prices seen at `now` (epoch seconds); closes the previous period if it has ended"""
+        period = int((time.time() if now is None else now) // self.period_seconds)
+        if self._period is not None and period > self._period:
+            self._close_period()
+        if self._period is None or period > self._period:
+            self._period = period
+        for symbol, price in prices.items():
+            if price and price > 0:
+                self._current[symbol] = price
+    
+    def _close_period(self):
+        """Log returns of the period's closes against the previous closes"""
+        returns = {}
+        for symbol, price in self._current.items():
+            previous = self._last_price.get(symbol)
+            self._last_price[symbol] = price
+            if previous:
+                returns[symbol] = math.log(price / previous)
+        self._current = {}
+        if returns:
+            self.update_returns(returns)
+    
+    def update_returns(self, returns: Dict[str, float]):
+        """Fold in one period of returns; instruments not in it had a zero return"""
+        symbols = list(returns)
+        idx = self._ensure(symbols)
+        r = np.fromiter(returns.values(), dtype=np.float64, count=len(symbols))
+        size = len(self.index)
+        self._cov[:size, :size] *= self.decay
+        self._cov[np.ix_(idx, idx)] += (1 - self.decay) * np.outer(r, r)
+        self._observations[idx] += 1
+    
+    def _known(self, symbol: str) -> Optional[int]:
+        i = self.index.get(symbol)
+        if i is None or self._observations[i] < self.min_observations:
+            return None
+        return i
+    
+    def volatility(self, symbol: str) -> Optional[float]:
+        """Annualized volatility, or None without enough history"""
+        i = self._known(symbol)
+        if i is None:
+            return None
+        return math.sqrt(self._cov[i, i] * self.periods_per_year)
+    
+    def correlation(self, a: str, b: str) -> Optional[float]:
+        """Correlation of two instruments, or None without enough history"""
+        i, j = self._known(a), self._known(b)
+        if i is None or j is None:
+            return None
+        denominator = math.sqrt(self._cov[i, i] * self._cov[j, j])
+        if denominator == 0:
+            return 0.0
+        # Rounding can push a near-perfect correlation just past +/-1
+        return max(-1.0, min(1.0, float(self._cov[i, j] / denominator)))
+
+
+class FollowerRiskState:
+    """
+    Running risk figures for one follower.
+
+    Updated from balance marks, position snapshots and fills; every
+    property is O(1) and the exposure map is O(instruments held).
+    """
+    
+    def __init__(self, follower_id: str):
+        self.follower_id = follower_id
+        self.equity: Optional[float] = None
+        self.initial_equity: Optional[float] = None
+        self.peak_equity = 0.0
+        self.max_drawdown = 0.0
+        self.day = None
+        self.day_start_equity = 0.0
+        # Signed notional per instrument (long > 0, short < 0)
+        self.exposure: Dict[str, float] = {}
+        self.updated_at = 0.0
+    
+    def mark(self, equity: float, now: Optional[datetime] = None):
+        """Record the current account equity"""
+        now = now or datetime.now(timezone.utc)
+        if self.equity is None:
+            self.initial_equity = equity
+        if self.day != now.date():
+            # Daily PnL is measured from the first mark of each UTC day
+            self.day = now.date()
+            self.day_start_equity = equity
+        self.equity = equity
+        if equity > self.peak_equity:
+            self.peak_equity = equity
+        self.max_drawdown = max(self.max_drawdown, self.drawdown)
+        self.updated_at = time.time()
+    
+    def sync_positions(self, positions: List[Position]):
+        """Replace the exposure map from the exchange's position list"""
+        exposure = {}
+        for position in positions:
+            sign = -1.0 if position.side == OrderSide.SELL else 1.0
+            exposure[position.symbol] = exposure.get(position.symbol, 0.0) + sign * position.size * position.current_price
+        self.exposure = exposure
+    
+    def apply_fill(self, symbol: str, side: OrderSide, quantity: float, price: float, realized_pnl: float = 0.0):
+        """Update exposure (and equity by any realized PnL) after a fill"""
+        sign = -1.0 if side == OrderSide.SELL else 1.0
+        notional = self.exposure.get(symbol, 0.0) + sign * quantity * price
+        if abs(notional) < 1e-12:
+            self.exposure.pop(symbol, None)
+        else:
+            self.exposure[symbol] = notional
+        if realized_pnl and self.equity is not None:
+            self.mark(self.equity + realized_pnl)
+    
+    @property
+    def drawdown(self) -> float:
+        if not self.peak_equity or self.equity is None:
+            return 0.0
+        return max(0.0, (self.peak_equity - self.equity) / self.peak_equity)
+    
+    @property
+    def daily_pnl(self) -> float:
+        if self.equity is None:
+            return 0.0
+        return self.equity - self.day_start_equity
+    
+    @property
+    def daily_return(self) -> float:
+        if not self.day_start_equity:
+            return 0.0
+        return self.daily_pnl / self.day_start_equity
+    
+    @property
+    def total_pnl(self) -> float:
+        if self.equity is None:
+            return 0.0
+        return self.equity - self.initial_equity
+    
+    @property
+    def gross_exposure(self) -> float:
+        return sum(abs(value) for value in self.exposure.values())
+
+
 class CircuitBreaker:
     """Circuit breaker for risk management"""
     
@@ -255,6 +455,10 @@ class RiskManager:
         self.price_data: Dict[str, deque] = defaultdict(lambda: deque(maxlen=1000))
         self.return_data: Dict[str, deque] = defaultdict(lambda: deque(maxlen=1000))
         
+        # Incremental risk state: one per follower, covariance shared by all
+        self.follower_states: Dict[str, FollowerRiskState] = {}
+        self.covariance = EwmaCovariance()
+        
         logger.info("Risk management system initialized")
     
     async def validate_trade(
@@ -288,61 +492,27 @@ class RiskManager:
                 ))
                 return False, violations
             
-            # Check position size limits
-            position_violation = await self._check_position_size_limits(
-                follower_id, signal, risk_limits, account_balance
-            )
-            if position_violation:
-                violations.append(position_violation)
-            
-            # Check daily loss limits
-            daily_loss_violation = await self._check_daily_loss_limits(
-                follower_id, signal, risk_limits
-            )
-            if daily_loss_violation:
-                violations.append(daily_loss_violation)
+            # Bring the follower's running state up to date: O(positions)
+            state = self.get_follower_state(follower_id)
+            state.mark(account_balance)
+            state.sync_positions(current_positions)
+            self.update_prices({position.symbol: position.current_price for position in current_positions})
             
-            # Check drawdown limits
-            drawdown_violation = await self._check_drawdown_limits(
-                follower_id, signal, risk_limits, current_positions
-            )
-            if drawdown_violation:
-                violations.append(drawdown_violation)
-            
-            # Check correlation limits
-            correlation_violation = await self._check_correlation_limits(
-                follower_id, signal, risk_limits, current_positions
-            )
-            if correlation_violation:
-                violations.append(correlation_violation)
-            
-            # Check leverage limits
-            leverage_violation = await self._check_leverage_limits(
-                follower_id, signal, risk_limits, account_balance
-            )
-            if leverage_violation:
-                violations.append(leverage_violation)
-            
-            # Check instrument restrictions
-            instrument_violation = await self._check_instrument_restrictions(
-                follower_id, signal, risk_limits
-            )
-            if instrument_violation:
-                violations.append(instrument_violation)
-            
-            # Check slippage limits
-            slippage_violation = await self._check_slippage_limits(
-                follower_id, signal, risk_limits
-            )
-            if slippage_violation:
-                violations.append(slippage_violation)
-            
-            # Check volatility limits
-            volatility_violation = await self._check_volatility_limits(
-                follower_id, signal, risk_limits
-            )
-            if volatility_violation:
-                violations.append(volatility_violation)
+            # Each check is a lookup against the running state and never waits,
+            # so they are awaited in turn rather than scheduled as tasks
+            for check in (
+                self._check_position_size_limits(follower_id, signal, risk_limits, account_balance),
+                self._check_daily_loss_limits(follower_id, signal, risk_limits),
+                self._check_drawdown_limits(follower_id, signal, risk_limits, current_positions),
+                self._check_correlation_limits(follower_id, signal, risk_limits, current_positions),
+                self._check_leverage_limits(follower_id, signal, risk_limits, account_balance),
+                self._check_instrument_restrictions(follower_id, signal, risk_limits),
+                self._check_slippage_limits(follower_id, signal, risk_limits),
+                self._check_volatility_limits(follower_id, signal, risk_limits)
+            ):
+                violation = await check
+                if violation:
+                    violations.append(violation)
             
             # Record violations
             for violation in violations:
@@ -372,6 +542,30 @@ class RiskManager:
                 trade_signal=signal
             )]
     
+    def get_follower_state(self, follower_id: str) -> FollowerRiskState:
+        """Running risk state for a follower (created on first use)"""
+        state = self.follower_states.get(follower_id)
+        if state is None:
+            state = self.follower_states[follower_id] = FollowerRiskState(follower_id)
+        return state
+    
+    def update_prices(self, prices: Dict[str, float], now: Optional[float] = None):
+        """Feed observed prices into the shared covariance estimate"""
+        self.covariance.update_prices(prices, now)
+    
+    def record_fill(
+        self,
+        follower_id: str,
+        symbol: str,
+        side: OrderSide,
+        quantity: float,
+        price: float,
+        realized_pnl: float = 0.0
+    ):
+        """Apply an executed copy trade to the follower's running state"""
+        self.get_follower_state(follower_id).apply_fill(symbol, side, quantity, price, realized_pnl)
+        self.covariance.update_prices({symbol: price})
+    
     async def _get_risk_limits(self, follower_id: str) -> RiskLimits:
         """Get risk limits for a follower"""
         # Check cache first
@@ -431,9 +625,8 @@ class RiskManager:
         risk_limits: RiskLimits
     ) -> Optional[RiskViolation]:
         """Check daily loss limits"""
-        # This would calculate actual daily P&L from database
-        # For now, use a simplified calculation
-        daily_pnl = 0.0  # Would be calculated from actual trades
+        # Fraction of the day's opening equity
+        daily_pnl = self.get_follower_state(follower_id).daily_return
         
         max_daily_loss = risk_limits.max_daily_loss
         if daily_pnl < -max_daily_loss:
@@ -461,9 +654,8 @@ class RiskManager:
         current_positions: List[Position]
     ) -> Optional[RiskViolation]:
         """Check drawdown limits"""
-        # Calculate current drawdown
-        # This would use actual portfolio value history
-        current_drawdown = 0.0  # Would be calculated from actual data
+        # Drawdown from the running peak equity
+        current_drawdown = self.get_follower_state(follower_id).drawdown
         
         if current_drawdown > risk_limits.max_drawdown:
             violation_percentage = (current_drawdown / risk_limits.max_drawdown - 1) * 100
@@ -490,17 +682,20 @@ class RiskManager:
         current_positions: List[Position]
     ) -> Optional[RiskViolation]:
         """Check correlation limits"""
-        if not current_positions:
+        exposure = self.get_follower_state(follower_id).exposure
+        if not exposure:
             return None
         
-        # Calculate correlation with existing positions
-        # This is simplified - in reality would use historical price data
+        # Highest correlation between the new instrument and any held one
         max_correlation = 0.0
-        for position in current_positions:
-            if position.symbol == signal.symbol:
+        for symbol in exposure:
+            if symbol == signal.symbol:
                 # Same symbol = 100% correlation
                 max_correlation = 1.0
                 break
+            correlation = self.covariance.correlation(signal.symbol, symbol)
+            if correlation is not None and abs(correlation) > max_correlation:
+                max_correlation = abs(correlation)
         
         if max_correlation > risk_limits.max_correlation:
             violation_percentage = (max_correlation / risk_limits.max_correlation - 1) * 100
@@ -618,11 +813,10 @@ class RiskManager:
         risk_limits: RiskLimits
     ) -> Optional[RiskViolation]:
         """Check volatility limits"""
-        # This would calculate actual volatility from price data
-        # For now, use a simplified calculation
-        estimated_volatility = 0.20  # 20% estimated volatility
+        # Annualized EWMA volatility; no verdict without enough price history
+        estimated_volatility = self.covariance.volatility(signal.symbol)
         
-        if estimated_volatility > risk_limits.max_volatility:
+        if estimated_volatility is not None and estimated_volatility > risk_limits.max_volatility:
             violation_percentage = (estimated_volatility / risk_limits.max_volatility - 1) * 100
             return RiskViolation(
                 id=f"volatility_{int(time.time())}",
@@ -1,15 +1,27 @@
 """
 Security and Compliance System for Copy Trading
 Handles encryption, audit trails, regulatory compliance, and security monitoring
+
+- Fills are recorded in the audit trail and fed to a streaming anomaly
+  detector with per-user sliding-window counters (order rate, notional,
+  daily loss, failures, unusual symbols and venues), updated in O(1) per
+  fill so anomalies are raised as the fill arrives
+- The detector rebuilds its windows from the audit trail on startup; until
+  then SecurityMonitor falls back to querying trade history
+- One manager per process (get_security_compliance_manager), so the
+  detector sees every fill; fill and anomaly audit rows are written behind
 """
 
+import asyncio
 import os
 import json
 import hashlib
 import hmac
+import threading
 import time
+from collections import deque
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple, Callable, Iterator, Container
 from dataclasses import dataclass
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
@@ -25,6 +37,23 @@ from passlib.context import CryptContext
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Streaming anomaly detection thresholds (the same rules the batch queries apply)
+ANOMALY_RAPID_WINDOW_SECONDS = int(os.getenv('ANOMALY_RAPID_WINDOW_SECONDS', '300'))
+ANOMALY_RAPID_MAX_ORDERS = int(os.getenv('ANOMALY_RAPID_MAX_ORDERS', '10'))
+ANOMALY_VOLUME_SPIKE_FACTOR = float(os.getenv('ANOMALY_VOLUME_SPIKE_FACTOR', '3'))
+ANOMALY_VOLUME_LOOKBACK_DAYS = int(os.getenv('ANOMALY_VOLUME_LOOKBACK_DAYS', '7'))
+ANOMALY_MAX_FAILED_FILLS = int(os.getenv('ANOMALY_MAX_FAILED_FILLS', '5'))
+# Fills a user needs before a never-seen symbol or venue counts as unusual
+ANOMALY_MIN_HISTORY_FILLS = int(os.getenv('ANOMALY_MIN_HISTORY_FILLS', '20'))
+# How much audit trail is replayed on startup (also the memory of seen symbols/venues)
+ANOMALY_REBUILD_DAYS = int(os.getenv('ANOMALY_REBUILD_DAYS', '30'))
+
+FILL_EVENT_TYPE = 'trade_fill'
+
+# Database holding the audit trail and risk limits, and the credential master key
+COMPLIANCE_DATABASE_URL = os.getenv('COMPLIANCE_DATABASE_URL') or os.getenv('DATABASE_URL')
+SECURITY_MASTER_KEY = os.getenv('SECURITY_MASTER_KEY') or os.getenv('ENCRYPTION_KEY', '')
+
 @dataclass
 class SecurityEvent:
     """Security event for audit trail"""
@@ -93,6 +122,21 @@ class AuditTrailService:
         self.db_engine = db_engine
         self.Session = sessionmaker(bind=db_engine)
     
+    @staticmethod
+    def event_row(event: SecurityEvent) -> Dict[str, Any]:
+        """security_audit_log row of an event"""
+        return {
+            'event_id': event.event_id,
+            'user_id': event.user_id,
+            'event_type': event.event_type,
+            'description': event.description,
+            'ip_address': event.ip_address,
+            'user_agent': event.user_agent,
+            'timestamp': event.timestamp,
+            'severity': event.severity,
+            'metadata': json.dumps(event.metadata)
+        }
+    
     def log_security_event(self, event: SecurityEvent):
         """Log security event to audit trail"""
         try:
@@ -107,17 +151,7 @@ class AuditTrailService:
                     )
                 """)
                 
-                session.execute(query, {
-                    'event_id': event.event_id,
-                    'user_id': event.user_id,
-                    'event_type': event.event_type,
-                    'description': event.description,
-                    'ip_address': event.ip_address,
-                    'user_agent': event.user_agent,
-                    'timestamp': event.timestamp,
-                    'severity': event.severity,
-                    'metadata': json.dumps(event.metadata)
-                })
+                session.execute(query, self.event_row(event))
                 session.commit()
                 logger.info(f"Security event logged: {event.event_type}")
         except Exception as e:
@@ -148,6 +182,28 @@ class AuditTrailService:
             logger.error(f"Failed to retrieve audit trail: {e}")
             raise
     
+    def iter_events(self, event_type: str, since: datetime, batch_size: int = 10000) -> Iterator[Dict[str, Any]]:
+        """Stream all users' events of one type since a time, oldest first"""
+        query = text("""
+            SELECT event_id, user_id, timestamp, metadata
+            FROM security_audit_log
+            WHERE event_type = :event_type
+            AND timestamp >= :since
+            ORDER BY timestamp ASC
+        """)
+        with self.db_engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+                query, {'event_type': event_type, 'since': since}
+            )
+            for row in result:
+                metadata = row.metadata
+                if isinstance(metadata, str):
+                    metadata = json.loads(metadata)
+                timestamp = row.timestamp
+                if isinstance(timestamp, str):
+                    timestamp = datetime.fromisoformat(timestamp)
+                yield {'event_id': row.event_id, 'user_id': row.user_id, 'timestamp': timestamp, 'metadata': metadata or {}}
+    
     def generate_compliance_report(self, user_id: str, report_type: str) -> Dict[str, Any]:
         """Generate compliance report for regulatory requirements"""
         try:
@@ -299,6 +355,288 @@ class CredentialManager:
             logger.error(f"Failed to delete credentials: {e}")
             raise
 
+class SlidingWindow:
+    """
+    Count and total of values over the last window_seconds.
+    
+    Values are summed into buckets of bucket_seconds, so memory is bounded
+    by window / bucket and add() is O(1) amortized. Expiry is per bucket,
+    so a value may count for up to one bucket longer than the window.
+    """
+    
+    __slots__ = ('window', 'bucket', 'buckets', 'count', 'total')
+    
+    def __init__(self, window_seconds: float, bucket_seconds: float):
+        self.window = window_seconds
+        self.bucket = bucket_seconds
+        self.buckets = deque()  # [bucket_start, count, total]
+        self.count = 0
+        self.total = 0.0
+    
+    def expire(self, now: float):
+        cutoff = now - self.window
+        while self.buckets and self.buckets[0][0] + self.bucket <= cutoff:
+            _, count, total = self.buckets.popleft()
+            self.count -= count
+            self.total -= total
+        if not self.buckets:
+            # Reset exactly so float error doesn't accumulate
+            self.count, self.total = 0, 0.0
+    
+    def add(self, now: float, value: float = 0.0):
+        self.expire(now)
+        start = now - now % self.bucket
+        if self.buckets and self.buckets[-1][0] == start:
+            entry = self.buckets[-1]
+            entry[1] += 1
+            entry[2] += value
+        else:
+            self.buckets.append([start, 1, value])
+        self.count += 1
+        self.total += value
+
+
+class UserActivity:
+    """Sliding-window state for one user"""
+    
+    def __init__(self):
+        self.orders = SlidingWindow(ANOMALY_RAPID_WINDOW_SECONDS, 10)
+        self.failures = SlidingWindow(ANOMALY_VOLUME_LOOKBACK_DAYS * 86400, 3600)
+        self.largest_notional = deque()  # (time, notional), decreasing: max over the last day
+        # Notional per calendar day for the lookback, plus today's running figures
+        self.daily_notional = deque()  # (date, notional) for days before today
+        self.day = None
+        self.day_notional = 0.0
+        self.day_pnl = 0.0
+        self.fills = 0
+        self.symbols = set()
+        self.venues = set()
+        # anomaly type -> when it was last raised, to avoid repeating it every fill
+        self.raised: Dict[str, float] = {}
+    
+    def roll_day(self, day):
+        if self.day == day:
+            return
+        if self.day is not None:
+            self.daily_notional.append((self.day, self.day_notional))
+        cutoff = day - timedelta(days=ANOMALY_VOLUME_LOOKBACK_DAYS)
+        while self.daily_notional and self.daily_notional[0][0] < cutoff:
+            self.daily_notional.popleft()
+        self.day, self.day_notional, self.day_pnl = day, 0.0, 0.0
+    
+    def track_largest(self, now: float, notional: float):
+        # Monotonic deque: the front is the largest notional of the last 24 hours
+        while self.largest_notional and self.largest_notional[-1][1] <= notional:
+            self.largest_notional.pop()
+        self.largest_notional.append((now, notional))
+        while self.largest_notional[0][0] <= now - 86400:
+            self.largest_notional.popleft()
+    
+    @property
+    def max_notional(self) -> float:
+        return self.largest_notional[0][1] if self.largest_notional else 0.0
+
+
+class StreamingAnomalyDetector:
+    """
+    Per-fill anomaly detection over in-memory sliding windows.
+    
+    on_fill() updates the user's counters and returns the anomalies the fill
+    triggers, in the same shape as SecurityMonitor.detect_anomalies; listeners
+    are called with (user_id, anomaly) as they are raised. Each anomaly type
+    is raised at most once per its window for a user.
+    """
+    
+    def __init__(self):
+        self.users: Dict[str, UserActivity] = {}
+        self.limits: Dict[str, Dict[str, float]] = {}
+        self.listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        self.ready = False
+        self._lock = threading.Lock()
+    
+    def add_listener(self, callback: Callable[[str, Dict[str, Any]], None]):
+        self.listeners.append(callback)
+    
+    def set_limits(self, user_id: str, max_daily_loss: Optional[float] = None, max_position_size: Optional[float] = None):
+        self.limits[user_id] = {'max_daily_loss': max_daily_loss, 'max_position_size': max_position_size}
+    
+    def on_fill(
+        self,
+        user_id: str,
+        symbol: str,
+        venue: str,
+        quantity: float,
+        price: float,
+        pnl: float = 0.0,
+        status: str = 'completed',
+        timestamp: Optional[datetime] = None,
+        replay: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Fold one fill into the user's windows.
+        
+        Replayed fills are checked too, so anomalies raised before a restart
+        aren't raised again, but they return nothing and notify no one.
+        """
+        timestamp = timestamp or datetime.now()
+        now = timestamp.timestamp()
+        notional = abs(quantity * price)
+        
+        with self._lock:
+            user = self.users.get(user_id)
+            if user is None:
+                user = self.users[user_id] = UserActivity()
+            
+            user.roll_day(timestamp.date())
+            user.orders.add(now)
+            if status == 'failed':
+                user.failures.add(now)
+            else:
+                user.day_notional += notional
+                user.day_pnl += pnl or 0.0
+                user.track_largest(now, notional)
+            
+            anomalies = self._check(user_id, user, symbol, venue, notional, timestamp)
+            
+            user.fills += 1
+            user.symbols.add(symbol)
+            user.venues.add(venue)
+            for anomaly in anomalies:
+                user.raised[anomaly['type']] = now
+        
+        if replay:
+            return []
+        for anomaly in anomalies:
+            for listener in self.listeners:
+                try:
+                    listener(user_id, anomaly)
+                except Exception as e:
+                    logger.error(f"Anomaly listener failed: {e}")
+        return anomalies
+    
+    def _check(self, user_id: str, user: UserActivity, symbol: str, venue: str, notional: float, timestamp: datetime) -> List[Dict[str, Any]]:
+        now = timestamp.timestamp()
+        found = []
+        
+        def raise_once(anomaly_type: str, quiet_seconds: float, severity: str, description: str, data: Dict[str, Any]):
+            if now - user.raised.get(anomaly_type, float('-inf')) < quiet_seconds:
+                return
+            found.append({'type': anomaly_type, 'severity': severity, 'description': description, 'data': data})
+        
+        if user.orders.count > ANOMALY_RAPID_MAX_ORDERS:
+            raise_once(
+                'rapid_trading', ANOMALY_RAPID_WINDOW_SECONDS, 'medium',
+                f"Rapid trading detected: {user.orders.count} trades in {ANOMALY_RAPID_WINDOW_SECONDS // 60} minutes",
+                {'count': user.orders.count}
+            )
+        
+        if user.daily_notional:
+            average = sum(value for _, value in user.daily_notional) / len(user.daily_notional)
+            if user.day_notional > average * ANOMALY_VOLUME_SPIKE_FACTOR:
+                raise_once(
+                    'volume_spike', 86400, 'high',
+                    f"Unusual trading volume detected: {user.day_notional:.2f} on {user.day}",
+                    {'trade_date': user.day.isoformat(), 'total_volume': user.day_notional, 'average_volume': average}
+                )
+        
+        if user.failures.count > ANOMALY_MAX_FAILED_FILLS:
+            raise_once(
+                'high_failure_rate', user.failures.window, 'medium',
+                f"High failure rate detected: {user.failures.count} failed trades",
+                {'count': user.failures.count}
+            )
+        
+        limits = self.limits.get(user_id) or {}
+        if limits.get('max_daily_loss') is not None and user.day_pnl < -limits['max_daily_loss']:
+            raise_once(
+                'daily_loss_exceeded', 86400, 'critical',
+                f"Daily loss limit exceeded: ${user.day_pnl:.2f}",
+                {'limit': limits['max_daily_loss'], 'actual': user.day_pnl}
+            )
+        if limits.get('max_position_size') is not None and notional > limits['max_position_size']:
+            raise_once(
+                'position_size_exceeded', 0, 'high',
+                f"Position size limit exceeded: ${notional:.2f}",
+                {'limit': limits['max_position_size'], 'actual': notional}
+            )
+        
+        if user.fills >= ANOMALY_MIN_HISTORY_FILLS:
+            if symbol not in user.symbols:
+                raise_once(
+                    'unusual_symbol', 0, 'low',
+                    f"First trade in {symbol} after {user.fills} fills",
+                    {'symbol': symbol, 'known_symbols': len(user.symbols)}
+                )
+            if venue not in user.venues:
+                raise_once(
+                    'unusual_venue', 0, 'medium',
+                    f"First trade on {venue} after {user.fills} fills",
+                    {'venue': venue, 'known_venues': len(user.venues)}
+                )
+        return found
+    
+    def snapshot(self, user_id: str) -> Dict[str, Any]:
+        """Current window figures for a user (expired buckets dropped first)"""
+        now = time.time()
+        with self._lock:
+            user = self.users.get(user_id)
+            if user is None:
+                return {}
+            user.roll_day(datetime.now().date())
+            user.orders.expire(now)
+            user.failures.expire(now)
+            while user.largest_notional and user.largest_notional[0][0] <= now - 86400:
+                user.largest_notional.popleft()
+            return {
+                'recent_orders': user.orders.count,
+                'failed_fills': user.failures.count,
+                'day_notional': user.day_notional,
+                'average_daily_notional': (
+                    sum(value for _, value in user.daily_notional) / len(user.daily_notional)
+                    if user.daily_notional else None
+                ),
+                'day_pnl': user.day_pnl,
+                'max_notional_24h': user.max_notional,
+            }
+    
+    def rebuild(self, audit_trail: 'AuditTrailService', db_engine=None, skip: Container[str] = ()) -> int:
+        """
+        Replay recent fills from the audit trail (and load risk limits) into
+        this detector, which should be new; returns fills replayed.
+        
+        Fills whose event id is in skip are left out (the caller folds those
+        in itself).
+        """
+        if db_engine is not None:
+            try:
+                with db_engine.connect() as conn:
+                    rows = conn.execute(text(
+                        "SELECT user_id, max_daily_loss, max_position_size FROM risk_limits"
+                    ))
+                    for row in rows:
+                        self.set_limits(row.user_id, row.max_daily_loss, row.max_position_size)
+            except Exception as e:
+                logger.warning(f"Could not load risk limits for anomaly detection: {e}")
+        
+        replayed = 0
+        since = datetime.now() - timedelta(days=ANOMALY_REBUILD_DAYS)
+        for event in audit_trail.iter_events(FILL_EVENT_TYPE, since):
+            if event['event_id'] in skip:
+                continue
+            fill = event['metadata']
+            self.on_fill(
+                event['user_id'], fill.get('symbol'), fill.get('venue'),
+                float(fill.get('quantity') or 0), float(fill.get('price') or 0),
+                pnl=float(fill.get('pnl') or 0), status=fill.get('status', 'completed'),
+                timestamp=event['timestamp'], replay=True
+            )
+            replayed += 1
+        
+        self.ready = True
+        logger.info(f"Anomaly detector rebuilt from {replayed} fills for {len(self.users)} users")
+        return replayed
+
+
 class SecurityMonitor:
     """Monitors system for security threats and anomalies"""
     
@@ -306,9 +644,12 @@ class SecurityMonitor:
         self.db_engine = db_engine
         self.Session = sessionmaker(bind=db_engine)
         self.suspicious_activities = []
+        self.detector = StreamingAnomalyDetector()
     
     def detect_anomalies(self, user_id: str) -> List[Dict[str, Any]]:
         """Detect suspicious trading patterns and activities"""
+        if self.detector.ready:
+            return self._window_anomalies(user_id)
         try:
             anomalies = []
             
@@ -393,8 +734,63 @@ class SecurityMonitor:
             logger.error(f"Failed to detect anomalies: {e}")
             return []
     
+    def _window_anomalies(self, user_id: str) -> List[Dict[str, Any]]:
+        """detect_anomalies answered from the streaming detector's windows"""
+        figures = self.detector.snapshot(user_id)
+        if not figures:
+            return []
+        anomalies = []
+        average = figures['average_daily_notional']
+        if average is not None and figures['day_notional'] > average * ANOMALY_VOLUME_SPIKE_FACTOR:
+            anomalies.append({
+                'type': 'volume_spike',
+                'severity': 'high',
+                'description': f"Unusual trading volume detected: {figures['day_notional']:.2f} today",
+                'data': {'total_volume': figures['day_notional'], 'average_volume': average}
+            })
+        if figures['recent_orders'] > ANOMALY_RAPID_MAX_ORDERS:
+            anomalies.append({
+                'type': 'rapid_trading',
+                'severity': 'medium',
+                'description': f"Rapid trading detected: {figures['recent_orders']} trades in {ANOMALY_RAPID_WINDOW_SECONDS // 60} minutes",
+                'data': {'count': figures['recent_orders']}
+            })
+        if figures['failed_fills'] > ANOMALY_MAX_FAILED_FILLS:
+            anomalies.append({
+                'type': 'high_failure_rate',
+                'severity': 'medium',
+                'description': f"High failure rate detected: {figures['failed_fills']} failed trades",
+                'data': {'count': figures['failed_fills']}
+            })
+        return anomalies
+    
+    def _window_risk_violations(self, user_id: str) -> List[Dict[str, Any]]:
+        """check_risk_limits answered from the streaming detector's windows"""
+        limits = self.detector.limits.get(user_id)
+        figures = self.detector.snapshot(user_id)
+        if not limits or not figures:
+            return []
+        violations = []
+        if limits.get('max_daily_loss') is not None and figures['day_pnl'] < -limits['max_daily_loss']:
+            violations.append({
+                'type': 'daily_loss_exceeded',
+                'severity': 'critical',
+                'description': f"Daily loss limit exceeded: ${figures['day_pnl']}",
+                'data': {'limit': limits['max_daily_loss'], 'actual': figures['day_pnl']}
+            })
+        if limits.get('max_position_size') is not None and figures['max_notional_24h'] > limits['max_position_size']:
+            violations.append({
+                'type': 'position_size_exceeded',
+                'severity': 'high',
+                'description': f"Position size limit exceeded: ${figures['max_notional_24h']}",
+                'data': {'limit': limits['max_position_size'], 'actual': figures['max_notional_24h']}
+            })
+        return violations
+    
     def check_risk_limits(self, user_id: str) -> List[Dict[str, Any]]:
         """Check if user has exceeded risk limits"""
+        if self.detector.ready:
+            return self._window_risk_violations(user_id)
         try:
             violations = []
             
@@ -555,13 +951,109 @@ class ComplianceService:
 class SecurityComplianceManager:
     """Main security and compliance manager"""
     
-    def __init__(self, db_engine, master_key: str):
+    def __init__(self, db_engine, master_key: str, persistence=None):
         self.db_engine = db_engine
+        # Write-behind writer (services.write_behind) for fill and anomaly audit rows
+        self.persistence = persistence
         self.encryption_service = EncryptionService(master_key)
         self.audit_trail = AuditTrailService(db_engine)
         self.credential_manager = CredentialManager(self.encryption_service, db_engine)
         self.security_monitor = SecurityMonitor(db_engine)
+        self.security_monitor.detector.add_listener(self._log_anomaly)
         self.compliance_service = ComplianceService(db_engine)
+        # Fills recorded while start() rebuilds, by event id (None when not rebuilding)
+        self._rebuild_fills: Optional[Dict[str, Dict[str, Any]]] = None
+        self._rebuild_lock = threading.Lock()
+    
+    def start(self) -> int:
+        """
+        Rebuild the streaming anomaly detector from the audit trail.
+        
+        The audit trail is replayed into a fresh detector while the live one
+        keeps checking fills. Fills recorded meanwhile are skipped by the
+        replay (they may already be flushed) and folded in after it, in
+        arrival order, before the new detector is swapped in.
+        """
+        with self._rebuild_lock:
+            self._rebuild_fills = {}
+        try:
+            detector = StreamingAnomalyDetector()
+            detector.add_listener(self._log_anomaly)
+            replayed = detector.rebuild(self.audit_trail, self.db_engine, skip=self._rebuild_fills)
+            with self._rebuild_lock:
+                for fill in self._rebuild_fills.values():
+                    detector.on_fill(**fill, replay=True)
+                self.security_monitor.detector = detector
+                return replayed
+        finally:
+            with self._rebuild_lock:
+                self._rebuild_fills = None
+    
+    def record_fill(
+        self,
+        user_id: str,
+        symbol: str,
+        venue: str,
+        side: str,
+        quantity: float,
+        price: float,
+        pnl: float = 0.0,
+        status: str = 'completed',
+        timestamp: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        """Audit a fill and check it for anomalies inline; returns the anomalies raised"""
+        timestamp = timestamp or datetime.now()
+        event = SecurityEvent(
+            event_id=hashlib.sha256(f"{user_id}_{FILL_EVENT_TYPE}_{time.time()}_{symbol}".encode()).hexdigest()[:16],
+            user_id=user_id,
+            event_type=FILL_EVENT_TYPE,
+            description=f"{side} {quantity} {symbol} @ {price} on {venue}",
+            ip_address='',
+            user_agent='',
+            timestamp=timestamp,
+            severity='info',
+            metadata={
+                'symbol': symbol, 'venue': venue, 'side': side, 'quantity': quantity,
+                'price': price, 'pnl': pnl, 'status': status
+            }
+        )
+        self._audit(event)
+        fill = {
+            'user_id': user_id, 'symbol': symbol, 'venue': venue, 'quantity': quantity,
+            'price': price, 'pnl': pnl, 'status': status, 'timestamp': timestamp
+        }
+        with self._rebuild_lock:
+            if self._rebuild_fills is not None:
+                self._rebuild_fills[event.event_id] = fill
+            detector = self.security_monitor.detector
+        return detector.on_fill(**fill)
+    
+    def _audit(self, event: SecurityEvent):
+        """Audit an event raised on the fill path"""
+        if self.persistence is not None:
+            # Queued for a batched insert; the fill path never waits on the database
+            self.persistence.enqueue('security_audit_log', self.audit_trail.event_row(event))
+        else:
+            self.audit_trail.log_security_event(event)
+    
+    def _log_anomaly(self, user_id: str, anomaly: Dict[str, Any]):
+        event = SecurityEvent(
+            event_id=hashlib.sha256(f"{user_id}_{anomaly['type']}_{time.time()}".encode()).hexdigest()[:16],
+            user_id=user_id,
+            event_type=f"anomaly_{anomaly['type']}",
+            description=anomaly['description'],
+            ip_address='',
+            user_agent='',
+            timestamp=datetime.now(),
+            severity=anomaly['severity'],
+            metadata=anomaly['data']
+        )
+        try:
+            # Called from on_fill, so it runs on the fill path too
+            self._audit(event)
+        except Exception as e:
+            # Detection carries on
+            logger.error(f"Failed to audit anomaly {anomaly['type']}: {e}")
     
     def log_user_action(self, user_id: str, action: str, ip_address: str, user_agent: str, metadata: Dict[str, Any] = None):
         """Log user action for audit trail"""
@@ -616,6 +1108,30 @@ class SecurityComplianceManager:
             'compliance_status': 'compliant' if kyc_status['status'] == 'complete' and not monitoring_results['risk_violations'] else 'non_compliant'
         }
 
+# Global manager instance, created on first use
+_manager: Optional[SecurityComplianceManager] = None
 
+def get_security_compliance_manager(db_engine=None, master_key: Optional[str] = None, persistence=None) -> SecurityComplianceManager:
+    """Get or create the process-wide manager (the first caller's engine is used)"""
+    global _manager
+    if _manager is None:
+        if db_engine is None:
+            if not COMPLIANCE_DATABASE_URL:
+                raise RuntimeError("COMPLIANCE_DATABASE_URL is not set")
+            db_engine = create_engine(COMPLIANCE_DATABASE_URL, pool_pre_ping=True)
+        if persistence is None:
+            from services.write_behind import get_write_behind
+            persistence = get_write_behind(db_engine.url.render_as_string(hide_password=False), db_engine)
+        _manager = SecurityComplianceManager(db_engine, master_key or SECURITY_MASTER_KEY, persistence)
+    return _manager
 
-
+async def start_security_compliance():
+    """Rebuild the anomaly detector at service startup (the audit trail is read off the event loop)"""
+    if not COMPLIANCE_DATABASE_URL:
+        logger.warning("COMPLIANCE_DATABASE_URL not set - fill anomaly detection starts empty")
+        return
+    try:
+        manager = get_security_compliance_manager()
+        await asyncio.get_running_loop().run_in_executor(None, manager.start)
+    except Exception as e:
+        logger.error(f"Failed to start security compliance manager: {e}")
@@ -1,20 +1,31 @@
 """
 Trade Reconciliation Service
 Handles trade reconciliation, error detection, and correction
+
+- Source and target fills are matched by (symbol, side) and time: copied
+  trades on another exchange never share trade ids with the source
+- Matching runs on sorted timestamp arrays (window bounds by binary search,
+  one linear pass to pair fills); quantity and price tolerances are checked
+  on whole arrays of matched pairs
 """
 
 import asyncio
 import json
 import logging
+import uuid
+from collections import defaultdict
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
+import numpy as np
+
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 
 from utils.monitoring import reconciliation_checks, reconciliation_errors, reconciliation_corrections
+from services.write_behind import get_write_behind
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +61,156 @@ class ReconciliationResult:
     correction_needed: bool = False
     error_message: Optional[str] = None
 
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _match_key(symbol: Optional[str], side: Optional[str]) -> Tuple[str, str]:
+    """Symbols compare without separators or case ('BTC/USDT' == 'btcusdt')"""
+    symbol = (symbol or '').upper().replace('/', '').replace('-', '').replace('_', '')
+    return symbol, (side or '').lower()
+
+
+def _epoch_seconds(timestamp: datetime) -> float:
+    # Naive timestamps are UTC, as stored by the copy trading services
+    if timestamp.tzinfo is None:
+        return (timestamp - _EPOCH).total_seconds()
+    return timestamp.timestamp()
+
+
+class TradeMatcher:
+    """
+    Pairs source fills with target fills.
+
+    Within each (symbol, side) group both sides are sorted by time. Every
+    source fill, in time order, takes the earliest unmatched target fill
+    within +/- time_tolerance, which pairs as many fills as the window
+    allows. Matched pairs outside the quantity or price tolerance are
+    mismatches; leftover source fills are missing, leftover target fills
+    duplicates.
+    """
+
+    def __init__(self, tolerance_settings: Dict[str, float]):
+        self.tolerance_settings = tolerance_settings
+
+    def match(self, source_trades: List[TradeRecord], target_trades: List[TradeRecord]) -> List[ReconciliationResult]:
+        source_groups = self._group(source_trades)
+        target_groups = self._group(target_trades)
+
+        # Index of the matched target trade per source trade, -1 if none
+        source_match = np.full(len(source_trades), -1, dtype=np.int64)
+        target_matched = np.zeros(len(target_trades), dtype=bool)
+
+        for key, (source_idx, source_times) in source_groups.items():
+            if key not in target_groups:
+                continue
+            target_idx, target_times = target_groups[key]
+            src, tgt = self._match_sorted(source_times, target_times)
+            source_match[source_idx[src]] = target_idx[tgt]
+            target_matched[target_idx[tgt]] = True
+
+        discrepancies = self._check_pairs(source_trades, target_trades, source_match)
+
+        results = []
+        for i, source_trade in enumerate(source_trades):
+            j = source_match[i]
+            if j < 0:
+                results.append(ReconciliationResult(
+                    status=ReconciliationStatus.MISSING,
+                    source_trade=source_trade,
+                    discrepancies=['Trade not found in target exchanges'],
+                    correction_needed=True
+                ))
+                continue
+            found = discrepancies.get(i, [])
+            results.append(ReconciliationResult(
+                status=ReconciliationStatus.MISMATCH if found else ReconciliationStatus.MATCHED,
+                source_trade=source_trade,
+                target_trade=target_trades[j],
+                discrepancies=found,
+                correction_needed=bool(found)
+            ))
+
+        for j in np.flatnonzero(~target_matched):
+            results.append(ReconciliationResult(
+                status=ReconciliationStatus.DUPLICATE,
+                target_trade=target_trades[j],
+                discrepancies=['Trade found in target but not in source'],
+                correction_needed=True
+            ))
+        return results
+
+    @staticmethod
+    def _group(trades: List[TradeRecord]) -> Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]]:
+        """(symbol, side) -> (trade indexes, epoch seconds), both sorted by time"""
+        by_raw = defaultdict(list)
+        for i, trade in enumerate(trades):
+            by_raw[(trade.symbol, trade.side)].append(i)
+        # Normalize each distinct (symbol, side) once
+        members = defaultdict(list)
+        for (symbol, side), idx in by_raw.items():
+            members[_match_key(symbol, side)].extend(idx)
+
+        all_times = np.array([_epoch_seconds(trade.timestamp) for trade in trades], dtype=np.float64)
+        groups = {}
+        for key, idx in members.items():
+            idx = np.asarray(idx, dtype=np.int64)
+            times = all_times[idx]
+            order = np.argsort(times, kind='stable')
+            groups[key] = (idx[order], times[order])
+        return groups
+
+    def _match_sorted(self, source_times: np.ndarray, target_times: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Greedy pairing of two sorted time arrays; returns matched positions in each"""
+        tolerance = self.tolerance_settings['time_tolerance']
+        # Window of candidate targets for every source fill
+        lower = np.searchsorted(target_times, source_times - tolerance, side='left').tolist()
+        upper = np.searchsorted(target_times, source_times + tolerance, side='right').tolist()
+
+        src, tgt = [], []
+        next_free = 0
+        for i in range(len(lower)):
+            j = lower[i] if lower[i] > next_free else next_free
+            if j < upper[i]:
+                src.append(i)
+                tgt.append(j)
+                next_free = j + 1
+        return np.asarray(src, dtype=np.int64), np.asarray(tgt, dtype=np.int64)
+
+    def _check_pairs(
+        self,
+        source_trades: List[TradeRecord],
+        target_trades: List[TradeRecord],
+        source_match: np.ndarray
+    ) -> Dict[int, List[str]]:
+        """Quantity / price tolerance checks over all matched pairs at once"""
+        pairs = np.flatnonzero(source_match >= 0)
+        if len(pairs) == 0:
+            return {}
+        targets = source_match[pairs]
+
+        source_qty = np.fromiter((source_trades[i].quantity for i in pairs), dtype=np.float64, count=len(pairs))
+        target_qty = np.fromiter((target_trades[j].quantity for j in targets), dtype=np.float64, count=len(pairs))
+        source_px = np.fromiter((source_trades[i].price or 0.0 for i in pairs), dtype=np.float64, count=len(pairs))
+        target_px = np.fromiter((target_trades[j].price or 0.0 for j in targets), dtype=np.float64, count=len(pairs))
+
+        quantity_bad = np.abs(source_qty - target_qty) > source_qty * self.tolerance_settings['quantity_tolerance']
+        price_bad = (
+            (source_px != 0) & (target_px != 0)
+            & (np.abs(source_px - target_px) > source_px * self.tolerance_settings['price_tolerance'])
+        )
+
+        discrepancies: Dict[int, List[str]] = {}
+        for k in np.flatnonzero(quantity_bad | price_bad):
+            i, j = pairs[k], targets[k]
+            found = []
+            if quantity_bad[k]:
+                found.append(f"Quantity mismatch: {source_trades[i].quantity} vs {target_trades[j].quantity}")
+            if price_bad[k]:
+                found.append(f"Price mismatch: {source_trades[i].price} vs {target_trades[j].price}")
+            discrepancies[int(i)] = found
+        return discrepancies
+
+
 class TradeReconciliationService:
     """Service for reconciling trades between source and target exchanges"""
     
@@ -60,6 +221,9 @@ class TradeReconciliationService:
         self.engine = create_engine(db_url)
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
         
+        # Batched, non-blocking persistence for reconciliation results
+        self.persistence = get_write_behind(db_url, self.engine)
+        
         # Reconciliation settings
         self.tolerance_settings = {
             'price_tolerance': 0.001,  # 0.1% price tolerance
@@ -67,6 +231,7 @@ class TradeReconciliationService:
             'time_tolerance': 300,  # 5 minutes time tolerance
             'fee_tolerance': 0.01  # $0.01 fee tolerance
         }
+        self.matcher = TradeMatcher(self.tolerance_settings)
         
         logger.info("Trade Reconciliation Service initialized")
 
@@ -230,157 +395,48 @@ class TradeReconciliationService:
     ) -> List[ReconciliationResult]:
         """Perform the actual reconciliation"""
         try:
-            results = []
-            
-            # Create lookup maps for efficient matching
-            source_map = {trade.trade_id: trade for trade in source_trades}
-            target_map = {trade.trade_id: trade for trade in target_trades}
-            
-            # Check for matched trades
-            for source_trade in source_trades:
-                target_trade = target_map.get(source_trade.trade_id)
-                
-                if target_trade:
-                    # Trades exist in both - check for discrepancies
-                    result = await self._compare_trades(source_trade, target_trade)
-                    results.append(result)
-                else:
-                    # Source trade not found in target
-                    result = ReconciliationResult(
-                        status=ReconciliationStatus.MISSING,
-                        source_trade=source_trade,
-                        discrepancies=['Trade not found in target exchanges'],
-                        correction_needed=True
-                    )
-                    results.append(result)
-            
-            # Check for target trades not in source (duplicates or errors)
-            for target_trade in target_trades:
-                if target_trade.trade_id not in source_map:
-                    result = ReconciliationResult(
-                        status=ReconciliationStatus.DUPLICATE,
-                        target_trade=target_trade,
-                        discrepancies=['Trade found in target but not in source'],
-                        correction_needed=True
-                    )
-                    results.append(result)
-            
-            return results
+            return await asyncio.get_event_loop().run_in_executor(
+                None, self.matcher.match, source_trades, target_trades
+            )
             
         except Exception as e:
             logger.error(f"Error performing reconciliation: {e}")
             return []
 
-    async def _compare_trades(self, source_trade: TradeRecord, target_trade: TradeRecord) -> ReconciliationResult:
-        """Compare two trades for discrepancies"""
+    async def _log_reconciliation_results(self, config_id: str, results: List[ReconciliationResult]):
+        """Queue reconciliation results (written behind in one batch)"""
         try:
-            discrepancies = []
-            
-            # Compare symbol
-            if source_trade.symbol != target_trade.symbol:
-                discrepancies.append(f"Symbol mismatch: {source_trade.symbol} vs {target_trade.symbol}")
+            # Client-side id, so discrepancy rows can reference it without a round trip
+            reconciliation_id = str(uuid.uuid4())
+            created_at = datetime.now()
+            status_counts = {status: 0 for status in ReconciliationStatus}
+            for result in results:
+                status_counts[result.status] += 1
             
-            # Compare side
-            if source_trade.side != target_trade.side:
-                discrepancies.append(f"Side mismatch: {source_trade.side} vs {target_trade.side}")
-            
-            # Compare quantity (with tolerance)
-            quantity_diff = abs(source_trade.quantity - target_trade.quantity)
-            quantity_tolerance = source_trade.quantity * self.tolerance_settings['quantity_tolerance']
-            if quantity_diff > quantity_tolerance:
-                discrepancies.append(f"Quantity mismatch: {source_trade.quantity} vs {target_trade.quantity}")
-            
-            # Compare price (with tolerance)
-            if source_trade.price and target_trade.price:
-                price_diff = abs(source_trade.price - target_trade.price)
-                price_tolerance = source_trade.price * self.tolerance_settings['price_tolerance']
-                if price_diff > price_tolerance:
-                    discrepancies.append(f"Price mismatch: {source_trade.price} vs {target_trade.price}")
-            
-            # Compare timestamp (with tolerance)
-            time_diff = abs((source_trade.timestamp - target_trade.timestamp).total_seconds())
-            if time_diff > self.tolerance_settings['time_tolerance']:
-                discrepancies.append(f"Time mismatch: {source_trade.timestamp} vs {target_trade.timestamp}")
-            
-            # Determine status
-            if not discrepancies:
-                status = ReconciliationStatus.MATCHED
-                correction_needed = False
-            else:
-                status = ReconciliationStatus.MISMATCH
-                correction_needed = True
-            
-            return ReconciliationResult(
-                status=status,
-                source_trade=source_trade,
-                target_trade=target_trade,
-                discrepancies=discrepancies,
-                correction_needed=correction_needed
-            )
+            self.persistence.enqueue("trade_reconciliations", {
+                "id": reconciliation_id,
+                "config_id": config_id,
+                "total_trades": len(results),
+                "matched_trades": status_counts[ReconciliationStatus.MATCHED],
+                "mismatched_trades": status_counts[ReconciliationStatus.MISMATCH],
+                "missing_trades": status_counts[ReconciliationStatus.MISSING],
+                "duplicate_trades": status_counts[ReconciliationStatus.DUPLICATE],
+                "error_trades": status_counts[ReconciliationStatus.ERROR],
+                "created_at": created_at
+            })
             
-        except Exception as e:
-            logger.error(f"Error comparing trades: {e}")
-            return ReconciliationResult(
-                status=ReconciliationStatus.ERROR,
-                source_trade=source_trade,
-                target_trade=target_trade,
-                error_message=str(e)
-            )
-
-    async def _log_reconciliation_results(self, config_id: str, results: List[ReconciliationResult]):
-        """Log reconciliation results to database"""
-        try:
-            with self.SessionLocal() as session:
-                # Create reconciliation record
-                reconciliation_id = session.execute(
-                    text("""
-                        INSERT INTO trade_reconciliations (
-                            config_id, total_trades, matched_trades, 
-                            mismatched_trades, missing_trades, duplicate_trades,
-                            error_trades, created_at
-                        ) VALUES (
-                            :config_id, :total_trades, :matched_trades,
-                            :mismatched_trades, :missing_trades, :duplicate_trades,
-                            :error_trades, :created_at
-                        ) RETURNING id
-                    """),
-                    {
-                        "config_id": config_id,
-                        "total_trades": len(results),
-                        "matched_trades": len([r for r in results if r.status == ReconciliationStatus.MATCHED]),
-                        "mismatched_trades": len([r for r in results if r.status == ReconciliationStatus.MISMATCH]),
-                        "missing_trades": len([r for r in results if r.status == ReconciliationStatus.MISSING]),
-                        "duplicate_trades": len([r for r in results if r.status == ReconciliationStatus.DUPLICATE]),
-                        "error_trades": len([r for r in results if r.status == ReconciliationStatus.ERROR]),
-                        "created_at": datetime.now()
-                    }
-                ).fetchone()
-                
-                # Log individual discrepancies
-                for result in results:
-                    if result.discrepancies:
-                        for discrepancy in result.discrepancies:
-                            session.execute(
-                                text("""
-                                    INSERT INTO reconciliation_discrepancies (
-                                        reconciliation_id, trade_id, discrepancy_type,
-                                        description, correction_needed, created_at
-                                    ) VALUES (
-                                        :reconciliation_id, :trade_id, :discrepancy_type,
-                                        :description, :correction_needed, :created_at
-                                    )
-                                """),
-                                {
-                                    "reconciliation_id": reconciliation_id.id,
-                                    "trade_id": result.source_trade.trade_id if result.source_trade else result.target_trade.trade_id,
-                                    "discrepancy_type": result.status.value,
-                                    "description": discrepancy,
-                                    "correction_needed": result.correction_needed,
-                                    "created_at": datetime.now()
-                                }
-                            )
-                
-                session.commit()
+            # Log individual discrepancies
+            for result in results:
+                if result.discrepancies:
+                    for discrepancy in result.discrepancies:
+                        self.persistence.enqueue("reconciliation_discrepancies", {
+                            "reconciliation_id": reconciliation_id,
+                            "trade_id": result.source_trade.trade_id if result.source_trade else result.target_trade.trade_id,
+                            "discrepancy_type": result.status.value,
+                            "description": discrepancy,
+                            "correction_needed": result.correction_needed,
+                            "created_at": created_at
+                        })
                 
         except Exception as e:
             logger.error(f"Error logging reconciliation results: {e}")
@@ -12,12 +12,13 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Union
 from dataclasses import dataclass
 from enum import Enum
-import ccxt.pro as ccxt
 import websockets
 import aiohttp
 import numpy as np
 from scipy.stats import pearsonr
 
+from services.exchange_registry import get_exchange_registry
+
 logger = logging.getLogger(__name__)
 
 class PlatformType(Enum):
@@ -163,24 +164,21 @@ class CryptoExchangeAdapter(BasePlatformAdapter):
     async def connect(self) -> bool:
         """Connect to crypto exchange"""
         try:
-            # Get exchange class
-            exchange_class = getattr(ccxt, self.platform_name.lower())
-            
-            # Create exchange instance
-            self.exchange = exchange_class({
-                'apiKey': self.credentials.get('api_key'),
-                'secret': self.credentials.get('api_secret'),
-                'password': self.credentials.get('passphrase'),  # For some exchanges
-                'sandbox': self.credentials.get('sandbox', False),
-                'enableRateLimit': True,
-                'options': {
+            # Shared exchange instance for this account, markets loaded from the shared cache
+            self.exchange = await get_exchange_registry().acquire(
+                self.platform_name,
+                {
+                    'apiKey': self.credentials.get('api_key'),
+                    'secret': self.credentials.get('api_secret'),
+                    'password': self.credentials.get('passphrase'),  # For some exchanges
+                },
+                sandbox=self.credentials.get('sandbox', False),
+                config={'options': {
                     'defaultType': self.credentials.get('default_type', 'spot'),
                     'adjustForTimeDifference': True,
-                }
-            })
-            
-            # Load markets
-            await self.exchange.load_markets()
+                }},
+                hold=True
+            )
             self.markets = self.exchange.markets
             
             # Set rate limits
@@ -198,13 +196,18 @@ class CryptoExchangeAdapter(BasePlatformAdapter):
             
         except Exception as e:
             logger.error(f"Failed to connect to {self.platform_name}: {e}")
+            if self.exchange:
+                get_exchange_registry().release(self.exchange)
+                self.exchange = None
             return False
     
     async def disconnect(self) -> bool:
         """Disconnect from exchange"""
         try:
-            if self.exchange and hasattr(self.exchange, 'close'):
-                await self.exchange.close()
+            if self.exchange:
+                # The registry closes the shared client once nobody holds it
+                get_exchange_registry().release(self.exchange)
+                self.exchange = None
             self.is_connected = False
             logger.info(f"Disconnected from {self.platform_name}")
             return True
@@ -0,0 +1,344 @@
+"""
+Write-Behind Persistence
+Batched, asynchronous inserts for trade-path logging (copy trades,
+replication sessions, reconciliation results)
+
+- enqueue() never touches the database: rows go to a bounded in-memory
+  queue and the caller returns immediately
+- A background flusher writes a batch when it reaches `max_batch` rows or
+  every `flush_interval` seconds, as one multi-row INSERT per table, each
+  table in its own transaction, on a worker thread
+- If the database connection fails (or the queue is full) rows are appended
+  to a local JSONL log and replayed once the database accepts writes again
+- Rows the database rejects (constraint or data errors) are retried one by
+  one and the failing ones go to a dead-letter JSONL log instead of being
+  retried forever
+- Local log writes (and their fsync) run on a worker thread, never on the
+  event loop
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Any, Deque, Tuple
+
+from sqlalchemy import create_engine, text
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_MAX_BATCH = int(os.getenv('WRITE_BEHIND_MAX_BATCH', '500'))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv('WRITE_BEHIND_FLUSH_INTERVAL', '0.5'))
+WRITE_BEHIND_MAX_QUEUE = int(os.getenv('WRITE_BEHIND_MAX_QUEUE', '50000'))
+WRITE_BEHIND_FALLBACK_DIR = os.getenv('WRITE_BEHIND_FALLBACK_DIR', '/tmp/lean-write-behind')
+WRITE_BEHIND_RETRY_SECONDS = 5.0
+
+# (table, row)
+PendingRow = Tuple[str, Dict[str, Any]]
+# (table, row, error)
+RejectedRow = Tuple[str, Dict[str, Any], str]
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+
+def _is_connection_error(e: Exception) -> bool:
+    """True if the database could not be reached, as opposed to rejecting the rows"""
+    if isinstance(e, sa_exc.DBAPIError):
+        return e.connection_invalidated or isinstance(e, (sa_exc.OperationalError, sa_exc.InterfaceError))
+    return isinstance(e, (sa_exc.DisconnectionError, sa_exc.TimeoutError, OSError))
+
+
+class WriteBehindWriter:
+    """Bounded write-behind queue flushed to one database in batches"""
+
+    def __init__(
+        self,
+        engine: Engine,
+        name: str = 'default',
+        max_batch: int = WRITE_BEHIND_MAX_BATCH,
+        flush_interval: float = WRITE_BEHIND_FLUSH_INTERVAL,
+        max_queue: int = WRITE_BEHIND_MAX_QUEUE,
+        fallback_dir: str = WRITE_BEHIND_FALLBACK_DIR,
+    ):
+        self.engine = engine
+        self.name = name
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.fallback_path = os.path.join(fallback_dir, f"{name}.jsonl")
+        self.dead_letter_path = os.path.join(fallback_dir, f"{name}.dead.jsonl")
+        self._replay_path = f"{self.fallback_path}.replay"
+
+        self._pending: Deque[PendingRow] = deque()
+        self._overflow: List[PendingRow] = []
+        self._overflow_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._db_down_until = 0.0
+        # Spills, dead letters and replays touch the local logs from worker threads
+        self._log_lock = threading.RLock()
+
+        self.stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'spilled': 0,
+            'replayed': 0,
+            'dead_lettered': 0,
+            'errors': 0,
+        }
+
+    # ============ Producer side ============
+
+    def enqueue(self, table: str, row: Dict[str, Any]):
+        """Queue one row for insertion (never blocks on the database)"""
+        self.stats['enqueued'] += 1
+        if len(self._pending) >= self.max_queue:
+            # Bounded: overflow goes straight to the local log, written off the event loop
+            self._overflow.append((table, row))
+            if self._overflow_task is None or self._overflow_task.done():
+                self._overflow_task = asyncio.create_task(self._spill_overflow())
+            return
+
+        self._pending.append((table, row))
+        self._ensure_started()
+        if len(self._pending) >= self.max_batch:
+            self._wakeup.set()
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def _spill_overflow(self):
+        loop = asyncio.get_event_loop()
+        while self._overflow:
+            rows, self._overflow = self._overflow, []
+            await loop.run_in_executor(None, self._spill, rows)
+
+    # ============ Flushing ============
+
+    async def _flush_loop(self):
+        # Runs until close(); a flush in progress always finishes, so no popped batch is lost
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write everything queued so far"""
+        loop = asyncio.get_event_loop()
+        while self._pending:
+            batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+
+            if time.time() < self._db_down_until:
+                await loop.run_in_executor(None, self._spill, batch)
+                continue
+
+            written, rejected, unwritten = await loop.run_in_executor(None, self._write_batch, batch)
+            self.stats['written'] += written
+            self.stats['batches'] += 1
+            if rejected:
+                await loop.run_in_executor(None, self._dead_letter, rejected)
+            if unwritten:
+                self.stats['errors'] += 1
+                self._db_down_until = time.time() + WRITE_BEHIND_RETRY_SECONDS
+                await loop.run_in_executor(None, self._spill, unwritten)
+
+        if time.time() >= self._db_down_until and (
+            os.path.exists(self.fallback_path) or os.path.exists(self._replay_path)
+        ):
+            await loop.run_in_executor(None, self._replay)
+
+    def _write_batch(self, batch: List[PendingRow]) -> Tuple[int, List[RejectedRow], List[PendingRow]]:
+        """
+        One multi-row INSERT per (table, columns) group, each in its own
+        transaction, so one table's failure doesn't roll back the others.
+
+        Returns (written, rejected, unwritten): rejected rows failed on their
+        data and belong in the dead-letter log; unwritten rows were not
+        committed because the database connection failed, and are retried.
+        """
+        groups: Dict[Tuple[str, Tuple[str, ...]], List[Dict[str, Any]]] = {}
+        for table, row in batch:
+            # Insertion order of groups is kept so parents are written before children
+            groups.setdefault((table, tuple(row)), []).append(row)
+
+        written = 0
+        rejected: List[RejectedRow] = []
+        ordered = list(groups.items())
+        for index, ((table, columns), rows) in enumerate(ordered):
+            try:
+                self._insert(table, columns, rows)
+                written += len(rows)
+                continue
+            except Exception as e:
+                if _is_connection_error(e):
+                    logger.error(f"Write-behind '{self.name}' database unavailable: {e}")
+                    return written, rejected, self._unwritten(ordered[index:])
+
+            # One bad row fails the whole statement: write row by row so only the bad ones are rejected
+            for position, row in enumerate(rows):
+                try:
+                    self._insert(table, columns, [row])
+                    written += 1
+                except Exception as e:
+                    if _is_connection_error(e):
+                        logger.error(f"Write-behind '{self.name}' database unavailable: {e}")
+                        remaining = [((table, columns), rows[position:])] + ordered[index + 1:]
+                        return written, rejected, self._unwritten(remaining)
+                    rejected.append((table, row, str(e)))
+        return written, rejected, []
+
+    @staticmethod
+    def _unwritten(groups: List[Tuple[Tuple[str, Tuple[str, ...]], List[Dict[str, Any]]]]) -> List[PendingRow]:
+        return [(table, row) for (table, _), rows in groups for row in rows]
+
+    def _insert(self, table: str, columns: Tuple[str, ...], rows: List[Dict[str, Any]]):
+        values = []
+        params: Dict[str, Any] = {}
+        for i, row in enumerate(rows):
+            values.append(f"({', '.join(f':{c}_{i}' for c in columns)})")
+            params.update({f"{c}_{i}": row[c] for c in columns})
+        with self.engine.begin() as conn:
+            conn.execute(
+                text(f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join(values)}"),
+                params
+            )
+
+    # ============ Local fallback log ============
+
+    def _append(self, path: str, entries: List[Dict[str, Any]]):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._log_lock, open(path, 'a') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, default=_encode) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _spill(self, batch: List[PendingRow]):
+        try:
+            self._append(self.fallback_path, [{'table': table, 'row': row} for table, row in batch])
+            self.stats['spilled'] += len(batch)
+        except Exception as e:
+            logger.error(f"Write-behind '{self.name}' lost {len(batch)} rows: {e}")
+
+    def _dead_letter(self, rejected: List[RejectedRow]):
+        """Keep rows the database refused for inspection; they are never retried"""
+        logger.error(
+            f"Write-behind '{self.name}' rejected {len(rejected)} rows, "
+            f"kept in {self.dead_letter_path}: {rejected[0][2]}"
+        )
+        try:
+            self._append(self.dead_letter_path, [
+                {'table': table, 'row': row, 'error': error, 'failed_at': datetime.utcnow()}
+                for table, row, error in rejected
+            ])
+            self.stats['dead_lettered'] += len(rejected)
+        except Exception as e:
+            logger.error(f"Write-behind '{self.name}' lost {len(rejected)} rejected rows: {e}")
+
+    def _replay(self):
+        """Write the fallback log back to the database, then remove it"""
+        replaying = self._replay_path
+        with self._log_lock:
+            # A leftover replay file (interrupted replay) is finished first
+            if not os.path.exists(replaying):
+                try:
+                    os.replace(self.fallback_path, replaying)
+                except FileNotFoundError:
+                    return
+
+        with open(replaying) as f:
+            batch = [
+                (entry['table'], entry['row'])
+                for entry in (json.loads(line, object_hook=_decode) for line in f if line.strip())
+            ]
+        replayed = 0
+        for start in range(0, len(batch), self.max_batch):
+            written, rejected, unwritten = self._write_batch(batch[start:start + self.max_batch])
+            replayed += written
+            if rejected:
+                self._dead_letter(rejected)
+            if unwritten:
+                # Put the unwritten tail back; already-written chunks are committed
+                self.stats['errors'] += 1
+                self._db_down_until = time.time() + WRITE_BEHIND_RETRY_SECONDS
+                logger.warning(f"Write-behind '{self.name}' replay interrupted, will retry")
+                self._spill(unwritten + batch[start + self.max_batch:])
+                break
+        self.stats['replayed'] += replayed
+        logger.info(f"Write-behind '{self.name}' replayed {replayed} of {len(batch)} rows from {self.fallback_path}")
+        os.remove(replaying)
+
+    # ============ Lifecycle ============
+
+    async def close(self):
+        """Stop the flusher and write what is still queued, including the batch in flight"""
+        self._closing = True
+        try:
+            if self._task is not None:
+                # Let the flusher finish its current batch instead of cancelling it mid-write
+                self._wakeup.set()
+                await self._task
+                self._task = None
+            if self._overflow_task is not None:
+                await self._overflow_task
+                self._overflow_task = None
+            await self.flush()
+        finally:
+            self._closing = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'queued': len(self._pending),
+            'db_available': time.time() >= self._db_down_until,
+        }
+
+
+# Shared writers, one per database URL
+_writers: Dict[str, WriteBehindWriter] = {}
+
+
+def get_write_behind(db_url: str, engine: Optional[Engine] = None) -> WriteBehindWriter:
+    """Get or create the write-behind writer for a database"""
+    writer = _writers.get(db_url)
+    if writer is None:
+        writer = WriteBehindWriter(
+            engine if engine is not None else create_engine(db_url, pool_pre_ping=True),
+            # Stable across restarts, so a spilled log is replayed to the same database
+            name=hashlib.sha1(db_url.encode()).hexdigest()[:12],
+        )
+        _writers[db_url] = writer
+    return writer
+
+
+async def close_write_behind():
+    """Flush and stop every writer"""
+    for writer in _writers.values():
+        await writer.close()
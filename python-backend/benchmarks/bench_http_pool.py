@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+HTTP connection pool benchmark
+Compares request latency with a new session/connector per request (cold:
+DNS + TCP + TLS every time) against sessions on the shared upstream pool
+
+Usage:
+    python benchmarks/bench_http_pool.py [--url https://api.dexscreener.com/latest/dex/search?q=SOL]
+                                         [--requests 50] [--concurrency 1]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.http_utils import get_http_registry, pooled_session, close_http_pools
+
+DEFAULT_URL = "https://api.dexscreener.com/latest/dex/search?q=SOL"
+
+
+async def cold_request(url: str) -> int:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as resp:
+            await resp.read()
+            return resp.status
+
+
+async def pooled_request(url: str) -> int:
+    async with pooled_session("bench") as session:
+        async with session.get(url) as resp:
+            await resp.read()
+            return resp.status
+
+
+async def run(name: str, request, url: str, requests: int, concurrency: int):
+    samples = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            t0 = time.perf_counter()
+            try:
+                status = await request(url)
+                if status >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            samples.append((time.perf_counter() - t0) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    samples.sort()
+    print(f"\n{name}")
+    print(f"  requests:     {requests} (concurrency {concurrency}, {errors} errors)")
+    print(f"  throughput:   {requests / elapsed:,.1f} req/s")
+    print(f"  mean:         {statistics.fmean(samples):.1f} ms")
+    print(f"  p50:          {samples[len(samples) // 2]:.1f} ms")
+    print(f"  p95:          {samples[min(len(samples) - 1, int(len(samples) * 0.95))]:.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    await run("cold (new session + connector per request)", cold_request, args.url, args.requests, args.concurrency)
+    # One warm-up request opens the pooled connection
+    try:
+        await pooled_request(args.url)
+    except Exception as e:
+        print(f"\nwarm-up failed: {e}")
+    await run("pooled (shared keep-alive connector)", pooled_request, args.url, args.requests, args.concurrency)
+    print(f"\n  registry:     {get_http_registry().get_stats()}")
+    await close_http_pools()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
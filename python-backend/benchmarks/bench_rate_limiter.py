@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Rate limiter benchmark
+Measures per-request overhead of the WagyuTech API rate limit backends
+
+Usage:
+    python benchmarks/bench_rate_limiter.py [--requests 200000] [--keys 1000]
+    REDIS_URL=redis://localhost:6379 python benchmarks/bench_rate_limiter.py
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.wagyu_api.rate_limiter import (
+    InMemoryRateLimitBackend,
+    RedisRateLimitBackend,
+    REDIS_AVAILABLE,
+)
+
+
+async def run(backend, name: str, requests: int, keys: int):
+    key_ids = [f"key_{i}" for i in range(keys)]
+    samples = []
+    allowed = 0
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        key_id = random.choice(key_ids)
+        t0 = time.perf_counter_ns()
+        ok, _ = await backend.check(key_id, 100, 1000)
+        samples.append(time.perf_counter_ns() - t0)
+        allowed += ok
+    elapsed = time.perf_counter() - start
+
+    samples.sort()
+    print(f"\n{name}")
+    print(f"  requests:     {requests:,} over {keys:,} keys ({allowed:,} allowed)")
+    print(f"  throughput:   {requests / elapsed:,.0f} checks/s")
+    print(f"  mean:         {statistics.fmean(samples) / 1000:.2f} us")
+    print(f"  p50:          {samples[len(samples) // 2] / 1000:.2f} us")
+    print(f"  p99:          {samples[int(len(samples) * 0.99)] / 1000:.2f} us")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--keys", type=int, default=1_000)
+    args = parser.parse_args()
+
+    memory = InMemoryRateLimitBackend()
+    await run(memory, "in-memory GCRA", args.requests, args.keys)
+    print(f"  tracked keys: {len(memory):,}")
+
+    redis_url = os.getenv("REDIS_URL")
+    if REDIS_AVAILABLE and redis_url:
+        backend = RedisRateLimitBackend(redis_url, key_prefix="wagyu:ratelimit:bench")
+        # Fewer iterations: every check is a network round trip
+        await run(backend, "redis GCRA (1 round trip)", min(args.requests, 20_000), args.keys)
+        await backend.close()
+    else:
+        print("\nSet REDIS_URL to benchmark the Redis backend")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Trading WebSocket fan-out load test
+Simulated clients watch a handful of tokens through TradingWebSocketManager;
+swap events are published on RedisService's in-memory pub/sub (the path it
+takes without a Redis server) and timed until they sit in every client queue
+and until every client has received them
+
+The legacy path (one Redis callback per client subscription, message
+serialized per recipient) is replayed on a small sample and extrapolated.
+
+Usage:
+    python benchmarks/bench_ws_fanout.py [--clients 5000] [--tokens 10] [--rounds 10]
+        [--burst 10] [--legacy-messages 2]
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.websockets import WebSocketState
+
+import services.trading_websocket as trading_websocket
+from services.redis_service import RedisService, SwapEvent
+from services.trading_websocket import TradingWebSocketManager, WSMessage, MessageType
+from services.websocket_backpressure import BackpressureController, MessagePriority
+
+
+class SimClient:
+    """Stands in for a browser connection: accepts, counts what it is sent"""
+
+    def __init__(self):
+        self.client_state = WebSocketState.CONNECTED
+        self.received = 0
+        self.bytes = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        self.received += 1
+        self.bytes += len(data)
+
+    async def close(self):
+        self.client_state = WebSocketState.DISCONNECTED
+
+
+class OfflineSwapStream:
+    """Keeps subscriptions away from Helius/Birdeye; counts what the manager asks for"""
+
+    def __init__(self):
+        self.subscribed = 0
+        self.unsubscribed = 0
+
+    async def subscribe_token(self, token_address: str):
+        self.subscribed += 1
+
+    async def unsubscribe_token(self, token_address: str):
+        self.unsubscribed += 1
+
+
+def make_swap(token: str, i: int) -> SwapEvent:
+    return SwapEvent(
+        signature=f"sig{i:064d}", timestamp=1_700_000_000_000 + i, source="raydium",
+        side="buy" if i % 2 else "sell", token_address=token, amount_token=1234.5 + i,
+        amount_sol=0.75, price_usd=0.00123, market_cap_usd=1_230_000.0,
+        trader="Trader1111111111111111111111111111111111111",
+    )
+
+
+async def make_manager(clients: int, tokens: list, swap_stream: OfflineSwapStream, legacy: bool):
+    manager = TradingWebSocketManager()
+    manager._backpressure = BackpressureController()
+    manager._redis = RedisService("redis://unused")
+    # RedisService's own fallback: in-process pub/sub, no server
+    manager._redis._use_fallback = True
+    manager._running = True
+
+    sockets = [SimClient() for _ in range(clients)]
+    for i, ws in enumerate(sockets):
+        await manager.connect(ws)
+        token = tokens[i % len(tokens)]
+        if legacy:
+            await legacy_subscribe(manager, ws, token)
+        else:
+            await manager._handle_subscribe(ws, {"token": token, "timeframes": ["1m"]})
+    await settle(manager, sockets, [1] * clients if legacy else [2] * clients)
+    return manager, sockets
+
+
+async def legacy_subscribe(manager: TradingWebSocketManager, ws, token: str):
+    """What _handle_subscribe used to do: one more callback on the channel per client"""
+    manager.token_subscribers.setdefault(token, set()).add(ws)
+    await manager._redis.subscribe_swaps(
+        token, lambda swap: asyncio.create_task(legacy_broadcast(manager, swap))
+    )
+
+
+async def legacy_broadcast(manager: TradingWebSocketManager, swap: SwapEvent):
+    """The old _broadcast_swap: serialize and enqueue per recipient"""
+    message = WSMessage(type=MessageType.TRADE.value, data={
+        "token": swap.token_address, "signature": swap.signature, "side": swap.side,
+        "amount_token": swap.amount_token, "amount_sol": swap.amount_sol,
+        "price_usd": swap.price_usd, "market_cap_usd": swap.market_cap_usd,
+        "trader": swap.trader, "source": swap.source, "timestamp": swap.timestamp,
+    })
+    for ws in manager.token_subscribers.get(swap.token_address, set()):
+        if ws.client_state == WebSocketState.CONNECTED:
+            await manager._backpressure.enqueue(
+                ws, message.to_json(), priority=MessagePriority.HIGH, message_type=message.type
+            )
+
+
+async def settle(manager, sockets, expected, timeout: float = 120.0):
+    """Wait until every client has received its expected message count"""
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if all(ws.received >= n for ws, n in zip(sockets, expected)):
+            return True
+        await asyncio.sleep(0.005)
+    return False
+
+
+async def publish_burst(manager, tokens, burst: int, offset: int):
+    """Publish burst swaps per token and run the broadcasts they trigger"""
+    before = asyncio.all_tasks()
+    for i in range(burst):
+        for token in tokens:
+            await manager._redis.publish_swap(token, make_swap(token, offset + i))
+    broadcasts = asyncio.all_tasks() - before
+    await asyncio.gather(*broadcasts)
+
+
+def report(name: str, messages: int, deliveries: int, elapsed: float, extrapolate_to: int = 0):
+    line = (
+        f"  {name:<26} {messages:>7,} msgs  {deliveries:>11,} deliveries  {elapsed:8.3f} s  "
+        f"{elapsed / messages * 1e3:9.3f} ms/msg"
+    )
+    if extrapolate_to:
+        line += f"  (~{elapsed / messages * extrapolate_to:,.1f} s for {extrapolate_to:,})"
+    print(line)
+
+
+async def run_hub(args, tokens):
+    swap_stream = OfflineSwapStream()
+    trading_websocket.get_swap_stream_service = _provide(swap_stream)
+    manager, sockets = await make_manager(args.clients, tokens, swap_stream, legacy=False)
+    callbacks = sum(len(cbs) for cbs in manager._redis._subscriptions.values())
+    print(f"hub: {len(manager._redis._subscriptions)} Redis channels, {callbacks} callbacks, "
+          f"{swap_stream.subscribed} swap stream subscriptions for {args.clients:,} clients")
+
+    baseline = [ws.received for ws in sockets]
+    fanout = delivery = 0.0
+    for round_ in range(args.rounds):
+        start = time.perf_counter()
+        await publish_burst(manager, tokens, args.burst, round_ * args.burst)
+        fanout += time.perf_counter() - start
+
+        if round_ == 0:
+            # Queued entries share one payload object per message
+            queued = [msg.data for queue in manager._backpressure.queues.values() for msg in queue]
+            print(f"hub: {len(queued):,} queued entries share {len({id(data) for data in queued})} "
+                  f"payload objects ({args.burst * len(tokens)} messages published)")
+
+        expected = [n + (round_ + 1) * args.burst for n in baseline]
+        if not await settle(manager, sockets, expected):
+            print("  delivery timed out")
+        delivery += time.perf_counter() - start
+
+    messages = args.rounds * args.burst * len(tokens)
+    deliveries = sum(ws.received for ws in sockets) - sum(baseline)
+    report("hub fan-out (enqueue)", messages, deliveries, fanout)
+    report("hub delivered", messages, deliveries, delivery)
+
+    for ws in list(sockets):
+        await manager.disconnect(ws)
+    print(f"hub: after disconnect {len(manager._redis._subscriptions)} Redis channels, "
+          f"{swap_stream.unsubscribed} swap stream unsubscriptions")
+    return fanout / messages
+
+
+async def run_legacy(args, tokens):
+    swap_stream = OfflineSwapStream()
+    manager, sockets = await make_manager(args.clients, tokens, swap_stream, legacy=True)
+    callbacks = sum(len(cbs) for cbs in manager._redis._subscriptions.values())
+    print(f"legacy: {len(manager._redis._subscriptions)} Redis channels, {callbacks} callbacks")
+
+    start = time.perf_counter()
+    await publish_burst(manager, tokens[:1], args.legacy_messages, 0)
+    elapsed = time.perf_counter() - start
+    queued = sum(len(q) for q in manager._backpressure.queues.values())
+    report("legacy fan-out (enqueue)", args.legacy_messages, queued, elapsed,
+           extrapolate_to=args.rounds * args.burst * len(tokens))
+
+    for ws in list(sockets):
+        await manager.disconnect(ws)
+    return elapsed / args.legacy_messages
+
+
+def _provide(service):
+    async def get_service():
+        return service
+    return get_service
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--clients', type=int, default=5000)
+    parser.add_argument('--tokens', type=int, default=10)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--burst', type=int, default=10, help='swaps per token per round')
+    parser.add_argument('--legacy-messages', type=int, default=2)
+    args = parser.parse_args()
+
+    tokens = [f"Token{i:039d}" for i in range(args.tokens)]
+    print(f"{args.clients:,} clients over {args.tokens} tokens, "
+          f"{args.rounds} rounds of {args.burst} swaps per token")
+
+    hub = await run_hub(args, tokens)
+    gc.collect()
+    legacy = await run_legacy(args, tokens)
+    print(f"fan-out per message: legacy {legacy * 1e3:.1f} ms, hub {hub * 1e3:.3f} ms "
+          f"({legacy / hub:,.0f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -28,6 +28,10 @@ class Settings(BaseSettings):
     preferred_data_source: str = "alpha_vantage"
     fallback_data_sources: List[str] = ["yfinance", "ccxt"]
     
+    # Backtest result cache
+    backtest_cache_dir: str = "data/backtest_cache"
+    backtest_cache_max_mb: int = 1024
+    
     # Redis Configuration
     redis_url: str = os.getenv("REDIS_URL", "redis://localhost:6379")
     redis_channel_swaps: str = "swaps:{token_address}"
@@ -10,6 +10,7 @@ from .metrics import calculate_metrics, calculate_tearsheet
 from .strategy_executor import StrategyExecutor
 from .data_loader import DataLoader
 from .notebook_manager import NotebookManager, get_notebook_manager
+from .result_cache import ResultCache, make_key, fingerprint_frame, fingerprint_files
 
 __all__ = [
     'BacktestRunner',
@@ -21,5 +22,9 @@ __all__ = [
     'DataLoader',
     'NotebookManager',
     'get_notebook_manager',
+    'ResultCache',
+    'make_key',
+    'fingerprint_frame',
+    'fingerprint_files',
 ]
 
@@ -11,6 +11,7 @@ import pandas as pd
 import numpy as np
 
 from .metrics import calculate_metrics
+from .metrics_core import trade_stats
 
 
 @dataclass
@@ -297,9 +298,8 @@ class BacktestRunner:
         metrics = calculate_metrics(returns, benchmark_returns)
         
         # Calculate trade statistics
-        closed_trades = [t for t in trades if 'pnl' in t]
-        winning = [t for t in closed_trades if t['pnl'] > 0]
-        losing = [t for t in closed_trades if t['pnl'] < 0]
+        closed_pnl = np.fromiter((t['pnl'] for t in trades if 'pnl' in t), dtype=float)
+        trade_summary = trade_stats(closed_pnl)
         
         # Build result
         result = BacktestResult(
@@ -317,15 +317,15 @@ class BacktestRunner:
             beta=metrics['beta'],
             var_95=metrics['var_95'],
             cvar_95=metrics['cvar_95'],
-            total_trades=len(closed_trades),
-            winning_trades=len(winning),
-            losing_trades=len(losing),
-            win_rate=len(winning) / max(len(closed_trades), 1) * 100,
-            profit_factor=sum(t['pnl'] for t in winning) / max(abs(sum(t['pnl'] for t in losing)), 1) if losing else float('inf'),
-            average_win=np.mean([t['pnl'] for t in winning]) if winning else 0,
-            average_loss=np.mean([abs(t['pnl']) for t in losing]) if losing else 0,
-            largest_win=max([t['pnl'] for t in winning]) if winning else 0,
-            largest_loss=max([abs(t['pnl']) for t in losing]) if losing else 0,
+            total_trades=trade_summary['trades'],
+            winning_trades=trade_summary['winning_trades'],
+            losing_trades=trade_summary['losing_trades'],
+            win_rate=trade_summary['win_rate'] * 100,
+            profit_factor=trade_summary['gross_profit'] / max(trade_summary['gross_loss'], 1) if trade_summary['losing_trades'] else float('inf'),
+            average_win=trade_summary['avg_win'],
+            average_loss=abs(trade_summary['avg_loss']),
+            largest_win=trade_summary['largest_win'],
+            largest_loss=abs(trade_summary['largest_loss']),
             equity_curve=equity_curve,
             timestamps=timestamps,
             trades=trades,
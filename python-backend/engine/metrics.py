@@ -2,13 +2,16 @@
 Performance Metrics Calculator using Empyrical
 
 This module provides standardized performance metrics calculation
-using the Empyrical library (originally from Quantopian).
+using the Empyrical library (originally from Quantopian), or the shared
+vectorized core in metrics_core when it is not installed.
 """
 
 import numpy as np
 import pandas as pd
 from typing import Dict, Any, Optional, Union
 
+from .metrics_core import performance_stats, rolling_stats
+
 # Try to import empyrical, fall back to manual calculation if not available
 try:
     import empyrical as ep
@@ -73,21 +76,10 @@ def _calculate_empyrical_metrics(
     # Drawdown
     max_dd = ep.max_drawdown(returns) * 100
     
-    # Calculate drawdown duration
-    cumulative = (1 + returns).cumprod()
-    running_max = cumulative.cummax()
-    drawdown = (cumulative - running_max) / running_max
-    is_drawdown = drawdown < 0
-    
-    # Find longest drawdown duration
-    max_dd_duration = 0
-    current_duration = 0
-    for in_dd in is_drawdown:
-        if in_dd:
-            current_duration += 1
-            max_dd_duration = max(max_dd_duration, current_duration)
-        else:
-            current_duration = 0
+    # Drawdown duration and tail risk from the shared core
+    core = performance_stats(returns.to_numpy(dtype=float), risk_free_rate=risk_free_rate,
+                             periods_per_year=periods_per_year)
+    max_dd_duration = core['max_drawdown_duration']
     
     # Risk-adjusted returns
     sharpe = ep.sharpe_ratio(returns, risk_free=period_rf, period='daily', annualization=periods_per_year)
@@ -110,8 +102,8 @@ def _calculate_empyrical_metrics(
         beta = 1.0 if np.isnan(beta) else beta
     
     # VaR and CVaR
-    var_95 = np.percentile(returns, 5) * 100
-    cvar_95 = returns[returns <= np.percentile(returns, 5)].mean() * 100 if len(returns) > 20 else var_95
+    var_95 = core['var_95'] * 100
+    cvar_95 = core['cvar_95'] * 100 if len(returns) > 20 else var_95
     
     return {
         'total_return': total_return,
@@ -129,7 +121,7 @@ def _calculate_empyrical_metrics(
         'information_ratio': 0.0,  # Requires benchmark
         'treynor_ratio': 0.0,  # Requires benchmark
         'var_95': abs(var_95),
-        'cvar_95': abs(cvar_95) if not np.isnan(cvar_95) else abs(var_95),
+        'cvar_95': abs(cvar_95),
     }
 
 
@@ -142,71 +134,42 @@ def _calculate_fallback_metrics(
     """Fallback metrics calculation without Empyrical"""
     
     n = len(returns)
-    
-    # Total return
-    cumulative = (1 + returns).prod() - 1
-    total_return = cumulative * 100
-    
-    # Annual return
-    years = n / periods_per_year
-    annual_return = ((1 + cumulative) ** (1 / max(years, 0.01)) - 1) * 100 if years > 0 else 0
-    monthly_return = annual_return / 12
-    
-    # Volatility
-    volatility = returns.std() * np.sqrt(periods_per_year) * 100
-    
-    # Downside volatility
-    negative_returns = returns[returns < 0]
-    downside_vol = negative_returns.std() * np.sqrt(periods_per_year) * 100 if len(negative_returns) > 0 else 0
-    
-    # Max drawdown
-    cumulative_returns = (1 + returns).cumprod()
-    running_max = cumulative_returns.cummax()
-    drawdown = (cumulative_returns - running_max) / running_max
-    max_dd = abs(drawdown.min()) * 100
-    
-    # Drawdown duration
-    is_drawdown = drawdown < 0
-    max_dd_duration = 0
-    current_duration = 0
-    for in_dd in is_drawdown:
-        if in_dd:
-            current_duration += 1
-            max_dd_duration = max(max_dd_duration, current_duration)
-        else:
-            current_duration = 0
-    
-    # Sharpe ratio
-    excess_return = returns.mean() - risk_free_rate / periods_per_year
-    sharpe = (excess_return / returns.std() * np.sqrt(periods_per_year)) if returns.std() > 0 else 0
-    
-    # Sortino ratio
-    sortino = (excess_return / negative_returns.std() * np.sqrt(periods_per_year)) if len(negative_returns) > 0 and negative_returns.std() > 0 else 0
-    
-    # Calmar ratio
-    calmar = annual_return / max_dd if max_dd > 0 else 0
-    
-    # VaR and CVaR
-    var_95 = np.percentile(returns, 5) * 100
-    cvar_95 = returns[returns <= np.percentile(returns, 5)].mean() * 100 if len(returns) > 20 else var_95
+    benchmark = None
+    if benchmark_returns is not None and len(benchmark_returns) == n:
+        benchmark = np.asarray(benchmark_returns, dtype=float)
+    
+    # Every statistic from one pass over the returns; short backtests are
+    # annualized over at least 0.01 years
+    stats = performance_stats(
+        returns.to_numpy(dtype=float),
+        benchmark,
+        risk_free_rate=risk_free_rate,
+        periods_per_year=periods_per_year,
+        years=max(n / periods_per_year, 0.01),
+    )
+    
+    annual_return = stats['annual_return'] * 100
+    var_95 = stats['var_95'] * 100
+    cvar_95 = stats['cvar_95'] * 100 if n > 20 else var_95
     
     return {
-        'total_return': total_return,
+        'total_return': stats['total_return'] * 100,
         'annual_return': annual_return,
-        'monthly_return': monthly_return,
-        'volatility': volatility,
-        'downside_volatility': downside_vol,
-        'max_drawdown': max_dd,
-        'max_drawdown_duration': max_dd_duration,
-        'sharpe_ratio': sharpe,
-        'sortino_ratio': sortino,
-        'calmar_ratio': calmar,
-        'alpha': 0.0,
-        'beta': 1.0,
-        'information_ratio': 0.0,
-        'treynor_ratio': 0.0,
+        'monthly_return': annual_return / 12,
+        'volatility': stats['volatility'] * 100,
+        'downside_volatility': stats['downside_volatility'] * 100,
+        'max_drawdown': abs(stats['max_drawdown']) * 100,
+        'max_drawdown_duration': stats['max_drawdown_duration'],
+        'sharpe_ratio': stats['sharpe_ratio'],
+        'sortino_ratio': stats['sortino_ratio'],
+        'calmar_ratio': stats['calmar_ratio'],
+        # Annualized, as Empyrical reports it
+        'alpha': stats['alpha'] * periods_per_year * 100,
+        'beta': stats['beta'],
+        'information_ratio': stats['information_ratio'],
+        'treynor_ratio': stats['treynor_ratio'],
         'var_95': abs(var_95),
-        'cvar_95': abs(cvar_95) if not np.isnan(cvar_95) else abs(var_95),
+        'cvar_95': abs(cvar_95),
     }
 
 
@@ -248,16 +211,10 @@ def calculate_tearsheet(
     # Add time series data
     cumulative_returns = (1 + returns).cumprod() - 1
     
-    # Rolling metrics (21-day window)
-    rolling_sharpe = []
-    rolling_vol = []
-    
-    for i in range(21, len(returns)):
-        window = returns.iloc[i-21:i]
-        rs = window.mean() / window.std() * np.sqrt(252) if window.std() > 0 else 0
-        rv = window.std() * np.sqrt(252) * 100
-        rolling_sharpe.append(rs)
-        rolling_vol.append(rv)
+    # Rolling metrics over the 21 days before each day
+    rolling = rolling_stats(returns.to_numpy(dtype=float), 21)
+    rolling_sharpe = rolling['sharpe'][:-1].tolist()
+    rolling_vol = (rolling['volatility'][:-1] * 100).tolist()
     
     # Monthly returns
     if hasattr(returns.index, 'to_period'):
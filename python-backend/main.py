@@ -31,6 +31,15 @@ else:
     ssl._create_default_https_context = _create_unverified_https_context
 
 logger = logging.getLogger(__name__)
+
+from services.http_utils import get_http_registry, pooled_session, close_http_pools
+from services.feed_broadcaster import get_feed_broadcaster, serve_feed, PollingFeedTopic, StreamFeedTopic
+
+# Upstream pools used by the legacy proxy/websocket handlers; certificate
+# verification stays off for them as before (public data behind CDNs)
+for _pool in ("birdeye", "dexscreener", "pump_fun", "images"):
+    get_http_registry().configure(_pool, verify_ssl=False)
+
 from models.market_data import (
     OHLCVData, 
     SymbolInfo, 
@@ -45,6 +54,7 @@ try:
     from engine.data_loader import DataLoader
     from engine.metrics import calculate_metrics
     from engine.notebook_manager import get_notebook_manager, NotebookManager
+    from engine.result_cache import ResultCache, make_key, fingerprint_frame, fingerprint_files
     ENGINE_AVAILABLE = True
 except ImportError:
     ENGINE_AVAILABLE = False
@@ -85,6 +95,8 @@ except ImportError as e:
 market_data_service = None
 data_aggregator = None
 data_loader = None
+result_cache = None
+backtest_engine_version = None
 crypto_analytics = None
 redis_service = None
 trading_ws_manager = None
@@ -97,12 +109,23 @@ async def lifespan(app: FastAPI):
     """Initialize services on startup"""
     global market_data_service, data_aggregator, data_loader, crypto_analytics
     global redis_service, trading_ws_manager, swap_stream_service
+    global result_cache, backtest_engine_version
     
     market_data_service = MarketDataService()
     data_aggregator = DataAggregator(market_data_service)
     
     if ENGINE_AVAILABLE:
         data_loader = DataLoader(cache_dir="data/cache")
+        result_cache = ResultCache(
+            cache_dir=settings.backtest_cache_dir,
+            max_bytes=settings.backtest_cache_max_mb * 1024 * 1024,
+        )
+        # Cached results are dropped whenever the engine code changes
+        engine_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "engine")
+        backtest_engine_version = fingerprint_files(
+            os.path.join(engine_dir, name)
+            for name in ("backtest_runner.py", "strategy_executor.py", "metrics.py", "metrics_core.py")
+        )
     
     # Initialize crypto analytics
     if CRYPTO_ANALYTICS_AVAILABLE:
@@ -233,6 +256,8 @@ async def lifespan(app: FastAPI):
     await data_aggregator.cleanup()
     if crypto_analytics:
         await crypto_analytics.cleanup()
+    await get_feed_broadcaster().close()
+    await close_http_pools()
     
     # Cleanup trading services
     if TRADING_SERVICES_AVAILABLE:
@@ -363,6 +388,204 @@ async def get_migrating_tokens(limit: int = 20):
 
 # ============ Real-time Pump.fun Token WebSocket ============
 
+async def fetch_trending_feed():
+    """Fetch trending tokens with high market cap (> $50K) from Birdeye API"""
+    # Get API key from environment OR aggregator (which might have its own)
+    birdeye_api_key = os.getenv("BIRDEYE_API_KEY", "")
+    if not birdeye_api_key:
+        try:
+            from services.wagyu_api.data_aggregator import get_aggregator
+            agg = await get_aggregator()
+            birdeye_api_key = agg.birdeye_key
+        except:
+            pass
+
+    # Try Birdeye API first for high market cap tokens
+    if birdeye_api_key:
+        try:
+            logger.debug("Fetching trending tokens from Birdeye")
+            # Use Birdeye token list to get trending Solana tokens
+            url = "https://public-api.birdeye.so/defi/tokenlist"
+            headers = {
+                "X-API-KEY": birdeye_api_key,
+                "Accept": "application/json"
+            }
+            params = {
+                "sort_by": "mc",  # Sort by market cap
+                "sort_type": "desc",
+                "offset": 0,
+                "limit": 50
+            }
+
+            timeout = aiohttp.ClientTimeout(total=10)
+
+            async with pooled_session("birdeye", timeout=timeout) as session:
+                async with session.get(url, headers=headers, params=params) as resp:
+                    if resp.status == 200:
+                        data = await resp.json()
+                        tokens = []
+
+                        if data.get("success") and data.get("data", {}).get("tokens"):
+                            for token in data["data"]["tokens"]:
+                                mc = float(token.get("mc") or token.get("marketCap") or 0)
+
+                                # Filter: market cap > $50K and skip pump.fun tokens
+                                if mc < 50000:
+                                    continue
+
+                                # Filter: Minimum 500 holders (if available)
+                                # This ensures "many holders" as requested
+                                holder_count = float(token.get("holder") or 0)
+                                if holder_count > 0 and holder_count < 500:
+                                    continue
+
+                                token_name = (token.get("name") or "").lower()
+                                token_symbol = (token.get("symbol") or "").lower()
+
+                                # Skip pump.fun tokens - they typically have "pump" in name
+                                if "pump" in token_name or token_symbol == "pump":
+                                    continue
+
+                                tokens.append({
+                                    "mint": token.get("address", ""),
+                                    "symbol": token.get("symbol", ""),
+                                    "name": token.get("name", ""),
+                                    "image_uri": token.get("logoURI") or token.get("image"),
+                                    "usd_market_cap": mc,
+                                    "market_cap": mc,
+                                    "volume_24h": float(token.get("v24hUSD") or 0),
+                                    "liquidity": float(token.get("liquidity") or 0),
+                                    "price_change_24h": float(token.get("v24hChangePercent") or 0),
+                                    "complete": True,
+                                    "created_timestamp": int(datetime.utcnow().timestamp() * 1000),
+                                    "source": "birdeye"
+                                })
+
+                                if len(tokens) >= 30:
+                                    break
+
+                        if tokens:
+                            logger.info(f"Fetched {len(tokens)} trending tokens from Birdeye (MC > $50K)")
+                            return tokens
+                    else:
+                        logger.debug(f"Birdeye returned {resp.status}")
+        except Exception as e:
+            logger.warning(f"Failed to fetch trending from Birdeye: {e}")
+
+    # Fallback to DexScreener for high market cap tokens
+    try:
+        logger.debug("Fetching trending tokens from DexScreener fallback")
+        # Use search endpoint with 'Raydium' to get active Solana pairs, which is very reliable for trending list
+        url = "https://api.dexscreener.com/latest/dex/search"
+        params = {"q": "Raydium"}
+
+        timeout = aiohttp.ClientTimeout(total=10)
+
+        async with pooled_session("dexscreener", timeout=timeout) as session:
+            async with session.get(url, params=params) as resp:
+                if resp.status == 200:
+                    data = await resp.json()
+                    tokens = []
+                    pairs = data.get("pairs") or []
+
+                    # Sort pairs by volume or FDV if possible, as search is unsorted
+                    valid_pairs = [p for p in pairs if p and p.get("chainId") == "solana"]
+                    logger.debug(f"DexScreener returned {len(valid_pairs)} Solana pairs")
+                    valid_pairs.sort(key=lambda x: float(x.get("volume", {}).get("h24") or 0), reverse=True)
+
+                    for pair in valid_pairs:
+                        if not pair:
+                            continue
+
+                        base = pair.get("baseToken") or {}
+                        info = pair.get("info") or {}
+                        volume = pair.get("volume") or {}
+                        liquidity = pair.get("liquidity") or {}
+                        price_change = pair.get("priceChange") or {}
+
+                        mc = float(pair.get("fdv") or pair.get("marketCap") or 0)
+
+                        # Filter: market cap > $50K
+                        if mc < 50000:
+                            continue
+
+                        token_name = (base.get("name") or "").lower()
+                        token_symbol = (base.get("symbol") or "").lower()
+
+                        # Skip pump.fun tokens
+                        if "pump" in token_name or token_symbol == "pump":
+                            continue
+
+                        tokens.append({
+                            "mint": base.get("address", ""),
+                            "symbol": base.get("symbol", ""),
+                            "name": base.get("name", ""),
+                            "image_uri": info.get("imageUrl"),
+                            "usd_market_cap": mc,
+                            "market_cap": mc,
+                            "volume_24h": float(volume.get("h24") or 0),
+                            "liquidity": float(liquidity.get("usd") or 0),
+                            "price_change_24h": float(price_change.get("h24") or 0),
+                            "complete": True,
+                            "created_timestamp": int(datetime.utcnow().timestamp() * 1000),
+                            "source": "dexscreener"
+                        })
+
+                        if len(tokens) >= 30:
+                            break
+
+                    if tokens:
+                        logger.info(f"Fetched {len(tokens)} trending tokens from DexScreener (MC > $50K)")
+                        return tokens
+    except Exception as e:
+        logger.warning(f"DexScreener fetch failed: {e}")
+
+    return []
+
+
+def _register_token_feeds():
+    """One shared producer per token feed, fanned out to every WebSocket viewer"""
+    from services.migration_stream import (
+        subscribe_to_migrations,
+        unsubscribe_from_migrations,
+        get_graduated_tokens,
+        get_approaching_tokens,
+    )
+    from services.pump_portal_stream import (
+        subscribe_to_tokens,
+        unsubscribe_from_tokens,
+        get_recent_tokens,
+    )
+    
+    def migrated_seed():
+        graduated = get_graduated_tokens(30)
+        graduated_mints = {g.get("mint") for g in graduated}
+        return graduated + [t for t in get_approaching_tokens(20) if t.get("mint") not in graduated_mints]
+    
+    broadcaster = get_feed_broadcaster()
+    # created_timestamp is regenerated on every poll, so it doesn't count as a change
+    broadcaster.register(PollingFeedTopic(
+        "trending", fetch_trending_feed, interval=30.0, ignore_fields=("created_timestamp",)
+    ))
+    # The approaching list changes without a migration event, so re-read it on the
+    # migration stream's own check interval
+    broadcaster.register(StreamFeedTopic(
+        "migrated", subscribe_to_migrations, unsubscribe_from_migrations, migrated_seed, "new_migration",
+        refresh_interval=15.0
+    ))
+    broadcaster.register(StreamFeedTopic(
+        "pump-new", subscribe_to_tokens, unsubscribe_from_tokens, lambda: get_recent_tokens(20), "new_token"
+    ))
+
+
+def token_feed(name: str):
+    """Get a shared token feed topic, registering the feeds on first use"""
+    broadcaster = get_feed_broadcaster()
+    if name not in broadcaster.topics:
+        _register_token_feeds()
+    return broadcaster.topic(name)
+
+
 @app.websocket("/ws/pump-tokens")
 async def websocket_pump_tokens(websocket: WebSocket):
     """
@@ -371,27 +594,14 @@ async def websocket_pump_tokens(websocket: WebSocket):
     """
     await websocket.accept()
     
-    import asyncio
-    
     # Send initial status
     await websocket.send_json({
         "type": "connected",
         "message": "Connected to Pump.fun token stream"
     })
     
-    # Queue for sending tokens to this client
-    token_queue = asyncio.Queue()
-    
-    async def token_callback(token):
-        await token_queue.put(token)
-    
     try:
-        from services.pump_portal_stream import (
-            subscribe_to_tokens, 
-            unsubscribe_from_tokens, 
-            get_recent_tokens,
-            is_stream_connected
-        )
+        from services.pump_portal_stream import is_stream_connected
         
         # Send stream status
         await websocket.send_json({
@@ -399,46 +609,8 @@ async def websocket_pump_tokens(websocket: WebSocket):
             "connected": is_stream_connected()
         })
         
-        # Send recent tokens first
-        recent = get_recent_tokens(20)
-        if recent:
-            await websocket.send_json({
-                "type": "initial_tokens",
-                "tokens": recent,
-                "count": len(recent)
-            })
-        
-        # Subscribe to new tokens
-        subscribe_to_tokens(token_callback)
-        
-        # Create task to receive messages from client
-        async def receive_messages():
-            try:
-                while True:
-                    data = await websocket.receive_json()
-                    if data.get("type") == "ping":
-                        await websocket.send_json({"type": "pong"})
-            except WebSocketDisconnect:
-                pass
-        
-        receive_task = asyncio.create_task(receive_messages())
-        
-        # Send tokens as they arrive
-        try:
-            while True:
-                # Wait for new token with timeout
-                try:
-                    token = await asyncio.wait_for(token_queue.get(), timeout=30)
-                    await websocket.send_json({
-                        "type": "new_token",
-                        "token": token
-                    })
-                except asyncio.TimeoutError:
-                    # Send ping to keep connection alive
-                    await websocket.send_json({"type": "heartbeat"})
-        finally:
-            receive_task.cancel()
-            unsubscribe_from_tokens(token_callback)
+        # Recent tokens first, then each new token as it is created
+        await serve_feed(websocket, token_feed("pump-new"))
             
     except WebSocketDisconnect:
         logger.info("Client disconnected from pump-tokens WebSocket")
@@ -465,20 +637,8 @@ async def websocket_migrated_tokens(websocket: WebSocket):
         "message": "Connected to migrated tokens stream"
     })
     
-    # Queue for sending tokens to this client
-    token_queue = asyncio.Queue()
-    
-    async def migration_callback(token):
-        await token_queue.put(token)
-    
     try:
-        from services.migration_stream import (
-            subscribe_to_migrations,
-            unsubscribe_from_migrations,
-            get_graduated_tokens,
-            get_approaching_tokens,
-            is_migration_stream_connected
-        )
+        from services.migration_stream import is_migration_stream_connected
         
         # Send stream status
         await websocket.send_json({
@@ -486,59 +646,8 @@ async def websocket_migrated_tokens(websocket: WebSocket):
             "connected": is_migration_stream_connected()
         })
         
-        # Send recent graduated tokens first
-        graduated = get_graduated_tokens(30)
-        approaching = get_approaching_tokens(20)
-        initial_tokens = graduated + [t for t in approaching if t.get("mint") not in [g.get("mint") for g in graduated]]
-        
-        if initial_tokens:
-            await websocket.send_json({
-                "type": "initial_tokens",
-                "tokens": initial_tokens,
-                "count": len(initial_tokens)
-            })
-        
-        # Subscribe to new migration events
-        subscribe_to_migrations(migration_callback)
-        
-        # Create task to receive messages from client
-        async def receive_messages():
-            try:
-                while True:
-                    data = await websocket.receive_json()
-                    if data.get("type") == "ping":
-                        await websocket.send_json({"type": "pong"})
-                    elif data.get("type") == "refresh":
-                        # Send current tokens on refresh
-                        graduated = get_graduated_tokens(30)
-                        approaching = get_approaching_tokens(20)
-                        tokens = graduated + [t for t in approaching if t.get("mint") not in [g.get("mint") for g in graduated]]
-                        await websocket.send_json({
-                            "type": "migration_update",
-                            "tokens": tokens,
-                            "count": len(tokens)
-                        })
-            except WebSocketDisconnect:
-                pass
-        
-        receive_task = asyncio.create_task(receive_messages())
-        
-        # Send tokens as they migrate
-        try:
-            while True:
-                # Wait for new token with timeout
-                try:
-                    token = await asyncio.wait_for(token_queue.get(), timeout=30)
-                    await websocket.send_json({
-                        "type": "new_migration",
-                        "token": token
-                    })
-                except asyncio.TimeoutError:
-                    # Send heartbeat to keep connection alive
-                    await websocket.send_json({"type": "heartbeat"})
-        finally:
-            receive_task.cancel()
-            unsubscribe_from_migrations(migration_callback)
+        # Recent graduated/approaching tokens first, then each migration as it happens
+        await serve_feed(websocket, token_feed("migrated"))
             
     except WebSocketDisconnect:
         logger.info("Client disconnected from migrated-tokens WebSocket")
@@ -554,230 +663,19 @@ async def websocket_migrated_tokens(websocket: WebSocket):
 async def websocket_trending_tokens(websocket: WebSocket):
     """
     Real-time trending tokens WebSocket endpoint.
-    Periodically fetches and broadcasts trending tokens with high market cap.
+    All viewers share one trending producer (refreshed every 30 seconds);
+    clients get the current list, then diffs as it changes.
     """
     await websocket.accept()
-    print("🧨🧨🧨 Websocket accepted connection! Starting handler... 🧨🧨🧨")
-    
-    import aiohttp
-    import ssl
-    import traceback
     
     # Send initial status
     await websocket.send_json({
         "type": "connected",
         "message": "Connected to trending tokens stream"
     })
-    print("🧨 Sent connected message")
-    
-    async def fetch_trending():
-        """Fetch trending tokens with high market cap (> $50K) from Birdeye API"""
-        print("🔍 Starting fetch_trending...")
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = False
-        ssl_context.verify_mode = ssl.CERT_NONE
-        
-        # Get API key from environment OR aggregator (which might have its own)
-        birdeye_api_key = os.getenv("BIRDEYE_API_KEY", "")
-        if not birdeye_api_key:
-            try:
-                from services.wagyu_api.data_aggregator import get_aggregator
-                agg = await get_aggregator()
-                birdeye_api_key = agg.birdeye_key
-            except:
-                pass
-        
-        # Try Birdeye API first for high market cap tokens
-        if birdeye_api_key:
-            try:
-                print(f"🔍 Trying Birdeye for trending tokens (key starts with {birdeye_api_key[:4]}...)")
-                # Use Birdeye token list to get trending Solana tokens
-                url = "https://public-api.birdeye.so/defi/tokenlist"
-                headers = {
-                    "X-API-KEY": birdeye_api_key,
-                    "Accept": "application/json"
-                }
-                params = {
-                    "sort_by": "mc",  # Sort by market cap
-                    "sort_type": "desc",
-                    "offset": 0,
-                    "limit": 50
-                }
-                
-                timeout = aiohttp.ClientTimeout(total=10)
-                connector = aiohttp.TCPConnector(ssl=ssl_context)
-                
-                async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
-                    async with session.get(url, headers=headers, params=params) as resp:
-                        if resp.status == 200:
-                            data = await resp.json()
-                            tokens = []
-                            
-                            if data.get("success") and data.get("data", {}).get("tokens"):
-                                for token in data["data"]["tokens"]:
-                                    mc = float(token.get("mc") or token.get("marketCap") or 0)
-                                    
-                                    # Filter: market cap > $50K and skip pump.fun tokens
-                                    if mc < 50000:
-                                        continue
-                                        
-                                    # Filter: Minimum 500 holders (if available)
-                                    # This ensures "many holders" as requested
-                                    holder_count = float(token.get("holder") or 0)
-                                    if holder_count > 0 and holder_count < 500:
-                                        continue
-                                    
-                                    token_name = (token.get("name") or "").lower()
-                                    token_symbol = (token.get("symbol") or "").lower()
-                                    
-                                    # Skip pump.fun tokens - they typically have "pump" in name
-                                    if "pump" in token_name or token_symbol == "pump":
-                                        continue
-                                    
-                                    tokens.append({
-                                        "mint": token.get("address", ""),
-                                        "symbol": token.get("symbol", ""),
-                                        "name": token.get("name", ""),
-                                        "image_uri": token.get("logoURI") or token.get("image"),
-                                        "usd_market_cap": mc,
-                                        "market_cap": mc,
-                                        "volume_24h": float(token.get("v24hUSD") or 0),
-                                        "liquidity": float(token.get("liquidity") or 0),
-                                        "price_change_24h": float(token.get("v24hChangePercent") or 0),
-                                        "complete": True,
-                                        "created_timestamp": int(datetime.utcnow().timestamp() * 1000),
-                                        "source": "birdeye"
-                                    })
-                                    
-                                    if len(tokens) >= 30:
-                                        break
-                            
-                            if tokens:
-                                logger.info(f"Fetched {len(tokens)} trending tokens from Birdeye (MC > $50K)")
-                                return tokens
-                        else:
-                            logger.debug(f"Birdeye returned {resp.status}")
-                            print(f"❌ Birdeye returned {resp.status}")
-            except Exception as e:
-                logger.warning(f"Failed to fetch trending from Birdeye: {e}")
-                print(f"❌ Birdeye error: {e}")
-        
-        # Fallback to DexScreener for high market cap tokens
-        try:
-            print("🔍 Trying DexScreener fallback for trending tokens (Query: Raydium)...")
-            # Use search endpoint with 'Raydium' to get active Solana pairs, which is very reliable for trending list
-            url = "https://api.dexscreener.com/latest/dex/search"
-            params = {"q": "Raydium"}
-            
-            timeout = aiohttp.ClientTimeout(total=10)
-            connector = aiohttp.TCPConnector(ssl=ssl_context)
-            
-            async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
-                async with session.get(url, params=params) as resp:
-                    if resp.status == 200:
-                        data = await resp.json()
-                        tokens = []
-                        pairs = data.get("pairs") or []
-                        
-                        # Sort pairs by volume or FDV if possible, as search is unsorted
-                        valid_pairs = [p for p in pairs if p and p.get("chainId") == "solana"]
-                        print(f"🔍 DexScreener returned {len(valid_pairs)} Solana pairs")
-                        valid_pairs.sort(key=lambda x: float(x.get("volume", {}).get("h24") or 0), reverse=True)
-                        
-                        for pair in valid_pairs:
-                            if not pair:
-                                continue
-                            
-                            base = pair.get("baseToken") or {}
-                            info = pair.get("info") or {}
-                            volume = pair.get("volume") or {}
-                            liquidity = pair.get("liquidity") or {}
-                            price_change = pair.get("priceChange") or {}
-                            
-                            mc = float(pair.get("fdv") or pair.get("marketCap") or 0)
-                            
-                            # Filter: market cap > $50K
-                            if mc < 50000:
-                                continue
-                            
-                            token_name = (base.get("name") or "").lower()
-                            token_symbol = (base.get("symbol") or "").lower()
-                            
-                            # Skip pump.fun tokens
-                            if "pump" in token_name or token_symbol == "pump":
-                                continue
-                            
-                            tokens.append({
-                                "mint": base.get("address", ""),
-                                "symbol": base.get("symbol", ""),
-                                "name": base.get("name", ""),
-                                "image_uri": info.get("imageUrl"),
-                                "usd_market_cap": mc,
-                                "market_cap": mc,
-                                "volume_24h": float(volume.get("h24") or 0),
-                                "liquidity": float(liquidity.get("usd") or 0),
-                                "price_change_24h": float(price_change.get("h24") or 0),
-                                "complete": True,
-                                "created_timestamp": int(datetime.utcnow().timestamp() * 1000),
-                                "source": "dexscreener"
-                            })
-                            
-                            if len(tokens) >= 30:
-                                break
-                        
-                        if tokens:
-                            logger.info(f"Fetched {len(tokens)} trending tokens from DexScreener (MC > $50K)")
-                            print(f"✅ Found {len(tokens)} trending tokens via DexScreener")
-                            return tokens
-        except Exception as e:
-            logger.warning(f"DexScreener fetch failed: {e}")
-            
-        return []
-
+    
     try:
-        # Fetch and send initial trending tokens
-        trending = await fetch_trending()
-        if trending:
-            logger.info(f"Sending {len(trending)} initial trending tokens")
-            await websocket.send_json({
-                "type": "initial_tokens",
-                "tokens": trending,
-                "count": len(trending)
-            })
-        
-        # Create task to receive messages from client
-        async def receive_messages():
-            try:
-                while True:
-                    data = await websocket.receive_json()
-                    if data.get("type") == "ping":
-                        await websocket.send_json({"type": "pong"})
-                    elif data.get("type") == "refresh":
-                        # Manual refresh request
-                        tokens = await fetch_trending()
-                        await websocket.send_json({
-                            "type": "trending_update",
-                            "tokens": tokens,
-                            "count": len(tokens)
-                        })
-            except WebSocketDisconnect:
-                pass
-        
-        receive_task = asyncio.create_task(receive_messages())
-        
-        # Periodically refresh trending tokens (every 30 seconds)
-        try:
-            while True:
-                await asyncio.sleep(30)  # Refresh every 30 seconds
-                tokens = await fetch_trending()
-                if tokens:
-                    await websocket.send_json({
-                        "type": "trending_update",
-                        "tokens": tokens,
-                        "count": len(tokens)
-                    })
-        finally:
-            receive_task.cancel()
+        await serve_feed(websocket, token_feed("trending"))
             
     except WebSocketDisconnect:
         logger.info("Client disconnected from trending-tokens WebSocket")
@@ -1035,12 +933,7 @@ async def birdeye_proxy_deprecated(path: str, request: Request):
     }
     
     try:
-        import ssl
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = False
-        ssl_context.verify_mode = ssl.CERT_NONE
-
-        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context)) as session:
+        async with pooled_session("birdeye") as session:
             async with session.get(target_url, params=params, headers=headers) as resp:
                 content = await resp.read()
                 
@@ -1075,12 +968,7 @@ async def proxy_image(url: str):
     }
     
     try:
-        import ssl
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = False
-        ssl_context.verify_mode = ssl.CERT_NONE
-
-        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context)) as session:
+        async with pooled_session("images") as session:
             async with session.get(url, headers=headers) as resp:
                 if resp.status != 200:
                     error_detail = await resp.text()
@@ -1202,6 +1090,7 @@ async def execute_strategy(request: dict):
         initial_capital = request.get("initialCapital", 100000)
         timeframe = request.get("timeframe", "1h")
         exchange = request.get("exchange", "binance")
+        bypass_cache = bool(request.get("bypassCache", False))
         
         if not code:
             raise HTTPException(status_code=400, detail="No code provided")
@@ -1274,6 +1163,8 @@ async def execute_strategy(request: dict):
                     end_date=end_date,
                 )
                 
+                # Random synthetic data is never cached
+                cacheable = len(data) >= 100
                 if len(data) < 100:
                     # Not enough data, generate synthetic
                     import pandas as pd
@@ -1289,19 +1180,15 @@ async def execute_strategy(request: dict):
                         'volume': np.random.uniform(1000, 10000, len(dates)),
                     })
                 
-                # Create strategy function
-                strategy_func = create_strategy_function(code)
-                
-                # Run backtest
-                runner = BacktestRunner(config)
-                result = await runner.run_backtest(data, strategy_func)
-                
-                execution_time = (time.time() - start_time) * 1000
-                
-                return {
-                    "success": True,
-                    "backtestId": f"backtest_{int(datetime.now().timestamp())}",
-                    "results": {
+                async def run_engine() -> Dict[str, Any]:
+                    # Create strategy function
+                    strategy_func = create_strategy_function(code)
+                    
+                    # Run backtest
+                    runner = BacktestRunner(config)
+                    result = await runner.run_backtest(data, strategy_func)
+                    
+                    return {
                         "totalReturn": result.total_return,
                         "sharpeRatio": result.sharpe_ratio,
                         "maxDrawdown": -result.max_drawdown,
@@ -1318,7 +1205,35 @@ async def execute_strategy(request: dict):
                         "annualReturn": result.annual_return,
                         "equityCurve": result.equity_curve[-500:],  # Last 500 points
                         "timestamps": result.timestamps[-500:],
-                    },
+                    }
+                
+                if cacheable:
+                    cache_key = make_key(
+                        code,
+                        {
+                            "symbols": config.symbols,
+                            "startDate": start_date,
+                            "endDate": end_date,
+                            "initialCapital": initial_capital,
+                            "timeframe": timeframe,
+                            "exchange": exchange,
+                        },
+                        fingerprint_frame(data),
+                        backtest_engine_version,
+                    )
+                    results, cache_hit = await result_cache.get_or_compute(
+                        cache_key, run_engine, bypass=bypass_cache
+                    )
+                else:
+                    results, cache_hit = await run_engine(), False
+                
+                execution_time = (time.time() - start_time) * 1000
+                
+                return {
+                    "success": True,
+                    "backtestId": f"backtest_{int(datetime.now().timestamp())}",
+                    "results": results,
+                    "cached": cache_hit,
                     "executionTime": execution_time
                 }
                 
@@ -2387,27 +2302,20 @@ async def fetch_dexscreener_graduated_tokens(limit: int = 20):
     Fetch recently graduated tokens (new Raydium pools) from DexScreener.
     These are pump.fun tokens that have migrated to Raydium.
     """
-    import aiohttp
     from aiohttp import ClientTimeout
-    import ssl
     import time
     
     graduated_tokens = []
     
     try:
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = False
-        ssl_context.verify_mode = ssl.CERT_NONE
-        
         timeout = ClientTimeout(total=15)
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
         
         headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)',
             'Accept': 'application/json'
         }
         
-        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        async with pooled_session("dexscreener", timeout=timeout) as session:
             # Method 1: Use token-profiles for recently boosted meme tokens with icons
             boosted_url = "https://api.dexscreener.com/token-boosts/latest/v1"
             token_addresses = []
@@ -2573,16 +2481,8 @@ async def fetch_dexscreener_graduated_tokens(limit: int = 20):
 @app.get("/api/test/pump-fun")
 async def test_pump_fun_connection():
     """Test endpoint to verify Pump.fun API connectivity"""
-    import aiohttp
-    import ssl
-    
     try:
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = False
-        ssl_context.verify_mode = ssl.CERT_NONE
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
-        
-        async with aiohttp.ClientSession(connector=connector) as session:
+        async with pooled_session("pump_fun") as session:
             async with session.get("https://frontend-api.pump.fun/coins?limit=1") as resp:
                 return {
                     "status": resp.status,
@@ -2600,9 +2500,7 @@ async def test_pump_fun_connection():
 @app.get("/api/debug/pump-fun")
 async def debug_pump_fun_coins(limit: int = 10):
     """Debug endpoint to see raw Pump.fun API response and filtering"""
-    import aiohttp
     from aiohttp import ClientTimeout
-    import ssl
     
     try:
         url = "https://frontend-api.pump.fun/coins"
@@ -2615,17 +2513,13 @@ async def debug_pump_fun_coins(limit: int = 10):
         }
         
         timeout = ClientTimeout(total=10, connect=5)
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = False
-        ssl_context.verify_mode = ssl.CERT_NONE
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
         headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
             'Accept': 'application/json',
             'Accept-Language': 'en-US,en;q=0.9'
         }
         
-        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        async with pooled_session("pump_fun", timeout=timeout) as session:
             async with session.get(url, params=params, headers=headers) as resp:
                 if resp.status == 200:
                     data = await resp.json()
@@ -2688,9 +2582,7 @@ async def fetch_dexscreener_fallback(limit: int = 50):
     when Pump.fun API is blocked by Cloudflare.
     Uses the search API which returns actual market data.
     """
-    import aiohttp
     from aiohttp import ClientTimeout
-    import ssl
     import time
     
     try:
@@ -2699,19 +2591,12 @@ async def fetch_dexscreener_fallback(limit: int = 50):
         url = "https://api.dexscreener.com/latest/dex/search?q=pump"
         timeout = ClientTimeout(total=10)
         
-        # Create SSL context
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = False
-        ssl_context.verify_mode = ssl.CERT_NONE
-        
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
-        
         headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7)',
             'Accept': 'application/json'
         }
         
-        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        async with pooled_session("dexscreener", timeout=timeout) as session:
             async with session.get(url, headers=headers) as resp:
                 if resp.status == 200:
                     data = await resp.json()
@@ -2805,7 +2690,6 @@ async def get_pump_fun_coins(
     include_nsfw: bool = False
 ):
     """Proxy endpoint for Pump.fun API to avoid CORS issues"""
-    import aiohttp
     from aiohttp import ClientTimeout
     
     logger.info(f"Received request for Pump.fun coins: offset={offset}, limit={limit}, sort={sort}")
@@ -2862,13 +2746,6 @@ async def get_pump_fun_coins(
         # Set timeout to 10 seconds
         timeout = ClientTimeout(total=10, connect=5)
         
-        # Create SSL context that doesn't verify certificates (for development)
-        # In production, you should use proper certificate verification
-        import ssl
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = False
-        ssl_context.verify_mode = ssl.CERT_NONE
-        
         # Add request headers to mimic browser requests
         headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
@@ -2886,13 +2763,9 @@ async def get_pump_fun_coins(
         last_exception = None
         
         for attempt in range(max_retries):
-            connector = None
             try:
-                # Create a new connector for each attempt to avoid closed connector issues
-                connector = aiohttp.TCPConnector(ssl=ssl_context)
-                
-                # Use proper context manager for session to ensure it stays open
-                async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+                # Pooled session; a closed pool connector is replaced on the next attempt
+                async with pooled_session("pump_fun", timeout=timeout) as session:
                     # Verify session is valid before making request
                     if session.closed:
                         logger.warning(f"Session closed immediately after creation on attempt {attempt + 1}, retrying...")
@@ -2970,7 +2843,7 @@ async def get_pump_fun_coins(
                             
                             return {"coins": [], "count": 0}
                 
-                # Session and connector are automatically closed by context manager
+                # Session is closed by the context manager; pooled connections stay open
                 # If we got here without returning, the request succeeded
                 # Check if we should break or continue
                 if attempt < max_retries - 1:
@@ -3032,7 +2905,6 @@ async def get_pump_fun_coins(
 @app.get("/api/pump-fun/coins/{mint}")
 async def get_pump_fun_coin_details(mint: str):
     """Get details for a specific Pump.fun coin"""
-    import aiohttp
     from aiohttp import ClientTimeout
 
     logger.info(f"Fetching details for coin: {mint}")
@@ -3043,18 +2915,13 @@ async def get_pump_fun_coin_details(mint: str):
     url = f"https://frontend-api.pump.fun/coins/{mint}"
     timeout = ClientTimeout(total=10)
     
-    import ssl
-    ssl_context = ssl.create_default_context()
-    ssl_context.check_hostname = False
-    ssl_context.verify_mode = ssl.CERT_NONE
-    
     headers = {
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36',
         'Accept': 'application/json'
     }
 
     try:
-        async with aiohttp.ClientSession(timeout=timeout, connector=aiohttp.TCPConnector(ssl=ssl_context)) as session:
+        async with pooled_session("pump_fun", timeout=timeout) as session:
             async with session.get(url, headers=headers) as resp:
                 if resp.status == 200:
                     data = await resp.json()
@@ -3134,12 +3001,7 @@ async def birdeye_proxy(path: str, request: Request):
             "x-chain": "solana"
         }
         
-        import ssl
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = False
-        ssl_context.verify_mode = ssl.CERT_NONE  # Safe for proxied public API
-
-        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(ssl=ssl_context)) as session:
+        async with pooled_session("birdeye") as session:
             async with session.get(target_url, params=params, headers=headers) as resp:
                 content = await resp.read()
                 
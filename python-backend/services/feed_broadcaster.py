@@ -0,0 +1,416 @@
+"""
+Token Feed Broadcaster
+
+Shared topic-based fan-out for the token feed WebSockets
+(/ws/trending-tokens, /ws/migrated-tokens, /ws/pump-tokens).
+
+- One producer per feed, started with the first subscriber and stopped with
+  the last, so upstream load does not grow with the number of viewers
+- Every update is serialized once and the same text is queued for every
+  subscriber through the backpressure controller
+- Polled feeds send diffs (added / changed / removed + new order) instead
+  of the full list; streamed feeds push single new tokens
+- A client whose queue overflows is marked for resync and gets a full
+  snapshot instead of the diffs it missed
+"""
+
+import asyncio
+import json
+import logging
+from typing import Dict, Any, List, Optional, Set, Callable, Awaitable, Tuple
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from services.websocket_backpressure import get_backpressure_controller, MessagePriority
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = 20.0
+RESYNC_DELAY = 1.0
+
+_HEARTBEAT = json.dumps({"type": "heartbeat"})
+_PONG = json.dumps({"type": "pong"})
+
+
+def _dumps(message: Dict[str, Any]) -> str:
+    return json.dumps(message, default=str)
+
+
+class FeedTopic:
+    """
+    A feed's current token list and its subscribers.
+
+    Tokens are kept in rank order, keyed by `key_field`. `ignore_fields` are
+    left out of change detection (e.g. timestamps regenerated every poll).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        key_field: str = "mint",
+        max_tokens: int = 100,
+        ignore_fields: Tuple[str, ...] = (),
+    ):
+        self.name = name
+        self.key_field = key_field
+        self.max_tokens = max_tokens
+        self.ignore_fields = set(ignore_fields)
+
+        self.tokens: Dict[str, Dict[str, Any]] = {}
+        self.version = 0
+        self.subscribers: Set[WebSocket] = set()
+        self._resync: Set[WebSocket] = set()
+        self._snapshot: Optional[str] = None
+        self._tasks: List[asyncio.Task] = []
+        self._resync_task: Optional[asyncio.Task] = None
+        self._lifecycle_lock = asyncio.Lock()
+        self._backpressure = get_backpressure_controller()
+
+        self.stats = {'updates': 0, 'messages_queued': 0, 'messages_dropped': 0, 'resyncs': 0}
+
+    # ============ Subscribers ============
+
+    async def subscribe(self, websocket: WebSocket):
+        """Add a subscriber and queue the current snapshot for it"""
+        self._backpressure.register_client(websocket)
+        self.subscribers.add(websocket)
+        await self._sync_producer()
+        if self.tokens:
+            await self._queue(websocket, self.snapshot_message(), MessagePriority.HIGH, "snapshot")
+
+    async def unsubscribe(self, websocket: WebSocket):
+        """Remove a subscriber; the producer stops with the last one"""
+        self.subscribers.discard(websocket)
+        self._resync.discard(websocket)
+        self._backpressure.unregister_client(websocket)
+        await self._sync_producer()
+
+    async def send(self, websocket: WebSocket, text: str, message_type: str = "reply"):
+        """Queue a message for one subscriber (keeps all sends on its send loop)"""
+        await self._queue(websocket, text, MessagePriority.HIGH, message_type)
+
+    async def resync(self, websocket: WebSocket):
+        """Queue the full current snapshot for one subscriber"""
+        await self._queue(websocket, self.snapshot_message(), MessagePriority.HIGH, "snapshot")
+
+    # ============ Producer lifecycle ============
+
+    async def _sync_producer(self):
+        """Run the producer exactly while there are subscribers"""
+        async with self._lifecycle_lock:
+            if self.subscribers and not self._tasks:
+                await self._activate()
+            elif not self.subscribers and self._tasks:
+                await self._deactivate()
+
+    async def _activate(self):
+        await self.on_start()
+        self._tasks = [asyncio.create_task(self._heartbeat_loop())] + self.producer_tasks()
+        logger.info(f"Feed '{self.name}' producer started")
+
+    async def _deactivate(self):
+        tasks, self._tasks = self._tasks, []
+        if self._resync_task is not None:
+            tasks.append(self._resync_task)
+            self._resync_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.on_stop()
+        logger.info(f"Feed '{self.name}' producer stopped (no subscribers)")
+
+    async def on_start(self):
+        """Hook: attach to the upstream source"""
+
+    async def on_stop(self):
+        """Hook: detach from the upstream source"""
+
+    def producer_tasks(self) -> List[asyncio.Task]:
+        """Hook: background tasks producing updates"""
+        return []
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            await self._fan_out(_HEARTBEAT, "heartbeat", MessagePriority.LOW)
+
+    # ============ Updates ============
+
+    def snapshot_message(self) -> str:
+        """Full current list, serialized once per version"""
+        if self._snapshot is None:
+            tokens = list(self.tokens.values())
+            self._snapshot = _dumps({
+                "type": "initial_tokens",
+                "topic": self.name,
+                "version": self.version,
+                "tokens": tokens,
+                "count": len(tokens),
+            })
+        return self._snapshot
+
+    def _fingerprint(self, token: Dict[str, Any]) -> Dict[str, Any]:
+        if not self.ignore_fields:
+            return token
+        return {k: v for k, v in token.items() if k not in self.ignore_fields}
+
+    async def publish_list(self, tokens: List[Dict[str, Any]]):
+        """Replace the whole ranked list and broadcast the diff"""
+        new_tokens: Dict[str, Dict[str, Any]] = {}
+        for token in tokens[:self.max_tokens]:
+            key = token.get(self.key_field)
+            if key and key not in new_tokens:
+                new_tokens[key] = token
+
+        added, changed = [], []
+        for key, token in new_tokens.items():
+            previous = self.tokens.get(key)
+            if previous is None:
+                added.append(token)
+            elif self._fingerprint(previous) != self._fingerprint(token):
+                changed.append(token)
+        removed = [key for key in self.tokens if key not in new_tokens]
+        order = list(new_tokens)
+
+        if not (added or changed or removed) and order == list(self.tokens):
+            return
+
+        self.tokens = new_tokens
+        self._commit()
+        await self._fan_out(_dumps({
+            "type": "tokens_diff",
+            "topic": self.name,
+            "version": self.version,
+            "added": added,
+            "changed": changed,
+            "removed": removed,
+            "order": order,
+        }), "diff")
+
+    async def publish_token(self, token: Dict[str, Any], message_type: str):
+        """Add one new token at the top of the list and broadcast it"""
+        key = token.get(self.key_field)
+        if not key:
+            return
+        self.tokens.pop(key, None)
+        self.tokens = {key: token, **self.tokens}
+        while len(self.tokens) > self.max_tokens:
+            self.tokens.pop(next(reversed(self.tokens)))
+        self._commit()
+        await self._fan_out(_dumps({
+            "type": message_type,
+            "topic": self.name,
+            "version": self.version,
+            "token": token,
+        }), message_type)
+
+    def _commit(self):
+        self.version += 1
+        self._snapshot = None
+        self.stats['updates'] += 1
+
+    async def _fan_out(self, text: str, message_type: str, priority: MessagePriority = MessagePriority.NORMAL):
+        """Queue one serialized message for every subscriber"""
+        for websocket in list(self.subscribers):
+            if websocket in self._resync and message_type != "heartbeat":
+                # The snapshot supersedes the update this client would have missed
+                if await self._queue(websocket, self.snapshot_message(), MessagePriority.HIGH, "snapshot"):
+                    self._resync.discard(websocket)
+                    self.stats['resyncs'] += 1
+                continue
+            if not await self._queue(websocket, text, priority, message_type) and message_type != "heartbeat":
+                self._resync.add(websocket)
+        if self._resync and (self._resync_task is None or self._resync_task.done()):
+            self._resync_task = asyncio.create_task(self._resync_loop())
+
+    async def _resync_loop(self):
+        """Send pending snapshots once queues have had time to drain, without waiting for the next update"""
+        while self._resync:
+            await asyncio.sleep(RESYNC_DELAY)
+            for websocket in list(self._resync):
+                if websocket not in self.subscribers:
+                    self._resync.discard(websocket)
+                elif await self._queue(websocket, self.snapshot_message(), MessagePriority.HIGH, "snapshot"):
+                    self._resync.discard(websocket)
+                    self.stats['resyncs'] += 1
+
+    async def _queue(self, websocket: WebSocket, text: str, priority: MessagePriority, message_type: str) -> bool:
+        queued = await self._backpressure.enqueue(websocket, text, priority, message_type)
+        self.stats['messages_queued' if queued else 'messages_dropped'] += 1
+        return queued
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'subscribers': len(self.subscribers),
+            'tokens': len(self.tokens),
+            'version': self.version,
+            'active': bool(self._tasks),
+        }
+
+
+class PollingFeedTopic(FeedTopic):
+    """Feed refreshed by polling an upstream fetch function"""
+
+    def __init__(self, name: str, fetch: Callable[[], Awaitable[List[Dict[str, Any]]]], interval: float = 30.0, **kwargs):
+        super().__init__(name, **kwargs)
+        self.fetch = fetch
+        self.interval = interval
+        self._refreshing: Optional[asyncio.Task] = None
+
+    def producer_tasks(self) -> List[asyncio.Task]:
+        return [asyncio.create_task(self._poll_loop())]
+
+    async def refresh(self):
+        """Fetch once and broadcast the diff, or join the fetch already running"""
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self._refresh())
+        await asyncio.shield(self._refreshing)
+
+    async def _refresh(self):
+        # An empty result keeps the current list
+        try:
+            tokens = await self.fetch()
+        except Exception as e:
+            logger.warning(f"Feed '{self.name}' fetch failed: {e}")
+            return
+        if tokens:
+            await self.publish_list(tokens)
+
+    async def subscribe(self, websocket: WebSocket):
+        await super().subscribe(websocket)
+        if not self.tokens:
+            # First viewer of a cold feed: fetch now rather than on the next poll
+            await self.refresh()
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.refresh()
+
+
+class StreamFeedTopic(FeedTopic):
+    """
+    Feed fed by an upstream stream's subscribe/unsubscribe callbacks.
+    With a refresh_interval the seed is re-read periodically too, for lists
+    the upstream updates without a callback.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        attach: Callable[[Callable], None],
+        detach: Callable[[Callable], None],
+        seed: Callable[[], List[Dict[str, Any]]],
+        message_type: str,
+        refresh_interval: Optional[float] = None,
+        **kwargs
+    ):
+        super().__init__(name, **kwargs)
+        self.attach = attach
+        self.detach = detach
+        self.seed = seed
+        self.message_type = message_type
+        self.refresh_interval = refresh_interval
+
+    def _read_seed(self) -> Optional[List[Dict[str, Any]]]:
+        try:
+            return self.seed() or []
+        except Exception as e:
+            logger.warning(f"Feed '{self.name}' seed failed: {e}")
+            return None
+
+    async def _on_token(self, token: Dict[str, Any]):
+        await self.publish_token(token, self.message_type)
+
+    def producer_tasks(self) -> List[asyncio.Task]:
+        if not self.refresh_interval:
+            return []
+        return [asyncio.create_task(self._refresh_loop())]
+
+    async def refresh(self):
+        """Re-read the seed and broadcast the diff"""
+        tokens = self._read_seed()
+        if tokens is not None:
+            await self.publish_list(tokens)
+
+    async def on_start(self):
+        seeded = self._read_seed() or []
+        self.tokens = {}
+        for token in seeded[:self.max_tokens]:
+            key = token.get(self.key_field)
+            if key and key not in self.tokens:
+                self.tokens[key] = token
+        self._commit()
+        self.attach(self._on_token)
+
+    async def on_stop(self):
+        self.detach(self._on_token)
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+
+async def serve_feed(
+    websocket: WebSocket,
+    topic: FeedTopic,
+    on_message: Optional[Callable[[WebSocket, Dict[str, Any]], Awaitable[None]]] = None
+):
+    """
+    Subscribe an accepted WebSocket to a topic until it disconnects.
+    Handles "ping" and "refresh" (resends the current snapshot) client messages.
+    """
+    await topic.subscribe(websocket)
+    try:
+        while True:
+            data = await websocket.receive_json()
+            message_type = data.get("type")
+            if message_type == "ping":
+                await topic.send(websocket, _PONG, "pong")
+            elif message_type == "refresh":
+                await topic.resync(websocket)
+            elif on_message is not None:
+                await on_message(websocket, data)
+    except WebSocketDisconnect:
+        logger.info(f"Client disconnected from '{topic.name}' feed")
+    finally:
+        await topic.unsubscribe(websocket)
+
+
+class FeedBroadcaster:
+    """Registry of feed topics"""
+
+    def __init__(self):
+        self.topics: Dict[str, FeedTopic] = {}
+
+    def register(self, topic: FeedTopic) -> FeedTopic:
+        self.topics[topic.name] = topic
+        return topic
+
+    def topic(self, name: str) -> FeedTopic:
+        return self.topics[name]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {name: topic.get_stats() for name, topic in self.topics.items()}
+
+    async def close(self):
+        """Stop every active producer"""
+        for topic in self.topics.values():
+            topic.subscribers.clear()
+            await topic._sync_producer()
+
+
+# Global instance
+_feed_broadcaster: Optional[FeedBroadcaster] = None
+
+
+def get_feed_broadcaster() -> FeedBroadcaster:
+    """Get or create the feed broadcaster singleton"""
+    global _feed_broadcaster
+
+    if _feed_broadcaster is None:
+        _feed_broadcaster = FeedBroadcaster()
+
+    return _feed_broadcaster
@@ -1,14 +1,40 @@
 """
 HTTP Utilities
-Helper functions for aiohttp session management and validation
+Helper functions for aiohttp session management and validation, and the
+app-lifetime registry of pooled upstream connections
+
+Each upstream gets one long-lived TCPConnector (keep-alive connection pool,
+DNS cache, shared SSL context, per-host connection limit). Callers open
+cheap ClientSessions on top of it that do not own the connector, so closing
+a session returns its connections to the pool instead of dropping them and
+the next request skips DNS and the TLS handshake.
+
+aiohttp speaks HTTP/1.1 only; concurrency per upstream comes from the
+pooled keep-alive connections rather than HTTP/2 multiplexing.
 """
 
+import asyncio
+import os
+import ssl
 import logging
-from typing import Optional
+from dataclasses import dataclass, replace
+from typing import Optional, Dict, Any, Union
 import aiohttp
 
 logger = logging.getLogger(__name__)
 
+try:
+    import certifi
+    CERTIFI_AVAILABLE = True
+except ImportError:
+    certifi = None
+    CERTIFI_AVAILABLE = False
+
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", 100))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", 20))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", 300))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", 30))
+
 
 def is_session_valid(session: Optional[aiohttp.ClientSession]) -> bool:
     """
@@ -88,3 +114,170 @@ def is_cloudflare_error(status_code: int) -> bool:
     """
     cloudflare_errors = {520, 521, 522, 523, 524, 525, 526, 527, 530}
     return status_code in cloudflare_errors
+
+
+# ============ Pooled upstream connections ============
+
+@dataclass(frozen=True)
+class PoolConfig:
+    """Connection pool settings for one upstream"""
+    limit: int = HTTP_POOL_LIMIT                    # Total open connections
+    limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST  # Concurrent connections per host
+    ttl_dns_cache: int = HTTP_DNS_CACHE_TTL
+    keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT
+    verify_ssl: bool = True
+
+
+# Named upstream pools; unknown names use the default settings
+POOL_CONFIGS: Dict[str, PoolConfig] = {
+    'default': PoolConfig(),
+    'wagyu_api': PoolConfig(),
+    'birdeye': PoolConfig(limit_per_host=10),
+    'dexscreener': PoolConfig(limit_per_host=10),
+    'pump_fun': PoolConfig(limit_per_host=10),
+    'images': PoolConfig(limit_per_host=8),
+}
+
+
+def _ssl_context(verify: bool) -> Union[ssl.SSLContext, bool]:
+    if not verify:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+        return context
+    if CERTIFI_AVAILABLE:
+        try:
+            return ssl.create_default_context(cafile=certifi.where())
+        except Exception as e:
+            logger.warning(f"Failed to create SSL context with certifi: {e}. Using default SSL context.")
+    return True
+
+
+class HttpClientRegistry:
+    """App-lifetime connection pools, one per named upstream"""
+
+    def __init__(self):
+        self._connectors: Dict[str, aiohttp.TCPConnector] = {}
+        self._loops: Dict[str, asyncio.AbstractEventLoop] = {}
+        self.stats = {'connectors_created': 0, 'sessions_opened': 0}
+
+    def configure(self, name: str, **overrides) -> PoolConfig:
+        """
+        Override pool settings for an upstream.
+        
+        Takes effect for connectors created afterwards, so call this at
+        startup before the upstream is first used.
+        
+        Args:
+            name: Upstream pool name
+            **overrides: PoolConfig fields to change
+            
+        Returns:
+            The resulting pool configuration
+        """
+        config = replace(POOL_CONFIGS.get(name, POOL_CONFIGS['default']), **overrides)
+        POOL_CONFIGS[name] = config
+        return config
+
+    def connector(self, name: str = 'default') -> aiohttp.TCPConnector:
+        """
+        Get the pooled connector for an upstream, creating it on first use.
+        
+        Must be called from inside the running event loop. A connector that
+        was closed or belongs to another (finished) loop is replaced.
+        
+        Args:
+            name: Upstream pool name
+            
+        Returns:
+            Shared TCPConnector for the upstream
+        """
+        loop = asyncio.get_running_loop()
+        connector = self._connectors.get(name)
+        if connector is not None and not connector.closed and self._loops.get(name) is loop:
+            return connector
+
+        config = POOL_CONFIGS.get(name, POOL_CONFIGS['default'])
+        connector = aiohttp.TCPConnector(
+            limit=config.limit,
+            limit_per_host=config.limit_per_host,
+            use_dns_cache=True,
+            ttl_dns_cache=config.ttl_dns_cache,
+            keepalive_timeout=config.keepalive_timeout,
+            ssl=_ssl_context(config.verify_ssl),
+        )
+        self._connectors[name] = connector
+        self._loops[name] = loop
+        self.stats['connectors_created'] += 1
+        logger.debug(f"Created HTTP connection pool '{name}' ({config})")
+        return connector
+
+    def session(self, name: str = 'default', **kwargs) -> aiohttp.ClientSession:
+        """
+        Open a ClientSession on the upstream's pooled connector.
+        
+        The session does not own the connector: closing it (or leaving its
+        async with block) keeps the pooled connections alive.
+        
+        Args:
+            name: Upstream pool name
+            **kwargs: Extra ClientSession arguments (timeout, headers, ...)
+            
+        Returns:
+            A new ClientSession sharing the upstream's connection pool
+        """
+        self.stats['sessions_opened'] += 1
+        return aiohttp.ClientSession(connector=self.connector(name), connector_owner=False, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Registry counters and open pools"""
+        return {
+            **self.stats,
+            'pools': {
+                name: {
+                    'limit': connector.limit,
+                    'limit_per_host': connector.limit_per_host,
+                    'closed': connector.closed,
+                }
+                for name, connector in self._connectors.items()
+            },
+        }
+
+    async def close(self) -> None:
+        """Close every pooled connector (application shutdown)"""
+        connectors = list(self._connectors.values())
+        self._connectors.clear()
+        self._loops.clear()
+        for connector in connectors:
+            await safe_close_connector(connector)
+
+
+# Global registry instance
+_http_registry = HttpClientRegistry()
+
+
+def get_http_registry() -> HttpClientRegistry:
+    """Get the shared HTTP client registry"""
+    return _http_registry
+
+
+def pooled_session(name: str = 'default', **kwargs) -> aiohttp.ClientSession:
+    """
+    Open a ClientSession on a shared upstream connection pool.
+    
+    Drop-in replacement for aiohttp.ClientSession(connector=TCPConnector(...))
+    in async with blocks.
+    
+    Args:
+        name: Upstream pool name (see POOL_CONFIGS)
+        **kwargs: Extra ClientSession arguments
+        
+    Returns:
+        ClientSession that leaves the pooled connector open when closed
+    """
+    return _http_registry.session(name, **kwargs)
+
+
+async def close_http_pools() -> None:
+    """Close all pooled upstream connections"""
+    await _http_registry.close()
@@ -13,6 +13,7 @@ This is the main fan-out point from Redis pub/sub to connected frontend clients.
 import asyncio
 import json
 import logging
+from contextlib import asynccontextmanager
 from typing import Dict, Set, Optional, Any, List
 from dataclasses import dataclass, asdict
 from datetime import datetime
@@ -27,6 +28,7 @@ from services.redis_service import (
     CandleUpdate,
     get_redis_service,
 )
+from services.redis_schemas import swap_pubsub_key, candle_pubsub_key
 from services.marketcap_aggregator import (
     get_multi_aggregator,
     timeframe_string_to_ms,
@@ -93,7 +95,9 @@ class TradingWebSocketManager:
     Features:
     - Multi-client connection management
     - Per-token/timeframe subscriptions
-    - Efficient fan-out from Redis pub/sub
+    - Efficient fan-out from Redis pub/sub: one Redis subscription per
+      channel while anyone watches it, each message serialized once
+      for all of its subscribers
     - Automatic cleanup on disconnect
     - Backpressure control (message queue per connection)
     - Message replay on reconnection
@@ -103,10 +107,13 @@ class TradingWebSocketManager:
     def __init__(self):
         # websocket -> subscriptions
         self.connections: Dict[WebSocket, Dict[str, ClientSubscription]] = {}
-        # token_address -> set of websockets
+        # token_address -> set of websockets (the swap channel's refcount)
         self.token_subscribers: Dict[str, Set[WebSocket]] = {}
-        # (token, timeframe) -> set of websockets
+        # (token, timeframe) -> set of websockets (the candle channel's refcount)
         self.candle_subscribers: Dict[tuple, Set[WebSocket]] = {}
+        # token_address -> [lock, holders and waiters]; claiming and releasing a
+        # token's channels spans awaits, so it is serialized per token
+        self._token_locks: Dict[str, list] = {}
         
         # Backpressure control: message queues per connection
         self.message_queues: Dict[WebSocket, asyncio.Queue] = {}
@@ -166,18 +173,10 @@ class TradingWebSocketManager:
         # Unregister from backpressure controller
         self._backpressure.unregister_client(websocket)
         
-        # Remove from all subscription sets
-        for token in list(self.token_subscribers.keys()):
-            self.token_subscribers[token].discard(websocket)
-            if not self.token_subscribers[token]:
-                del self.token_subscribers[token]
-        
-        for key in list(self.candle_subscribers.keys()):
-            self.candle_subscribers[key].discard(websocket)
-            if not self.candle_subscribers[key]:
-                del self.candle_subscribers[key]
-        
-        del self.connections[websocket]
+        # Release this client's channels
+        subscriptions = self.connections.pop(websocket)
+        for subscription in subscriptions.values():
+            await self._release(websocket, subscription.token_address, subscription.timeframes)
         
         try:
             if websocket.client_state == WebSocketState.CONNECTED:
@@ -234,33 +233,41 @@ class TradingWebSocketManager:
         if isinstance(timeframes, str):
             timeframes = [timeframes]
         
-        # Add to token subscribers
-        if token_address not in self.token_subscribers:
-            self.token_subscribers[token_address] = set()
-        self.token_subscribers[token_address].add(websocket)
-        
-        # Add to candle subscribers for each timeframe
-        for tf in timeframes:
-            key = (token_address, tf)
-            if key not in self.candle_subscribers:
-                self.candle_subscribers[key] = set()
-            self.candle_subscribers[key].add(websocket)
-        
-        # Track subscription for this client
-        self.connections[websocket][token_address] = ClientSubscription(
-            token_address=token_address,
-            timeframes=set(timeframes)
-        )
-        
-        # Subscribe to Redis channels
-        await self._subscribe_to_redis(token_address, timeframes)
-        
-        # Also subscribe via swap stream service
-        try:
-            swap_service = await get_swap_stream_service()
-            await swap_service.subscribe_token(token_address)
-        except Exception as e:
-            logger.warning(f"Could not subscribe via swap stream: {e}")
+        async with self._token_guard(token_address):
+            # The client may have gone while this waited for the token
+            if websocket not in self.connections:
+                return
+            
+            # Track subscription for this client (a repeat subscribe adds timeframes)
+            subscription = self.connections[websocket].get(token_address)
+            if subscription is None:
+                subscription = ClientSubscription(token_address=token_address, timeframes=set())
+                self.connections[websocket][token_address] = subscription
+            subscription.timeframes.update(timeframes)
+            
+            # Add to token subscribers; the first one opens the swap channel
+            new_token = token_address not in self.token_subscribers
+            self.token_subscribers.setdefault(token_address, set()).add(websocket)
+            
+            # Add to candle subscribers for each timeframe
+            new_timeframes = []
+            for tf in timeframes:
+                key = (token_address, tf)
+                if key not in self.candle_subscribers:
+                    self.candle_subscribers[key] = set()
+                    new_timeframes.append(tf)
+                self.candle_subscribers[key].add(websocket)
+            
+            # Subscribe to Redis channels nobody was watching yet
+            await self._subscribe_to_redis(token_address, new_token, new_timeframes)
+            
+            # Also subscribe via swap stream service
+            if new_token:
+                try:
+                    swap_service = await get_swap_stream_service()
+                    await swap_service.subscribe_token(token_address)
+                except Exception as e:
+                    logger.warning(f"Could not subscribe via swap stream: {e}")
         
         await self._send(websocket, WSMessage(
             type=MessageType.STATUS.value,
@@ -297,18 +304,10 @@ class TradingWebSocketManager:
             await self._send_error(websocket, "Missing token address")
             return
         
-        # Remove from subscribers
-        if token_address in self.token_subscribers:
-            self.token_subscribers[token_address].discard(websocket)
-        
-        # Remove from candle subscribers
-        for key in list(self.candle_subscribers.keys()):
-            if key[0] == token_address:
-                self.candle_subscribers[key].discard(websocket)
-        
-        # Remove from client tracking
-        if token_address in self.connections.get(websocket, {}):
-            del self.connections[websocket][token_address]
+        # Remove from client tracking and release its channels
+        subscription = self.connections.get(websocket, {}).pop(token_address, None)
+        if subscription is not None:
+            await self._release(websocket, token_address, subscription.timeframes)
         
         await self._send(websocket, WSMessage(
             type=MessageType.STATUS.value,
@@ -395,16 +394,17 @@ class TradingWebSocketManager:
             logger.error(f"Error getting token info: {e}")
             await self._send_error(websocket, f"Failed to get token info: {e}")
     
-    async def _subscribe_to_redis(self, token_address: str, timeframes: List[str]):
-        """Subscribe to Redis channels for a token"""
+    async def _subscribe_to_redis(self, token_address: str, swaps: bool, timeframes: List[str]):
+        """Subscribe to Redis channels for a token (only channels without subscribers so far)"""
         if not self._redis:
             return
         
         # Subscribe to swap events
-        await self._redis.subscribe_swaps(
-            token_address,
-            lambda swap: asyncio.create_task(self._broadcast_swap(swap))
-        )
+        if swaps:
+            await self._redis.subscribe_swaps(
+                token_address,
+                lambda swap: asyncio.create_task(self._broadcast_swap(swap))
+            )
         
         # Subscribe to candle events for each timeframe
         for tf in timeframes:
@@ -416,6 +416,62 @@ class TradingWebSocketManager:
                 )
             )
     
+    @asynccontextmanager
+    async def _token_guard(self, token_address: str):
+        """Hold the token's lock; the lock is dropped once nobody holds or waits for it"""
+        entry = self._token_locks.get(token_address)
+        if entry is None:
+            entry = self._token_locks[token_address] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._token_locks[token_address]
+    
+    async def _release(self, websocket: WebSocket, token_address: str, timeframes: Set[str]):
+        """Drop a client from a token's channels, unsubscribing channels left without subscribers"""
+        async with self._token_guard(token_address):
+            await self._release_locked(websocket, token_address, timeframes)
+    
+    async def _release_locked(self, websocket: WebSocket, token_address: str, timeframes: Set[str]):
+        empty_channels = []
+        
+        for tf in timeframes:
+            key = (token_address, tf)
+            subscribers = self.candle_subscribers.get(key)
+            if subscribers is None:
+                continue
+            subscribers.discard(websocket)
+            if not subscribers:
+                del self.candle_subscribers[key]
+                empty_channels.append(candle_pubsub_key(token_address, tf))
+        
+        subscribers = self.token_subscribers.get(token_address)
+        last_viewer = False
+        if subscribers is not None:
+            subscribers.discard(websocket)
+            if not subscribers:
+                del self.token_subscribers[token_address]
+                empty_channels.append(swap_pubsub_key(token_address))
+                last_viewer = True
+        
+        if self._redis:
+            for channel in empty_channels:
+                try:
+                    await self._redis.unsubscribe(channel)
+                except Exception as e:
+                    logger.warning(f"Could not unsubscribe from {channel}: {e}")
+        
+        if last_viewer:
+            try:
+                swap_service = await get_swap_stream_service()
+                await swap_service.unsubscribe_token(token_address)
+            except Exception as e:
+                logger.warning(f"Could not unsubscribe via swap stream: {e}")
+    
     async def _broadcast_swap(self, swap: SwapEvent):
         """Broadcast a swap event to relevant subscribers"""
         subscribers = self.token_subscribers.get(swap.token_address, set())
@@ -471,18 +527,23 @@ class TradingWebSocketManager:
         message: WSMessage,
         priority: MessagePriority = MessagePriority.NORMAL
     ):
-        """Broadcast a message to a set of WebSockets"""
-        disconnected = set()
+        """Broadcast a message to a set of WebSockets, serialized once for all of them"""
+        if not subscribers:
+            return
         
-        for ws in subscribers:
-            try:
-                await self._send(ws, message, priority=priority)
-            except Exception:
-                disconnected.add(ws)
+        recipients = [ws for ws in subscribers if ws.client_state == WebSocketState.CONNECTED]
+        enqueued = self._backpressure.broadcast(
+            recipients,
+            message.to_json(),
+            priority=priority,
+            message_type=message.type
+        )
         
-        # Clean up disconnected clients
-        for ws in disconnected:
-            await self.disconnect(ws)
+        if enqueued < len(recipients):
+            logger.debug(
+                f"{message.type} dropped for {len(recipients) - enqueued} of "
+                f"{len(recipients)} clients due to backpressure"
+            )
     
     async def _send(
         self, 
@@ -10,6 +10,8 @@ from typing import Optional, Dict, Any
 from datetime import datetime
 from supabase import create_client, Client
 
+from .usage_pipeline import get_usage_pipeline, UsageEvent
+
 logger = logging.getLogger(__name__)
 
 # Supabase connection
@@ -143,22 +145,18 @@ async def log_api_usage(
     ip_address: Optional[str] = None,
     user_agent: Optional[str] = None
 ):
-    """Log API usage for analytics and billing"""
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        return
-    
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    
-    try:
-        supabase.table('api_usage_logs').insert({
-            'api_key_id': api_key_id,
-            'user_id': user_id,
-            'endpoint': endpoint,
-            'method': method,
-            'response_time_ms': response_time_ms,
-            'status_code': status_code,
-            'ip_address': ip_address,
-            'user_agent': user_agent,
-        }).execute()
-    except Exception as e:
-        logger.error(f"Failed to log API usage: {e}")
+    """
+    Log API usage for analytics and billing.
+    Events are buffered by the usage pipeline and written in batches,
+    so this never waits on the database.
+    """
+    get_usage_pipeline().record(UsageEvent(
+        api_key_id=api_key_id,
+        user_id=user_id,
+        endpoint=endpoint,
+        method=method,
+        response_time_ms=response_time_ms,
+        status_code=status_code,
+        ip_address=ip_address,
+        user_agent=user_agent,
+    ))
@@ -67,26 +67,24 @@ class BillingService:
             from .models.fee_models import get_fee_structure
             fee_structure = get_fee_structure(tier)
             
-            # Calculate time ranges
-            now = datetime.now()
+            # Calculate time ranges (local day and hour, sent with their offset)
+            now = datetime.now().astimezone()
             today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
             hour_start = now.replace(minute=0, second=0, microsecond=0)
             
-            # Build query
-            query = self.supabase.table('api_usage_logs').select('id', count='exact').eq('user_id', user_id)
-            
-            if api_key_id:
-                query = query.eq('api_key_id', api_key_id)
-            
-            # Get counts
-            total_result = query.execute()
-            total_requests = total_result.count if hasattr(total_result, 'count') else 0
-            
-            today_result = query.gte('created_at', today_start.isoformat()).execute()
-            requests_today = today_result.count if hasattr(today_result, 'count') else 0
+            # Sum the hourly rollups in the database; selecting the rows would be
+            # capped by PostgREST's row limit and undercount active users
+            result = self.supabase.rpc('api_usage_totals', {
+                'p_user_id': user_id,
+                'p_today_start': today_start.isoformat(),
+                'p_hour_start': hour_start.isoformat(),
+                'p_api_key_id': api_key_id,
+            }).execute()
+            totals = result.data[0] if result.data else {}
             
-            hour_result = query.gte('created_at', hour_start.isoformat()).execute()
-            requests_this_hour = hour_result.count if hasattr(hour_result, 'count') else 0
+            total_requests = totals.get('total_requests') or 0
+            requests_today = totals.get('requests_today') or 0
+            requests_this_hour = totals.get('requests_this_hour') or 0
             
             return {
                 'total_requests': total_requests or 0,
@@ -0,0 +1,293 @@
+"""
+Two-Tier Cache for WagyuTech API
+In-process L1 (LRU + TTL + byte budget) in front of an async Redis L2
+
+- L1 hits never leave the event loop; L2 is only consulted on an L1 miss
+- Per-type TTLs, each with an optional stale window for stale-while-revalidate
+- Values are serialized once (orjson, json fallback) for L2 and for sizing;
+  Decimal and datetime values carry a type tag so every cache type reads
+  back from L2 with the types it was stored with
+- Redis errors back off L2 for a few seconds instead of failing requests
+"""
+
+import os
+import time
+import logging
+from typing import Dict, Any, Optional, Tuple, Callable
+from collections import OrderedDict
+from decimal import Decimal
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+
+    def _dumps(value: Any) -> bytes:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+    _loads = orjson.loads
+except ImportError:
+    import json
+
+    def _dumps(value: Any) -> bytes:
+        return json.dumps(value, default=_default, separators=(',', ':')).encode()
+
+    _loads = json.loads
+
+# Redis L2 (optional - L1 only if Redis not available)
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    aioredis = None
+    REDIS_AVAILABLE = False
+
+REDIS_URL = os.getenv("REDIS_URL") or (
+    f"redis://{os.getenv('REDIS_HOST')}:{os.getenv('REDIS_PORT', 6379)}/0" if os.getenv("REDIS_HOST") else None
+)
+CACHE_MAX_ENTRIES = int(os.getenv("WAGYU_CACHE_MAX_ENTRIES", 20000))
+CACHE_MAX_BYTES = int(os.getenv("WAGYU_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+L2_BACKOFF_SECONDS = 5.0
+
+# cache_type -> (ttl_seconds, stale_seconds)
+DEFAULT_TTLS: Dict[str, Tuple[float, float]] = {
+    'price': (5, 0),
+    'token_data': (5, int(os.getenv("WAGYU_STALE_TTL", 30))),
+    'token_metadata': (60, 0),
+    'holder_data': (300, 0),
+    'analytics': (60, 0),
+    'ohlcv': (30, 0),
+}
+
+
+# Tagged encodings of rich types: {TYPE_TAG: kind, 'v': text}
+TYPE_TAG = '__t'
+_TYPE_TAG_BYTES = b'"__t"'
+
+
+def _default(value: Any) -> Any:
+    """Serialize types the encoders don't handle natively, tagged so L2 reads restore them"""
+    if isinstance(value, Decimal):
+        return {TYPE_TAG: 'decimal', 'v': str(value)}
+    if isinstance(value, datetime):
+        return {TYPE_TAG: 'datetime', 'v': value.isoformat()}
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _restore(value: Any) -> Any:
+    """Turn tagged encodings back into Decimal and datetime values"""
+    if isinstance(value, dict):
+        kind = value.get(TYPE_TAG)
+        if kind == 'decimal' and len(value) == 2:
+            return Decimal(value['v'])
+        if kind == 'datetime' and len(value) == 2:
+            return datetime.fromisoformat(value['v'])
+        return {k: _restore(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_restore(v) for v in value]
+    return value
+
+
+class _Entry:
+    """L1 entry"""
+    __slots__ = ('value', 'size', 'fresh_until', 'stale_until')
+
+    def __init__(self, value: Any, size: int, fresh_until: float, stale_until: float):
+        self.value = value
+        self.size = size
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class TwoTierCache:
+    """L1 in-process LRU cache backed by an optional Redis L2"""
+
+    def __init__(
+        self,
+        namespace: str = "wagyu",
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES,
+        ttls: Optional[Dict[str, Tuple[float, float]]] = None,
+        redis_url: Optional[str] = REDIS_URL,
+    ):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+
+        # cache_type -> function applied to values read back from L2, for types
+        # beyond the Decimal/datetime the encoding already restores
+        self.decoders: Dict[str, Callable[[Any], Any]] = {}
+
+        self._l1: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._l1_bytes = 0
+
+        self.redis = None
+        if REDIS_AVAILABLE and redis_url:
+            self.redis = aioredis.from_url(redis_url, socket_connect_timeout=1, socket_timeout=1)
+        self._l2_disabled_until = 0.0
+
+        self.metrics = {
+            'l1_hits': 0,
+            'l2_hits': 0,
+            'misses': 0,
+            'stale_hits': 0,
+            'sets': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'l2_errors': 0,
+        }
+
+    def _key(self, cache_type: str, identifier: str) -> str:
+        return f"{self.namespace}:{cache_type}:{identifier}"
+
+    def _ttl(self, cache_type: str) -> Tuple[float, float]:
+        return self.ttls.get(cache_type, (60, 0))
+
+    def _l2_usable(self) -> bool:
+        return self.redis is not None and time.time() >= self._l2_disabled_until
+
+    def _l2_failed(self, e: Exception):
+        self.metrics['l2_errors'] += 1
+        self._l2_disabled_until = time.time() + L2_BACKOFF_SECONDS
+        logger.warning(f"Redis cache unavailable, using L1 only for {L2_BACKOFF_SECONDS}s: {e}")
+
+    # ============ L1 ============
+
+    def _l1_get(self, key: str, now: float) -> Optional[_Entry]:
+        entry = self._l1.get(key)
+        if entry is None:
+            return None
+        if now >= entry.stale_until:
+            self._l1_remove(key)
+            self.metrics['expirations'] += 1
+            return None
+        self._l1.move_to_end(key)
+        return entry
+
+    def _l1_put(self, key: str, entry: _Entry):
+        if entry.size > self.max_bytes:
+            return
+        if key in self._l1:
+            self._l1_remove(key)
+        self._l1[key] = entry
+        self._l1_bytes += entry.size
+        # Size-aware LRU eviction: drop least recently used until within budget
+        while self._l1 and (len(self._l1) > self.max_entries or self._l1_bytes > self.max_bytes):
+            _, evicted = self._l1.popitem(last=False)
+            self._l1_bytes -= evicted.size
+            self.metrics['evictions'] += 1
+
+    def _l1_remove(self, key: str):
+        entry = self._l1.pop(key, None)
+        if entry is not None:
+            self._l1_bytes -= entry.size
+
+    # ============ Public API ============
+
+    async def get_entry(self, cache_type: str, identifier: str) -> Tuple[Optional[Any], bool]:
+        """
+        Get a cached value including stale entries
+        Returns: (value, is_fresh) - value is None on a miss
+        """
+        key = self._key(cache_type, identifier)
+        now = time.time()
+
+        entry = self._l1_get(key, now)
+        if entry is not None:
+            is_fresh = now < entry.fresh_until
+            self.metrics['l1_hits' if is_fresh else 'stale_hits'] += 1
+            return entry.value, is_fresh
+
+        if self._l2_usable():
+            try:
+                raw = await self.redis.get(key)
+            except Exception as e:
+                self._l2_failed(e)
+                raw = None
+            if raw:
+                fresh_until, value = _loads(raw)
+                if _TYPE_TAG_BYTES in raw:
+                    value = _restore(value)
+                decoder = self.decoders.get(cache_type)
+                if decoder is not None:
+                    value = decoder(value)
+                _, stale = self._ttl(cache_type)
+                self._l1_put(key, _Entry(value, len(raw), fresh_until, fresh_until + stale))
+                is_fresh = now < fresh_until
+                self.metrics['l2_hits' if is_fresh else 'stale_hits'] += 1
+                return value, is_fresh
+
+        self.metrics['misses'] += 1
+        return None, False
+
+    def register_decoder(self, cache_type: str, decoder: Callable[[Any], Any]):
+        """Register a function applied to values of cache_type read back from L2"""
+        self.decoders[cache_type] = decoder
+
+    async def get(self, cache_type: str, identifier: str) -> Optional[Any]:
+        """Get a fresh cached value, or None"""
+        value, is_fresh = await self.get_entry(cache_type, identifier)
+        return value if is_fresh else None
+
+    async def set(self, cache_type: str, identifier: str, value: Any):
+        """Cache a value in both tiers with the type's TTL"""
+        key = self._key(cache_type, identifier)
+        ttl, stale = self._ttl(cache_type)
+        fresh_until = time.time() + ttl
+
+        try:
+            payload = _dumps([fresh_until, value])
+        except TypeError as e:
+            logger.warning(f"Cannot cache {key}: {e}")
+            return
+
+        self._l1_put(key, _Entry(value, len(payload), fresh_until, fresh_until + stale))
+        self.metrics['sets'] += 1
+
+        if self._l2_usable():
+            try:
+                await self.redis.set(key, payload, px=int((ttl + stale) * 1000))
+            except Exception as e:
+                self._l2_failed(e)
+
+    async def delete(self, cache_type: str, identifier: str):
+        """Remove a value from both tiers"""
+        key = self._key(cache_type, identifier)
+        self._l1_remove(key)
+        if self._l2_usable():
+            try:
+                await self.redis.delete(key)
+            except Exception as e:
+                self._l2_failed(e)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Cache metrics"""
+        lookups = self.metrics['l1_hits'] + self.metrics['l2_hits'] + self.metrics['stale_hits'] + self.metrics['misses']
+        hits = lookups - self.metrics['misses']
+        return {
+            **self.metrics,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'l1_entries': len(self._l1),
+            'l1_bytes': self._l1_bytes,
+            'l2_enabled': self.redis is not None,
+        }
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.close()
+
+
+# Global cache instance
+_cache: Optional[TwoTierCache] = None
+
+
+def get_cache() -> TwoTierCache:
+    """Get or create the shared cache"""
+    global _cache
+    if _cache is None:
+        _cache = TwoTierCache()
+    return _cache
@@ -6,26 +6,25 @@ Aggregates data from DexScreener, Jupiter, Birdeye, QuickNode, Moralis, Raydium
 import asyncio
 import aiohttp
 import os
-import ssl
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable, Awaitable
 from decimal import Decimal
 from datetime import datetime
 import logging
 
+from ..http_utils import pooled_session
+from .cache import get_cache
+from .provider_racer import get_provider_racer, ProviderCall
+
 logger = logging.getLogger(__name__)
 
-try:
-    import certifi
-    CERTIFI_AVAILABLE = True
-except ImportError:
-    CERTIFI_AVAILABLE = False
-    logger.warning("certifi not available. SSL certificate verification may fail in production.")
+HTTP_POOL = 'wagyu_api'
 
 # API Keys from environment
 DEXSCREENER_API_URL = "https://api.dexscreener.com/latest"
 JUPITER_API_URL = "https://quote-api.jup.ag/v6"
 JUPITER_PRICE_API_URL = "https://price.jup.ag/v4"
 BIRDEYE_API_URL = "https://public-api.birdeye.so/v1"
+BIRDEYE_DEFI_URL = "https://public-api.birdeye.so/defi"
 BIRDEYE_API_KEY = os.getenv("BIRDEYE_API_KEY")
 # QuickNode RPC endpoint for Solana mainnet
 QUICKNODE_RPC_URL = os.getenv("QUICKNODE_RPC_URL", "https://misty-alien-panorama.soneium-mainnet.quiknode.pro/31ceef5941b0811baf68fff3e4884c002c2a9b2e")
@@ -33,9 +32,70 @@ MORALIS_API_KEY = os.getenv("MORALIS_API_KEY")
 MORALIS_API_URL = "https://deep-index.moralis.io/api/v2.2"
 RAYDIUM_API_URL = "https://api.raydium.io/v2"
 
-# Cache for API responses (simple in-memory cache, should use Redis in production)
-_data_cache: Dict[str, tuple[Any, float]] = {}
-CACHE_TTL = 5  # 5 seconds for price data
+# API responses are cached in the shared two-tier cache under this type
+# (5s TTL, then served stale for WAGYU_STALE_TTL seconds while a refresh runs)
+CACHE_TYPE = 'token_data'
+
+
+# Max addresses per upstream multi-token call
+DEXSCREENER_BATCH_SIZE = 30
+BIRDEYE_BATCH_SIZE = 100
+
+
+def _token_cache_key(symbol: str, token_address: Optional[str] = None) -> str:
+    return f"token_data_{symbol}_{token_address or ''}"
+
+
+def _price_cache_key(address: str) -> str:
+    """Key for price-only rows (Birdeye multi_price), kept apart from full token data"""
+    return f"token_price_{address}"
+
+
+def _is_token_address(symbol: str) -> bool:
+    """Solana mint addresses are 32-44 base58 characters; anything shorter is a ticker"""
+    return len(symbol) >= 32
+
+
+def _token_from_pair(pair: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize a DexScreener pair into token data"""
+    return {
+        'symbol': f"{pair['baseToken']['symbol']}/{pair['quoteToken']['symbol']}",
+        'name': pair['baseToken'].get('name'),
+        'address': pair['baseToken']['address'],
+        'price': Decimal(str(pair.get('priceUsd', pair.get('priceNative', 0)))),
+        'price_usd': Decimal(str(pair.get('priceUsd', 0))),
+        'change_24h': Decimal(str(pair.get('priceChange', {}).get('h24', 0))),
+        'volume_24h': Decimal(str(pair.get('volume', {}).get('h24', 0))),
+        'liquidity': Decimal(str(pair.get('liquidity', {}).get('usd', 0))),
+        'market_cap': Decimal(str(pair.get('marketCap', 0))) if pair.get('marketCap') else None,
+        'fdv': Decimal(str(pair.get('fdv', 0))) if pair.get('fdv') else None,
+        'pair_address': pair.get('pairAddress'),
+        'chain': pair.get('chainId', 'solana'),
+        'dex': pair.get('dexId'),
+        'source': 'dexscreener',
+    }
+
+
+# In-flight fetches keyed by cache key (concurrent misses share one fetch)
+_inflight: Dict[str, asyncio.Task] = {}
+
+# Max concurrent fallback-chain calls per upstream provider
+PROVIDER_CONCURRENCY = {
+    'dexscreener': int(os.getenv("WAGYU_DEXSCREENER_CONCURRENCY", 8)),
+    'jupiter': int(os.getenv("WAGYU_JUPITER_CONCURRENCY", 8)),
+    'birdeye': int(os.getenv("WAGYU_BIRDEYE_CONCURRENCY", 4)),
+    'moralis': int(os.getenv("WAGYU_MORALIS_CONCURRENCY", 2)),
+}
+_provider_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def _provider_slot(provider: str) -> asyncio.Semaphore:
+    """Get the concurrency limiter for an upstream provider"""
+    semaphore = _provider_semaphores.get(provider)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(PROVIDER_CONCURRENCY.get(provider, 4))
+        _provider_semaphores[provider] = semaphore
+    return semaphore
 
 
 class DataAggregator:
@@ -47,36 +107,73 @@ class DataAggregator:
         self.birdeye_key = BIRDEYE_API_KEY
     
     async def __aenter__(self):
-        # Configure SSL context for production compatibility
-        if CERTIFI_AVAILABLE:
-            try:
-                ssl_context = ssl.create_default_context(cafile=certifi.where())
-                connector = aiohttp.TCPConnector(ssl=ssl_context)
-                self.session = aiohttp.ClientSession(connector=connector)
-            except Exception as e:
-                logger.warning(f"Failed to create SSL context with certifi: {e}. Using default SSL context.")
-                self.session = aiohttp.ClientSession()
-        else:
-            # Fallback to default SSL context if certifi not available
-            self.session = aiohttp.ClientSession()
+        # Sessions share the app-lifetime connection pool, so entering is cheap
+        # and closing keeps the upstream connections alive for the next request
+        self.session = pooled_session(HTTP_POOL)
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if self.session:
             await self.session.close()
     
-    def _get_cached(self, key: str) -> Optional[Any]:
+    async def _get_cached(self, key: str) -> Optional[Any]:
         """Get cached data if not expired"""
-        if key in _data_cache:
-            data, timestamp = _data_cache[key]
-            if (datetime.now().timestamp() - timestamp) < CACHE_TTL:
-                return data
-            del _data_cache[key]
-        return None
+        return await get_cache().get(CACHE_TYPE, key)
+    
+    async def _get_cache_entry(self, key: str) -> tuple[Optional[Any], bool]:
+        """
+        Get cached data including stale entries
+        Returns: (data, is_fresh) - data is None if missing or past the stale window
+        """
+        return await get_cache().get_entry(CACHE_TYPE, key)
+    
+    async def _set_cached(self, key: str, data: Any):
+        """Cache data"""
+        await get_cache().set(CACHE_TYPE, key, data)
+    
+    def _start_flight(self, key: str, factory: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """Start a fetch for key, or join the one already in flight"""
+        task = _inflight.get(key)
+        if task is not None:
+            return task
+        
+        async def _run():
+            try:
+                data = await factory()
+            except Exception as e:
+                logger.warning(f"Fetch failed for {key}: {e}")
+                return None
+            if data:
+                await self._set_cached(key, data)
+            return data
+        
+        task = asyncio.ensure_future(_run())
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _inflight.pop(key, None) if _inflight.get(key) is t else None)
+        return task
+    
+    async def _cached_fetch(self, key: str, loader: Callable[['DataAggregator'], Awaitable[Any]]) -> Any:
+        """
+        Cache lookup with single-flight and stale-while-revalidate:
+        - fresh hit: return cached data
+        - stale hit: return cached data, refresh once in the background
+        - miss: join the in-flight fetch for this key or start one
+        """
+        data, is_fresh = await self._get_cache_entry(key)
+        if data is not None:
+            if not is_fresh:
+                self._start_flight(key, lambda: self._load_detached(loader))
+            return data
+        
+        # Other callers may join this flight, so it runs on its own session (this
+        # caller can be cancelled or close its aggregator first), and is shielded
+        return await asyncio.shield(self._start_flight(key, lambda: self._load_detached(loader)))
     
-    def _set_cached(self, key: str, data: Any):
-        """Cache data with timestamp"""
-        _data_cache[key] = (data, datetime.now().timestamp())
+    @staticmethod
+    async def _load_detached(loader: Callable[['DataAggregator'], Awaitable[Any]]) -> Any:
+        """Run a loader with its own session (for refreshes outliving the request)"""
+        async with DataAggregator() as aggregator:
+            return await loader(aggregator)
     
     async def fetch_token_data(self, symbol: str, token_address: Optional[str] = None, is_pump_fun: bool = False) -> Optional[Dict[str, Any]]:
         """
@@ -84,83 +181,236 @@ class DataAggregator:
         For Pump.fun tokens: Birdeye → DexScreener → Jupiter → Moralis
         For regular tokens: DexScreener → Birdeye → Jupiter → Moralis
         """
-        cache_key = f"token_data_{symbol}_{token_address or ''}"
-        cached = self._get_cached(cache_key)
-        if cached:
-            return cached
+        return await self._cached_fetch(
+            _token_cache_key(symbol, token_address),
+            lambda aggregator: aggregator._fetch_token_data_uncached(symbol, token_address, is_pump_fun)
+        )
+    
+    async def _fetch_token_data_uncached(self, symbol: str, token_address: Optional[str] = None, is_pump_fun: bool = False) -> Optional[Dict[str, Any]]:
+        """Race the provider fallback chain (see fetch_token_data)"""
+        calls: List[ProviderCall] = []
         
         # For Pump.fun tokens, prioritize Birdeye
         if is_pump_fun and token_address:
-            try:
-                data = await self.fetch_pump_fun_price(token_address)
-                if data:
-                    self._set_cached(cache_key, data)
-                    return data
-            except Exception as e:
-                logger.warning(f"Pump.fun price fetch failed for {symbol}: {e}")
+            calls.append(('birdeye_pump', lambda: self._provider_call('birdeye', self.fetch_pump_fun_price, token_address)))
         
         # If token address is provided, try Jupiter first (best for real-time prices)
         if token_address:
-            try:
-                data = await self._fetch_jupiter_price_via_rpc(token_address)
-                if data:
-                    self._set_cached(cache_key, data)
-                    return data
-            except Exception as e:
-                logger.warning(f"Jupiter RPC failed for {symbol}: {e}")
+            calls.append(('jupiter', lambda: self._provider_call('jupiter', self._fetch_jupiter_price_via_rpc, token_address)))
         
-        # Try DexScreener (best for meme coins and comprehensive data)
-        try:
-            data = await self._fetch_from_dexscreener(symbol)
-            if data:
-                self._set_cached(cache_key, data)
-                # If we got token address from DexScreener, also try Jupiter for price
-                if data.get('address') and not token_address:
-                    try:
-                        jupiter_data = await self._fetch_jupiter_price_via_rpc(
-                            data['address'], 
-                            data.get('symbol', '').split('/')[-1] if '/' in data.get('symbol', '') else 'SOL',
-                            None
-                        )
-                        if jupiter_data:
-                            # Merge Jupiter price data with DexScreener comprehensive data
-                            data['price'] = jupiter_data.get('price', data.get('price'))
-                            data['price_usd'] = jupiter_data.get('price_usd', data.get('price_usd'))
-                            data['source'] = 'jupiter+dexscreener'
-                    except Exception as e:
-                        logger.debug(f"Jupiter price merge failed: {e}")
-                return data
-        except Exception as e:
-            logger.warning(f"DexScreener failed for {symbol}: {e}")
+        # DexScreener (best for meme coins and comprehensive data), then Jupiter, Birdeye, Moralis
+        calls.extend([
+            ('dexscreener', lambda: self._fetch_dexscreener_with_jupiter_price(symbol, token_address)),
+            ('jupiter_search', lambda: self._provider_call('jupiter', self._fetch_from_jupiter, symbol)),
+            ('birdeye', lambda: self._provider_call('birdeye', self._fetch_from_birdeye, symbol)),
+            ('moralis', lambda: self._provider_call('moralis', self._fetch_from_moralis, symbol)),
+        ])
         
-        # Try Jupiter (without address - will try to resolve)
-        try:
-            data = await self._fetch_from_jupiter(symbol)
-            if data:
-                self._set_cached(cache_key, data)
-                return data
-        except Exception as e:
-            logger.warning(f"Jupiter failed for {symbol}: {e}")
+        return await get_provider_racer().race(calls)
+    
+    async def fetch_token_data_batch(self, symbols: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Fetch token data for many symbols/addresses at once.
         
-        # Try Birdeye
-        try:
-            data = await self._fetch_from_birdeye(symbol)
-            if data:
-                self._set_cached(cache_key, data)
-                return data
-        except Exception as e:
-            logger.warning(f"Birdeye failed for {symbol}: {e}")
+        Cache hits are served locally (stale ones refreshed in the background).
+        Missing mint addresses are grouped into multi-token upstream calls
+        (DexScreener, then Birdeye multi_price for what DexScreener lacks);
+        tickers go through the regular per-symbol fallback chain. Every miss
+        is registered as an in-flight fetch, so concurrent single lookups
+        join the batch instead of calling upstream again. Price-only rows
+        are cached under their own key, so batches can reuse them but single
+        lookups never serve them as full token data.
         
-        # Try Moralis
-        try:
-            data = await self._fetch_from_moralis(symbol)
-            if data:
-                self._set_cached(cache_key, data)
-                return data
-        except Exception as e:
-            logger.warning(f"Moralis failed for {symbol}: {e}")
+        Returns: {symbol: token data or None}, in request order
+        """
+        symbols = list(dict.fromkeys(symbols))
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        flights: Dict[str, asyncio.Task] = {}
+        missing_addresses: List[str] = []
+        stale_addresses: List[str] = []
         
-        return None
+        for symbol in symbols:
+            key = _token_cache_key(symbol)
+            data, is_fresh = await self._get_cache_entry(key)
+            if data is None and _is_token_address(symbol):
+                data, is_fresh = await self._get_cache_entry(_price_cache_key(symbol))
+            if data is not None:
+                results[symbol] = data
+                if not is_fresh:
+                    if _is_token_address(symbol):
+                        stale_addresses.append(symbol)
+                    else:
+                        self._start_flight(key, lambda s=symbol: self._load_detached(
+                            lambda aggregator: aggregator._fetch_token_data_uncached(s)))
+            elif key in _inflight:
+                flights[symbol] = _inflight[key]
+            elif _is_token_address(symbol):
+                missing_addresses.append(symbol)
+            else:
+                flights[symbol] = self._start_flight(key, lambda s=symbol: self._load_detached(
+                    lambda aggregator: aggregator._fetch_token_data_uncached(s)))
+        
+        if missing_addresses:
+            batch = asyncio.ensure_future(self._load_detached(
+                lambda aggregator: aggregator._fetch_address_batch(missing_addresses)))
+            for address in missing_addresses:
+                flights[address] = self._start_flight(
+                    _token_cache_key(address), lambda a=address: self._batch_item(batch, a))
+        
+        if stale_addresses:
+            self._refresh_address_batch(stale_addresses)
+        
+        if flights:
+            # Shield so a cancelled caller doesn't cancel fetches other callers share
+            fetched = await asyncio.gather(*(asyncio.shield(task) for task in flights.values()), return_exceptions=True)
+            for symbol, data in zip(flights.keys(), fetched):
+                if not isinstance(data, dict) and _is_token_address(symbol):
+                    # Only a price-only row was found (cached by the batch itself)
+                    data = await self._get_cached(_price_cache_key(symbol))
+                results[symbol] = data if isinstance(data, dict) else None
+        
+        return {symbol: results.get(symbol) for symbol in symbols}
+    
+    @staticmethod
+    async def _batch_item(batch: asyncio.Future, address: str) -> Optional[Dict[str, Any]]:
+        """One address's share of a multi-token fetch"""
+        return (await asyncio.shield(batch)).get(address)
+    
+    def _refresh_address_batch(self, addresses: List[str]):
+        """Refresh stale addresses with one detached multi-token fetch"""
+        addresses = [a for a in addresses if _token_cache_key(a) not in _inflight]
+        if not addresses:
+            return
+        
+        async def _load(aggregator: 'DataAggregator') -> Dict[str, Any]:
+            return await aggregator._fetch_address_batch(addresses)
+        
+        batch = asyncio.ensure_future(self._load_detached(_load))
+        for address in addresses:
+            self._start_flight(_token_cache_key(address), lambda a=address: self._batch_item(batch, a))
+    
+    async def _fetch_address_batch(self, addresses: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch token data for mint addresses using multi-token upstream calls.
+        
+        Returns the full DexScreener rows; Birdeye multi_price rows for the
+        rest only carry prices, so they are cached under _price_cache_key
+        instead of being returned (and cached) as token data.
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        
+        chunks = [addresses[i:i + DEXSCREENER_BATCH_SIZE] for i in range(0, len(addresses), DEXSCREENER_BATCH_SIZE)]
+        for found in await asyncio.gather(
+            *(self._provider_call('dexscreener', self._fetch_dexscreener_tokens, chunk) for chunk in chunks),
+            return_exceptions=True
+        ):
+            if isinstance(found, dict):
+                results.update(found)
+            elif isinstance(found, Exception):
+                logger.warning(f"DexScreener batch lookup failed: {found}")
+        
+        remaining = [a for a in addresses if a not in results]
+        if remaining and BIRDEYE_API_KEY:
+            chunks = [remaining[i:i + BIRDEYE_BATCH_SIZE] for i in range(0, len(remaining), BIRDEYE_BATCH_SIZE)]
+            for found in await asyncio.gather(
+                *(self._provider_call('birdeye', self._fetch_birdeye_multi_price, chunk) for chunk in chunks),
+                return_exceptions=True
+            ):
+                if isinstance(found, dict):
+                    for address, data in found.items():
+                        await self._set_cached(_price_cache_key(address), data)
+                elif isinstance(found, Exception):
+                    logger.warning(f"Birdeye multi_price lookup failed: {found}")
+        
+        return results
+    
+    async def _fetch_dexscreener_tokens(self, addresses: List[str]) -> Dict[str, Dict[str, Any]]:
+        """DexScreener token lookup for up to DEXSCREENER_BATCH_SIZE addresses (deepest pool per token)"""
+        if not self.session:
+            return {}
+        
+        url = f"{DEXSCREENER_API_URL}/dex/tokens/{','.join(addresses)}"
+        async with self.session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
+            if response.status != 200:
+                logger.warning(f"DexScreener tokens API returned {response.status}")
+                return {}
+            data = await response.json()
+        
+        wanted = set(addresses)
+        best: Dict[str, Dict[str, Any]] = {}
+        for pair in data.get('pairs') or []:
+            address = (pair.get('baseToken') or {}).get('address')
+            if address not in wanted:
+                continue
+            liquidity = float((pair.get('liquidity') or {}).get('usd') or 0)
+            current = best.get(address)
+            if current is None or liquidity > float((current.get('liquidity') or {}).get('usd') or 0):
+                best[address] = pair
+        return {address: _token_from_pair(pair) for address, pair in best.items()}
+    
+    async def _fetch_birdeye_multi_price(self, addresses: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Birdeye multi_price for up to BIRDEYE_BATCH_SIZE addresses (price fields only)"""
+        if not BIRDEYE_API_KEY or not self.session:
+            return {}
+        
+        url = f"{BIRDEYE_DEFI_URL}/multi_price"
+        params = {"list_address": ','.join(addresses), "include_liquidity": "true"}
+        headers = {"X-API-KEY": BIRDEYE_API_KEY, "Accept": "application/json", "x-chain": "solana"}
+        async with self.session.get(url, params=params, headers=headers, timeout=aiohttp.ClientTimeout(total=5)) as response:
+            if response.status != 200:
+                logger.warning(f"Birdeye multi_price returned {response.status}")
+                return {}
+            data = await response.json()
+        
+        results = {}
+        for address, item in (data.get('data') or {}).items():
+            if not item or item.get('value') is None:
+                continue
+            price = Decimal(str(item['value']))
+            results[address] = {
+                'symbol': address,
+                'name': None,
+                'address': address,
+                'price': price,
+                'price_usd': price,
+                'change_24h': Decimal(str(item.get('priceChange24h') or 0)),
+                'volume_24h': Decimal('0'),
+                'liquidity': Decimal(str(item.get('liquidity') or 0)),
+                'market_cap': None,
+                'fdv': None,
+                'pair_address': None,
+                'chain': 'solana',
+                'dex': 'birdeye',
+                'source': 'birdeye',
+            }
+        return results
+    
+    async def _provider_call(self, provider: str, fetch: Callable[..., Awaitable[Any]], *args) -> Any:
+        """Call a provider fetcher within that provider's concurrency limit"""
+        async with _provider_slot(provider):
+            return await fetch(*args)
+    
+    async def _fetch_dexscreener_with_jupiter_price(self, symbol: str, token_address: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """DexScreener data, with the price refreshed from Jupiter when possible"""
+        data = await self._provider_call('dexscreener', self._fetch_from_dexscreener, symbol)
+        # If we got token address from DexScreener, also try Jupiter for price
+        if data and data.get('address') and not token_address:
+            try:
+                jupiter_data = await self._provider_call(
+                    'jupiter',
+                    self._fetch_jupiter_price_via_rpc,
+                    data['address'], 
+                    data.get('symbol', '').split('/')[-1] if '/' in data.get('symbol', '') else 'SOL',
+                    None
+                )
+                if jupiter_data:
+                    # Merge Jupiter price data with DexScreener comprehensive data
+                    data['price'] = jupiter_data.get('price', data.get('price'))
+                    data['price_usd'] = jupiter_data.get('price_usd', data.get('price_usd'))
+                    data['source'] = 'jupiter+dexscreener'
+            except Exception as e:
+                logger.debug(f"Jupiter price merge failed: {e}")
+        return data
     
     async def _fetch_from_dexscreener(self, symbol: str) -> Optional[Dict[str, Any]]:
         """Fetch from DexScreener API"""
@@ -173,23 +423,7 @@ class DataAggregator:
             if response.status == 200:
                 data = await response.json()
                 if data.get('pairs') and len(data['pairs']) > 0:
-                    pair = data['pairs'][0]
-                    return {
-                        'symbol': f"{pair['baseToken']['symbol']}/{pair['quoteToken']['symbol']}",
-                        'name': pair['baseToken'].get('name'),
-                        'address': pair['baseToken']['address'],
-                        'price': Decimal(str(pair.get('priceUsd', pair.get('priceNative', 0)))),
-                        'price_usd': Decimal(str(pair.get('priceUsd', 0))),
-                        'change_24h': Decimal(str(pair.get('priceChange', {}).get('h24', 0))),
-                        'volume_24h': Decimal(str(pair.get('volume', {}).get('h24', 0))),
-                        'liquidity': Decimal(str(pair.get('liquidity', {}).get('usd', 0))),
-                        'market_cap': Decimal(str(pair.get('marketCap', 0))) if pair.get('marketCap') else None,
-                        'fdv': Decimal(str(pair.get('fdv', 0))) if pair.get('fdv') else None,
-                        'pair_address': pair.get('pairAddress'),
-                        'chain': pair.get('chainId', 'solana'),
-                        'dex': pair.get('dexId'),
-                        'source': 'dexscreener',
-                    }
+                    return _token_from_pair(data['pairs'][0])
         return None
     
     async def _fetch_from_jupiter(self, symbol: str) -> Optional[Dict[str, Any]]:
@@ -428,19 +662,75 @@ class DataAggregator:
     
     async def fetch_ohlcv(self, symbol: str, timeframe: str = '1h', limit: int = 100) -> List[Dict[str, Any]]:
         """Fetch OHLCV data"""
-        # Try DexScreener first
         try:
             if not self.session:
                 return []
             
-            # DexScreener doesn't have direct OHLCV endpoint
-            # Would need to use pair address and fetch from other sources
-            # For now, return empty - would need Birdeye or backend data
-            return []
+            # Birdeye OHLCV needs the token address, DexScreener's chart the pair address
+            token_data = None
+            token_address = symbol if len(symbol) >= 32 else None
+            if not token_address:
+                token_data = await self.fetch_token_data(symbol)
+                token_address = token_data.get('address') if token_data else None
+            if not token_address:
+                return []
+            
+            candles = await get_provider_racer().race([
+                ('birdeye_ohlcv', lambda: self._provider_call('birdeye', self._fetch_birdeye_candles, token_address, timeframe, limit)),
+                ('dexscreener_ohlcv', lambda: self._fetch_dexscreener_candles(symbol, token_data, timeframe, limit)),
+            ])
+            return candles or []
         except Exception as e:
             logger.error(f"Error fetching OHLCV: {e}")
             return []
     
+    async def _fetch_birdeye_candles(self, token_address: str, timeframe: str, limit: int) -> List[Dict[str, Any]]:
+        """Fetch and normalize Birdeye OHLCV candles"""
+        # Birdeye uses upper-case hour/day/week units (1H, 4H, 1D, 1W)
+        birdeye_type = timeframe if timeframe.endswith('m') else timeframe.upper()
+        result = await self.fetch_birdeye_ohlcv(token_address, birdeye_type, limit)
+        if result.get('success') is False:
+            return []
+        items = (result.get('data') or {}).get('items') or []
+        return [
+            {
+                'time': datetime.fromtimestamp(item['unixTime']),
+                'open': item.get('o', 0),
+                'high': item.get('h', 0),
+                'low': item.get('l', 0),
+                'close': item.get('c', 0),
+                'volume': item.get('v', 0),
+            }
+            for item in items[-limit:]
+            if item.get('unixTime') is not None
+        ]
+    
+    async def _fetch_dexscreener_candles(self, symbol: str, token_data: Optional[Dict[str, Any]], timeframe: str, limit: int) -> List[Dict[str, Any]]:
+        """Fetch and normalize DexScreener chart candles (the chart is keyed by pair address)"""
+        # Resolved outside the provider slot: the lookup takes provider slots of its own
+        if token_data is None:
+            token_data = await self.fetch_token_data(symbol)
+        pair_address = token_data.get('pair_address') if token_data else None
+        if not pair_address:
+            return []
+        result = await self._provider_call(
+            'dexscreener', self.fetch_dex_screener_ohlcv, token_data.get('chain') or 'solana', pair_address, timeframe.lower(), limit)
+        if not result.get('success'):
+            return []
+        bars = (result.get('data') or {}).get('bars') or []
+        return [
+            {
+                'time': datetime.fromtimestamp(bar['timestamp'] / 1000),
+                'open': float(bar.get('open') or 0),
+                'high': float(bar.get('high') or 0),
+                'low': float(bar.get('low') or 0),
+                'close': float(bar.get('close') or 0),
+                'volume': float(bar.get('volume') or 0),
+            }
+            for bar in bars[-limit:]
+            if bar.get('timestamp') is not None
+        ]
+    
     async def fetch_liquidity(self, symbol: str) -> Optional[Dict[str, Any]]:
         """Fetch liquidity data"""
         token_data = await self.fetch_token_data(symbol)
@@ -763,17 +1053,8 @@ class DataAggregator:
             
         if not self.session:
             logger.error("DataAggregator session is not initialized (self.session is None).")
-            # Try to initialize session if missing (should be done in __aenter__)
-            try:
-                if CERTIFI_AVAILABLE:
-                    ssl_context = ssl.create_default_context(cafile=certifi.where())
-                    connector = aiohttp.TCPConnector(ssl=ssl_context)
-                    self.session = aiohttp.ClientSession(connector=connector)
-                else:
-                    self.session = aiohttp.ClientSession()
-            except Exception as init_err:
-                logger.error(f"Failed to auto-initialize session: {init_err}")
-                return {"success": False, "message": "Session initialization failed"}
+            # Initialize session if missing (should be done in __aenter__)
+            self.session = pooled_session(HTTP_POOL)
         
         url = f"{BIRDEYE_API_URL}/{path}"
         headers = {
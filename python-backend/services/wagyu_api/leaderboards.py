@@ -0,0 +1,217 @@
+"""
+Precomputed Token Leaderboards for WagyuTech API
+Background materializer for the trending / new / surging token feeds
+
+- Each feed is refreshed from upstream on a fixed schedule, independent of
+  request volume, and kept as an in-process ranked list
+- Filter facets (DEX, liquidity tier) are precomputed per refresh, so a read
+  is a slice of at most `limit` tokens
+- Every snapshot carries a content hash used for ETags / If-None-Match
+- A failed or empty refresh keeps serving the previous snapshot
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import logging
+from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable
+from decimal import Decimal
+
+from .data_aggregator import DataAggregator
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_DEPTH = int(os.getenv("WAGYU_LEADERBOARD_DEPTH", 100))
+LEADERBOARD_INTERVAL = float(os.getenv("WAGYU_LEADERBOARD_INTERVAL", 15.0))
+
+# Liquidity tiers (USD) with a precomputed facet each
+LIQUIDITY_TIERS = (1_000, 10_000, 100_000, 1_000_000)
+
+# loader(depth) -> ranked tokens, best first
+FeedLoader = Callable[[int], Awaitable[List[Dict[str, Any]]]]
+
+
+def _liquidity(token: Dict[str, Any]) -> float:
+    value = token.get('liquidity') or 0
+    return float(value) if isinstance(value, (int, float, Decimal)) else 0.0
+
+
+class FeedSnapshot:
+    """One materialized, ranked feed with its filter facets"""
+
+    def __init__(self, name: str, tokens: List[Dict[str, Any]]):
+        self.name = name
+        self.tokens = tokens
+        self.generated_at = time.time()
+        self.etag = hashlib.sha1(json.dumps(tokens, default=str).encode()).hexdigest()[:16]
+
+        # facet -> ranked tokens matching it (references, not copies)
+        self.facets: Dict[str, List[Dict[str, Any]]] = {}
+        for tier in LIQUIDITY_TIERS:
+            self.facets[f"liq:{tier}"] = [t for t in tokens if _liquidity(t) >= tier]
+        for token in tokens:
+            dex = token.get('dex_id') or token.get('dex')
+            if dex:
+                self.facets.setdefault(f"dex:{str(dex).lower()}", []).append(token)
+
+    def select(
+        self,
+        limit: int,
+        dex: Optional[str] = None,
+        min_liquidity: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """Top `limit` tokens matching the filters"""
+        # Start from the narrowest precomputed facet
+        candidates = self.tokens
+        if dex:
+            candidates = self.facets.get(f"dex:{dex.lower()}", [])
+        elif min_liquidity:
+            tiers = [tier for tier in LIQUIDITY_TIERS if tier <= min_liquidity]
+            if tiers:
+                candidates = self.facets[f"liq:{tiers[-1]}"]
+
+        if not min_liquidity or (not dex and min_liquidity in LIQUIDITY_TIERS):
+            return candidates[:limit]
+
+        selected = []
+        for token in candidates:
+            if _liquidity(token) >= min_liquidity:
+                selected.append(token)
+                if len(selected) >= limit:
+                    break
+        return selected
+
+
+class LeaderboardMaterializer:
+    """Refreshes registered feeds in the background and serves their snapshots"""
+
+    def __init__(self, depth: int = LEADERBOARD_DEPTH, interval: float = LEADERBOARD_INTERVAL):
+        self.depth = depth
+        self.interval = interval
+        self.loaders: Dict[str, FeedLoader] = {}
+        self.snapshots: Dict[str, FeedSnapshot] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.metrics = {'refreshes': 0, 'refresh_errors': 0, 'reads': 0, 'not_modified': 0}
+
+    def register(self, name: str, loader: FeedLoader):
+        """Register a feed loader"""
+        self.loaders[name] = loader
+
+    async def start(self):
+        """Start the background refresh loop"""
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._refresh_loop())
+        logger.info(f"Leaderboard materializer started ({', '.join(self.loaders)} every {self.interval}s)")
+
+    async def stop(self):
+        """Stop the background refresh loop"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh_loop(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.gather(*(self.refresh(name) for name in self.loaders))
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def refresh(self, name: str) -> asyncio.Task:
+        """Refresh one feed, or join the refresh already running"""
+        task = self._refreshing.get(name)
+        if task is None or task.done():
+            task = asyncio.ensure_future(self._refresh(name))
+            self._refreshing[name] = task
+        return task
+
+    async def _refresh(self, name: str) -> Optional[FeedSnapshot]:
+        try:
+            tokens = await self.loaders[name](self.depth)
+        except Exception as e:
+            tokens = None
+            logger.warning(f"Leaderboard refresh failed for {name}: {e}")
+
+        if not tokens:
+            self.metrics['refresh_errors'] += 1
+            return self.snapshots.get(name)
+
+        snapshot = FeedSnapshot(name, tokens)
+        self.snapshots[name] = snapshot
+        self.metrics['refreshes'] += 1
+        return snapshot
+
+    async def get(self, name: str) -> Optional[FeedSnapshot]:
+        """Current snapshot for a feed (loaded on demand before the first refresh)"""
+        self.metrics['reads'] += 1
+        snapshot = self.snapshots.get(name)
+        if snapshot is None and name in self.loaders:
+            snapshot = await asyncio.shield(self.refresh(name))
+        return snapshot
+
+    async def read(
+        self,
+        name: str,
+        limit: int,
+        if_none_match: Optional[str] = None,
+        dex: Optional[str] = None,
+        min_liquidity: Optional[float] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str], bool]:
+        """
+        Read the top `limit` tokens of a feed
+        Returns: (tokens, etag, not_modified) - tokens is empty when not_modified
+        """
+        snapshot = await self.get(name)
+        if snapshot is None:
+            return [], None, False
+
+        etag = etag_for(snapshot, limit, dex, min_liquidity)
+        if if_none_match and etag in (tag.strip().removeprefix('W/') for tag in if_none_match.split(',')):
+            self.metrics['not_modified'] += 1
+            return [], etag, True
+        return snapshot.select(limit, dex, min_liquidity), etag, False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Materializer metrics and snapshot ages"""
+        now = time.time()
+        return {
+            **self.metrics,
+            'feeds': {
+                name: {
+                    'tokens': len(snapshot.tokens),
+                    'age_seconds': round(now - snapshot.generated_at, 1),
+                    'etag': snapshot.etag,
+                }
+                for name, snapshot in self.snapshots.items()
+            },
+        }
+
+
+def etag_for(snapshot: FeedSnapshot, *params: Any) -> str:
+    """ETag for one view (limit/filters) of a snapshot"""
+    suffix = "-".join(str(p) for p in params if p is not None)
+    return f'"{snapshot.name}-{snapshot.etag}{"-" + suffix if suffix else ""}"'
+
+
+# Global materializer instance
+_materializer: Optional[LeaderboardMaterializer] = None
+
+
+def get_leaderboards() -> LeaderboardMaterializer:
+    """Get or create the leaderboard materializer with the standard token feeds"""
+    global _materializer
+    if _materializer is None:
+        _materializer = LeaderboardMaterializer()
+        _materializer.register('trending', lambda depth: DataAggregator._load_detached(
+            lambda aggregator: aggregator.fetch_trending_tokens(depth)))
+        _materializer.register('new', lambda depth: DataAggregator._load_detached(
+            lambda aggregator: aggregator.fetch_new_tokens(depth)))
+        _materializer.register('surging', lambda depth: DataAggregator._load_detached(
+            lambda aggregator: aggregator.fetch_surging_tokens(depth)))
+    return _materializer
@@ -3,10 +3,12 @@ WagyuTech API Main Application
 FastAPI service for meme coin trading and analytics
 """
 
-from fastapi import FastAPI, HTTPException, Depends, Header, Request, status
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from pydantic import ValidationError
 from contextlib import asynccontextmanager
+import os
 import time
 import logging
 from typing import Optional, List
@@ -18,19 +20,26 @@ from .models.api_models import (
     LiquidityData, HolderDistributionResponse, TokenAnalytics,
     TradingOrderRequest, TradingOrderResponse,
     MonitoringSubscriptionRequest, MonitoringEvent, SocialSignal,
-    APIUsageStats, ErrorResponse
+    APIUsageStats, ErrorResponse,
+    BatchSymbolsRequest, BatchTokenResponse, BatchPriceResponse, BatchLiquidityResponse
 )
 from .models.fee_models import get_fee_structure
 from .data_aggregator import DataAggregator
 from .auth_service import validate_api_key, log_api_usage
-from .rate_limiter import check_rate_limit
+from .rate_limiter import check_rate_limit, get_rate_limiter
 from .billing_service import BillingService
+from .usage_pipeline import get_usage_pipeline
+from .leaderboards import get_leaderboards
 from .trading_service import TradingService
 from .onchain_monitor import OnChainMonitor
+from ..http_utils import close_http_pools
 from .social_monitor import SocialMonitor
 
 logger = logging.getLogger(__name__)
 
+# Max symbols per batch request
+BATCH_MAX_SYMBOLS = int(os.getenv("WAGYU_BATCH_MAX_SYMBOLS", 200))
+
 # Initialize services
 billing_service = BillingService()
 onchain_monitor = OnChainMonitor()
@@ -42,6 +51,8 @@ async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     # Startup
     logger.info("Starting WagyuTech API service")
+    await get_usage_pipeline().start()
+    await get_leaderboards().start()
     # Try to start monitoring services, but don't fail if they can't connect
     try:
         await onchain_monitor.start_monitoring()
@@ -62,6 +73,10 @@ async def lifespan(app: FastAPI):
         await social_monitor.stop_monitoring()
     except Exception:
         pass
+    await get_leaderboards().stop()
+    await get_usage_pipeline().stop()
+    await get_rate_limiter().close()
+    await close_http_pools()
 
 
 app = FastAPI(
@@ -104,6 +119,7 @@ async def get_api_key_info(
 
 # Dependency for rate limiting
 async def check_rate_limit_dep(
+    request: Request,
     api_key_info: dict = Depends(get_api_key_info)
 ) -> dict:
     """Check rate limits before processing request"""
@@ -112,6 +128,8 @@ async def check_rate_limit_dep(
         api_key_info['rate_limit_per_minute'],
         api_key_info['rate_limit_per_hour']
     )
+    # Expose to the logging middleware so it can set headers without a second check
+    request.state.rate_limit_info = rate_info
     
     if not is_allowed:
         raise HTTPException(
@@ -127,6 +145,46 @@ async def check_rate_limit_dep(
     return api_key_info
 
 
+async def fetch_batch(request: BatchSymbolsRequest) -> dict:
+    """Validate a batch request and fetch token data for all its symbols"""
+    symbols = [symbol.strip() for symbol in request.symbols if symbol.strip()]
+    if not symbols:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one symbol is required"
+        )
+    if len(symbols) > BATCH_MAX_SYMBOLS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many symbols: {len(symbols)} (max {BATCH_MAX_SYMBOLS})"
+        )
+    
+    async with DataAggregator() as aggregator:
+        return await aggregator.fetch_token_data_batch(symbols)
+
+
+async def read_feed(
+    feed: str,
+    limit: int,
+    request: Request,
+    response: Response,
+    dex: Optional[str] = None,
+    min_liquidity: Optional[float] = None
+):
+    """
+    Read a precomputed leaderboard feed, honouring If-None-Match.
+    Returns the token list, or a 304 response if the client copy is current.
+    """
+    tokens, etag, not_modified = await get_leaderboards().read(
+        feed, limit, request.headers.get("if-none-match"), dex, min_liquidity
+    )
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    if etag:
+        response.headers["ETag"] = etag
+    return tokens
+
+
 # Middleware to log API usage
 @app.middleware("http")
 async def log_api_requests(request: Request, call_next):
@@ -147,7 +205,7 @@ async def log_api_requests(request: Request, call_next):
     # Process request
     response = await call_next(request)
     
-    # Log usage
+    # Log usage (buffered, flushed in the background)
     process_time = int((time.time() - start_time) * 1000)
     if api_key_id and user_id:
         await log_api_usage(
@@ -162,12 +220,8 @@ async def log_api_requests(request: Request, call_next):
         )
     
     # Add rate limit headers
-    if api_key_id:
-        _, rate_info = await check_rate_limit(
-            api_key_id,
-            100,  # Would get from key_info
-            1000
-        )
+    rate_info = getattr(request.state, 'rate_limit_info', None)
+    if api_key_id and rate_info:
         response.headers["X-RateLimit-Remaining-Minute"] = str(rate_info['remaining_per_minute'])
         response.headers["X-RateLimit-Remaining-Hour"] = str(rate_info['remaining_per_hour'])
     
@@ -183,30 +237,43 @@ async def health_check():
 
 # Public endpoints (no auth required) - for frontend use
 @app.get("/api/public/tokens/new")
-async def get_new_tokens_public(limit: int = 20):
+async def get_new_tokens_public(
+    request: Request,
+    response: Response,
+    limit: int = 20,
+    dex: Optional[str] = None,
+    min_liquidity: Optional[float] = None
+):
     """Get newly listed tokens - public endpoint"""
-    async with DataAggregator() as aggregator:
-        tokens_data = await aggregator.fetch_new_tokens(limit)
-        return {
-            "tokens": tokens_data,
-            "total": len(tokens_data),
-            "limit": limit
-        }
+    tokens_data = await read_feed('new', limit, request, response, dex, min_liquidity)
+    if isinstance(tokens_data, Response):
+        return tokens_data
+    return {
+        "tokens": tokens_data,
+        "total": len(tokens_data),
+        "limit": limit
+    }
 
 
 @app.get("/api/public/tokens/surging")
-async def get_surging_tokens_public(limit: int = 20):
+async def get_surging_tokens_public(
+    request: Request,
+    response: Response,
+    limit: int = 20,
+    dex: Optional[str] = None,
+    min_liquidity: Optional[float] = None
+):
     """Get surging tokens - public endpoint"""
-    async with DataAggregator() as aggregator:
-        tokens_data = await aggregator.fetch_surging_tokens(limit)
-        return {
-            "tokens": tokens_data,
-            "total": len(tokens_data),
-            "limit": limit
-        }
+    tokens_data = await read_feed('surging', limit, request, response, dex, min_liquidity)
+    if isinstance(tokens_data, Response):
+        return tokens_data
+    return {
+        "tokens": tokens_data,
+        "total": len(tokens_data),
+        "limit": limit
+    }
 
 
-# Token endpoints
 @app.get("/api/v1/tokens/search", response_model=TokenSearchResponse)
 async def search_tokens(
     q: str,
@@ -238,77 +305,142 @@ async def search_tokens(
         )
 
 
-@app.get("/api/v1/tokens/{symbol}", response_model=TokenData)
-async def get_token_data(
-    symbol: str,
+@app.post("/api/v1/tokens/batch", response_model=BatchTokenResponse)
+async def get_token_data_batch(
+    request: BatchSymbolsRequest,
     api_key_info: dict = Depends(check_rate_limit_dep)
 ):
-    """Get token data"""
-    async with DataAggregator() as aggregator:
-        token_data = await aggregator.fetch_token_data(symbol)
-        
-        if not token_data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Token {symbol} not found"
-            )
-        
-        return TokenData(**token_data)
+    """Get token data for up to BATCH_MAX_SYMBOLS symbols or addresses"""
+    results = await fetch_batch(request)
+    
+    tokens = {}
+    missing = []
+    for symbol, data in results.items():
+        if not data:
+            missing.append(symbol)
+            continue
+        # One malformed upstream row must not fail the whole batch
+        try:
+            tokens[symbol] = TokenData(**data)
+        except ValidationError as e:
+            logger.warning(f"Dropping invalid batch row for {symbol}: {e}")
+            missing.append(symbol)
+    
+    return BatchTokenResponse(tokens=tokens, missing=missing)
 
 
 @app.get("/api/v1/tokens/trending", response_model=List[TokenData])
 async def get_trending_tokens(
+    request: Request,
+    response: Response,
     limit: int = 20,
+    dex: Optional[str] = None,
+    min_liquidity: Optional[float] = None,
     api_key_info: dict = Depends(check_rate_limit_dep)
 ):
     """Get trending tokens"""
-    async with DataAggregator() as aggregator:
-        tokens_data = await aggregator.fetch_trending_tokens(limit)
-        
-        return [
-            TokenData(
-                symbol=token['symbol'],
-                address=token.get('address', ''),
-                price=token['price'],
-                price_usd=token.get('price_usd', token['price']),
-                change_24h=token.get('change_24h', Decimal('0')),
-                volume_24h=token.get('volume_24h', Decimal('0')),
-                liquidity=token.get('liquidity', Decimal('0')),
-            )
-            for token in tokens_data
-        ]
+    tokens_data = await read_feed('trending', limit, request, response, dex, min_liquidity)
+    if isinstance(tokens_data, Response):
+        return tokens_data
+    
+    return [
+        TokenData(
+            symbol=token['symbol'],
+            address=token.get('address', ''),
+            price=token['price'],
+            price_usd=token.get('price_usd', token['price']),
+            change_24h=token.get('change_24h', Decimal('0')),
+            volume_24h=token.get('volume_24h', Decimal('0')),
+            liquidity=token.get('liquidity', Decimal('0')),
+        )
+        for token in tokens_data
+    ]
 
 
 @app.get("/api/v1/tokens/new")
 async def get_new_tokens(
+    request: Request,
+    response: Response,
     limit: int = 20,
+    dex: Optional[str] = None,
+    min_liquidity: Optional[float] = None,
     api_key_info: dict = Depends(check_rate_limit_dep)
 ):
     """Get newly listed tokens - sorted by creation time"""
-    async with DataAggregator() as aggregator:
-        tokens_data = await aggregator.fetch_new_tokens(limit)
-        
-        return {
-            "tokens": tokens_data,
-            "total": len(tokens_data),
-            "limit": limit
-        }
+    tokens_data = await read_feed('new', limit, request, response, dex, min_liquidity)
+    if isinstance(tokens_data, Response):
+        return tokens_data
+    
+    return {
+        "tokens": tokens_data,
+        "total": len(tokens_data),
+        "limit": limit
+    }
 
 
 @app.get("/api/v1/tokens/surging")
 async def get_surging_tokens(
+    request: Request,
+    response: Response,
     limit: int = 20,
+    dex: Optional[str] = None,
+    min_liquidity: Optional[float] = None,
     api_key_info: dict = Depends(check_rate_limit_dep)
 ):
     """Get tokens with highest volume/price surge in last 24h"""
+    tokens_data = await read_feed('surging', limit, request, response, dex, min_liquidity)
+    if isinstance(tokens_data, Response):
+        return tokens_data
+    
+    return {
+        "tokens": tokens_data,
+        "total": len(tokens_data),
+        "limit": limit
+    }
+
+
+# Declared after the fixed /api/v1/tokens/* paths so they aren't captured as a symbol
+@app.get("/api/v1/tokens/{symbol}", response_model=TokenData)
+async def get_token_data(
+    symbol: str,
+    api_key_info: dict = Depends(check_rate_limit_dep)
+):
+    """Get token data"""
     async with DataAggregator() as aggregator:
-        tokens_data = await aggregator.fetch_surging_tokens(limit)
+        token_data = await aggregator.fetch_token_data(symbol)
         
-        return {
-            "tokens": tokens_data,
-            "total": len(tokens_data),
-            "limit": limit
-        }
+        if not token_data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Token {symbol} not found"
+            )
+        
+        return TokenData(**token_data)
+
+
+@app.post("/api/v1/prices/batch", response_model=BatchPriceResponse)
+async def get_price_batch(
+    request: BatchSymbolsRequest,
+    api_key_info: dict = Depends(check_rate_limit_dep)
+):
+    """Get real-time prices for up to BATCH_MAX_SYMBOLS symbols or addresses"""
+    results = await fetch_batch(request)
+    now = datetime.now()
+    
+    return BatchPriceResponse(
+        prices={
+            symbol: PriceResponse(
+                symbol=symbol,
+                price=data.get('price', Decimal('0')),
+                price_usd=data.get('price_usd', data.get('price', Decimal('0'))),
+                change_24h=data.get('change_24h', Decimal('0')),
+                timestamp=now,
+                source=data.get('source', 'unknown')
+            )
+            for symbol, data in results.items() if data
+        },
+        missing=[symbol for symbol, data in results.items() if not data]
+    )
 
 
 @app.get("/api/v1/prices/{symbol}", response_model=PriceResponse)
@@ -369,6 +501,32 @@ async def get_ohlcv(
         )
 
 
+@app.post("/api/v1/liquidity/batch", response_model=BatchLiquidityResponse)
+async def get_liquidity_batch(
+    request: BatchSymbolsRequest,
+    api_key_info: dict = Depends(check_rate_limit_dep)
+):
+    """Get liquidity data for up to BATCH_MAX_SYMBOLS symbols or addresses"""
+    results = await fetch_batch(request)
+    now = datetime.now()
+    
+    liquidity = {
+        symbol: LiquidityData(
+            symbol=symbol,
+            liquidity_usd=data['liquidity'],
+            liquidity_base=Decimal('0'),  # Would need pair data
+            liquidity_quote=Decimal('0'),
+            liquidity_ratio=None,
+            timestamp=now
+        )
+        for symbol, data in results.items() if data and data.get('liquidity')
+    }
+    return BatchLiquidityResponse(
+        liquidity=liquidity,
+        missing=[symbol for symbol in results if symbol not in liquidity]
+    )
+
+
 @app.get("/api/v1/liquidity/{symbol}", response_model=LiquidityData)
 async def get_liquidity(
     symbol: str,
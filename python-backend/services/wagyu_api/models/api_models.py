@@ -46,6 +46,23 @@ class PriceResponse(BaseModel):
     source: str  # Which API provided the data
 
 
+class BatchSymbolsRequest(BaseModel):
+    """Batch lookup request"""
+    symbols: List[str]  # Token symbols or mint addresses
+
+
+class BatchTokenResponse(BaseModel):
+    """Batch token data response (partial results)"""
+    tokens: Dict[str, TokenData]
+    missing: List[str]
+
+
+class BatchPriceResponse(BaseModel):
+    """Batch price response (partial results)"""
+    prices: Dict[str, PriceResponse]
+    missing: List[str]
+
+
 class OHLCVData(BaseModel):
     """OHLCV candle data"""
     time: datetime
@@ -73,6 +90,12 @@ class LiquidityData(BaseModel):
     timestamp: datetime
 
 
+class BatchLiquidityResponse(BaseModel):
+    """Batch liquidity response (partial results)"""
+    liquidity: Dict[str, LiquidityData]
+    missing: List[str]
+
+
 class HolderData(BaseModel):
     """Holder distribution data"""
     address: str
@@ -0,0 +1,206 @@
+"""
+Provider Racing for WagyuTech API
+Hedged requests across upstream data providers with adaptive ordering
+
+The top-ranked provider is called first. If it hasn't answered within its
+own p95 latency, the next provider is launched in parallel (a hedge); a
+failed provider launches the next one immediately. The first good answer
+wins and the remaining calls are cancelled.
+
+Providers are ranked by EWMA latency plus a fixed penalty per unit of EWMA
+error and miss rate, so a slow or failing upstream drops down the order on
+its own and recovers once it is healthy again; failing fast never ranks a
+provider ahead of one that answers.
+"""
+
+import asyncio
+import os
+import time
+import logging
+from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+PROVIDER_RACING_ENABLED = os.getenv("WAGYU_PROVIDER_RACING", "true").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("WAGYU_HEDGE_PERCENTILE", 0.95))
+HEDGE_DEFAULT_MS = float(os.getenv("WAGYU_HEDGE_DEFAULT_MS", 500))
+HEDGE_MIN_MS = float(os.getenv("WAGYU_HEDGE_MIN_MS", 50))
+HEDGE_MAX_MS = float(os.getenv("WAGYU_HEDGE_MAX_MS", 2000))
+ERROR_PENALTY_MS = float(os.getenv("WAGYU_PROVIDER_ERROR_PENALTY_MS", 5000))
+MISS_PENALTY_MS = float(os.getenv("WAGYU_PROVIDER_MISS_PENALTY_MS", 1000))
+
+# (provider name, zero-arg coroutine factory); a falsy result counts as a miss
+ProviderCall = Tuple[str, Callable[[], Awaitable[Any]]]
+
+
+class ProviderStats:
+    """Latency and error statistics for one provider"""
+
+    def __init__(self, alpha: float = 0.2, window: int = 200, min_samples: int = 5):
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.latency_ewma_ms: Optional[float] = None
+        self.error_ewma = 0.0
+        self.miss_ewma = 0.0
+        self.samples = 0
+        self._recent: deque = deque(maxlen=window)
+        self._percentile_cache: Optional[float] = None
+
+    def record(self, latency_ms: float, outcome: str):
+        """
+        Record the outcome of one call: 'ok', 'miss' (answered, nothing
+        found) or 'error'. Only answers feed the latency statistics, so a
+        provider that fails fast does not look fast.
+        """
+        self.samples += 1
+        self.error_ewma += self.alpha * ((1.0 if outcome == 'error' else 0.0) - self.error_ewma)
+        self.miss_ewma += self.alpha * ((1.0 if outcome == 'miss' else 0.0) - self.miss_ewma)
+        if outcome != 'error':
+            self._record_latency(latency_ms)
+
+    def record_cancelled(self, elapsed_ms: float):
+        """
+        A hedge loser was cancelled after elapsed_ms. That is only a lower
+        bound on its latency, so it can raise the estimate but not lower it,
+        and it says nothing about errors.
+        """
+        if self.latency_ewma_ms is None or elapsed_ms > self.latency_ewma_ms:
+            self._record_latency(elapsed_ms)
+
+    def _record_latency(self, latency_ms: float):
+        if self.latency_ewma_ms is None:
+            self.latency_ewma_ms = latency_ms
+        else:
+            self.latency_ewma_ms += self.alpha * (latency_ms - self.latency_ewma_ms)
+        self._recent.append(latency_ms)
+        # Recompute the percentile lazily, at most every 20 samples
+        if len(self._recent) % 20 == 0:
+            self._percentile_cache = None
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency percentile over the recent window"""
+        if len(self._recent) < self.min_samples:
+            return None
+        if self._percentile_cache is None:
+            ordered = sorted(self._recent)
+            self._percentile_cache = ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        return self._percentile_cache
+
+    def score(self) -> float:
+        """
+        Lower is better. Unmeasured providers are assumed to take
+        HEDGE_DEFAULT_MS; errors and misses add a fixed penalty that does not
+        shrink with the provider's latency.
+        """
+        latency = HEDGE_DEFAULT_MS if self.latency_ewma_ms is None else self.latency_ewma_ms
+        return latency + ERROR_PENALTY_MS * self.error_ewma + MISS_PENALTY_MS * self.miss_ewma
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'samples': self.samples,
+            'latency_ewma_ms': round(self.latency_ewma_ms, 2) if self.latency_ewma_ms is not None else None,
+            'error_rate_ewma': round(self.error_ewma, 4),
+            'miss_rate_ewma': round(self.miss_ewma, 4),
+            f'p{int(HEDGE_PERCENTILE * 100)}_ms': self.percentile(HEDGE_PERCENTILE),
+        }
+
+
+class ProviderRacer:
+    """Runs provider fallback chains as hedged races"""
+
+    def __init__(self, enabled: bool = PROVIDER_RACING_ENABLED):
+        self.enabled = enabled
+        self.stats: Dict[str, ProviderStats] = {}
+
+    def _stats(self, name: str) -> ProviderStats:
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = ProviderStats()
+        return stats
+
+    def order(self, calls: List[ProviderCall]) -> List[ProviderCall]:
+        """Rank providers adaptively (stable, so ties keep the caller's priority)"""
+        if not self.enabled:
+            return list(calls)
+        return sorted(calls, key=lambda call: self._stats(call[0]).score())
+
+    def hedge_delay(self, name: str) -> Optional[float]:
+        """Seconds to wait on a provider before hedging, None to never hedge"""
+        if not self.enabled:
+            return None
+        p = self._stats(name).percentile(HEDGE_PERCENTILE)
+        delay_ms = HEDGE_DEFAULT_MS if p is None else min(HEDGE_MAX_MS, max(HEDGE_MIN_MS, p))
+        return delay_ms / 1000.0
+
+    async def _timed(self, name: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run one provider call and record its outcome"""
+        start = time.perf_counter()
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            # A hedge loser took at least this long; recording it keeps a provider
+            # that always loses from looking fast forever
+            self._stats(name).record_cancelled((time.perf_counter() - start) * 1000)
+            raise
+        except Exception as e:
+            self._stats(name).record((time.perf_counter() - start) * 1000, 'error')
+            logger.warning(f"{name} failed: {e}")
+            return None
+        self._stats(name).record((time.perf_counter() - start) * 1000, 'ok' if result else 'miss')
+        return result
+
+    async def race(self, calls: List[ProviderCall]) -> Any:
+        """
+        Return the first good result across providers, or None if all miss.
+        With racing disabled this is a plain sequential fallback chain.
+        """
+        ordered = self.order(calls)
+        pending: Dict[asyncio.Task, str] = {}
+        next_index = 0
+        last_launched: Optional[str] = None
+
+        def launch():
+            nonlocal next_index, last_launched
+            name, factory = ordered[next_index]
+            next_index += 1
+            last_launched = name
+            pending[asyncio.ensure_future(self._timed(name, factory))] = name
+
+        try:
+            while pending or next_index < len(ordered):
+                if not pending:
+                    launch()
+
+                timeout = self.hedge_delay(last_launched) if next_index < len(ordered) else None
+                done, _ = await asyncio.wait(pending.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Hedge: the newest call is slower than its usual p95
+                    logger.debug(f"Hedging {last_launched} with {ordered[next_index][0]}")
+                    launch()
+                    continue
+
+                for task in done:
+                    pending.pop(task)
+                    result = task.result()
+                    if result:
+                        return result
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-provider statistics, best-ranked first"""
+        ranked = sorted(self.stats.items(), key=lambda item: item[1].score())
+        return {name: stats.to_dict() for name, stats in ranked}
+
+
+# Global racer instance (stats are shared by all aggregators in the process)
+_racer = ProviderRacer()
+
+
+def get_provider_racer() -> ProviderRacer:
+    """Get provider racer instance"""
+    return _racer
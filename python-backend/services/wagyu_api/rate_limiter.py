@@ -1,145 +1,264 @@
 """
 Rate Limiting Service for WagyuTech API
-Implements token bucket algorithm for tier-based rate limiting
+Implements GCRA (generic cell rate algorithm) for tier-based rate limiting
+
+Backends:
+- InMemoryRateLimitBackend: per-process, no per-key locks, idle keys evicted
+- RedisRateLimitBackend: shared across workers/hosts, minute and hour windows
+  checked atomically in one Lua round trip
+
+GCRA stores a single "theoretical arrival time" (TAT) per key and window.
+A key whose TAT is in the past is indistinguishable from a fresh key, so it
+can be dropped without losing any state.
 """
 
 import time
-import asyncio
-from typing import Dict, Optional
-from collections import defaultdict
-from datetime import datetime, timedelta
+import os
+import math
+from typing import Dict, Optional, Tuple
+from collections import OrderedDict
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Redis for shared limits (optional - falls back to in-process limits)
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    aioredis = None
+    REDIS_AVAILABLE = False
 
-class TokenBucket:
-    """Token bucket for rate limiting"""
-    
-    def __init__(self, capacity: int, refill_rate: float):
-        """
-        capacity: Maximum tokens
-        refill_rate: Tokens per second
-        """
-        self.capacity = capacity
-        self.refill_rate = refill_rate
-        self.tokens = capacity
-        self.last_refill = time.time()
-        self._lock = asyncio.Lock()
-    
-    async def consume(self, tokens: int = 1) -> bool:
-        """Try to consume tokens, returns True if successful"""
-        async with self._lock:
-            # Refill tokens based on time passed
-            now = time.time()
-            elapsed = now - self.last_refill
-            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
-            self.last_refill = now
-            
-            # Check if we have enough tokens
-            if self.tokens >= tokens:
-                self.tokens -= tokens
-                return True
-            return False
-    
-    async def get_remaining(self) -> int:
-        """Get remaining tokens"""
-        async with self._lock:
-            now = time.time()
-            elapsed = now - self.last_refill
-            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
-            self.last_refill = now
-            return int(self.tokens)
-
-
-class RateLimiter:
-    """Rate limiter with per-key tracking"""
-    
-    def __init__(self):
-        # Per API key: {minute_bucket, hour_bucket}
-        self.buckets: Dict[str, Dict[str, TokenBucket]] = defaultdict(dict)
-        self._cleanup_interval = 3600  # Clean up old buckets every hour
-        self._last_cleanup = time.time()
-    
-    def _get_buckets(self, api_key_id: str, per_minute: int, per_hour: int) -> Dict[str, TokenBucket]:
-        """Get or create token buckets for an API key"""
-        if api_key_id not in self.buckets:
-            # Create buckets: capacity = limit, refill_rate = limit / time_window
-            self.buckets[api_key_id] = {
-                'minute': TokenBucket(per_minute, per_minute / 60.0),  # Refill per second
-                'hour': TokenBucket(per_hour, per_hour / 3600.0),  # Refill per second
-            }
-        return self.buckets[api_key_id]
-    
-    async def is_allowed(
-        self, 
-        api_key_id: str, 
-        rate_limit_per_minute: int, 
+REDIS_URL = os.getenv("REDIS_URL")
+RATE_LIMIT_BACKEND = os.getenv("WAGYU_RATE_LIMIT_BACKEND", "redis" if REDIS_URL else "memory")
+
+MINUTE = 60.0
+HOUR = 3600.0
+
+
+def _gcra(tat: float, now: float, limit: int, period: float) -> Tuple[bool, float, int, float]:
+    """
+    Single GCRA step for one window.
+    Returns: (allowed, new_tat, remaining, retry_after_seconds)
+    """
+    interval = period / max(limit, 1)
+    tat = max(tat, now)
+    new_tat = tat + interval
+    if new_tat - now <= period:
+        remaining = int((period - (new_tat - now)) / interval)
+        return True, new_tat, remaining, 0.0
+    remaining = max(0, int((period - (tat - now)) / interval))
+    return False, tat, remaining, new_tat - period - now
+
+
+class RateLimitBackend:
+    """Base class for rate limit backends"""
+
+    async def check(
+        self,
+        api_key_id: str,
+        rate_limit_per_minute: int,
         rate_limit_per_hour: int
-    ) -> tuple[bool, Dict[str, int]]:
+    ) -> Tuple[bool, Dict[str, Optional[int]]]:
         """
-        Check if request is allowed
+        Consume one request from both windows if allowed.
         Returns: (is_allowed, {remaining_per_minute, remaining_per_hour, reset_at})
         """
-        buckets = self._get_buckets(api_key_id, rate_limit_per_minute, rate_limit_per_hour)
-        
-        # Try to consume from both buckets
-        minute_allowed = await buckets['minute'].consume(1)
-        hour_allowed = await buckets['hour'].consume(1)
-        
-        is_allowed = minute_allowed and hour_allowed
-        
-        # Get remaining tokens
-        remaining_minute = await buckets['minute'].get_remaining()
-        remaining_hour = await buckets['hour'].get_remaining()
-        
-        # Calculate reset time (when next token will be available)
+        raise NotImplementedError
+
+    async def close(self):
+        """Release backend resources"""
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """
+    Per-process GCRA limiter.
+
+    The check does not await anywhere, so it is atomic on the event loop and
+    needs no locks. Keys are kept in least-recently-used order and idle keys
+    are evicted incrementally from the front on each check.
+    """
+
+    def __init__(self, evictions_per_check: int = 8):
+        # api_key_id -> [minute_tat, hour_tat] (monotonic seconds)
+        self._tats: "OrderedDict[str, list]" = OrderedDict()
+        self.evictions_per_check = evictions_per_check
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+    def check_sync(
+        self,
+        api_key_id: str,
+        rate_limit_per_minute: int,
+        rate_limit_per_hour: int
+    ) -> Tuple[bool, Dict[str, Optional[int]]]:
+        """Synchronous check (the async interface delegates here)"""
+        now = time.monotonic()
+        state = self._tats.get(api_key_id)
+        if state is None:
+            state = self._tats[api_key_id] = [now, now]
+        else:
+            self._tats.move_to_end(api_key_id)
+
+        minute_ok, minute_tat, remaining_minute, minute_retry = _gcra(state[0], now, rate_limit_per_minute, MINUTE)
+        hour_ok, hour_tat, remaining_hour, hour_retry = _gcra(state[1], now, rate_limit_per_hour, HOUR)
+
+        is_allowed = minute_ok and hour_ok
         reset_at = None
-        if not is_allowed:
-            # Find which bucket is limiting
-            if not minute_allowed:
-                # Reset in 60 seconds (approximate)
-                reset_at = int(time.time()) + 60
-            elif not hour_allowed:
-                # Reset in 3600 seconds (approximate)
-                reset_at = int(time.time()) + 3600
-        
+        if is_allowed:
+            state[0] = minute_tat
+            state[1] = hour_tat
+        else:
+            # Nothing is consumed from either window on a denied request
+            if minute_ok:
+                remaining_minute += 1
+            if hour_ok:
+                remaining_hour += 1
+            reset_at = int(time.time() + max(minute_retry, hour_retry)) + 1
+
+        self._evict_idle(now)
+
         return is_allowed, {
             'remaining_per_minute': remaining_minute,
             'remaining_per_hour': remaining_hour,
             'reset_at': reset_at,
         }
-    
-    async def cleanup_old_buckets(self):
-        """Clean up buckets for inactive API keys"""
-        now = time.time()
-        if now - self._last_cleanup < self._cleanup_interval:
-            return
-        
-        # Remove buckets that haven't been used in 24 hours
-        # (In production, use Redis with TTL instead)
-        keys_to_remove = []
-        for key_id in self.buckets:
-            # Simple cleanup - in production, track last access time
-            pass
-        
-        self._last_cleanup = now
+
+    async def check(
+        self,
+        api_key_id: str,
+        rate_limit_per_minute: int,
+        rate_limit_per_hour: int
+    ) -> Tuple[bool, Dict[str, Optional[int]]]:
+        return self.check_sync(api_key_id, rate_limit_per_minute, rate_limit_per_hour)
+
+    def _evict_idle(self, now: float):
+        """Drop least-recently-used keys whose windows are fully replenished"""
+        for _ in range(self.evictions_per_check):
+            if not self._tats:
+                return
+            key, state = next(iter(self._tats.items()))
+            if max(state) > now:
+                return
+            del self._tats[key]
+
+    def cleanup_old_buckets(self) -> int:
+        """Full sweep of idle keys. Returns number of keys removed"""
+        now = time.monotonic()
+        idle = [key for key, state in self._tats.items() if max(state) <= now]
+        for key in idle:
+            del self._tats[key]
+        return len(idle)
+
+
+# KEYS[1] = minute TAT key, KEYS[2] = hour TAT key
+# ARGV[1] = per-minute limit, ARGV[2] = per-hour limit
+# Returns {allowed, remaining_minute, remaining_hour, retry_after_us}
+_GCRA_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+
+local function step(key, limit, period)
+  local interval = math.floor(period / math.max(limit, 1))
+  local tat = tonumber(redis.call('GET', key)) or now
+  if tat < now then tat = now end
+  local new_tat = tat + interval
+  if new_tat - now <= period then
+    return 1, new_tat, math.floor((period - (new_tat - now)) / interval), 0
+  end
+  local remaining = math.floor((period - (tat - now)) / interval)
+  if remaining < 0 then remaining = 0 end
+  return 0, tat, remaining, new_tat - period - now
+end
+
+local m_ok, m_tat, m_rem, m_retry = step(KEYS[1], tonumber(ARGV[1]), 60000000)
+local h_ok, h_tat, h_rem, h_retry = step(KEYS[2], tonumber(ARGV[2]), 3600000000)
+
+if m_ok == 1 and h_ok == 1 then
+  redis.call('SET', KEYS[1], string.format('%.0f', m_tat), 'PX', math.ceil((m_tat - now) / 1000) + 1)
+  redis.call('SET', KEYS[2], string.format('%.0f', h_tat), 'PX', math.ceil((h_tat - now) / 1000) + 1)
+  return {1, m_rem, h_rem, 0}
+end
+
+if m_ok == 1 then m_rem = m_rem + 1 end
+if h_ok == 1 then h_rem = h_rem + 1 end
+return {0, m_rem, h_rem, math.max(m_retry, h_retry)}
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """
+    Redis-backed GCRA limiter shared by every worker and host.
+
+    Both windows are checked and updated in one atomic Lua call using the
+    Redis server clock, so hosts with skewed clocks still agree. TAT keys
+    expire on their own once the window is replenished. If Redis is
+    unreachable, requests are limited per process instead of failing.
+    """
+
+    def __init__(self, url: str, key_prefix: str = "wagyu:ratelimit"):
+        self.url = url
+        self.key_prefix = key_prefix
+        self.redis = aioredis.from_url(url, socket_connect_timeout=1, socket_timeout=1)
+        self._script = self.redis.register_script(_GCRA_LUA)
+        self._fallback = InMemoryRateLimitBackend()
+
+    async def check(
+        self,
+        api_key_id: str,
+        rate_limit_per_minute: int,
+        rate_limit_per_hour: int
+    ) -> Tuple[bool, Dict[str, Optional[int]]]:
+        keys = [f"{self.key_prefix}:{api_key_id}:m", f"{self.key_prefix}:{api_key_id}:h"]
+        try:
+            allowed, remaining_minute, remaining_hour, retry_after_us = await self._script(
+                keys=keys,
+                args=[rate_limit_per_minute, rate_limit_per_hour],
+            )
+        except Exception as e:
+            logger.warning(f"Redis rate limit check failed, using in-process limits: {e}")
+            return self._fallback.check_sync(api_key_id, rate_limit_per_minute, rate_limit_per_hour)
+
+        is_allowed = bool(allowed)
+        return is_allowed, {
+            'remaining_per_minute': int(remaining_minute),
+            'remaining_per_hour': int(remaining_hour),
+            'reset_at': None if is_allowed else int(time.time() + math.ceil(int(retry_after_us) / 1_000_000)),
+        }
+
+    async def close(self):
+        await self.redis.close()
 
 
 # Global rate limiter instance
-_rate_limiter = RateLimiter()
+_rate_limiter: Optional[RateLimitBackend] = None
+
+
+def get_rate_limiter() -> RateLimitBackend:
+    """Get or create the configured rate limit backend"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        if RATE_LIMIT_BACKEND == "redis" and REDIS_AVAILABLE and REDIS_URL:
+            _rate_limiter = RedisRateLimitBackend(REDIS_URL)
+            logger.info("Using Redis rate limit backend")
+        else:
+            if RATE_LIMIT_BACKEND == "redis":
+                logger.warning("Redis rate limit backend unavailable. Using in-process limits.")
+            _rate_limiter = InMemoryRateLimitBackend()
+    return _rate_limiter
 
 
 async def check_rate_limit(
     api_key_id: str,
     rate_limit_per_minute: int,
     rate_limit_per_hour: int
-) -> tuple[bool, Dict[str, int]]:
+) -> Tuple[bool, Dict[str, Optional[int]]]:
     """
     Check if API key is within rate limits
     Returns: (is_allowed, rate_limit_info)
     """
-    return await _rate_limiter.is_allowed(
+    return await get_rate_limiter().check(
         api_key_id,
         rate_limit_per_minute,
         rate_limit_per_hour
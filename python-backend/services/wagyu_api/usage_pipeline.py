@@ -0,0 +1,322 @@
+"""
+API Usage Pipeline for WagyuTech API
+Buffers usage events in memory and writes them to Supabase in batches
+
+- Bounded in-memory queue (requests never wait on the database)
+- Background flusher doing multi-row inserts on batch size or interval
+- Local JSONL spool file when the sink is unavailable, replayed on recovery
+- Pre-aggregated hourly counters per (api key, endpoint) for billing reads
+"""
+
+import asyncio
+import json
+import os
+import logging
+from typing import Optional, Dict, Any, List, Tuple
+from dataclasses import dataclass, asdict, field
+from datetime import datetime, timezone
+from supabase import create_client, Client
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_URL = os.getenv("SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+
+USAGE_QUEUE_MAX_SIZE = int(os.getenv("WAGYU_USAGE_QUEUE_MAX_SIZE", 10000))
+USAGE_BATCH_SIZE = int(os.getenv("WAGYU_USAGE_BATCH_SIZE", 500))
+USAGE_FLUSH_INTERVAL = float(os.getenv("WAGYU_USAGE_FLUSH_INTERVAL", 2.0))
+USAGE_SPOOL_PATH = os.getenv("WAGYU_USAGE_SPOOL_PATH", "/tmp/wagyu_api_usage_spool.jsonl")
+
+# Rollup key: (api_key_id, user_id, endpoint, bucket_start ISO hour)
+RollupKey = Tuple[str, str, str, str]
+
+
+@dataclass
+class UsageEvent:
+    """Single API request usage record"""
+    api_key_id: str
+    user_id: str
+    endpoint: str
+    method: str
+    response_time_ms: int
+    status_code: int
+    ip_address: Optional[str] = None
+    user_agent: Optional[str] = None
+    created_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+
+    def to_row(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class UsageRollup:
+    """Aggregated usage counters for one key/endpoint/hour bucket"""
+    request_count: int = 0
+    error_count: int = 0
+    total_response_time_ms: int = 0
+
+    def add(self, event: UsageEvent):
+        self.request_count += 1
+        if event.status_code >= 400:
+            self.error_count += 1
+        self.total_response_time_ms += max(0, event.response_time_ms)
+
+
+def _hour_bucket(created_at: str) -> str:
+    """Truncate an ISO timestamp to the start of its hour"""
+    try:
+        ts = datetime.fromisoformat(created_at)
+    except ValueError:
+        ts = datetime.now(timezone.utc)
+    return ts.replace(minute=0, second=0, microsecond=0).isoformat()
+
+
+class UsagePipeline:
+    """Asynchronous, batched sink for API usage events"""
+
+    def __init__(
+        self,
+        max_queue_size: int = USAGE_QUEUE_MAX_SIZE,
+        batch_size: int = USAGE_BATCH_SIZE,
+        flush_interval: float = USAGE_FLUSH_INTERVAL,
+        spool_path: str = USAGE_SPOOL_PATH,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue_size)
+        self.supabase: Optional[Client] = None
+        if SUPABASE_URL and SUPABASE_KEY:
+            self.supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+        # Rollups accumulated since the last successful flush
+        self._rollups: Dict[RollupKey, UsageRollup] = {}
+        self._flusher_task: Optional[asyncio.Task] = None
+        self._running = False
+        self._sink_healthy = True
+
+        # Stats
+        self.events_enqueued = 0
+        self.events_dropped = 0
+        self.events_written = 0
+        self.events_spooled = 0
+        self.flush_failures = 0
+
+    async def start(self):
+        """Start the background flusher"""
+        if self._flusher_task and not self._flusher_task.done():
+            return
+        self._running = True
+        self._flusher_task = asyncio.create_task(self._flush_loop())
+        logger.info("Usage pipeline started")
+
+    async def stop(self):
+        """Stop the flusher and drain everything still buffered"""
+        self._running = False
+        if self._flusher_task:
+            self._flusher_task.cancel()
+            try:
+                await self._flusher_task
+            except asyncio.CancelledError:
+                pass
+            self._flusher_task = None
+
+        while not self.queue.empty():
+            await self._flush_batch(self._drain(self.batch_size))
+        await self._flush_rollups()
+        logger.info(
+            f"Usage pipeline stopped (written={self.events_written}, "
+            f"spooled={self.events_spooled}, dropped={self.events_dropped})"
+        )
+
+    def record(self, event: UsageEvent) -> bool:
+        """
+        Enqueue a usage event without waiting.
+        Returns False if the queue is full and the event was dropped.
+        """
+        if not self.supabase:
+            return False
+
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.events_dropped += 1
+            if self.events_dropped % 1000 == 1:
+                logger.warning(f"Usage queue full, dropped {self.events_dropped} events so far")
+            return False
+
+        key = (event.api_key_id, event.user_id, event.endpoint, _hour_bucket(event.created_at))
+        rollup = self._rollups.get(key)
+        if rollup is None:
+            rollup = self._rollups[key] = UsageRollup()
+        rollup.add(event)
+        self.events_enqueued += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pipeline statistics"""
+        return {
+            'queue_size': self.queue.qsize(),
+            'pending_rollups': len(self._rollups),
+            'events_enqueued': self.events_enqueued,
+            'events_written': self.events_written,
+            'events_spooled': self.events_spooled,
+            'events_dropped': self.events_dropped,
+            'flush_failures': self.flush_failures,
+        }
+
+    def _drain(self, limit: int) -> List[UsageEvent]:
+        """Pop up to `limit` events from the queue without waiting"""
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return batch
+
+    async def _flush_loop(self):
+        """Flush when a full batch is available or the interval elapses"""
+        loop = asyncio.get_event_loop()
+        while self._running:
+            try:
+                deadline = loop.time() + self.flush_interval
+                batch: List[UsageEvent] = []
+                while len(batch) < self.batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                    batch.extend(self._drain(self.batch_size - len(batch)))
+
+                if await self._flush_batch(batch):
+                    await self._replay_spool()
+                await self._flush_rollups()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Usage flush loop error: {e}")
+                await asyncio.sleep(1)
+
+    async def _flush_batch(self, batch: List[UsageEvent]) -> bool:
+        """
+        Write a batch with a single multi-row insert, spooling on failure.
+        Returns False if the sink rejected the batch (or the last one, when empty).
+        """
+        if not batch:
+            return self._sink_healthy
+
+        rows = [event.to_row() for event in batch]
+        if await self._insert_rows(rows):
+            self.events_written += len(rows)
+            return True
+
+        self._spool(rows)
+        return False
+
+    async def _insert_rows(self, rows: List[Dict[str, Any]]) -> bool:
+        """Insert rows into api_usage_logs off the event loop"""
+        if not self.supabase:
+            return False
+
+        def _insert():
+            self.supabase.table('api_usage_logs').insert(rows).execute()
+
+        try:
+            await asyncio.get_event_loop().run_in_executor(None, _insert)
+            self._sink_healthy = True
+            return True
+        except Exception as e:
+            self._sink_healthy = False
+            self.flush_failures += 1
+            logger.error(f"Failed to write {len(rows)} usage rows: {e}")
+            return False
+
+    async def _flush_rollups(self):
+        """Merge accumulated counters into api_usage_rollups"""
+        if not self._rollups or not self.supabase:
+            return
+
+        rollups, self._rollups = self._rollups, {}
+        payload = [
+            {
+                'api_key_id': key[0],
+                'user_id': key[1],
+                'endpoint': key[2],
+                'bucket_start': key[3],
+                'request_count': rollup.request_count,
+                'error_count': rollup.error_count,
+                'total_response_time_ms': rollup.total_response_time_ms,
+            }
+            for key, rollup in rollups.items()
+        ]
+
+        def _merge():
+            self.supabase.rpc('increment_api_usage_rollups', {'rows': payload}).execute()
+
+        try:
+            await asyncio.get_event_loop().run_in_executor(None, _merge)
+        except Exception as e:
+            self.flush_failures += 1
+            logger.error(f"Failed to merge usage rollups: {e}")
+            # Put counters back so they are retried with the next flush
+            for key, rollup in rollups.items():
+                current = self._rollups.get(key)
+                if current is None:
+                    self._rollups[key] = rollup
+                else:
+                    current.request_count += rollup.request_count
+                    current.error_count += rollup.error_count
+                    current.total_response_time_ms += rollup.total_response_time_ms
+
+    def _spool(self, rows: List[Dict[str, Any]]):
+        """Append rows to the local spool file"""
+        try:
+            with open(self.spool_path, 'a') as f:
+                for row in rows:
+                    f.write(json.dumps(row, default=str) + '\n')
+            self.events_spooled += len(rows)
+        except Exception as e:
+            self.events_dropped += len(rows)
+            logger.error(f"Failed to spool {len(rows)} usage rows: {e}")
+
+    async def _replay_spool(self):
+        """Re-insert spooled rows once the sink is reachable again"""
+        if not self.supabase or not os.path.exists(self.spool_path):
+            return
+
+        replay_path = f"{self.spool_path}.replay"
+        try:
+            os.replace(self.spool_path, replay_path)
+            with open(replay_path) as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+        except Exception as e:
+            logger.error(f"Failed to read usage spool: {e}")
+            return
+
+        for i in range(0, len(rows), self.batch_size):
+            chunk = rows[i:i + self.batch_size]
+            if await self._insert_rows(chunk):
+                self.events_written += len(chunk)
+            else:
+                # Sink went down again: keep the remainder for the next attempt
+                self._spool(rows[i:])
+                break
+
+        os.remove(replay_path)
+        logger.info(f"Replayed {len(rows)} spooled usage rows")
+
+
+# Global pipeline instance
+_usage_pipeline: Optional[UsagePipeline] = None
+
+
+def get_usage_pipeline() -> UsagePipeline:
+    """Get or create the usage pipeline singleton"""
+    global _usage_pipeline
+    if _usage_pipeline is None:
+        _usage_pipeline = UsagePipeline()
+    return _usage_pipeline
@@ -11,11 +11,12 @@ Features:
 - Automatic message dropping when queue is full
 - Priority-based message handling
 - Connection health monitoring
+- Broadcasts measured once and shared by every recipient's queue
 """
 
 import asyncio
 import logging
-from typing import Dict, Optional, Deque
+from typing import Dict, Optional, Deque, Iterable
 from collections import deque
 from dataclasses import dataclass
 from enum import IntEnum
@@ -36,11 +37,12 @@ class MessagePriority(IntEnum):
 
 @dataclass
 class QueuedMessage:
-    """Message in the send queue"""
+    """Message in the send queue (shared by every queue it was broadcast to; never mutated)"""
     data: str
     priority: MessagePriority
     timestamp: float
     message_type: str
+    size: int = 0  # UTF-8 bytes of data
 
 
 class BackpressureController:
@@ -68,6 +70,7 @@ class BackpressureController:
         self.queues: Dict[WebSocket, Deque[QueuedMessage]] = {}
         self.queue_bytes: Dict[WebSocket, int] = {}
         self.send_tasks: Dict[WebSocket, asyncio.Task] = {}
+        self.wakeups: Dict[WebSocket, asyncio.Event] = {}  # set when a queue gains a message
         self.last_send_time: Dict[WebSocket, float] = {}
         self.send_rate: Dict[WebSocket, float] = {}  # messages per second
         
@@ -79,6 +82,7 @@ class BackpressureController:
         """Register a new WebSocket client"""
         self.queues[websocket] = deque(maxlen=self.max_queue_size)
         self.queue_bytes[websocket] = 0
+        self.wakeups[websocket] = asyncio.Event()
         self.health_scores[websocket] = 1.0
         self.consecutive_drops[websocket] = 0
         self.last_send_time[websocket] = datetime.now().timestamp()
@@ -95,6 +99,8 @@ class BackpressureController:
             del self.queues[websocket]
         if websocket in self.queue_bytes:
             del self.queue_bytes[websocket]
+        if websocket in self.wakeups:
+            del self.wakeups[websocket]
         if websocket in self.health_scores:
             del self.health_scores[websocket]
         if websocket in self.consecutive_drops:
@@ -122,11 +128,45 @@ class BackpressureController:
         
         Returns True if enqueued, False if dropped.
         """
+        return self._enqueue(websocket, QueuedMessage(
+            data=message,
+            priority=priority,
+            timestamp=datetime.now().timestamp(),
+            message_type=message_type,
+            size=len(message.encode('utf-8')),
+        ))
+    
+    def broadcast(
+        self,
+        websockets: Iterable[WebSocket],
+        message: str,
+        priority: MessagePriority = MessagePriority.NORMAL,
+        message_type: str = "unknown"
+    ) -> int:
+        """
+        Enqueue one serialized message for many clients.
+        
+        The message is measured once and the same QueuedMessage goes into
+        every queue. Returns the number of clients it was enqueued for.
+        """
+        queued = QueuedMessage(
+            data=message,
+            priority=priority,
+            timestamp=datetime.now().timestamp(),
+            message_type=message_type,
+            size=len(message.encode('utf-8')),
+        )
+        return sum(self._enqueue(websocket, queued) for websocket in websockets)
+    
+    def _enqueue(self, websocket: WebSocket, queued: QueuedMessage) -> bool:
+        """Apply the drop policy and insert by priority"""
         if websocket not in self.queues:
             return False
         
         queue = self.queues[websocket]
-        message_bytes = len(message.encode('utf-8'))
+        priority = queued.priority
+        message_type = queued.message_type
+        message_bytes = queued.size
         current_bytes = self.queue_bytes.get(websocket, 0)
         
         # Check if we need to drop messages
@@ -154,26 +194,23 @@ class BackpressureController:
             # For critical, drop oldest low-priority
             self._make_room_for_bytes(websocket, message_bytes)
         
-        # Add message (insert by priority)
-        queued = QueuedMessage(
-            data=message,
-            priority=priority,
-            timestamp=datetime.now().timestamp(),
-            message_type=message_type
-        )
-        
-        # Insert in priority order (higher priority first)
-        inserted = False
-        for i, existing in enumerate(queue):
-            if priority > existing.priority:
-                queue.insert(i, queued)
-                inserted = True
-                break
+        # Still full after making room (all queued messages outrank this one)
+        if len(queue) >= self.max_queue_size:
+            self.consecutive_drops[websocket] = self.consecutive_drops.get(websocket, 0) + 1
+            return False
         
-        if not inserted:
+        # Insert in priority order (higher priority first); the queue is
+        # kept sorted, so the common same-priority case is an append
+        if not queue or queue[-1].priority >= priority:
             queue.append(queued)
+        else:
+            for i, existing in enumerate(queue):
+                if priority > existing.priority:
+                    queue.insert(i, queued)
+                    break
         
-        self.queue_bytes[websocket] = current_bytes + message_bytes
+        self.queue_bytes[websocket] += message_bytes
+        self.wakeups[websocket].set()
         
         # Reset drop counter on successful enqueue
         if self.consecutive_drops.get(websocket, 0) > 0:
@@ -191,7 +228,7 @@ class BackpressureController:
         for msg in list(queue):
             if msg.priority < priority:
                 queue.remove(msg)
-                self.queue_bytes[websocket] -= len(msg.data.encode('utf-8'))
+                self.queue_bytes[websocket] -= msg.size
                 removed += 1
                 if len(queue) < self.max_queue_size * 0.5:
                     break
@@ -208,14 +245,14 @@ class BackpressureController:
         removed_bytes = 0
         while queue and removed_bytes < needed_bytes:
             msg = queue.popleft()
-            msg_bytes = len(msg.data.encode('utf-8'))
-            self.queue_bytes[websocket] -= msg_bytes
-            removed_bytes += msg_bytes
+            self.queue_bytes[websocket] -= msg.size
+            removed_bytes += msg.size
     
     async def _send_loop(self, websocket: WebSocket):
         """Main send loop for a client"""
         queue = self.queues.get(websocket)
-        if not queue:
+        wakeup = self.wakeups.get(websocket)
+        if queue is None or wakeup is None:
             return
         
         min_send_interval = 0.01  # 10ms minimum between sends
@@ -224,13 +261,14 @@ class BackpressureController:
         while websocket in self.queues:
             try:
                 if not queue:
-                    await asyncio.sleep(0.01)
+                    # Idle until enqueue() adds something
+                    wakeup.clear()
+                    await wakeup.wait()
                     continue
                 
                 # Get next message
                 msg = queue.popleft()
-                msg_bytes = len(msg.data.encode('utf-8'))
-                self.queue_bytes[websocket] -= msg_bytes
+                self.queue_bytes[websocket] -= msg.size
                 
                 # Throttle based on send rate
                 current_time = datetime.now().timestamp()
@@ -122,78 +122,146 @@ CREATE INDEX IF NOT EXISTS idx_backtest_data_backtest_id ON backtest_data(backte
 CREATE INDEX IF NOT EXISTS idx_backtest_data_symbol ON backtest_data(symbol);
 CREATE INDEX IF NOT EXISTS idx_backtest_data_created_at ON backtest_data(created_at);
 
--- Create continuous aggregates for common queries
--- 1-hour OHLCV from tick data
-CREATE MATERIALIZED VIEW IF NOT EXISTS market_data_1h_agg
-WITH (timescaledb.continuous) AS
+-- Create continuous aggregates for higher timeframes
+-- Only base-resolution (1m) bars are stored in market_data; every higher
+-- timeframe is a hierarchical rollup of the one below it (TimescaleDB 2.9+).
+-- The lean-service DataBridge reads the coarsest rollup a requested timeframe
+-- can be built from (e.g. 8h/12h from 4h, 1w/1M from 1d) and refreshes the
+-- range it backfills. MARKET_DATA_BASE_TIMEFRAME must match the base filter.
+-- Real-time aggregation (materialized_only = false) covers bars newer than
+-- the last refresh.
+
+-- Earlier *_agg aggregates: 1h/4h/1d were built from tick_data and 1h rows
+-- with a different column set, and CREATE ... IF NOT EXISTS would silently
+-- keep them, so the rollups use new names and the old views are dropped
+-- (coarsest first: each one is built on the one below it)
+DROP MATERIALIZED VIEW IF EXISTS market_data_1d_agg CASCADE;
+DROP MATERIALIZED VIEW IF EXISTS market_data_4h_agg CASCADE;
+DROP MATERIALIZED VIEW IF EXISTS market_data_1h_agg CASCADE;
+DROP MATERIALIZED VIEW IF EXISTS market_data_15m_agg CASCADE;
+DROP MATERIALIZED VIEW IF EXISTS market_data_5m_agg CASCADE;
+
+-- 5-minute OHLCV from 1-minute base bars
+CREATE MATERIALIZED VIEW IF NOT EXISTS market_data_5m_rollup
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT 
+    time_bucket('5 minutes', time) AS time,
+    symbol,
+    exchange,
+    first(open, time) AS open,
+    max(high) AS high,
+    min(low) AS low,
+    last(close, time) AS close,
+    sum(volume) AS volume,
+    sum(trade_count) AS trade_count,
+    sum(coalesce(vwap, close) * volume) / nullif(sum(volume), 0) AS vwap
+FROM market_data
+WHERE timeframe = '1m'
+GROUP BY time_bucket('5 minutes', time), symbol, exchange
+WITH NO DATA;
+
+-- 15-minute OHLCV from 5-minute rollup
+CREATE MATERIALIZED VIEW IF NOT EXISTS market_data_15m_rollup
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+SELECT 
+    time_bucket('15 minutes', time) AS time,
+    symbol,
+    exchange,
+    first(open, time) AS open,
+    max(high) AS high,
+    min(low) AS low,
+    last(close, time) AS close,
+    sum(volume) AS volume,
+    sum(trade_count) AS trade_count,
+    sum(coalesce(vwap, close) * volume) / nullif(sum(volume), 0) AS vwap
+FROM market_data_5m_rollup
+GROUP BY time_bucket('15 minutes', time), symbol, exchange
+WITH NO DATA;
+
+-- 1-hour OHLCV from 15-minute rollup
+CREATE MATERIALIZED VIEW IF NOT EXISTS market_data_1h_rollup
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
 SELECT 
     time_bucket('1 hour', time) AS time,
     symbol,
     exchange,
-    '1h' AS timeframe,
-    first(price, time) AS open,
-    max(price) AS high,
-    min(price) AS low,
-    last(price, time) AS close,
-    sum(size) AS volume,
-    count(*) AS trade_count,
-    sum(price * size) / sum(size) AS vwap
-FROM tick_data
-GROUP BY time_bucket('1 hour', time), symbol, exchange;
-
--- 4-hour OHLCV from 1-hour data
-CREATE MATERIALIZED VIEW IF NOT EXISTS market_data_4h_agg
-WITH (timescaledb.continuous) AS
+    first(open, time) AS open,
+    max(high) AS high,
+    min(low) AS low,
+    last(close, time) AS close,
+    sum(volume) AS volume,
+    sum(trade_count) AS trade_count,
+    sum(coalesce(vwap, close) * volume) / nullif(sum(volume), 0) AS vwap
+FROM market_data_15m_rollup
+GROUP BY time_bucket('1 hour', time), symbol, exchange
+WITH NO DATA;
+
+-- 4-hour OHLCV from 1-hour rollup
+CREATE MATERIALIZED VIEW IF NOT EXISTS market_data_4h_rollup
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
 SELECT 
     time_bucket('4 hours', time) AS time,
     symbol,
     exchange,
-    '4h' AS timeframe,
-    first(close, time) AS open,
+    first(open, time) AS open,
     max(high) AS high,
     min(low) AS low,
     last(close, time) AS close,
     sum(volume) AS volume,
     sum(trade_count) AS trade_count,
-    sum(close * volume) / sum(volume) AS vwap
-FROM market_data
-WHERE timeframe = '1h'
-GROUP BY time_bucket('4 hours', time), symbol, exchange;
-
--- Daily OHLCV from 1-hour data
-CREATE MATERIALIZED VIEW IF NOT EXISTS market_data_1d_agg
-WITH (timescaledb.continuous) AS
+    sum(coalesce(vwap, close) * volume) / nullif(sum(volume), 0) AS vwap
+FROM market_data_1h_rollup
+GROUP BY time_bucket('4 hours', time), symbol, exchange
+WITH NO DATA;
+
+-- Daily OHLCV from 4-hour rollup
+CREATE MATERIALIZED VIEW IF NOT EXISTS market_data_1d_rollup
+WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
 SELECT 
     time_bucket('1 day', time) AS time,
     symbol,
     exchange,
-    '1d' AS timeframe,
-    first(close, time) AS open,
+    first(open, time) AS open,
     max(high) AS high,
     min(low) AS low,
     last(close, time) AS close,
     sum(volume) AS volume,
     sum(trade_count) AS trade_count,
-    sum(close * volume) / sum(volume) AS vwap
-FROM market_data
-WHERE timeframe = '1h'
-GROUP BY time_bucket('1 day', time), symbol, exchange;
-
--- Add refresh policies for continuous aggregates
-SELECT add_continuous_aggregate_policy('market_data_1h_agg',
-    start_offset => INTERVAL '2 hours',
+    sum(coalesce(vwap, close) * volume) / nullif(sum(volume), 0) AS vwap
+FROM market_data_4h_rollup
+GROUP BY time_bucket('1 day', time), symbol, exchange
+WITH NO DATA;
+
+-- Add refresh policies for continuous aggregates (finest first)
+SELECT add_continuous_aggregate_policy('market_data_5m_rollup',
+    start_offset => INTERVAL '1 hour',
+    end_offset => INTERVAL '5 minutes',
+    schedule_interval => INTERVAL '5 minutes',
+    if_not_exists => true);
+
+SELECT add_continuous_aggregate_policy('market_data_15m_rollup',
+    start_offset => INTERVAL '3 hours',
+    end_offset => INTERVAL '15 minutes',
+    schedule_interval => INTERVAL '15 minutes',
+    if_not_exists => true);
+
+SELECT add_continuous_aggregate_policy('market_data_1h_rollup',
+    start_offset => INTERVAL '6 hours',
     end_offset => INTERVAL '1 hour',
-    schedule_interval => INTERVAL '1 hour');
+    schedule_interval => INTERVAL '1 hour',
+    if_not_exists => true);
 
-SELECT add_continuous_aggregate_policy('market_data_4h_agg',
-    start_offset => INTERVAL '8 hours',
+SELECT add_continuous_aggregate_policy('market_data_4h_rollup',
+    start_offset => INTERVAL '1 day',
     end_offset => INTERVAL '4 hours',
-    schedule_interval => INTERVAL '4 hours');
+    schedule_interval => INTERVAL '4 hours',
+    if_not_exists => true);
 
-SELECT add_continuous_aggregate_policy('market_data_1d_agg',
-    start_offset => INTERVAL '2 days',
+SELECT add_continuous_aggregate_policy('market_data_1d_rollup',
+    start_offset => INTERVAL '3 days',
     end_offset => INTERVAL '1 day',
-    schedule_interval => INTERVAL '1 day');
+    schedule_interval => INTERVAL '1 day',
+    if_not_exists => true);
 
 -- Create functions for data management
 
@@ -48,6 +48,9 @@ export function useBackendTrendingStream(
     const heartbeatTimeoutRef = useRef<NodeJS.Timeout | null>(null);
     const reconnectDelayRef = useRef(WS_RECONNECT_DELAY);
     const mountedRef = useRef(true);
+    // Raw feed state (keyed by mint) and version, for applying server diffs
+    const feedRef = useRef<Map<string, PumpFunCoin>>(new Map());
+    const versionRef = useRef(-1);
 
     // Reset heartbeat timer
     const resetHeartbeat = useCallback(() => {
@@ -78,6 +81,39 @@ export function useBackendTrendingStream(
         onUpdate?.(processedTokens);
     }, [onUpdate]);
 
+    // Replace the feed with a full snapshot
+    const applySnapshot = useCallback((snapshot: PumpFunCoin[], version?: number) => {
+        if (!Array.isArray(snapshot)) return;
+        feedRef.current = new Map(snapshot.map(token => [token.mint, token]));
+        versionRef.current = typeof version === 'number' ? version : -1;
+        processTokens(snapshot);
+    }, [processTokens]);
+
+    // Apply an added/changed/removed diff on top of the current feed
+    const applyDiff = useCallback((diff: {
+        version?: number;
+        added?: PumpFunCoin[];
+        changed?: PumpFunCoin[];
+        removed?: string[];
+        order?: string[];
+    }) => {
+        // A resync snapshot can overtake diffs queued before it; skip those
+        if (typeof diff.version === 'number' && diff.version <= versionRef.current) return;
+
+        const current = feedRef.current;
+        for (const mint of diff.removed ?? []) {
+            current.delete(mint);
+        }
+        for (const token of [...(diff.added ?? []), ...(diff.changed ?? [])]) {
+            current.set(token.mint, token);
+        }
+        const ordered = (diff.order ?? Array.from(current.keys()))
+            .map(mint => current.get(mint))
+            .filter((token): token is PumpFunCoin => Boolean(token));
+
+        applySnapshot(ordered, diff.version);
+    }, [applySnapshot]);
+
     // Connect to WebSocket
     const connect = useCallback(() => {
         if (wsRef.current?.readyState === WebSocket.OPEN) return;
@@ -99,6 +135,7 @@ export function useBackendTrendingStream(
                 setConnected(true);
                 setConnecting(false);
                 setError(null);
+                versionRef.current = -1;
                 reconnectDelayRef.current = WS_RECONNECT_DELAY;
                 onConnectionChange?.(true);
                 resetHeartbeat();
@@ -118,10 +155,14 @@ export function useBackendTrendingStream(
                         case 'initial_tokens':
                             console.log(`Received ${data.tokens?.length || 0} initial trending tokens`);
                             if (data.tokens) {
-                                processTokens(data.tokens);
+                                applySnapshot(data.tokens, data.version);
                             }
                             break;
 
+                        case 'tokens_diff':
+                            applyDiff(data);
+                            break;
+
                         case 'trending_update':
                             console.log(`Received trending update: ${data.tokens?.length || 0} tokens`);
                             if (data.tokens) {
@@ -180,7 +221,7 @@ export function useBackendTrendingStream(
             setConnecting(false);
             setError('Failed to connect');
         }
-    }, [onConnectionChange, processTokens, resetHeartbeat]);
+    }, [onConnectionChange, processTokens, applySnapshot, applyDiff, resetHeartbeat]);
 
     // Disconnect
     const disconnect = useCallback(() => {
@@ -50,6 +50,9 @@ export function useMigratedTokenStream(
     const heartbeatTimeoutRef = useRef<NodeJS.Timeout | null>(null);
     const reconnectDelayRef = useRef(WS_RECONNECT_DELAY);
     const mountedRef = useRef(true);
+    // Current feed by mint, and the server version it reflects
+    const feedRef = useRef<Map<string, PumpFunCoin>>(new Map());
+    const versionRef = useRef(-1);
 
     // Reset heartbeat timer
     const resetHeartbeat = useCallback(() => {
@@ -63,7 +66,10 @@ export function useMigratedTokenStream(
     }, []);
 
     // Process and add a single token (prepend to list)
-    const addToken = useCallback((token: PumpFunCoin) => {
+    const addToken = useCallback((token: PumpFunCoin, version?: number) => {
+        feedRef.current = new Map([[token.mint, token], ...Array.from(feedRef.current).filter(([mint]) => mint !== token.mint)]);
+        if (typeof version === 'number') versionRef.current = version;
+
         const processedToken = {
             ...token,
             image_uri: proxyImageUrl(token.image_uri),
@@ -93,6 +99,39 @@ export function useMigratedTokenStream(
         }
     }, [maxTokens]);
 
+    // Replace the feed with a full snapshot
+    const applySnapshot = useCallback((snapshot: PumpFunCoin[], version?: number) => {
+        if (!Array.isArray(snapshot)) return;
+        feedRef.current = new Map(snapshot.map(token => [token.mint, token]));
+        versionRef.current = typeof version === 'number' ? version : -1;
+        processTokens(snapshot);
+    }, [processTokens]);
+
+    // Apply an added/changed/removed diff on top of the current feed
+    const applyDiff = useCallback((diff: {
+        version?: number;
+        added?: PumpFunCoin[];
+        changed?: PumpFunCoin[];
+        removed?: string[];
+        order?: string[];
+    }) => {
+        // A resync snapshot can overtake diffs queued before it; skip those
+        if (typeof diff.version === 'number' && diff.version <= versionRef.current) return;
+
+        const current = feedRef.current;
+        for (const mint of diff.removed ?? []) {
+            current.delete(mint);
+        }
+        for (const token of [...(diff.added ?? []), ...(diff.changed ?? [])]) {
+            current.set(token.mint, token);
+        }
+        const ordered = (diff.order ?? Array.from(current.keys()))
+            .map(mint => current.get(mint))
+            .filter((token): token is PumpFunCoin => Boolean(token));
+
+        applySnapshot(ordered, diff.version);
+    }, [applySnapshot]);
+
     // Connect to WebSocket
     const connect = useCallback(() => {
         if (wsRef.current?.readyState === WebSocket.OPEN) return;
@@ -133,21 +172,25 @@ export function useMigratedTokenStream(
                         case 'initial_tokens':
                             console.log(`Received ${data.tokens?.length || 0} initial migrated tokens`);
                             if (data.tokens) {
-                                processTokens(data.tokens);
+                                applySnapshot(data.tokens, data.version);
                             }
                             break;
 
+                        case 'tokens_diff':
+                            applyDiff(data);
+                            break;
+
                         case 'migration_update':
                             console.log(`Received migration update: ${data.tokens?.length || 0} tokens`);
                             if (data.tokens) {
-                                processTokens(data.tokens);
+                                applySnapshot(data.tokens, data.version);
                             }
                             break;
 
                         case 'new_migration':
                             console.log(`New migration event: ${data.token?.symbol || data.token?.mint}`);
                             if (data.token) {
-                                addToken(data.token);
+                                addToken(data.token, data.version);
                             }
                             break;
 
@@ -202,7 +245,7 @@ export function useMigratedTokenStream(
             setConnecting(false);
             setError('Failed to connect');
         }
-    }, [onConnectionChange, processTokens, addToken, resetHeartbeat]);
+    }, [onConnectionChange, applySnapshot, applyDiff, addToken, resetHeartbeat]);
 
     // Disconnect
     const disconnect = useCallback(() => {
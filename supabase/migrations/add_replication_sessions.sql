@@ -0,0 +1,17 @@
+-- Replication sessions written by the lean-service replication engine
+-- (one row per replicated master trade and follower)
+CREATE TABLE IF NOT EXISTS replication_sessions (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  master_trade_id TEXT NOT NULL,
+  follower_relationship_id TEXT NOT NULL,
+  replication_delay_ms INTEGER NOT NULL DEFAULT 0,
+  status TEXT NOT NULL CHECK (status IN ('pending', 'executing', 'completed', 'failed', 'cancelled', 'partial')),
+  error_message TEXT,
+  executed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_replication_sessions_follower
+  ON replication_sessions(follower_relationship_id, executed_at DESC);
+CREATE INDEX IF NOT EXISTS idx_replication_sessions_master_trade
+  ON replication_sessions(master_trade_id);
@@ -0,0 +1,92 @@
+-- Migration: Add WagyuTech API usage rollups
+-- Description: Hourly pre-aggregated usage counters per API key and endpoint,
+-- written in batches by the API usage pipeline and read by billing stats
+
+CREATE TABLE IF NOT EXISTS public.api_usage_rollups (
+  api_key_id UUID NOT NULL REFERENCES public.api_keys(id) ON DELETE CASCADE,
+  user_id UUID NOT NULL REFERENCES auth.users(id) ON DELETE CASCADE,
+  endpoint TEXT NOT NULL,
+  bucket_start TIMESTAMPTZ NOT NULL, -- Start of the hour
+  request_count BIGINT NOT NULL DEFAULT 0,
+  error_count BIGINT NOT NULL DEFAULT 0,
+  total_response_time_ms BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+
+  PRIMARY KEY (api_key_id, endpoint, bucket_start)
+);
+
+CREATE INDEX IF NOT EXISTS idx_api_usage_rollups_user_bucket ON public.api_usage_rollups(user_id, bucket_start);
+
+-- Backfill from the raw request log so existing usage totals carry over;
+-- buckets the pipeline already wrote are left alone, so re-running is safe
+INSERT INTO public.api_usage_rollups (
+  api_key_id, user_id, endpoint, bucket_start,
+  request_count, error_count, total_response_time_ms
+)
+SELECT
+  api_key_id,
+  user_id,
+  endpoint,
+  date_trunc('hour', created_at) AS bucket_start,
+  COUNT(*) AS request_count,
+  COUNT(*) FILTER (WHERE status_code >= 400) AS error_count,
+  COALESCE(SUM(GREATEST(response_time_ms, 0)), 0) AS total_response_time_ms
+FROM public.api_usage_logs
+GROUP BY api_key_id, user_id, endpoint, date_trunc('hour', created_at)
+ON CONFLICT (api_key_id, endpoint, bucket_start) DO NOTHING;
+
+-- RLS Policies for api_usage_rollups
+ALTER TABLE public.api_usage_rollups ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view their own API usage rollups"
+  ON public.api_usage_rollups FOR SELECT
+  USING (auth.uid() = user_id);
+
+-- Merge a batch of counter deltas in one statement
+CREATE OR REPLACE FUNCTION increment_api_usage_rollups(rows JSONB)
+RETURNS void AS $$
+BEGIN
+  INSERT INTO public.api_usage_rollups AS r (
+    api_key_id, user_id, endpoint, bucket_start,
+    request_count, error_count, total_response_time_ms
+  )
+  SELECT
+    (row->>'api_key_id')::UUID,
+    (row->>'user_id')::UUID,
+    row->>'endpoint',
+    (row->>'bucket_start')::TIMESTAMPTZ,
+    (row->>'request_count')::BIGINT,
+    (row->>'error_count')::BIGINT,
+    (row->>'total_response_time_ms')::BIGINT
+  FROM jsonb_array_elements(rows) AS row
+  ON CONFLICT (api_key_id, endpoint, bucket_start) DO UPDATE SET
+    request_count = r.request_count + EXCLUDED.request_count,
+    error_count = r.error_count + EXCLUDED.error_count,
+    total_response_time_ms = r.total_response_time_ms + EXCLUDED.total_response_time_ms,
+    updated_at = now();
+END;
+$$ language 'plpgsql' SECURITY DEFINER;
+
+-- Usage totals for billing stats, summed in the database (a row select is
+-- capped by PostgREST and would undercount active users)
+CREATE OR REPLACE FUNCTION api_usage_totals(
+  p_user_id UUID,
+  p_today_start TIMESTAMPTZ,
+  p_hour_start TIMESTAMPTZ,
+  p_api_key_id UUID DEFAULT NULL
+)
+RETURNS TABLE (total_requests BIGINT, requests_today BIGINT, requests_this_hour BIGINT) AS $$
+  SELECT
+    COALESCE(SUM(request_count), 0)::BIGINT,
+    COALESCE(SUM(request_count) FILTER (WHERE bucket_start >= p_today_start), 0)::BIGINT,
+    COALESCE(SUM(request_count) FILTER (WHERE bucket_start >= p_hour_start), 0)::BIGINT
+  FROM public.api_usage_rollups
+  WHERE user_id = p_user_id
+    AND (p_api_key_id IS NULL OR api_key_id = p_api_key_id);
+$$ language 'sql' STABLE SECURITY DEFINER;
+
+-- Takes any user id, so only the backend's service role may call it
+REVOKE EXECUTE ON FUNCTION api_usage_totals(UUID, TIMESTAMPTZ, TIMESTAMPTZ, UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION api_usage_totals(UUID, TIMESTAMPTZ, TIMESTAMPTZ, UUID) TO service_role;
+
+COMMENT ON TABLE public.api_usage_rollups IS 'Hourly API usage counters per key and endpoint, maintained by the usage pipeline';